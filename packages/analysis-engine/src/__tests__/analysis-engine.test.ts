@@ -1,5 +1,8 @@
 // Analysis engine tests
 import { AnalysisEngine } from '../index';
+import { GraphBuilder } from '../graph/graph-builder';
+import { GraphOptimizer } from '../optimizers/graph-optimizer';
+import { packGraph, unpackGraph } from '../graph/graph-transfer';
 
 // Define minimal types for testing
 interface TestTrace {
@@ -124,6 +127,207 @@ describe('AnalysisEngine', () => {
       expect(result.optimization.optimizations.length).toBeGreaterThan(0);
       expect(result.processingTime).toBeLessThan(2000);
     });
+
+    it('should report optimizer passes without modifying the input graph', () => {
+      const trace: TestTrace = {
+        traceId: 'test-trace-chain',
+        spans: Array.from({ length: 20 }, (_, i) => ({
+          traceId: 'test-trace-chain',
+          spanId: `span-${i}`,
+          parentSpanId: i > 0 ? `span-${i - 1}` : undefined,
+          operationName: `operation-${i}`,
+          startTime: i * 10,
+          endTime: (i + 1) * 10,
+          duration: 10,
+          status: 'OK'
+        })),
+        startTime: 0,
+        endTime: 200,
+        duration: 200
+      };
+
+      const graph = new GraphBuilder().buildFromTrace(trace as any);
+      const nodeIds = Array.from(graph.nodes.keys());
+      const rootChildren = [...graph.nodes.get('span-0')!.children];
+
+      const { graph: optimized, result } = new GraphOptimizer().optimize(graph, { maxNodes: 5 });
+
+      expect(result.passes.map(pass => pass.name)).toEqual(
+        ['scan', 'removeNoise', 'mergeShortSpans', 'simplifyPaths', 'criticalPath']
+      );
+      expect(result.passes[0]!.nodesBefore).toBe(20);
+      expect(result.passes[result.passes.length - 1]!.nodesAfter).toBe(optimized.nodes.size);
+      expect(optimized.nodes.size).toBeLessThan(20);
+
+      expect(Array.from(graph.nodes.keys())).toEqual(nodeIds);
+      expect(graph.nodes.get('span-0')!.children).toEqual(rootChildren);
+    });
+
+    it('should reuse cached results until the trace version changes', async () => {
+      const cached = new AnalysisEngine({ cache: { maxEntries: 10 } });
+      const trace: TestTrace = {
+        traceId: 'test-trace-cached',
+        spans: Array.from({ length: 5 }, (_, i) => ({
+          traceId: 'test-trace-cached',
+          spanId: `span-${i}`,
+          parentSpanId: i > 0 ? `span-${i - 1}` : undefined,
+          operationName: `operation-${i}`,
+          startTime: i * 100,
+          endTime: (i + 1) * 100,
+          duration: 100,
+          status: 'OK'
+        })),
+        startTime: 0,
+        endTime: 500,
+        duration: 500
+      };
+
+      const first = await cached.analyzeTrace(trace as any, {}, 1);
+      expect(await cached.analyzeTrace(trace as any, {}, 1)).toBe(first);
+      expect(await cached.analyzeTrace(trace as any, { maxNodes: 3 }, 1)).not.toBe(first);
+      expect(await cached.analyzeTrace(trace as any, {}, 2)).not.toBe(first);
+
+      await cached.invalidateTrace('test-trace-cached');
+      expect(await cached.analyzeTrace(trace as any, {}, 1)).not.toBe(first);
+
+      const stats = cached.getCacheStats()!;
+      expect(stats.hits).toBe(1);
+      expect(stats.misses).toBe(4);
+      expect(stats.invalidations).toBe(3);
+      expect(engine.getCacheStats()).toBeNull();
+    });
+  });
+
+  describe('analyzeMultipleTraces', () => {
+    const buildTrace = (traceId: string, queryDuration: number): TestTrace => ({
+      traceId,
+      spans: [
+        {
+          traceId,
+          spanId: `${traceId}-root`,
+          operationName: 'GET /orders',
+          startTime: 0,
+          endTime: 100,
+          duration: 100,
+          status: 'OK',
+          tags: { 'service.name': 'api' }
+        },
+        {
+          traceId,
+          spanId: `${traceId}-query`,
+          parentSpanId: `${traceId}-root`,
+          operationName: 'SELECT orders',
+          startTime: 10,
+          endTime: 10 + queryDuration,
+          duration: queryDuration,
+          status: 'OK',
+          tags: { 'service.name': 'db' }
+        }
+      ],
+      startTime: 0,
+      endTime: 100,
+      duration: 100
+    });
+
+    it('should merge the same operation across traces with a true mean', async () => {
+      const traces = [buildTrace('t1', 20), buildTrace('t2', 40), buildTrace('t3', 60)];
+
+      const result = await engine.analyzeMultipleTraces(traces as any, { optimizeGraph: false });
+
+      expect(result.graph.nodes.size).toBe(2);
+      expect(result.graph.nodes.get('db:SELECT orders')?.duration).toBe(40);
+      expect(result.graph.edges.get('api:GET /orders->db:SELECT orders')?.metadata.count).toBe(3);
+      expect(result.graph.criticalPath).toEqual(['api:GET /orders', 'db:SELECT orders']);
+    });
+
+    it('should accumulate recorded traces into a service map', () => {
+      engine.recordTraces([buildTrace('t1', 20)] as any);
+      engine.recordTraces([buildTrace('t2', 40)] as any);
+
+      const serviceMap = engine.getServiceMap();
+
+      expect(serviceMap.traceCount).toBe(2);
+      expect(serviceMap.dependencies).toEqual([
+        { from: 'api', to: 'db', callCount: 2, averageDuration: 30 }
+      ]);
+    });
+
+    it('should give the same result when sharded across worker threads', async () => {
+      const traces = [buildTrace('t1', 20), buildTrace('t2', 40), buildTrace('t3', 60), buildTrace('t4', 80)];
+      const pooled = new AnalysisEngine({ workerPool: { size: 2 } });
+
+      try {
+        const expected = await engine.analyzeMultipleTraces(traces as any, { optimizeGraph: false });
+        const result = await pooled.analyzeMultipleTraces(traces as any, { optimizeGraph: false });
+
+        expect(Array.from(result.graph.nodes.keys())).toEqual(Array.from(expected.graph.nodes.keys()));
+        expect(result.graph.nodes.get('db:SELECT orders')?.duration).toBe(50);
+        expect(result.graph.criticalPath).toEqual(expected.graph.criticalPath);
+        expect(pooled.getPoolStats()?.completed).toBe(2);
+      } finally {
+        await pooled.close();
+      }
+    }, 20000);
+
+    // Spans are [spanId, parentSpanId, operation]; all in service 'api'
+    const chainTrace = (traceId: string, chain: Array<[string, string | undefined, string]>): TestTrace => ({
+      traceId,
+      spans: chain.map(([spanId, parentSpanId, operationName], depth) => ({
+        traceId,
+        spanId,
+        parentSpanId,
+        operationName,
+        startTime: depth * 10,
+        duration: 100 - depth * 10,
+        status: 'OK',
+        tags: { 'service.name': 'api' }
+      })),
+      startTime: 0,
+      duration: 100
+    });
+
+    it('should fold an operation nested in itself', async () => {
+      const trace = chainTrace('t1', [
+        ['root', undefined, 'GET /orders'],
+        ['outer', 'root', 'middleware'],
+        ['inner', 'outer', 'middleware'],
+        ['query', 'inner', 'SELECT orders']
+      ]);
+
+      const result = await engine.analyzeMultipleTraces([trace] as any);
+
+      expect(result.graph.edges.has('api:middleware->api:middleware')).toBe(false);
+      expect(result.graph.nodes.get('api:middleware')?.metadata.count).toBe(2);
+      expect(result.graph.rootNodes).toEqual(['api:GET /orders']);
+      expect(result.graph.criticalPath).toEqual(['api:GET /orders', 'api:middleware', 'api:SELECT orders']);
+    });
+
+    it('should break cycles between operations called in both directions', async () => {
+      const traces = [
+        chainTrace('t1', [['a', undefined, 'A'], ['b', 'a', 'B']]),
+        chainTrace('t2', [['b', undefined, 'B'], ['a', 'b', 'A']])
+      ];
+
+      const result = await engine.analyzeMultipleTraces(traces as any);
+
+      // A was seen first, so the edge back into it is the one dropped
+      expect(Array.from(result.graph.edges.keys())).toEqual(['api:A->api:B']);
+      expect(result.graph.rootNodes).toEqual(['api:A', 'api:B']);
+      expect(result.graph.criticalPath).toEqual(['api:A', 'api:B']);
+
+      engine.recordTraces(traces as any);
+      expect((await engine.analyzeAggregate()).graph.criticalPath).toEqual(['api:A', 'api:B']);
+    });
+
+    it('should round-trip a graph through its packed form', async () => {
+      const result = await engine.analyzeTrace(buildTrace('t1', 20) as any, { optimizeGraph: false });
+      const unpacked = unpackGraph(packGraph(result.graph));
+
+      expect(Array.from(unpacked.nodes)).toEqual(Array.from(result.graph.nodes));
+      expect(Array.from(unpacked.edges)).toEqual(Array.from(result.graph.edges));
+      expect(unpacked.criticalPath).toEqual(result.graph.criticalPath);
+      expect(unpacked.totalDuration).toBe(result.graph.totalDuration);
+    });
   });
 
   describe('getGraphSummary', () => {
@@ -1,5 +1,6 @@
 // Blocking path identification and bottleneck detection
 import { DependencyGraph, GraphNode, GraphEdge } from '../graph/graph-builder';
+import { CompactGraph } from '../graph/compact-graph';
 
 export interface BlockingPath {
   path: string[];
@@ -18,64 +19,159 @@ export interface Bottleneck {
   recommendations: string[];
 }
 
+export interface BlockingPathOptions {
+  maxPaths?: number; // K: how many of the heaviest paths to return
+  timeBudgetMs?: number; // once exceeded, remaining nodes keep only their best path
+}
+
+const DEFAULT_MAX_PATHS = 20;
+const DEFAULT_TIME_BUDGET_MS = 250;
+
 export class BlockingPathAnalyzer {
-  public identifyBlockingPaths(graph: DependencyGraph, threshold: number = 0.1): BlockingPath[] {
+  public identifyBlockingPaths(
+    graph: DependencyGraph,
+    threshold: number = 0.1,
+    options: BlockingPathOptions = {}
+  ): BlockingPath[] {
+    const maxPaths = Math.max(1, Math.floor(options.maxPaths ?? DEFAULT_MAX_PATHS));
+    const deadline = Date.now() + (options.timeBudgetMs ?? DEFAULT_TIME_BUDGET_MS);
     const blockingPaths: BlockingPath[] = [];
-    
-    // Analyze each path from root to leaf
-    for (const rootId of graph.rootNodes) {
-      const paths = this.findAllPaths(graph, rootId);
-      
-      for (const path of paths) {
-        const pathDuration = this.calculatePathDuration(graph, path);
-        const blockingDuration = this.calculateBlockingDuration(graph, path);
-        const impactPercentage = (blockingDuration / graph.totalDuration) * 100;
-        
-        if (impactPercentage >= threshold * 100) {
-          const bottlenecks = this.identifyBottlenecks(graph, path);
-          
-          blockingPaths.push({
-            path,
-            totalDuration: pathDuration,
-            blockingDuration,
-            impactPercentage,
-            bottlenecks
-          });
-        }
-      }
+
+    // Only 'blocks' edges contribute to a path's blocking duration
+    const core = CompactGraph.fromDependencyGraph(graph, edge => edge?.type === 'blocks' ? edge.weight : 0);
+
+    for (const path of this.findTopPaths(core, core.indicesOf(graph.rootNodes), maxPaths, deadline)) {
+      const pathDuration = this.calculatePathDuration(graph, path);
+      const blockingDuration = this.calculateBlockingDuration(graph, path);
+      const impactPercentage = (blockingDuration / graph.totalDuration) * 100;
+
+      // Paths arrive heaviest first, so the rest are below the threshold too
+      if (!(impactPercentage >= threshold * 100)) break;
+
+      blockingPaths.push({
+        path,
+        totalDuration: pathDuration,
+        blockingDuration,
+        impactPercentage,
+        bottlenecks: this.identifyBottlenecks(graph, path)
+      });
     }
-    
+
     // Sort by impact percentage (highest first)
     return blockingPaths.sort((a, b) => b.impactPercentage - a.impactPercentage);
   }
 
-  private findAllPaths(graph: DependencyGraph, startId: string, visited = new Set<string>()): string[][] {
-    const paths: string[][] = [];
-    const node = graph.nodes.get(startId);
-    
-    if (!node || visited.has(startId)) {
-      return paths;
-    }
-    
-    visited.add(startId);
-    
-    if (node.children.length === 0) {
-      // Leaf node - end of path
-      paths.push([startId]);
-    } else {
-      // Continue exploring children
-      for (const childId of node.children) {
-        const childPaths = this.findAllPaths(graph, childId, new Set(visited));
-        for (const childPath of childPaths) {
-          paths.push([startId, ...childPath]);
+  // K-best root-to-leaf paths by edge weight, without enumerating every path.
+  // Walking the reverse topological order, each node keeps its k heaviest
+  // suffixes as (value, edge, rank) entries: edge is the CSR slot of the next
+  // hop and rank the entry taken from that child. Equal values stay in
+  // depth-first order, matching the order a full enumeration would produce.
+  private findTopPaths(core: CompactGraph, roots: number[], k: number, deadline: number): string[][] {
+    const values = new Float64Array(core.size * k);
+    const edges = new Int32Array(core.size * k);
+    const ranks = new Int32Array(core.size * k);
+    const counts = new Int32Array(core.size);
+    const order = core.topologicalOrder();
+    let limit = k;
+
+    for (let o = order.length - 1; o >= 0; o--) {
+      if (limit > 1 && (o & 1023) === 0 && Date.now() > deadline) {
+        limit = 1;
+      }
+
+      const node = order[o]!;
+      const base = node * k;
+      const first = core.childOffsets[node]!;
+      const last = core.childOffsets[node + 1]!;
+
+      if (first === last) {
+        values[base] = 0;
+        edges[base] = -1;
+        ranks[base] = 0;
+        counts[node] = 1;
+        continue;
+      }
+
+      let count = 0;
+      for (let e = first; e < last; e++) {
+        const child = core.children[e]!;
+        const weight = core.weights[e]!;
+
+        for (let r = 0; r < counts[child]!; r++) {
+          const value = weight + values[child * k + r]!;
+          // Child entries are sorted, so the rest of this child cannot place
+          if (count === limit && value <= values[base + count - 1]!) break;
+          count = this.insertEntry(values, edges, ranks, base, count, limit, value, e, r);
         }
       }
+      counts[node] = count;
     }
-    
-    visited.delete(startId);
+
+    // Merge the roots' lists the same way, in root order
+    const topValues = new Float64Array(k);
+    const topRoots = new Int32Array(k);
+    const topRanks = new Int32Array(k);
+    let topCount = 0;
+
+    for (const root of roots) {
+      for (let r = 0; r < counts[root]!; r++) {
+        const value = values[root * k + r]!;
+        if (topCount === k && value <= topValues[topCount - 1]!) break;
+        topCount = this.insertEntry(topValues, topRoots, topRanks, 0, topCount, k, value, root, r);
+      }
+    }
+
+    const paths: string[][] = [];
+    for (let t = 0; t < topCount; t++) {
+      const path: string[] = [];
+      let node = topRoots[t]!;
+      let rank = topRanks[t]!;
+
+      while (true) {
+        path.push(core.ids[node]!);
+        const slot = node * k + rank;
+        const edge = edges[slot]!;
+        if (edge < 0) break;
+        node = core.children[edge]!;
+        rank = ranks[slot]!;
+      }
+      paths.push(path);
+    }
+
     return paths;
   }
 
+  // Inserts after every entry of equal or greater value; returns the new count
+  private insertEntry(
+    values: Float64Array,
+    refs: Int32Array,
+    ranks: Int32Array,
+    base: number,
+    count: number,
+    limit: number,
+    value: number,
+    ref: number,
+    rank: number
+  ): number {
+    let position = count;
+    while (position > 0 && values[base + position - 1]! < value) {
+      position--;
+    }
+    if (position >= limit) return count;
+
+    const end = Math.min(count, limit - 1);
+    for (let i = end; i > position; i--) {
+      values[base + i] = values[base + i - 1]!;
+      refs[base + i] = refs[base + i - 1]!;
+      ranks[base + i] = ranks[base + i - 1]!;
+    }
+
+    values[base + position] = value;
+    refs[base + position] = ref;
+    ranks[base + position] = rank;
+    return Math.min(count + 1, limit);
+  }
+
   private calculatePathDuration(graph: DependencyGraph, path: string[]): number {
     let totalDuration = 0;
     
@@ -0,0 +1,266 @@
+// Cache of analysis results keyed by trace ID, trace version and options
+//
+// The first tier is an in-process LRU bounded by entry count. The optional
+// second tier keeps one Redis hash per trace, shared by every process, so
+// invalidating a trace is a single DEL whatever versions and option sets
+// were cached for it.
+import { createHash } from 'crypto';
+import { Trace } from '@tracelens/shared';
+import type { AnalysisOptions, AnalysisResult } from '../index';
+import type { GraphNode, GraphEdge } from '../graph/graph-builder';
+
+// The subset of an ioredis client the cache uses
+export interface AnalysisCacheRedis {
+  hget(key: string, field: string): Promise<string | null>;
+  hset(key: string, field: string, value: string): Promise<unknown>;
+  expire(key: string, seconds: number): Promise<unknown>;
+  del(key: string): Promise<unknown>;
+}
+
+export interface AnalysisCacheOptions {
+  maxEntries: number;
+  ttl: number; // milliseconds, for both tiers
+  redis: AnalysisCacheRedis | null;
+  keyPrefix: string;
+}
+
+export interface AnalysisCacheStats {
+  size: number;
+  maxEntries: number;
+  hits: number;
+  redisHits: number;
+  misses: number;
+  evictions: number;
+  invalidations: number;
+  redisErrors: number;
+  hitRate: number;
+  savedTime: number; // milliseconds of analysis skipped by hits
+}
+
+interface CacheEntry {
+  traceId: string;
+  result: AnalysisResult;
+  expiresAt: number;
+}
+
+const DEFAULT_OPTIONS: AnalysisCacheOptions = {
+  maxEntries: 1000,
+  ttl: 10 * 60 * 1000,
+  redis: null,
+  keyPrefix: 'tracelens:analysis:'
+};
+
+// Stable across key order; undefined options are the same as absent ones
+export function hashAnalysisOptions(options: AnalysisOptions): string {
+  const entries = Object.entries(options)
+    .filter(([, value]) => value !== undefined)
+    .sort(([a], [b]) => (a < b ? -1 : a > b ? 1 : 0));
+  return createHash('sha1').update(JSON.stringify(entries)).digest('hex').slice(0, 16);
+}
+
+// Stand-in version for traces loaded without one. It changes when spans are
+// added or their timings change, which covers late-arriving spans.
+export function traceFingerprint(trace: Trace): string {
+  let latestEnd = 0;
+  let totalDuration = 0;
+  for (const span of trace.spans) {
+    latestEnd = Math.max(latestEnd, span.endTime ?? span.startTime);
+    totalDuration += span.duration || 0;
+  }
+  return `${trace.spans.length}.${latestEnd}.${totalDuration}`;
+}
+
+export class AnalysisCache {
+  private options: AnalysisCacheOptions;
+  // Map iteration order doubles as LRU order: oldest entries come first
+  private entries = new Map<string, CacheEntry>();
+  private keysByTrace = new Map<string, Set<string>>();
+  private pending = new Map<string, Promise<AnalysisResult>>();
+  private stats = {
+    hits: 0,
+    redisHits: 0,
+    misses: 0,
+    evictions: 0,
+    invalidations: 0,
+    redisErrors: 0,
+    savedTime: 0
+  };
+
+  constructor(options: Partial<AnalysisCacheOptions> = {}) {
+    this.options = { ...DEFAULT_OPTIONS, ...options };
+  }
+
+  // Returns the cached result, computing and caching it on a miss.
+  // Concurrent misses for the same key share one computation. Cached
+  // results are shared between callers and must not be modified.
+  public async resolve(
+    traceId: string,
+    version: number | string,
+    options: AnalysisOptions,
+    compute: () => Promise<AnalysisResult>
+  ): Promise<AnalysisResult> {
+    const field = `${version}:${hashAnalysisOptions(options)}`;
+    const key = `${traceId}\u0000${field}`;
+
+    const entry = this.entries.get(key);
+    if (entry && entry.expiresAt > Date.now()) {
+      // Refresh LRU position
+      this.entries.delete(key);
+      this.entries.set(key, entry);
+      this.stats.hits++;
+      this.stats.savedTime += entry.result.processingTime;
+      return entry.result;
+    }
+
+    const inFlight = this.pending.get(key);
+    if (inFlight) {
+      this.stats.hits++;
+      const result = await inFlight;
+      this.stats.savedTime += result.processingTime;
+      return result;
+    }
+
+    const lookup = this.load(traceId, field, key, compute).finally(() => {
+      this.pending.delete(key);
+    });
+    this.pending.set(key, lookup);
+    return lookup;
+  }
+
+  // Drops every cached result for the trace in this process and in Redis.
+  // A Redis failure is counted, not thrown; those entries expire by TTL.
+  public async invalidate(traceId: string): Promise<void> {
+    const keys = this.keysByTrace.get(traceId);
+    if (keys) {
+      for (const key of keys) {
+        this.entries.delete(key);
+      }
+      this.stats.invalidations += keys.size;
+      this.keysByTrace.delete(traceId);
+    }
+
+    if (this.options.redis) {
+      try {
+        await this.options.redis.del(this.redisKey(traceId));
+      } catch (error) {
+        this.stats.redisErrors++;
+      }
+    }
+  }
+
+  public clear(): void {
+    this.stats.invalidations += this.entries.size;
+    this.entries.clear();
+    this.keysByTrace.clear();
+  }
+
+  public getStats(): AnalysisCacheStats {
+    const lookups = this.stats.hits + this.stats.redisHits + this.stats.misses;
+
+    return {
+      size: this.entries.size,
+      maxEntries: this.options.maxEntries,
+      ...this.stats,
+      hitRate: lookups > 0 ? (this.stats.hits + this.stats.redisHits) / lookups : 0
+    };
+  }
+
+  private async load(
+    traceId: string,
+    field: string,
+    key: string,
+    compute: () => Promise<AnalysisResult>
+  ): Promise<AnalysisResult> {
+    const shared = await this.readRedis(traceId, field);
+    if (shared) {
+      this.stats.redisHits++;
+      this.stats.savedTime += shared.processingTime;
+      this.set(traceId, key, shared);
+      return shared;
+    }
+
+    this.stats.misses++;
+    const result = await compute();
+    this.set(traceId, key, result);
+    this.writeRedis(traceId, field, result);
+    return result;
+  }
+
+  private set(traceId: string, key: string, result: AnalysisResult): void {
+    this.entries.delete(key);
+    this.entries.set(key, { traceId, result, expiresAt: Date.now() + this.options.ttl });
+
+    let keys = this.keysByTrace.get(traceId);
+    if (!keys) {
+      keys = new Set();
+      this.keysByTrace.set(traceId, keys);
+    }
+    keys.add(key);
+
+    while (this.entries.size > this.options.maxEntries) {
+      const oldest = this.entries.entries().next().value;
+      if (oldest === undefined) break;
+      this.remove(oldest[0], oldest[1].traceId);
+      this.stats.evictions++;
+    }
+  }
+
+  private remove(key: string, traceId: string): void {
+    this.entries.delete(key);
+    const keys = this.keysByTrace.get(traceId);
+    if (keys) {
+      keys.delete(key);
+      if (keys.size === 0) this.keysByTrace.delete(traceId);
+    }
+  }
+
+  // Redis failures degrade to a miss
+  private async readRedis(traceId: string, field: string): Promise<AnalysisResult | null> {
+    if (!this.options.redis) return null;
+
+    try {
+      const value = await this.options.redis.hget(this.redisKey(traceId), field);
+      return value ? deserializeResult(value) : null;
+    } catch (error) {
+      this.stats.redisErrors++;
+      return null;
+    }
+  }
+
+  private writeRedis(traceId: string, field: string, result: AnalysisResult): void {
+    const redis = this.options.redis;
+    if (!redis) return;
+
+    const key = this.redisKey(traceId);
+    redis.hset(key, field, serializeResult(result))
+      .then(() => redis.expire(key, Math.ceil(this.options.ttl / 1000)))
+      .catch(() => {
+        this.stats.redisErrors++;
+      });
+  }
+
+  private redisKey(traceId: string): string {
+    return `${this.options.keyPrefix}${traceId}`;
+  }
+}
+
+// JSON with the graph's maps as entry lists; the packed core is not kept
+function serializeResult(result: AnalysisResult): string {
+  const { core, nodes, edges, ...graph } = result.graph;
+  return JSON.stringify({
+    ...result,
+    graph: { ...graph, nodes: Array.from(nodes), edges: Array.from(edges) }
+  });
+}
+
+function deserializeResult(value: string): AnalysisResult {
+  const parsed = JSON.parse(value);
+  return {
+    ...parsed,
+    graph: {
+      ...parsed.graph,
+      nodes: new Map<string, GraphNode>(parsed.graph.nodes),
+      edges: new Map<string, GraphEdge>(parsed.graph.edges)
+    }
+  };
+}
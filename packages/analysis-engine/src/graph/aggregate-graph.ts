@@ -0,0 +1,501 @@
+// Long-lived dependency graph aggregated across traces
+//
+// Nodes are keyed by service and operation name rather than span ID, so the
+// same operation from different traces lines up. Each trace is folded in once
+// and only running statistics are kept, so the graph's size depends on the
+// number of distinct operations, not on how many traces were added.
+import { Trace, TraceSpan, SpanStatus } from '@tracelens/shared';
+import type { DependencyGraph, GraphNode, GraphEdge } from './graph-builder';
+import { CompactGraph } from './compact-graph';
+
+export interface DurationStats {
+  count: number;
+  sum: number;
+  min: number;
+  max: number;
+}
+
+export interface AggregateNode {
+  id: string;
+  service: string;
+  operation: string;
+  duration: DurationStats;
+  errorCount: number;
+  lastSeen: number;
+  // Spans of this operation that started a trace (no parent in the trace)
+  rootCount: number;
+}
+
+export interface AggregateEdge {
+  from: string;
+  to: string;
+  // Durations of the child spans called along this edge
+  duration: DurationStats;
+}
+
+export interface ServiceMapEntry {
+  service: string;
+  operations: number;
+  spanCount: number;
+  errorCount: number;
+  averageDuration: number;
+  maxDuration: number;
+}
+
+export interface ServiceDependency {
+  from: string;
+  to: string;
+  callCount: number;
+  averageDuration: number;
+}
+
+export interface ServiceMap {
+  services: ServiceMapEntry[];
+  dependencies: ServiceDependency[];
+  traceCount: number;
+}
+
+export interface AggregateGraphSnapshot {
+  nodes: AggregateNode[];
+  edges: AggregateEdge[];
+  traces: DurationStats;
+}
+
+// Typed-array form for handing an aggregate to another thread; see
+// graph-transfer
+export interface PackedAggregateGraph {
+  services: string[];
+  operations: string[];
+  nodeStats: Float64Array; // count, sum, min, max, errorCount, lastSeen, rootCount per node
+  edgeEnds: Uint32Array; // from, to node indices per edge
+  edgeStats: Float64Array; // count, sum, min, max per edge
+  traces: DurationStats;
+}
+
+const NODE_STRIDE = 7;
+const EDGE_STRIDE = 4;
+
+const UNKNOWN_SERVICE = 'unknown';
+
+export function nodeKey(service: string, operation: string): string {
+  return `${service}:${operation}`;
+}
+
+// min and max are only meaningful once count > 0; they start at zero so
+// snapshots stay JSON-safe
+function emptyStats(): DurationStats {
+  return { count: 0, sum: 0, min: 0, max: 0 };
+}
+
+function record(stats: DurationStats, value: number): void {
+  if (stats.count === 0 || value < stats.min) stats.min = value;
+  if (stats.count === 0 || value > stats.max) stats.max = value;
+  stats.count++;
+  stats.sum += value;
+}
+
+function combine(into: DurationStats, from: DurationStats): void {
+  if (from.count === 0) return;
+  if (into.count === 0 || from.min < into.min) into.min = from.min;
+  if (into.count === 0 || from.max > into.max) into.max = from.max;
+  into.count += from.count;
+  into.sum += from.sum;
+}
+
+function mean(stats: DurationStats): number {
+  return stats.count > 0 ? stats.sum / stats.count : 0;
+}
+
+function cloneStats(stats: DurationStats): DurationStats {
+  return { count: stats.count, sum: stats.sum, min: stats.min, max: stats.max };
+}
+
+export class AggregateGraph {
+  private nodes = new Map<string, AggregateNode>();
+  private edges = new Map<string, AggregateEdge>();
+  private traces: DurationStats = emptyStats();
+
+  public get nodeCount(): number {
+    return this.nodes.size;
+  }
+
+  public get edgeCount(): number {
+    return this.edges.size;
+  }
+
+  public get traceCount(): number {
+    return this.traces.count;
+  }
+
+  public addTrace(trace: Trace): void {
+    // Span IDs only need resolving within a single trace
+    const keyBySpan = new Map<string, string>();
+    for (const span of trace.spans) {
+      keyBySpan.set(span.spanId, this.recordSpan(span));
+    }
+
+    for (const span of trace.spans) {
+      const childKey = keyBySpan.get(span.spanId)!;
+      const parentKey = span.parentSpanId ? keyBySpan.get(span.parentSpanId) : undefined;
+      if (parentKey === undefined) {
+        this.nodes.get(childKey)!.rootCount++;
+        continue;
+      }
+
+      // An operation nested in itself (recursion, retries) is folded into
+      // its node rather than recorded as a self-edge
+      if (parentKey === childKey) continue;
+
+      const edgeId = `${parentKey}->${childKey}`;
+      let edge = this.edges.get(edgeId);
+      if (!edge) {
+        edge = { from: parentKey, to: childKey, duration: emptyStats() };
+        this.edges.set(edgeId, edge);
+      }
+      record(edge.duration, span.duration || 0);
+    }
+
+    record(this.traces, trace.duration || 0);
+  }
+
+  public addTraces(traces: Iterable<Trace>): void {
+    for (const trace of traces) {
+      this.addTrace(trace);
+    }
+  }
+
+  // Folds another aggregate (e.g. from another shard or replica) into this one
+  public merge(other: AggregateGraph): void {
+    for (const [id, node] of other.nodes) {
+      const existing = this.nodes.get(id);
+      if (existing) {
+        combine(existing.duration, node.duration);
+        existing.errorCount += node.errorCount;
+        existing.lastSeen = Math.max(existing.lastSeen, node.lastSeen);
+        existing.rootCount += node.rootCount;
+      } else {
+        this.nodes.set(id, { ...node, duration: cloneStats(node.duration) });
+      }
+    }
+
+    for (const [id, edge] of other.edges) {
+      const existing = this.edges.get(id);
+      if (existing) {
+        combine(existing.duration, edge.duration);
+      } else {
+        this.edges.set(id, { ...edge, duration: cloneStats(edge.duration) });
+      }
+    }
+
+    combine(this.traces, other.traces);
+  }
+
+  public getNode(service: string, operation: string): AggregateNode | undefined {
+    return this.nodes.get(nodeKey(service, operation));
+  }
+
+  public getNodes(): AggregateNode[] {
+    return Array.from(this.nodes.values());
+  }
+
+  public getEdges(): AggregateEdge[] {
+    return Array.from(this.edges.values());
+  }
+
+  // Rolls operations up to services; calls within one service are omitted
+  public getServiceMap(): ServiceMap {
+    const services = new Map<string, ServiceMapEntry & { totalDuration: number }>();
+
+    for (const node of this.nodes.values()) {
+      let entry = services.get(node.service);
+      if (!entry) {
+        entry = {
+          service: node.service,
+          operations: 0,
+          spanCount: 0,
+          errorCount: 0,
+          averageDuration: 0,
+          maxDuration: 0,
+          totalDuration: 0
+        };
+        services.set(node.service, entry);
+      }
+
+      entry.operations++;
+      entry.spanCount += node.duration.count;
+      entry.errorCount += node.errorCount;
+      entry.totalDuration += node.duration.sum;
+      entry.maxDuration = Math.max(entry.maxDuration, node.duration.max);
+    }
+
+    const dependencies = new Map<string, ServiceDependency & { totalDuration: number }>();
+    for (const edge of this.edges.values()) {
+      const from = this.nodes.get(edge.from)!.service;
+      const to = this.nodes.get(edge.to)!.service;
+      if (from === to) continue;
+
+      const id = `${from}->${to}`;
+      let dependency = dependencies.get(id);
+      if (!dependency) {
+        dependency = { from, to, callCount: 0, averageDuration: 0, totalDuration: 0 };
+        dependencies.set(id, dependency);
+      }
+      dependency.callCount += edge.duration.count;
+      dependency.totalDuration += edge.duration.sum;
+    }
+
+    return {
+      services: Array.from(services.values()).map(({ totalDuration, ...entry }) => ({
+        ...entry,
+        averageDuration: entry.spanCount > 0 ? totalDuration / entry.spanCount : 0
+      })),
+      dependencies: Array.from(dependencies.values()).map(({ totalDuration, ...dependency }) => ({
+        ...dependency,
+        averageDuration: dependency.callCount > 0 ? totalDuration / dependency.callCount : 0
+      })),
+      traceCount: this.traces.count
+    };
+  }
+
+  // Graph view for the analyzers: durations and edge weights are means, and
+  // the total duration is the mean trace duration
+  public toDependencyGraph(): DependencyGraph {
+    const nodes = new Map<string, GraphNode>();
+    const edges = new Map<string, GraphEdge>();
+
+    for (const node of this.nodes.values()) {
+      nodes.set(node.id, {
+        id: node.id,
+        type: 'span',
+        name: node.operation,
+        startTime: node.lastSeen,
+        duration: mean(node.duration),
+        metadata: {
+          service: node.service,
+          tags: { 'service.name': node.service },
+          count: node.duration.count,
+          minDuration: node.duration.min,
+          maxDuration: node.duration.max,
+          errorCount: node.errorCount
+        },
+        children: [],
+        parents: []
+      });
+    }
+
+    const backEdges = this.findBackEdges();
+    for (const [id, edge] of this.edges) {
+      if (backEdges.has(id)) continue;
+      edges.set(id, {
+        from: edge.from,
+        to: edge.to,
+        type: 'calls',
+        weight: mean(edge.duration),
+        metadata: {
+          relationship: 'parent-child',
+          count: edge.duration.count,
+          minDuration: edge.duration.min,
+          maxDuration: edge.duration.max
+        }
+      });
+      nodes.get(edge.from)!.children.push(edge.to);
+      nodes.get(edge.to)!.parents.push(edge.from);
+    }
+
+    // Operations that started traces, plus any left without callers (e.g.
+    // from snapshots taken before root counts were kept)
+    const rootNodes: string[] = [];
+    const leafNodes: string[] = [];
+    for (const node of nodes.values()) {
+      if (this.nodes.get(node.id)!.rootCount > 0 || node.parents.length === 0) rootNodes.push(node.id);
+      if (node.children.length === 0) leafNodes.push(node.id);
+    }
+
+    const graph: DependencyGraph = {
+      nodes,
+      edges,
+      rootNodes,
+      leafNodes,
+      criticalPath: [],
+      totalDuration: mean(this.traces)
+    };
+
+    const core = CompactGraph.fromDependencyGraph(graph);
+    graph.criticalPath = core.toIds(core.longestPath(core.indicesOf(rootNodes)).path);
+
+    return graph;
+  }
+
+  public toSnapshot(): AggregateGraphSnapshot {
+    return {
+      nodes: this.getNodes().map(node => ({ ...node, duration: cloneStats(node.duration) })),
+      edges: this.getEdges().map(edge => ({ ...edge, duration: cloneStats(edge.duration) })),
+      traces: cloneStats(this.traces)
+    };
+  }
+
+  public static fromSnapshot(snapshot: AggregateGraphSnapshot): AggregateGraph {
+    const graph = new AggregateGraph();
+    for (const node of snapshot.nodes) {
+      graph.nodes.set(node.id, { ...node, duration: cloneStats(node.duration), rootCount: node.rootCount ?? 0 });
+    }
+    for (const edge of snapshot.edges) {
+      graph.edges.set(`${edge.from}->${edge.to}`, { ...edge, duration: cloneStats(edge.duration) });
+    }
+    graph.traces = cloneStats(snapshot.traces);
+    return graph;
+  }
+
+  public toPacked(): PackedAggregateGraph {
+    const index = new Map<string, number>();
+    const services: string[] = [];
+    const operations: string[] = [];
+    const nodeStats = new Float64Array(this.nodes.size * NODE_STRIDE);
+
+    for (const node of this.nodes.values()) {
+      const i = services.length;
+      index.set(node.id, i);
+      services.push(node.service);
+      operations.push(node.operation);
+      nodeStats.set([
+        node.duration.count,
+        node.duration.sum,
+        node.duration.min,
+        node.duration.max,
+        node.errorCount,
+        node.lastSeen,
+        node.rootCount
+      ], i * NODE_STRIDE);
+    }
+
+    const edgeEnds = new Uint32Array(this.edges.size * 2);
+    const edgeStats = new Float64Array(this.edges.size * EDGE_STRIDE);
+    let e = 0;
+    for (const edge of this.edges.values()) {
+      edgeEnds[e * 2] = index.get(edge.from)!;
+      edgeEnds[e * 2 + 1] = index.get(edge.to)!;
+      edgeStats.set([edge.duration.count, edge.duration.sum, edge.duration.min, edge.duration.max], e * EDGE_STRIDE);
+      e++;
+    }
+
+    return { services, operations, nodeStats, edgeEnds, edgeStats, traces: cloneStats(this.traces) };
+  }
+
+  public static fromPacked(packed: PackedAggregateGraph): AggregateGraph {
+    const graph = new AggregateGraph();
+    const { nodeStats, edgeStats } = packed;
+    const ids: string[] = new Array(packed.services.length);
+
+    for (let i = 0; i < ids.length; i++) {
+      const service = packed.services[i]!;
+      const operation = packed.operations[i]!;
+      const at = i * NODE_STRIDE;
+      ids[i] = nodeKey(service, operation);
+      graph.nodes.set(ids[i]!, {
+        id: ids[i]!,
+        service,
+        operation,
+        duration: { count: nodeStats[at]!, sum: nodeStats[at + 1]!, min: nodeStats[at + 2]!, max: nodeStats[at + 3]! },
+        errorCount: nodeStats[at + 4]!,
+        lastSeen: nodeStats[at + 5]!,
+        rootCount: nodeStats[at + 6]!
+      });
+    }
+
+    for (let e = 0; e < packed.edgeEnds.length / 2; e++) {
+      const from = ids[packed.edgeEnds[e * 2]!]!;
+      const to = ids[packed.edgeEnds[e * 2 + 1]!]!;
+      const at = e * EDGE_STRIDE;
+      graph.edges.set(`${from}->${to}`, {
+        from,
+        to,
+        duration: { count: edgeStats[at]!, sum: edgeStats[at + 1]!, min: edgeStats[at + 2]!, max: edgeStats[at + 3]! }
+      });
+    }
+
+    graph.traces = cloneStats(packed.traces);
+    return graph;
+  }
+
+  public clear(): void {
+    this.nodes.clear();
+    this.edges.clear();
+    this.traces = emptyStats();
+  }
+
+  // Operations keyed by name call each other in cycles (A -> B in one trace,
+  // B -> A in another) and through snapshots may still carry self-edges.
+  // A depth-first walk from the trace roots finds the edges that close a
+  // cycle so the analyzers only ever see a DAG.
+  private findBackEdges(): Set<string> {
+    const children = new Map<string, string[]>();
+    for (const edge of this.edges.values()) {
+      let list = children.get(edge.from);
+      if (!list) {
+        list = [];
+        children.set(edge.from, list);
+      }
+      list.push(edge.to);
+    }
+
+    const roots: string[] = [];
+    const rest: string[] = [];
+    for (const node of this.nodes.values()) {
+      (node.rootCount > 0 ? roots : rest).push(node.id);
+    }
+
+    const backEdges = new Set<string>();
+    const onStack = new Set<string>();
+    const visited = new Set<string>();
+
+    for (const start of roots.concat(rest)) {
+      if (visited.has(start)) continue;
+
+      visited.add(start);
+      onStack.add(start);
+      const stack: Array<{ id: string; next: number }> = [{ id: start, next: 0 }];
+
+      while (stack.length > 0) {
+        const frame = stack[stack.length - 1]!;
+        const next = children.get(frame.id)?.[frame.next++];
+        if (next === undefined) {
+          onStack.delete(frame.id);
+          stack.pop();
+        } else if (onStack.has(next)) {
+          backEdges.add(`${frame.id}->${next}`);
+        } else if (!visited.has(next)) {
+          visited.add(next);
+          onStack.add(next);
+          stack.push({ id: next, next: 0 });
+        }
+      }
+    }
+
+    return backEdges;
+  }
+
+  private recordSpan(span: TraceSpan): string {
+    const service = String(span.tags?.['service.name'] ?? UNKNOWN_SERVICE);
+    const id = nodeKey(service, span.operationName);
+
+    let node = this.nodes.get(id);
+    if (!node) {
+      node = {
+        id,
+        service,
+        operation: span.operationName,
+        duration: emptyStats(),
+        errorCount: 0,
+        lastSeen: span.startTime,
+        rootCount: 0
+      };
+      this.nodes.set(id, node);
+    }
+
+    record(node.duration, span.duration || 0);
+    if (span.status !== SpanStatus.OK) node.errorCount++;
+    if (span.startTime > node.lastSeen) node.lastSeen = span.startTime;
+
+    return id;
+  }
+}
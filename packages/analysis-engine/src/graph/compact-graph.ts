@@ -0,0 +1,275 @@
+// Compact array-backed graph core
+//
+// Span IDs are interned to dense integer indices and adjacency is stored in
+// CSR form: the children of node i are children[childOffsets[i] ..
+// childOffsets[i + 1]), with the matching edge weights in weights. All
+// traversals are iterative, so graph depth is bounded by memory rather than
+// the call stack.
+import { TraceSpan } from '@tracelens/shared';
+import type { DependencyGraph, GraphEdge } from './graph-builder';
+
+export interface LongestPath {
+  path: number[];
+  distance: number;
+}
+
+export class CompactGraph {
+  private order: Uint32Array | null = null;
+
+  constructor(
+    public readonly ids: string[],
+    public readonly index: Map<string, number>,
+    public readonly durations: Float64Array,
+    public readonly childOffsets: Uint32Array,
+    public readonly children: Uint32Array,
+    public readonly weights: Float64Array,
+    public readonly inDegree: Uint32Array
+  ) {}
+
+  // Edges run parent -> child and weigh the child span's duration
+  public static fromSpans(spans: TraceSpan[]): CompactGraph {
+    const index = new Map<string, number>();
+    const ids: string[] = [];
+
+    for (const span of spans) {
+      if (!index.has(span.spanId)) {
+        index.set(span.spanId, ids.length);
+        ids.push(span.spanId);
+      }
+    }
+
+    const size = ids.length;
+    const durations = new Float64Array(size);
+    const parentOf = new Int32Array(spans.length).fill(-1);
+    const childOffsets = new Uint32Array(size + 1);
+
+    for (let s = 0; s < spans.length; s++) {
+      const span = spans[s]!;
+      durations[index.get(span.spanId)!] = span.duration || 0;
+
+      const parent = span.parentSpanId ? index.get(span.parentSpanId) : undefined;
+      if (parent !== undefined) {
+        parentOf[s] = parent;
+        childOffsets[parent + 1] = childOffsets[parent + 1]! + 1;
+      }
+    }
+
+    for (let i = 0; i < size; i++) {
+      childOffsets[i + 1] = childOffsets[i + 1]! + childOffsets[i]!;
+    }
+
+    const edgeCount = childOffsets[size]!;
+    const children = new Uint32Array(edgeCount);
+    const weights = new Float64Array(edgeCount);
+    const inDegree = new Uint32Array(size);
+    const cursor = childOffsets.slice(0, size);
+
+    // Filling in span order keeps each child list in span order
+    for (let s = 0; s < spans.length; s++) {
+      const parent = parentOf[s]!;
+      if (parent < 0) continue;
+
+      const span = spans[s]!;
+      const child = index.get(span.spanId)!;
+      const slot = cursor[parent]!;
+      cursor[parent] = slot + 1;
+      children[slot] = child;
+      weights[slot] = span.duration || 0;
+      inDegree[child] = inDegree[child]! + 1;
+    }
+
+    return new CompactGraph(ids, index, durations, childOffsets, children, weights, inDegree);
+  }
+
+  // Packs an object graph, e.g. one rewritten by the optimizer. edgeWeight
+  // maps each parent -> child edge (undefined if absent) to its CSR weight.
+  public static fromDependencyGraph(
+    graph: DependencyGraph,
+    edgeWeight: (edge: GraphEdge | undefined) => number = edge => edge?.weight || 0
+  ): CompactGraph {
+    const ids = Array.from(graph.nodes.keys());
+    const index = new Map<string, number>();
+    for (let i = 0; i < ids.length; i++) {
+      index.set(ids[i]!, i);
+    }
+
+    const size = ids.length;
+    const durations = new Float64Array(size);
+    const childOffsets = new Uint32Array(size + 1);
+    const nodes = Array.from(graph.nodes.values());
+
+    for (let i = 0; i < size; i++) {
+      const node = nodes[i]!;
+      durations[i] = node.duration || 0;
+
+      let count = 0;
+      for (const childId of node.children) {
+        if (index.has(childId)) count++;
+      }
+      childOffsets[i + 1] = childOffsets[i]! + count;
+    }
+
+    const children = new Uint32Array(childOffsets[size]!);
+    const weights = new Float64Array(childOffsets[size]!);
+    const inDegree = new Uint32Array(size);
+
+    for (let i = 0; i < size; i++) {
+      let slot = childOffsets[i]!;
+      for (const childId of nodes[i]!.children) {
+        const child = index.get(childId);
+        if (child === undefined) continue;
+
+        children[slot] = child;
+        weights[slot] = edgeWeight(graph.edges.get(`${ids[i]}->${childId}`));
+        inDegree[child] = inDegree[child]! + 1;
+        slot++;
+      }
+    }
+
+    return new CompactGraph(ids, index, durations, childOffsets, children, weights, inDegree);
+  }
+
+  public get size(): number {
+    return this.ids.length;
+  }
+
+  public get edgeCount(): number {
+    return this.children.length;
+  }
+
+  public roots(): number[] {
+    const roots: number[] = [];
+    for (let i = 0; i < this.size; i++) {
+      if (this.inDegree[i] === 0) roots.push(i);
+    }
+    return roots;
+  }
+
+  public isLeaf(node: number): boolean {
+    return this.childOffsets[node] === this.childOffsets[node + 1];
+  }
+
+  public childIds(node: number): string[] {
+    const result: string[] = [];
+    for (let e = this.childOffsets[node]!; e < this.childOffsets[node + 1]!; e++) {
+      result.push(this.ids[this.children[e]!]!);
+    }
+    return result;
+  }
+
+  // Kahn's algorithm. Nodes on or below a cycle never reach in-degree zero
+  // and are left out, which is how malformed parent links are tolerated.
+  public topologicalOrder(): Uint32Array {
+    if (this.order) return this.order;
+
+    const remaining = this.inDegree.slice();
+    const order = new Uint32Array(this.size);
+    let tail = 0;
+
+    for (let i = 0; i < this.size; i++) {
+      if (remaining[i] === 0) order[tail++] = i;
+    }
+
+    for (let head = 0; head < tail; head++) {
+      const node = order[head]!;
+      for (let e = this.childOffsets[node]!; e < this.childOffsets[node + 1]!; e++) {
+        const child = this.children[e]!;
+        remaining[child] = remaining[child]! - 1;
+        if (remaining[child] === 0) order[tail++] = child;
+      }
+    }
+
+    this.order = order.subarray(0, tail);
+    return this.order;
+  }
+
+  // Heaviest edge-weighted path starting at any of the sources (all roots by
+  // default). Ties resolve to the lowest node index, i.e. the earliest span.
+  public longestPath(sources: ArrayLike<number> = this.roots()): LongestPath {
+    const size = this.size;
+    const distances = new Float64Array(size).fill(-Infinity);
+    const predecessors = new Int32Array(size).fill(-1);
+
+    for (let i = 0; i < sources.length; i++) {
+      distances[sources[i]!] = 0;
+    }
+
+    const order = this.topologicalOrder();
+    for (let k = 0; k < order.length; k++) {
+      const node = order[k]!;
+      const distance = distances[node]!;
+      if (distance === -Infinity) continue;
+
+      for (let e = this.childOffsets[node]!; e < this.childOffsets[node + 1]!; e++) {
+        const child = this.children[e]!;
+        const candidate = distance + this.weights[e]!;
+        if (candidate > distances[child]!) {
+          distances[child] = candidate;
+          predecessors[child] = node;
+        }
+      }
+    }
+
+    let end = -1;
+    let best = -Infinity;
+    for (let i = 0; i < size; i++) {
+      if (distances[i]! > best) {
+        best = distances[i]!;
+        end = i;
+      }
+    }
+
+    const path: number[] = [];
+    for (let node = end; node >= 0 && path.length < size; node = predecessors[node]!) {
+      path.push(node);
+    }
+    path.reverse();
+
+    return { path, distance: end >= 0 ? best : 0 };
+  }
+
+  // Number of nodes on the longest root-to-leaf chain
+  public depth(sources: ArrayLike<number> = this.roots()): number {
+    const levels = new Uint32Array(this.size);
+    let maxDepth = 0;
+
+    for (let i = 0; i < sources.length; i++) {
+      levels[sources[i]!] = 1;
+      maxDepth = 1;
+    }
+
+    const order = this.topologicalOrder();
+    for (let k = 0; k < order.length; k++) {
+      const node = order[k]!;
+      const level = levels[node]!;
+      if (level === 0) continue;
+
+      for (let e = this.childOffsets[node]!; e < this.childOffsets[node + 1]!; e++) {
+        const child = this.children[e]!;
+        if (level + 1 > levels[child]!) {
+          levels[child] = level + 1;
+          if (level + 1 > maxDepth) maxDepth = level + 1;
+        }
+      }
+    }
+
+    return maxDepth;
+  }
+
+  public toIds(nodes: ArrayLike<number>): string[] {
+    const result: string[] = new Array(nodes.length);
+    for (let i = 0; i < nodes.length; i++) {
+      result[i] = this.ids[nodes[i]!]!;
+    }
+    return result;
+  }
+
+  public indicesOf(ids: string[]): number[] {
+    const result: number[] = [];
+    for (const id of ids) {
+      const node = this.index.get(id);
+      if (node !== undefined) result.push(node);
+    }
+    return result;
+  }
+}
@@ -0,0 +1,174 @@
+// Packed dependency graphs for passing between threads
+//
+// A DependencyGraph is a web of Maps and small objects, which postMessage
+// would have to structured-clone entry by entry. The packed form keeps the
+// numbers and adjacency in typed arrays whose buffers are transferred
+// without copying; only the strings and metadata objects are cloned.
+import type { DependencyGraph, GraphNode, GraphEdge } from './graph-builder';
+
+export interface PackedDependencyGraph {
+  // Node IDs first, then any other IDs referenced by adjacency or edges
+  ids: string[];
+  nodeCount: number;
+  names: string[];
+  types: GraphNode['type'][];
+  metadata: Record<string, any>[];
+  times: Float64Array; // startTime, endTime, duration per node; NaN when unset
+  childOffsets: Uint32Array;
+  children: Uint32Array;
+  parentOffsets: Uint32Array;
+  parents: Uint32Array;
+  edgeEnds: Uint32Array; // from, to per edge
+  edgeWeights: Float64Array;
+  edgeTypes: GraphEdge['type'][];
+  edgeMetadata: Record<string, any>[];
+  rootNodes: Uint32Array;
+  leafNodes: Uint32Array;
+  criticalPath: Uint32Array;
+  totalDuration: number;
+}
+
+export function packGraph(graph: DependencyGraph): PackedDependencyGraph {
+  const index = new Map<string, number>();
+  const ids: string[] = [];
+  const intern = (id: string): number => {
+    let i = index.get(id);
+    if (i === undefined) {
+      i = ids.length;
+      index.set(id, i);
+      ids.push(id);
+    }
+    return i;
+  };
+
+  const nodeCount = graph.nodes.size;
+  const names: string[] = new Array(nodeCount);
+  const types: GraphNode['type'][] = new Array(nodeCount);
+  const metadata: Record<string, any>[] = new Array(nodeCount);
+  const times = new Float64Array(nodeCount * 3);
+  const childOffsets = new Uint32Array(nodeCount + 1);
+  const parentOffsets = new Uint32Array(nodeCount + 1);
+
+  let n = 0;
+  let childCount = 0;
+  let parentCount = 0;
+  for (const [id, node] of graph.nodes) {
+    intern(id);
+    names[n] = node.name;
+    types[n] = node.type;
+    metadata[n] = node.metadata;
+    times[n * 3] = node.startTime;
+    times[n * 3 + 1] = node.endTime ?? NaN;
+    times[n * 3 + 2] = node.duration ?? NaN;
+    childCount += node.children.length;
+    parentCount += node.parents.length;
+    childOffsets[n + 1] = childCount;
+    parentOffsets[n + 1] = parentCount;
+    n++;
+  }
+
+  const children = new Uint32Array(childCount);
+  const parents = new Uint32Array(parentCount);
+  n = 0;
+  for (const node of graph.nodes.values()) {
+    let c = childOffsets[n]!;
+    for (const id of node.children) children[c++] = intern(id);
+    let p = parentOffsets[n]!;
+    for (const id of node.parents) parents[p++] = intern(id);
+    n++;
+  }
+
+  const edgeEnds = new Uint32Array(graph.edges.size * 2);
+  const edgeWeights = new Float64Array(graph.edges.size);
+  const edgeTypes: GraphEdge['type'][] = [];
+  const edgeMetadata: Record<string, any>[] = [];
+  let e = 0;
+  for (const edge of graph.edges.values()) {
+    edgeEnds[e * 2] = intern(edge.from);
+    edgeEnds[e * 2 + 1] = intern(edge.to);
+    edgeWeights[e] = edge.weight;
+    edgeTypes.push(edge.type);
+    edgeMetadata.push(edge.metadata);
+    e++;
+  }
+
+  return {
+    ids,
+    nodeCount,
+    names,
+    types,
+    metadata,
+    times,
+    childOffsets,
+    children,
+    parentOffsets,
+    parents,
+    edgeEnds,
+    edgeWeights,
+    edgeTypes,
+    edgeMetadata,
+    rootNodes: Uint32Array.from(graph.rootNodes, intern),
+    leafNodes: Uint32Array.from(graph.leafNodes, intern),
+    criticalPath: Uint32Array.from(graph.criticalPath, intern),
+    totalDuration: graph.totalDuration
+  };
+}
+
+export function unpackGraph(packed: PackedDependencyGraph): DependencyGraph {
+  const { ids, times } = packed;
+  const nodes = new Map<string, GraphNode>();
+  const edges = new Map<string, GraphEdge>();
+  const toIds = (indices: Uint32Array, from: number = 0, to: number = indices.length): string[] => {
+    const result: string[] = new Array(to - from);
+    for (let i = from; i < to; i++) result[i - from] = ids[indices[i]!]!;
+    return result;
+  };
+
+  for (let n = 0; n < packed.nodeCount; n++) {
+    const node: GraphNode = {
+      id: ids[n]!,
+      type: packed.types[n]!,
+      name: packed.names[n]!,
+      startTime: times[n * 3]!,
+      metadata: packed.metadata[n]!,
+      children: toIds(packed.children, packed.childOffsets[n]!, packed.childOffsets[n + 1]!),
+      parents: toIds(packed.parents, packed.parentOffsets[n]!, packed.parentOffsets[n + 1]!)
+    };
+    if (!Number.isNaN(times[n * 3 + 1]!)) node.endTime = times[n * 3 + 1]!;
+    if (!Number.isNaN(times[n * 3 + 2]!)) node.duration = times[n * 3 + 2]!;
+    nodes.set(node.id, node);
+  }
+
+  for (let e = 0; e < packed.edgeWeights.length; e++) {
+    const from = ids[packed.edgeEnds[e * 2]!]!;
+    const to = ids[packed.edgeEnds[e * 2 + 1]!]!;
+    edges.set(`${from}->${to}`, {
+      from,
+      to,
+      type: packed.edgeTypes[e]!,
+      weight: packed.edgeWeights[e]!,
+      metadata: packed.edgeMetadata[e]!
+    });
+  }
+
+  return {
+    nodes,
+    edges,
+    rootNodes: toIds(packed.rootNodes),
+    leafNodes: toIds(packed.leafNodes),
+    criticalPath: toIds(packed.criticalPath),
+    totalDuration: packed.totalDuration
+  };
+}
+
+// Buffers of the typed arrays held directly by value, for a postMessage
+// transfer list. The arrays are unusable on the sending side afterwards.
+export function transferList(value: object): ArrayBuffer[] {
+  const buffers = new Set<ArrayBuffer>();
+  for (const field of Object.values(value)) {
+    if (ArrayBuffer.isView(field) && field.buffer instanceof ArrayBuffer) {
+      buffers.add(field.buffer);
+    }
+  }
+  return Array.from(buffers);
+}
@@ -1,8 +1,12 @@
 // Main analysis engine orchestrating graph construction and analysis
 import { Trace } from '@tracelens/shared';
 import { GraphBuilder, DependencyGraph } from './graph/graph-builder';
+import { CompactGraph } from './graph/compact-graph';
+import { AggregateGraph, ServiceMap } from './graph/aggregate-graph';
 import { BlockingPathAnalyzer, ImpactCalculator, BlockingPath } from './analyzers/blocking-path';
 import { GraphOptimizer, OptimizationResult } from './optimizers/graph-optimizer';
+import { AnalysisWorkerPool, AnalysisPoolOptions, AnalysisPoolStats } from './workers/analysis-pool';
+import { AnalysisCache, AnalysisCacheOptions, AnalysisCacheStats, traceFingerprint } from './cache/analysis-cache';
 
 export interface AnalysisResult {
   graph: DependencyGraph;
@@ -22,23 +26,57 @@ export interface AnalysisOptions {
   optimizeGraph?: boolean;
   maxNodes?: number;
   blockingThreshold?: number;
+  maxBlockingPaths?: number;
+  blockingPathTimeBudget?: number; // milliseconds
   includeRecommendations?: boolean;
 }
 
+export interface AnalysisEngineOptions {
+  // Run analyses on worker threads instead of the calling thread
+  workerPool?: AnalysisPoolOptions;
+  // Cache analyzeTrace results by trace ID, version and options
+  cache?: Partial<AnalysisCacheOptions>;
+}
+
 export class AnalysisEngine {
   private graphBuilder: GraphBuilder;
   private blockingAnalyzer: BlockingPathAnalyzer;
   private impactCalculator: ImpactCalculator;
   private optimizer: GraphOptimizer;
+  private aggregate: AggregateGraph;
+  private pool: AnalysisWorkerPool | null;
+  private cache: AnalysisCache | null;
 
-  constructor() {
+  constructor(options: AnalysisEngineOptions = {}) {
     this.graphBuilder = new GraphBuilder();
     this.blockingAnalyzer = new BlockingPathAnalyzer();
     this.impactCalculator = new ImpactCalculator();
     this.optimizer = new GraphOptimizer();
+    this.aggregate = new AggregateGraph();
+    this.pool = options.workerPool ? new AnalysisWorkerPool(options.workerPool) : null;
+    this.cache = options.cache ? new AnalysisCache(options.cache) : null;
   }
 
-  public async analyzeTrace(trace: Trace, options: AnalysisOptions = {}): Promise<AnalysisResult> {
+  // version is the trace's stored version from the ingestion service; when
+  // it is not given, cached results are keyed by a fingerprint of the spans
+  public async analyzeTrace(trace: Trace, options: AnalysisOptions = {}, version?: number): Promise<AnalysisResult> {
+    if (this.cache) {
+      return this.cache.resolve(
+        trace.traceId,
+        version ?? traceFingerprint(trace),
+        options,
+        () => this.runTraceAnalysis(trace, options)
+      );
+    }
+
+    return this.runTraceAnalysis(trace, options);
+  }
+
+  private async runTraceAnalysis(trace: Trace, options: AnalysisOptions): Promise<AnalysisResult> {
+    if (this.pool) {
+      return this.pool.analyzeTrace(trace, options);
+    }
+
     const startTime = Date.now();
 
     // Build dependency graph
@@ -51,12 +89,15 @@ export class AnalysisEngine {
       originalEdgeCount: graph.edges.size,
       optimizedEdgeCount: graph.edges.size,
       processingTime: 0,
-      optimizations: []
+      optimizations: [],
+      passes: []
     };
 
     if (options.optimizeGraph !== false) {
+      // The graph was built for this call, so it can be rewritten in place
       const optimizationResult = this.optimizer.optimize(graph, {
-        maxNodes: options.maxNodes || 100
+        maxNodes: options.maxNodes || 100,
+        inPlace: true
       });
       graph = optimizationResult.graph;
       optimization = optimizationResult.result;
@@ -65,7 +106,11 @@ export class AnalysisEngine {
     // Analyze blocking paths
     const blockingPaths = this.blockingAnalyzer.identifyBlockingPaths(
       graph, 
-      options.blockingThreshold || 0.05
+      options.blockingThreshold || 0.05,
+      {
+        maxPaths: options.maxBlockingPaths,
+        timeBudgetMs: options.blockingPathTimeBudget
+      }
     );
 
     // Calculate performance impact
@@ -91,9 +136,54 @@ export class AnalysisEngine {
   public async analyzeMultipleTraces(traces: Trace[], options: AnalysisOptions = {}): Promise<AnalysisResult> {
     const startTime = Date.now();
 
-    // Build merged dependency graph
-    let graph = this.graphBuilder.buildFromMultipleTraces(traces);
+    // Workers fold shards of the traces; only the merged aggregate, whose
+    // size depends on the number of operations, is analyzed here
+    if (this.pool) {
+      const aggregate = await this.pool.buildAggregate(traces);
+      return this.analyzeMergedGraph(aggregate.toDependencyGraph(), options, startTime);
+    }
+
+    return this.analyzeMergedGraph(this.graphBuilder.buildFromMultipleTraces(traces), options, startTime);
+  }
+
+  public getPoolStats(): AnalysisPoolStats | null {
+    return this.pool ? this.pool.getStats() : null;
+  }
+
+  // Call when a trace changes, e.g. on a tracelens_trace_updated notification
+  public async invalidateTrace(traceId: string): Promise<void> {
+    await this.cache?.invalidate(traceId);
+  }
+
+  public getCacheStats(): AnalysisCacheStats | null {
+    return this.cache ? this.cache.getStats() : null;
+  }
+
+  // Stops the worker pool, if any
+  public async close(): Promise<void> {
+    await this.pool?.close();
+  }
+
+  // Folds traces into the engine's long-lived aggregate graph
+  public recordTraces(traces: Trace[]): void {
+    this.aggregate.addTraces(traces);
+  }
+
+  public getAggregateGraph(): AggregateGraph {
+    return this.aggregate;
+  }
+
+  public getServiceMap(): ServiceMap {
+    return this.aggregate.getServiceMap();
+  }
+
+  // Analyzes every trace recorded so far without reloading them
+  public async analyzeAggregate(options: AnalysisOptions = {}): Promise<AnalysisResult> {
+    const startTime = Date.now();
+    return this.analyzeMergedGraph(this.aggregate.toDependencyGraph(), options, startTime);
+  }
 
+  private analyzeMergedGraph(graph: DependencyGraph, options: AnalysisOptions, startTime: number): AnalysisResult {
     // Optimize graph if requested
     let optimization: OptimizationResult = {
       originalNodeCount: graph.nodes.size,
@@ -101,12 +191,14 @@ export class AnalysisEngine {
       originalEdgeCount: graph.edges.size,
       optimizedEdgeCount: graph.edges.size,
       processingTime: 0,
-      optimizations: []
+      optimizations: [],
+      passes: []
     };
 
     if (options.optimizeGraph !== false) {
       const optimizationResult = this.optimizer.optimize(graph, {
-        maxNodes: options.maxNodes || 200 // Allow more nodes for multiple traces
+        maxNodes: options.maxNodes || 200, // Allow more nodes for multiple traces
+        inPlace: true
       });
       graph = optimizationResult.graph;
       optimization = optimizationResult.result;
@@ -115,7 +207,11 @@ export class AnalysisEngine {
     // Analyze blocking paths
     const blockingPaths = this.blockingAnalyzer.identifyBlockingPaths(
       graph, 
-      options.blockingThreshold || 0.03 // Lower threshold for multiple traces
+      options.blockingThreshold || 0.03, // Lower threshold for multiple traces
+      {
+        maxPaths: options.maxBlockingPaths,
+        timeBudgetMs: options.blockingPathTimeBudget
+      }
     );
 
     // Calculate performance impact
@@ -209,7 +305,8 @@ export class AnalysisEngine {
       ? durations.reduce((sum, d) => sum + d, 0) / durations.length 
       : 0;
     
-    const maxNodeDuration = durations.length > 0 ? Math.max(...durations) : 0;
+    // Reduced rather than spread: large graphs exceed the argument limit
+    const maxNodeDuration = durations.reduce((max, d) => Math.max(max, d), 0);
 
     return {
       nodeCount,
@@ -222,34 +319,17 @@ export class AnalysisEngine {
   }
 
   private calculateGraphDepth(graph: DependencyGraph): number {
-    let maxDepth = 0;
-    
-    const calculateDepth = (nodeId: string, currentDepth: number, visited: Set<string>): number => {
-      if (visited.has(nodeId)) return currentDepth;
-      
-      visited.add(nodeId);
-      const node = graph.nodes.get(nodeId);
-      if (!node) return currentDepth;
-      
-      let maxChildDepth = currentDepth;
-      for (const childId of node.children) {
-        const childDepth = calculateDepth(childId, currentDepth + 1, new Set(visited));
-        maxChildDepth = Math.max(maxChildDepth, childDepth);
-      }
-      
-      return maxChildDepth;
-    };
-    
-    for (const rootId of graph.rootNodes) {
-      const depth = calculateDepth(rootId, 1, new Set());
-      maxDepth = Math.max(maxDepth, depth);
-    }
-    
-    return maxDepth;
+    const core = graph.core ?? CompactGraph.fromDependencyGraph(graph);
+    return core.depth(core.indicesOf(graph.rootNodes));
   }
 }
 
 // Export all types and classes
 export * from './graph/graph-builder';
+export * from './graph/compact-graph';
+export * from './graph/aggregate-graph';
+export * from './graph/graph-transfer';
 export * from './analyzers/blocking-path';
 export * from './optimizers/graph-optimizer';
+export * from './workers/analysis-pool';
+export * from './cache/analysis-cache';
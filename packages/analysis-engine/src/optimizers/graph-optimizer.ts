@@ -1,6 +1,15 @@
 // Graph optimization for performance and clarity
 import { DependencyGraph, GraphNode, GraphEdge } from '../graph/graph-builder';
 
+export interface OptimizationPassStats {
+  name: string;
+  processingTime: number; // milliseconds
+  nodesBefore: number;
+  nodesAfter: number;
+  edgesBefore: number;
+  edgesAfter: number;
+}
+
 export interface OptimizationResult {
   originalNodeCount: number;
   optimizedNodeCount: number;
@@ -8,58 +17,130 @@ export interface OptimizationResult {
   optimizedEdgeCount: number;
   processingTime: number;
   optimizations: string[];
+  passes: OptimizationPassStats[];
+}
+
+export interface OptimizeOptions {
+  removeNoise?: boolean;
+  simplifyPaths?: boolean;
+  mergeShortSpans?: boolean;
+  maxNodes?: number;
+  // Rewrite the given graph instead of a copy-on-write view of it
+  inPlace?: boolean;
+}
+
+// Node-level copy-on-write over a graph. Unless editing in place, the node
+// and edge maps are shallow copies and a node object is only cloned the
+// first time a pass changes it, so the input graph is never modified.
+class GraphEditor {
+  public readonly graph: DependencyGraph;
+  private owned: Set<string> | null;
+
+  constructor(source: DependencyGraph, inPlace: boolean) {
+    if (inPlace) {
+      // The packed core no longer describes the rewritten graph
+      source.core = undefined;
+      this.graph = source;
+      this.owned = null;
+    } else {
+      this.graph = {
+        nodes: new Map(source.nodes),
+        edges: new Map(source.edges),
+        rootNodes: [...source.rootNodes],
+        leafNodes: [...source.leafNodes],
+        criticalPath: [...source.criticalPath],
+        totalDuration: source.totalDuration
+      };
+      this.owned = new Set();
+    }
+  }
+
+  public mutable(id: string): GraphNode | undefined {
+    const node = this.graph.nodes.get(id);
+    if (!node || !this.owned || this.owned.has(id)) return node;
+
+    const copy: GraphNode = { ...node, children: [...node.children], parents: [...node.parents] };
+    this.graph.nodes.set(id, copy);
+    this.owned.add(id);
+    return copy;
+  }
+
+  public set(id: string, node: GraphNode): void {
+    this.graph.nodes.set(id, node);
+    this.owned?.add(id);
+  }
 }
 
 export class GraphOptimizer {
-  public optimize(graph: DependencyGraph, options: {
-    removeNoise?: boolean;
-    simplifyPaths?: boolean;
-    mergeShortSpans?: boolean;
-    maxNodes?: number;
-  } = {}): { graph: DependencyGraph; result: OptimizationResult } {
+  // Unless options.inPlace is set the input graph is left untouched, and the
+  // returned graph shares every node object the passes did not change
+  public optimize(graph: DependencyGraph, options: OptimizeOptions = {}): { graph: DependencyGraph; result: OptimizationResult } {
     const startTime = Date.now();
     const originalNodeCount = graph.nodes.size;
     const originalEdgeCount = graph.edges.size;
     const optimizations: string[] = [];
-
-    let optimizedGraph = this.deepCloneGraph(graph);
-
-    // Remove noise nodes (very short duration, no significant impact)
-    if (options.removeNoise !== false) {
-      const noiseResult = this.removeNoiseNodes(optimizedGraph);
-      optimizedGraph = noiseResult.graph;
-      if (noiseResult.removedCount > 0) {
-        optimizations.push(`Removed ${noiseResult.removedCount} noise nodes`);
+    const passes: OptimizationPassStats[] = [];
+
+    const editor = new GraphEditor(graph, options.inPlace === true);
+    const optimizedGraph = editor.graph;
+
+    // Roots and the critical path only change in the final pass
+    const rootSet = new Set(optimizedGraph.rootNodes);
+    const criticalSet = new Set(optimizedGraph.criticalPath);
+
+    const removeNoise = options.removeNoise !== false;
+    const mergeShortSpans = options.mergeShortSpans !== false;
+
+    // Noise nodes and merge candidates are found in a single traversal
+    if (removeNoise || mergeShortSpans) {
+      const scan = this.runPass(optimizedGraph, passes, 'scan', () =>
+        this.scanNodes(optimizedGraph, rootSet, criticalSet, removeNoise, mergeShortSpans)
+      );
+
+      // Remove noise nodes (very short duration, no significant impact)
+      if (removeNoise) {
+        const removedCount = this.runPass(optimizedGraph, passes, 'removeNoise', () =>
+          this.removeNoiseNodes(editor, scan.noise)
+        );
+        if (removedCount > 0) {
+          optimizations.push(`Removed ${removedCount} noise nodes`);
+        }
       }
-    }
 
-    // Merge short consecutive spans
-    if (options.mergeShortSpans !== false) {
-      const mergeResult = this.mergeShortSpans(optimizedGraph);
-      optimizedGraph = mergeResult.graph;
-      if (mergeResult.mergedCount > 0) {
-        optimizations.push(`Merged ${mergeResult.mergedCount} short spans`);
+      // Merge short consecutive spans
+      if (mergeShortSpans) {
+        const mergedCount = this.runPass(optimizedGraph, passes, 'mergeShortSpans', () =>
+          this.mergeShortSpans(editor, scan.merges)
+        );
+        if (mergedCount > 0) {
+          optimizations.push(`Merged ${mergedCount} short spans`);
+        }
       }
     }
 
     // Simplify linear paths
     if (options.simplifyPaths !== false) {
-      const simplifyResult = this.simplifyLinearPaths(optimizedGraph);
-      optimizedGraph = simplifyResult.graph;
-      if (simplifyResult.simplifiedCount > 0) {
-        optimizations.push(`Simplified ${simplifyResult.simplifiedCount} linear paths`);
+      const simplifiedCount = this.runPass(optimizedGraph, passes, 'simplifyPaths', () =>
+        this.simplifyLinearPaths(editor, rootSet)
+      );
+      if (simplifiedCount > 0) {
+        optimizations.push(`Simplified ${simplifiedCount} linear paths`);
       }
     }
 
     // Limit total nodes if specified
     if (options.maxNodes && optimizedGraph.nodes.size > options.maxNodes) {
-      const limitResult = this.limitNodes(optimizedGraph, options.maxNodes);
-      optimizedGraph = limitResult.graph;
-      optimizations.push(`Limited to ${options.maxNodes} most important nodes`);
+      const maxNodes = options.maxNodes;
+      this.runPass(optimizedGraph, passes, 'limitNodes', () =>
+        this.limitNodes(editor, maxNodes, rootSet, criticalSet)
+      );
+      optimizations.push(`Limited to ${maxNodes} most important nodes`);
     }
 
     // Recalculate critical path after optimization
-    optimizedGraph.criticalPath = this.recalculateCriticalPath(optimizedGraph);
+    optimizedGraph.criticalPath = this.runPass(optimizedGraph, passes, 'criticalPath', () =>
+      this.recalculateCriticalPath(optimizedGraph)
+    );
 
     const processingTime = Date.now() - startTime;
 
@@ -69,85 +150,128 @@ export class GraphOptimizer {
       originalEdgeCount,
       optimizedEdgeCount: optimizedGraph.edges.size,
       processingTime,
-      optimizations
+      optimizations,
+      passes
     };
 
     return { graph: optimizedGraph, result };
   }
 
-  private removeNoiseNodes(graph: DependencyGraph): { graph: DependencyGraph; removedCount: number } {
-    const threshold = graph.totalDuration * 0.001; // 0.1% of total duration
-    const nodesToRemove: string[] = [];
+  private runPass<T>(graph: DependencyGraph, passes: OptimizationPassStats[], name: string, pass: () => T): T {
+    const nodesBefore = graph.nodes.size;
+    const edgesBefore = graph.edges.size;
+    const start = performance.now();
+
+    const result = pass();
+
+    passes.push({
+      name,
+      processingTime: Math.round((performance.now() - start) * 1000) / 1000,
+      nodesBefore,
+      nodesAfter: graph.nodes.size,
+      edgesBefore,
+      edgesAfter: graph.edges.size
+    });
+
+    return result;
+  }
+
+  // Noise removal only drops leaves, so whether a node keeps exactly one
+  // child afterwards can be decided from its children before anything is
+  // removed, and merge candidates come out of the same traversal
+  private scanNodes(
+    graph: DependencyGraph,
+    rootSet: Set<string>,
+    criticalSet: Set<string>,
+    removeNoise: boolean,
+    mergeShortSpans: boolean
+  ): { noise: Set<string>; merges: Array<{ parent: string; child: string }> } {
+    const noiseThreshold = graph.totalDuration * 0.001; // 0.1% of total duration
+    const mergeThreshold = graph.totalDuration * 0.01; // 1% of total duration
+
+    // Nodes with very short duration and no children, except roots and
+    // critical path nodes
+    const isNoise = (nodeId: string, node: GraphNode): boolean =>
+      removeNoise &&
+      node.children.length === 0 &&
+      (node.duration || 0) < noiseThreshold &&
+      !rootSet.has(nodeId) &&
+      !criticalSet.has(nodeId);
+
+    const noise = new Set<string>();
+    const merges: Array<{ parent: string; child: string }> = [];
 
     for (const [nodeId, node] of graph.nodes) {
-      // Don't remove root or critical path nodes
-      if (graph.rootNodes.includes(nodeId) || graph.criticalPath.includes(nodeId)) {
+      if (isNoise(nodeId, node)) {
+        noise.add(nodeId);
         continue;
       }
 
-      // Remove nodes with very short duration and no children
-      if ((node.duration || 0) < threshold && node.children.length === 0) {
-        nodesToRemove.push(nodeId);
+      if (!mergeShortSpans || rootSet.has(nodeId) || !((node.duration || 0) < mergeThreshold)) {
+        continue;
+      }
+
+      // Skip nodes left with anything but a single child
+      let childId: string | undefined;
+      let remaining = 0;
+      for (const id of node.children) {
+        const candidate = graph.nodes.get(id);
+        if (candidate && isNoise(id, candidate)) continue;
+        childId = id;
+        remaining++;
+      }
+      if (remaining !== 1 || !childId) continue;
+
+      const child = graph.nodes.get(childId);
+
+      // Merge if both spans are short and child has only one parent
+      if (child && (child.duration || 0) < mergeThreshold && child.parents.length === 1) {
+        merges.push({ parent: nodeId, child: childId });
       }
     }
 
-    // Remove nodes and update relationships
-    for (const nodeId of nodesToRemove) {
+    return { noise, merges };
+  }
+
+  private removeNoiseNodes(editor: GraphEditor, noise: Set<string>): number {
+    const graph = editor.graph;
+    const affectedParents = new Set<string>();
+
+    for (const nodeId of noise) {
       const node = graph.nodes.get(nodeId);
       if (!node) continue;
 
-      // Update parent nodes to remove this child
-      for (const parentId of node.parents) {
-        const parent = graph.nodes.get(parentId);
-        if (parent) {
-          parent.children = parent.children.filter(id => id !== nodeId);
-        }
-      }
-
-      // Remove associated edges
       for (const parentId of node.parents) {
+        affectedParents.add(parentId);
         graph.edges.delete(`${parentId}->${nodeId}`);
       }
 
       graph.nodes.delete(nodeId);
     }
 
+    // Each parent is rewritten once, however many children it lost
+    for (const parentId of affectedParents) {
+      const parent = editor.mutable(parentId);
+      if (parent) {
+        parent.children = parent.children.filter(id => !noise.has(id));
+      }
+    }
+
     // Update leaf nodes
-    graph.leafNodes = Array.from(graph.nodes.values())
-      .filter(node => node.children.length === 0)
-      .map(node => node.id);
+    const leafNodes: string[] = [];
+    for (const node of graph.nodes.values()) {
+      if (node.children.length === 0) leafNodes.push(node.id);
+    }
+    graph.leafNodes = leafNodes;
 
-    return { graph, removedCount: nodesToRemove.length };
+    return noise.size;
   }
 
-  private mergeShortSpans(graph: DependencyGraph): { graph: DependencyGraph; mergedCount: number } {
-    const threshold = graph.totalDuration * 0.01; // 1% of total duration
+  private mergeShortSpans(editor: GraphEditor, merges: Array<{ parent: string; child: string }>): number {
+    const graph = editor.graph;
     let mergedCount = 0;
 
-    const nodesToMerge: Array<{ parent: string; child: string }> = [];
-
-    for (const [nodeId, node] of graph.nodes) {
-      // Skip root nodes and nodes with multiple children
-      if (graph.rootNodes.includes(nodeId) || node.children.length !== 1) {
-        continue;
-      }
-
-      const childId = node.children[0];
-      if (!childId) continue; // Extra safety check
-      
-      const child = graph.nodes.get(childId);
-
-      // Merge if both spans are short and child has only one parent
-      if (child && 
-          (node.duration || 0) < threshold && 
-          (child.duration || 0) < threshold &&
-          child.parents.length === 1) {
-        nodesToMerge.push({ parent: nodeId, child: childId });
-      }
-    }
-
-    // Perform merges
-    for (const { parent: parentId, child: childId } of nodesToMerge) {
+    for (const { parent: parentId, child: childId } of merges) {
       const parent = graph.nodes.get(parentId);
       const child = graph.nodes.get(childId);
 
@@ -166,22 +290,19 @@ export class GraphOptimizer {
           merged: true,
           originalNodes: [parentId, childId]
         },
-        children: child.children,
-        parents: parent.parents
+        children: [...child.children],
+        parents: [...parent.parents]
       };
 
-      // Update relationships
+      // Update relationships and edges
+      graph.edges.delete(`${parentId}->${childId}`);
+
       for (const grandchildId of child.children) {
-        const grandchild = graph.nodes.get(grandchildId);
+        const grandchild = editor.mutable(grandchildId);
         if (grandchild) {
           grandchild.parents = grandchild.parents.map(id => id === childId ? parentId : id);
         }
-      }
 
-      // Update edges
-      graph.edges.delete(`${parentId}->${childId}`);
-      
-      for (const grandchildId of child.children) {
         const edge = graph.edges.get(`${childId}->${grandchildId}`);
         if (edge) {
           graph.edges.delete(`${childId}->${grandchildId}`);
@@ -193,39 +314,40 @@ export class GraphOptimizer {
       }
 
       // Replace parent node and remove child node
-      graph.nodes.set(parentId, mergedNode);
+      editor.set(parentId, mergedNode);
       graph.nodes.delete(childId);
 
       mergedCount++;
     }
 
-    return { graph, mergedCount };
+    return mergedCount;
   }
 
-  private simplifyLinearPaths(graph: DependencyGraph): { graph: DependencyGraph; simplifiedCount: number } {
+  private simplifyLinearPaths(editor: GraphEditor, rootSet: Set<string>): number {
+    const graph = editor.graph;
     let simplifiedCount = 0;
     const processedNodes = new Set<string>();
 
-    for (const [nodeId, node] of graph.nodes) {
-      if (processedNodes.has(nodeId) || graph.rootNodes.includes(nodeId)) {
+    for (const nodeId of graph.nodes.keys()) {
+      if (processedNodes.has(nodeId) || rootSet.has(nodeId)) {
         continue;
       }
 
       // Find linear path starting from this node
       const linearPath = this.findLinearPath(graph, nodeId);
-      
+
       if (linearPath.length > 3) { // Only simplify paths with 4+ nodes
         const simplifiedNode = this.createSimplifiedNode(graph, linearPath);
-        
+
         // Replace linear path with simplified node
-        this.replaceLinearPath(graph, linearPath, simplifiedNode);
-        
+        this.replaceLinearPath(editor, linearPath, simplifiedNode);
+
         linearPath.forEach(id => processedNodes.add(id));
         simplifiedCount++;
       }
     }
 
-    return { graph, simplifiedCount };
+    return simplifiedCount;
   }
 
   private findLinearPath(graph: DependencyGraph, startId: string): string[] {
@@ -238,7 +360,7 @@ export class GraphOptimizer {
 
       const childId = current.children[0];
       if (!childId) break; // Extra safety check
-      
+
       const child = graph.nodes.get(childId);
       if (!child || child.parents.length !== 1) break;
 
@@ -252,22 +374,22 @@ export class GraphOptimizer {
   private createSimplifiedNode(graph: DependencyGraph, path: string[]): GraphNode {
     const firstId = path[0];
     const lastId = path[path.length - 1];
-    
+
     if (!firstId || !lastId) {
       throw new Error('Invalid path for simplification');
     }
-    
+
     const firstNode = graph.nodes.get(firstId);
     const lastNode = graph.nodes.get(lastId);
-    
+
     if (!firstNode || !lastNode) {
       throw new Error('Nodes not found for simplification');
     }
-    
-    const totalDuration = path.reduce((sum, nodeId) => {
-      const node = graph.nodes.get(nodeId);
-      return sum + (node?.duration || 0);
-    }, 0);
+
+    let totalDuration = 0;
+    for (const nodeId of path) {
+      totalDuration += graph.nodes.get(nodeId)?.duration || 0;
+    }
 
     return {
       id: `simplified_${firstId}_${lastId}`,
@@ -281,32 +403,33 @@ export class GraphOptimizer {
         originalPath: path,
         stepCount: path.length
       },
-      children: lastNode.children,
-      parents: firstNode.parents
+      children: [...lastNode.children],
+      parents: [...firstNode.parents]
     };
   }
 
-  private replaceLinearPath(graph: DependencyGraph, path: string[], simplifiedNode: GraphNode): void {
+  private replaceLinearPath(editor: GraphEditor, path: string[], simplifiedNode: GraphNode): void {
+    const graph = editor.graph;
     const firstId = path[0];
     const lastId = path[path.length - 1];
-    
+
     if (!firstId || !lastId) return;
-    
+
     const firstNode = graph.nodes.get(firstId);
     const lastNode = graph.nodes.get(lastId);
-    
+
     if (!firstNode || !lastNode) return;
 
     // Add simplified node
-    graph.nodes.set(simplifiedNode.id, simplifiedNode);
+    editor.set(simplifiedNode.id, simplifiedNode);
 
     // Update parent relationships
     for (const parentId of firstNode.parents) {
-      const parent = graph.nodes.get(parentId);
+      const parent = editor.mutable(parentId);
       if (parent) {
         parent.children = parent.children.map(id => id === firstId ? simplifiedNode.id : id);
       }
-      
+
       // Update edge
       const edge = graph.edges.get(`${parentId}->${firstId}`);
       if (edge) {
@@ -320,11 +443,11 @@ export class GraphOptimizer {
 
     // Update child relationships
     for (const childId of lastNode.children) {
-      const child = graph.nodes.get(childId);
+      const child = editor.mutable(childId);
       if (child) {
         child.parents = child.parents.map(id => id === lastId ? simplifiedNode.id : id);
       }
-      
+
       // Update edge
       const edge = graph.edges.get(`${lastId}->${childId}`);
       if (edge) {
@@ -346,38 +469,38 @@ export class GraphOptimizer {
     }
   }
 
-  private limitNodes(graph: DependencyGraph, maxNodes: number): { graph: DependencyGraph } {
-    if (graph.nodes.size <= maxNodes) return { graph };
+  private limitNodes(editor: GraphEditor, maxNodes: number, rootSet: Set<string>, criticalSet: Set<string>): void {
+    const graph = editor.graph;
+    if (graph.nodes.size <= maxNodes) return;
 
     // Score nodes by importance
-    const nodeScores = new Map<string, number>();
-    
+    const nodeScores: Array<[string, number]> = [];
+
     for (const [nodeId, node] of graph.nodes) {
       let score = 0;
-      
+
       // Critical path nodes get highest score
-      if (graph.criticalPath.includes(nodeId)) score += 100;
-      
+      if (criticalSet.has(nodeId)) score += 100;
+
       // Root nodes get high score
-      if (graph.rootNodes.includes(nodeId)) score += 50;
-      
+      if (rootSet.has(nodeId)) score += 50;
+
       // Duration impact
       score += ((node.duration || 0) / graph.totalDuration) * 50;
-      
+
       // Connectivity (nodes with many connections are important)
       score += (node.children.length + node.parents.length) * 5;
-      
-      nodeScores.set(nodeId, score);
+
+      nodeScores.push([nodeId, score]);
     }
 
     // Keep top nodes
-    const sortedNodes = Array.from(nodeScores.entries())
-      .sort((a, b) => b[1] - a[1])
-      .slice(0, maxNodes)
-      .map(([nodeId]) => nodeId);
+    nodeScores.sort((a, b) => b[1] - a[1]);
+    const keptNodes = new Set<string>();
+    for (let i = 0; i < maxNodes && i < nodeScores.length; i++) {
+      keptNodes.add(nodeScores[i]![0]);
+    }
 
-    const keptNodes = new Set(sortedNodes);
-    
     // Remove nodes not in the kept set
     for (const nodeId of graph.nodes.keys()) {
       if (!keptNodes.has(nodeId)) {
@@ -392,17 +515,20 @@ export class GraphOptimizer {
       }
     }
 
-    // Update node relationships
-    for (const node of graph.nodes.values()) {
-      node.children = node.children.filter(id => keptNodes.has(id));
-      node.parents = node.parents.filter(id => keptNodes.has(id));
+    // Update node relationships, copying only nodes that lost a neighbour
+    const dropped = (id: string) => !keptNodes.has(id);
+    for (const nodeId of keptNodes) {
+      const node = graph.nodes.get(nodeId)!;
+      if (node.children.some(dropped) || node.parents.some(dropped)) {
+        const writable = editor.mutable(nodeId)!;
+        writable.children = writable.children.filter(id => keptNodes.has(id));
+        writable.parents = writable.parents.filter(id => keptNodes.has(id));
+      }
     }
 
     // Update root and leaf nodes
     graph.rootNodes = graph.rootNodes.filter(id => keptNodes.has(id));
     graph.leafNodes = graph.leafNodes.filter(id => keptNodes.has(id));
-
-    return { graph };
   }
 
   private recalculateCriticalPath(graph: DependencyGraph): string[] {
@@ -410,26 +536,4 @@ export class GraphOptimizer {
     // In a real implementation, this would use the same algorithm as GraphBuilder
     return graph.criticalPath.filter(nodeId => graph.nodes.has(nodeId));
   }
-
-  private deepCloneGraph(graph: DependencyGraph): DependencyGraph {
-    return {
-      nodes: new Map(Array.from(graph.nodes.entries()).map(([id, node]) => [
-        id,
-        {
-          ...node,
-          children: [...node.children],
-          parents: [...node.parents],
-          metadata: { ...node.metadata }
-        }
-      ])),
-      edges: new Map(Array.from(graph.edges.entries()).map(([id, edge]) => [
-        id,
-        { ...edge, metadata: { ...edge.metadata } }
-      ])),
-      rootNodes: [...graph.rootNodes],
-      leafNodes: [...graph.leafNodes],
-      criticalPath: [...graph.criticalPath],
-      totalDuration: graph.totalDuration
-    };
-  }
 }
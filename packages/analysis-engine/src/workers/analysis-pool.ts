@@ -0,0 +1,297 @@
+// Worker thread pool for running analyses off the caller's event loop
+//
+// Each worker runs one job at a time, so the pool size is the concurrency
+// limit; further jobs wait in a FIFO queue. A job that overruns its timeout
+// has its worker terminated, since synchronous analysis cannot be
+// interrupted any other way, and a fresh worker takes its place.
+import fs from 'fs';
+import os from 'os';
+import path from 'path';
+import { Worker } from 'worker_threads';
+import { Trace } from '@tracelens/shared';
+import type { AnalysisOptions, AnalysisResult } from '../index';
+import { AggregateGraph, PackedAggregateGraph } from '../graph/aggregate-graph';
+import { PackedDependencyGraph, unpackGraph } from '../graph/graph-transfer';
+
+export interface AnalysisPoolOptions {
+  size?: number; // worker threads, i.e. jobs running at once
+  jobTimeout?: number; // milliseconds a job may run once started
+  maxQueue?: number; // waiting jobs before new ones are rejected
+  workerScript?: string;
+}
+
+export interface AnalysisPoolStats {
+  size: number;
+  workers: number;
+  busy: number;
+  queued: number;
+  completed: number;
+  failed: number;
+  timedOut: number;
+}
+
+export type PackedAnalysisResult = Omit<AnalysisResult, 'graph'> & { graph: PackedDependencyGraph };
+
+export type AnalysisJob =
+  | { id: number; kind: 'trace'; trace: Trace; options: AnalysisOptions }
+  | { id: number; kind: 'aggregate'; traces: Trace[] };
+
+export type AnalysisJobReply =
+  | { id: number; ok: true; kind: 'trace'; result: PackedAnalysisResult }
+  | { id: number; ok: true; kind: 'aggregate'; aggregate: PackedAggregateGraph }
+  | { id: number; ok: false; error: string };
+
+// Posted by a worker once its modules are loaded
+export const WORKER_READY = 'ready';
+
+export class AnalysisPoolError extends Error {
+  constructor(message: string, public readonly code: 'timeout' | 'queue_full' | 'worker_error' | 'closed') {
+    super(message);
+    this.name = 'AnalysisPoolError';
+  }
+}
+
+interface PendingJob {
+  message: AnalysisJob;
+  resolve: (reply: AnalysisJobReply) => void;
+  reject: (error: Error) => void;
+}
+
+interface PoolWorker {
+  worker: Worker;
+  ready: boolean;
+  job: PendingJob | null;
+  timer: NodeJS.Timeout | null;
+}
+
+const DEFAULT_OPTIONS: Required<Omit<AnalysisPoolOptions, 'workerScript'>> = {
+  size: Math.max(1, os.cpus().length - 1),
+  jobTimeout: 30000,
+  maxQueue: 1000
+};
+
+// The compiled worker sits next to this file; when running from source
+// (tsx, ts-jest) the TypeScript entry is loaded through tsx instead
+function resolveWorkerScript(script?: string): { filename: string; execArgv?: string[] } {
+  if (script) return { filename: script };
+
+  const compiled = path.join(__dirname, 'analysis-worker.js');
+  if (fs.existsSync(compiled)) return { filename: compiled };
+
+  return { filename: path.join(__dirname, 'analysis-worker.ts'), execArgv: ['--import', 'tsx'] };
+}
+
+export class AnalysisWorkerPool {
+  private config: Required<Omit<AnalysisPoolOptions, 'workerScript'>>;
+  private script: { filename: string; execArgv?: string[] };
+  private workers: PoolWorker[] = [];
+  private queue: PendingJob[] = [];
+  private nextJobId = 1;
+  private closed = false;
+  private stats = {
+    completed: 0,
+    failed: 0,
+    timedOut: 0
+  };
+
+  constructor(options: AnalysisPoolOptions = {}) {
+    this.config = {
+      size: Math.max(1, options.size ?? DEFAULT_OPTIONS.size),
+      jobTimeout: options.jobTimeout ?? DEFAULT_OPTIONS.jobTimeout,
+      maxQueue: options.maxQueue ?? DEFAULT_OPTIONS.maxQueue
+    };
+    this.script = resolveWorkerScript(options.workerScript);
+  }
+
+  public get size(): number {
+    return this.config.size;
+  }
+
+  public async analyzeTrace(trace: Trace, options: AnalysisOptions = {}): Promise<AnalysisResult> {
+    const reply = await this.run({ id: this.nextJobId++, kind: 'trace', trace, options });
+    if (!reply.ok || reply.kind !== 'trace') {
+      throw new AnalysisPoolError('Unexpected reply from analysis worker', 'worker_error');
+    }
+    const { graph, ...result } = reply.result;
+    return { graph: unpackGraph(graph), ...result };
+  }
+
+  // Folds the traces into one aggregate, one contiguous shard per worker.
+  // Shards are merged in order, so the result matches a sequential build.
+  public async buildAggregate(traces: Trace[]): Promise<AggregateGraph> {
+    const shards = this.shard(traces);
+    const replies = await Promise.all(
+      shards.map(shard => this.run({ id: this.nextJobId++, kind: 'aggregate', traces: shard }))
+    );
+
+    const aggregate = new AggregateGraph();
+    for (const reply of replies) {
+      if (!reply.ok || reply.kind !== 'aggregate') {
+        throw new AnalysisPoolError('Unexpected reply from analysis worker', 'worker_error');
+      }
+      aggregate.merge(AggregateGraph.fromPacked(reply.aggregate));
+    }
+    return aggregate;
+  }
+
+  public getStats(): AnalysisPoolStats {
+    return {
+      size: this.config.size,
+      workers: this.workers.length,
+      busy: this.workers.filter(slot => slot.job !== null).length,
+      queued: this.queue.length,
+      ...this.stats
+    };
+  }
+
+  // Rejects queued and running jobs and stops every worker
+  public async close(): Promise<void> {
+    if (this.closed) return;
+    this.closed = true;
+
+    const error = new AnalysisPoolError('Analysis pool closed', 'closed');
+    for (const job of this.queue.splice(0)) {
+      job.reject(error);
+    }
+
+    const workers = this.workers.splice(0);
+    await Promise.all(workers.map(slot => {
+      this.release(slot)?.reject(error);
+      return slot.worker.terminate();
+    }));
+  }
+
+  private run(message: AnalysisJob): Promise<AnalysisJobReply> {
+    if (this.closed) {
+      return Promise.reject(new AnalysisPoolError('Analysis pool closed', 'closed'));
+    }
+    if (this.queue.length >= this.config.maxQueue) {
+      return Promise.reject(new AnalysisPoolError('Analysis queue is full', 'queue_full'));
+    }
+
+    return new Promise((resolve, reject) => {
+      this.queue.push({ message, resolve, reject });
+      this.dispatch();
+    });
+  }
+
+  // Balanced by span count, preserving trace order
+  private shard(traces: Trace[]): Trace[][] {
+    const count = Math.min(this.config.size, traces.length);
+    if (count <= 1) return traces.length > 0 ? [traces] : [];
+
+    let totalSpans = 0;
+    for (const trace of traces) totalSpans += trace.spans.length;
+
+    const shards: Trace[][] = [];
+    let current: Trace[] = [];
+    let seen = 0;
+    for (const trace of traces) {
+      current.push(trace);
+      seen += trace.spans.length;
+      if (shards.length < count - 1 && seen >= (totalSpans * (shards.length + 1)) / count) {
+        shards.push(current);
+        current = [];
+      }
+    }
+    if (current.length > 0) shards.push(current);
+
+    return shards;
+  }
+
+  private dispatch(): void {
+    while (this.queue.length > 0) {
+      let slot = this.workers.find(candidate => candidate.job === null);
+      if (!slot && this.workers.length < this.config.size) {
+        slot = this.spawn();
+      }
+      if (!slot) return;
+
+      const job = this.queue.shift()!;
+      slot.job = job;
+      // Keep the process alive only while a job is running
+      slot.worker.ref();
+      slot.worker.postMessage(job.message);
+      if (slot.ready) this.startTimer(slot);
+    }
+  }
+
+  // Worker startup does not count against the job's timeout
+  private startTimer(slot: PoolWorker): void {
+    slot.timer = setTimeout(() => this.timeout(slot), this.config.jobTimeout);
+  }
+
+  private spawn(): PoolWorker {
+    const worker = new Worker(this.script.filename, { execArgv: this.script.execArgv });
+    const slot: PoolWorker = { worker, ready: false, job: null, timer: null };
+
+    worker.on('message', (reply: AnalysisJobReply | typeof WORKER_READY) => {
+      if (reply === WORKER_READY) {
+        slot.ready = true;
+        if (slot.job) this.startTimer(slot);
+        return;
+      }
+
+      const job = this.release(slot);
+      if (!job) return;
+
+      if (reply.ok) {
+        this.stats.completed++;
+        job.resolve(reply);
+      } else {
+        this.stats.failed++;
+        job.reject(new Error(reply.error));
+      }
+      this.dispatch();
+    });
+
+    worker.on('error', error => {
+      this.retire(slot, new AnalysisPoolError(`Analysis worker failed: ${error.message}`, 'worker_error'));
+    });
+
+    worker.on('exit', code => {
+      this.retire(slot, new AnalysisPoolError(`Analysis worker exited with code ${code}`, 'worker_error'));
+    });
+
+    worker.unref();
+    this.workers.push(slot);
+    return slot;
+  }
+
+  private timeout(slot: PoolWorker): void {
+    this.stats.timedOut++;
+    this.retire(slot, new AnalysisPoolError(
+      `Analysis job exceeded ${this.config.jobTimeout}ms`,
+      'timeout'
+    ));
+    slot.worker.terminate().catch(() => undefined);
+  }
+
+  // Takes a worker out of the pool, failing its job; a replacement is
+  // spawned on demand
+  private retire(slot: PoolWorker, error: Error): void {
+    const index = this.workers.indexOf(slot);
+    if (index === -1) return;
+    this.workers.splice(index, 1);
+
+    const job = this.release(slot);
+    if (job) {
+      if (!(error instanceof AnalysisPoolError && error.code === 'timeout')) {
+        this.stats.failed++;
+      }
+      job.reject(error);
+    }
+    this.dispatch();
+  }
+
+  private release(slot: PoolWorker): PendingJob | null {
+    const job = slot.job;
+    if (slot.timer) {
+      clearTimeout(slot.timer);
+      slot.timer = null;
+    }
+    slot.job = null;
+    slot.worker.unref();
+    return job;
+  }
+}
@@ -0,0 +1,40 @@
+// Worker thread entry for AnalysisWorkerPool
+import { parentPort } from 'worker_threads';
+import { AnalysisEngine } from '../index';
+import { AggregateGraph } from '../graph/aggregate-graph';
+import { packGraph, transferList } from '../graph/graph-transfer';
+import { WORKER_READY } from './analysis-pool';
+import type { AnalysisJob, AnalysisJobReply } from './analysis-pool';
+
+if (!parentPort) {
+  throw new Error('analysis-worker must be started as a worker thread');
+}
+
+const port = parentPort;
+const engine = new AnalysisEngine();
+
+port.on('message', async (job: AnalysisJob) => {
+  try {
+    if (job.kind === 'trace') {
+      const { graph, ...result } = await engine.analyzeTrace(job.trace, job.options);
+      const packed = packGraph(graph);
+      const reply: AnalysisJobReply = { id: job.id, ok: true, kind: 'trace', result: { ...result, graph: packed } };
+      port.postMessage(reply, transferList(packed));
+    } else {
+      const aggregate = new AggregateGraph();
+      aggregate.addTraces(job.traces);
+      const packed = aggregate.toPacked();
+      const reply: AnalysisJobReply = { id: job.id, ok: true, kind: 'aggregate', aggregate: packed };
+      port.postMessage(reply, transferList(packed));
+    }
+  } catch (error) {
+    const reply: AnalysisJobReply = {
+      id: job.id,
+      ok: false,
+      error: error instanceof Error ? error.message : String(error)
+    };
+    port.postMessage(reply);
+  }
+});
+
+port.postMessage(WORKER_READY);
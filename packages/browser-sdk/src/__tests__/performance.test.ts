@@ -1,6 +1,8 @@
 // Performance overhead test to validate <1ms requirement
 import { TraceLensSDK } from '../core/tracer';
 import { SamplingManager } from '../utils/sampling';
+import { EventBuffer } from '../batching/event-buffer';
+import { DEFAULT_CONFIG } from '../config/sdk-config';
 
 // Mock performance API for testing
 const mockPerformance = {
@@ -133,6 +135,117 @@ describe('Browser SDK Performance Tests', () => {
     performance.now = originalNow;
   });
 
+  test('Event buffer splits batches by encoded size', async () => {
+    const sendBeacon = navigator.sendBeacon as jest.Mock;
+    sendBeacon.mockClear();
+
+    const buffer = new EventBuffer({
+      ...DEFAULT_CONFIG,
+      projectKey: 'test-project',
+      bufferSize: 1000,
+      maxBatchBytes: 2048,
+      compression: false,
+      persistQueue: false
+    });
+
+    for (let i = 0; i < 20; i++) {
+      buffer.add({
+        id: `event-${i}`,
+        timestamp: Date.now(),
+        type: 'custom' as any,
+        data: { padding: 'x'.repeat(200) } as any,
+        url: 'https://example.com',
+        userAgent: 'test-agent'
+      });
+    }
+    buffer.destroy();
+    await new Promise(resolve => setTimeout(resolve, 0));
+
+    expect(sendBeacon.mock.calls.length).toBeGreaterThan(1);
+    let delivered = 0;
+    for (const [, blob] of sendBeacon.mock.calls) {
+      expect((blob as Blob).size).toBeLessThanOrEqual(2048);
+      delivered += JSON.parse(await (blob as Blob).text()).events.length;
+    }
+    expect(delivered).toBe(20);
+    expect(buffer.getQueueSize()).toBe(0);
+  });
+
+  test('Priority sampling keeps errors and weights downsampled routine events', () => {
+    const sampler = new SamplingManager(0.5, false, 1.0, { sessionBudget: 100000, holdTime: 60000 });
+    const event = (type: string, data: any, id: number) => ({
+      id: `event-${id}`,
+      timestamp: Date.now(),
+      type: type as any,
+      data,
+      url: 'https://example.com',
+      userAgent: 'test-agent'
+    });
+
+    const kept: any[] = [];
+    for (let i = 0; i < 2000; i++) {
+      kept.push(...sampler.offer(event('resource-timing', { duration: 10 }, i)));
+    }
+    // Routine events wait for the hold window
+    expect(kept).toHaveLength(0);
+    kept.push(...sampler.release());
+
+    const estimated = kept.reduce((total, sampled) => total + sampled.sampleWeight, 0);
+    expect(kept.length).toBeLessThan(1200);
+    expect(Math.abs(estimated - 2000) / 2000).toBeLessThan(0.1);
+
+    const priority = [
+      ...sampler.offer(event('error', { message: 'boom' }, 1)),
+      ...sampler.offer(event('long-task', { duration: 120 }, 2)),
+      ...sampler.offer(event('web-vitals', { lcp: { value: 6000, rating: 'poor' } }, 3))
+    ];
+    expect(priority.map(sampled => sampled.sampleWeight)).toEqual([1, 1, 1]);
+    expect(sampler.getSamplingStats().priority).toBe(3);
+  });
+
+  test('Priority sampling keeps weighted estimates unbiased past the session budget', () => {
+    const event = (type: string, id: number) => ({
+      id: `event-${id}`,
+      timestamp: Date.now(),
+      type: type as any,
+      data: { duration: 10 },
+      url: 'https://example.com',
+      userAgent: 'test-agent'
+    });
+
+    // Each session offers 200 routine events in four windows against a
+    // budget of 100
+    let estimated = 0;
+    const sessions = 300;
+    for (let session = 0; session < sessions; session++) {
+      sessionStorage.clear();
+      const sampler = new SamplingManager(1.0, false, 1.0, { sessionBudget: 100, holdTime: 60000 });
+      const kept: any[] = [];
+      for (let window = 0; window < 4; window++) {
+        for (let i = 0; i < 50; i++) {
+          kept.push(...sampler.offer(event('resource-timing', window * 50 + i)));
+        }
+        kept.push(...sampler.release());
+      }
+
+      expect(kept.length).toBeLessThanOrEqual(100);
+      expect(sampler.getSamplingStats().budgetRemaining).toBeGreaterThan(0);
+      estimated += kept.reduce((total, sampled) => total + sampled.sampleWeight, 0);
+    }
+    expect(Math.abs(estimated / sessions - 200) / 200).toBeLessThan(0.05);
+
+    // Context around a priority event is capped and weighted accordingly
+    sessionStorage.clear();
+    const sampler = new SamplingManager(1.0, false, 1.0, { sessionBudget: 1000, holdTime: 60000, maxContextEvents: 50 });
+    for (let i = 0; i < 200; i++) {
+      sampler.offer(event('resource-timing', i));
+    }
+    expect(sampler.offer(event('error', 200))).toHaveLength(1);
+    const context = sampler.release();
+    expect(context).toHaveLength(50);
+    expect(context.every(sampled => sampled.sampleWeight === 4)).toBe(true);
+  });
+
   test('SDK handles missing APIs gracefully', () => {
     // Remove PerformanceObserver to test fallback
     delete (global as any).PerformanceObserver;
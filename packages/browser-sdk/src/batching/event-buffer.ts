@@ -1,70 +1,117 @@
 // Efficient event batching with minimal memory overhead
+//
+// Events are sampled by priority on arrival (see SamplingManager), encoded
+// once, and batched by encoded size as well as count, so every batch fits
+// the transport's payload limit.
 import { PerformanceEvent } from '@tracelens/shared';
 import { SDKConfig } from '../config/sdk-config';
-import { BeaconSender } from '../transport/beacon-sender';
+import { BeaconSender, utf8Length } from '../transport/beacon-sender';
+import { SamplingManager } from '../utils/sampling';
 
 export class EventBuffer {
   private config: SDKConfig;
-  private buffer: PerformanceEvent[] = [];
+  private buffer: string[] = [];
+  private bufferBytes = 0;
   private sender: BeaconSender;
+  private sampler: SamplingManager;
   private flushTimer: ReturnType<typeof setInterval> | null = null;
 
   constructor(config: SDKConfig) {
     this.config = config;
     this.sender = new BeaconSender(config);
+    this.sampler = new SamplingManager(config.sampling, true, 1.0, {
+      sessionBudget: config.sessionEventBudget,
+      holdTime: config.sampleHoldTime
+    });
     this.startFlushTimer();
   }
 
   public add(event: PerformanceEvent): void {
     // Apply sampling at buffer level
-    if (Math.random() > this.config.sampling) {
-      return;
+    for (const sampled of this.sampler.offer(event)) {
+      this.enqueue(sampled);
     }
+  }
 
-    this.buffer.push(event);
-
-    // Flush if buffer is full
-    if (this.buffer.length >= this.config.bufferSize) {
-      this.flush();
+  // During unload the batch goes out with sendBeacon, as there is no time
+  // to compress it. Held events are decided now rather than at the end of
+  // their window.
+  public flush(options: { unload?: boolean } = {}): void {
+    for (const event of this.sampler.release()) {
+      this.enqueue(event);
     }
+    this.sendBuffer(options);
   }
 
-  public flush(): void {
-    if (this.buffer.length === 0) return;
+  public getBufferSize(): number {
+    return this.buffer.length;
+  }
 
-    const events = [...this.buffer];
-    this.buffer = [];
+  public getBufferBytes(): number {
+    return this.bufferBytes;
+  }
 
-    // Send events asynchronously
-    this.sender.send(events).catch(error => {
-      if (this.config.debug) {
-        console.warn('TraceLens: Failed to send events:', error);
-      }
-      
-      // Re-add events to buffer on failure (with limit to prevent memory leak)
-      if (this.buffer.length < this.config.bufferSize) {
-        this.buffer.unshift(...events.slice(0, this.config.bufferSize - this.buffer.length));
-      }
-    });
+  public getQueueSize(): number {
+    return this.sender.getQueueSize();
   }
 
-  public getBufferSize(): number {
-    return this.buffer.length;
+  public getSampler(): SamplingManager {
+    return this.sampler;
   }
 
   public clear(): void {
     this.buffer = [];
+    this.bufferBytes = 0;
   }
 
   public destroy(): void {
-    this.flush();
+    this.flush({ unload: true });
     this.stopFlushTimer();
   }
 
+  private enqueue(event: PerformanceEvent): void {
+    const encoded = JSON.stringify(event);
+    const bytes = utf8Length(encoded) + 1; // separating comma
+
+    // Start a new batch rather than overflow this one
+    const budget = this.config.maxBatchBytes - this.sender.getEnvelopeSize();
+    if (this.buffer.length > 0 && this.bufferBytes + bytes > budget) {
+      this.sendBuffer();
+    }
+
+    this.buffer.push(encoded);
+    this.bufferBytes += bytes;
+
+    // Flush if buffer is full
+    if (this.buffer.length >= this.config.bufferSize || this.bufferBytes >= budget) {
+      this.sendBuffer();
+    }
+  }
+
+  private sendBuffer(options: { unload?: boolean } = {}): void {
+    if (this.buffer.length === 0) return;
+
+    const events = this.buffer;
+    const bytes = this.bufferBytes;
+    this.buffer = [];
+    this.bufferBytes = 0;
+
+    // Send events asynchronously
+    this.sender.sendBatch(events, bytes, options).catch(error => {
+      if (this.config.debug) {
+        console.warn('TraceLens: Failed to send events:', error);
+      }
+    });
+  }
+
   private startFlushTimer(): void {
     this.flushTimer = setInterval(() => {
+      // Only windows that have closed are decided here
+      for (const event of this.sampler.release(false)) {
+        this.enqueue(event);
+      }
       if (this.buffer.length > 0) {
-        this.flush();
+        this.sendBuffer();
       }
     }, this.config.flushInterval);
   }
@@ -5,6 +5,12 @@ export interface SDKConfig {
   sampling: number;
   bufferSize: number;
   flushInterval: number;
+  maxBatchBytes: number; // encoded payload size per request; sendBeacon caps at 64KB
+  compression: boolean; // gzip batches where CompressionStream is supported
+  persistQueue: boolean; // keep undelivered batches in IndexedDB across page loads
+  maxQueueBytes: number;
+  sessionEventBudget: number; // routine events kept per session; errors, long tasks and poor vitals are exempt
+  sampleHoldTime: number; // milliseconds routine events wait for a sampling decision
   enableWebVitals: boolean;
   enableResourceTiming: boolean;
   enableLongTasks: boolean;
@@ -18,6 +24,12 @@ export const DEFAULT_CONFIG: SDKConfig = {
   sampling: 1.0,
   bufferSize: 100,
   flushInterval: 5000,
+  maxBatchBytes: 60000,
+  compression: true,
+  persistQueue: true,
+  maxQueueBytes: 1000000,
+  sessionEventBudget: 1000,
+  sampleHoldTime: 2000,
   enableWebVitals: true,
   enableResourceTiming: true,
   enableLongTasks: true,
@@ -44,6 +56,14 @@ export function validateConfig(config: Partial<SDKConfig>): string[] {
     errors.push('flushInterval must be at least 1000ms');
   }
 
+  if (config.maxBatchBytes !== undefined && (config.maxBatchBytes < 1024 || config.maxBatchBytes > 65536)) {
+    errors.push('maxBatchBytes must be between 1024 and 65536');
+  }
+
+  if (config.sessionEventBudget !== undefined && config.sessionEventBudget < 0) {
+    errors.push('sessionEventBudget must not be negative');
+  }
+
   if (config.endpoint && !isValidUrl(config.endpoint)) {
     errors.push('endpoint must be a valid URL');
   }
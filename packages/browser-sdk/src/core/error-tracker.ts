@@ -86,8 +86,6 @@ export class ErrorTracker {
     stack: string;
     error?: Error | undefined;
   }): void {
-    if (Math.random() > this.config.sampling) return;
-
     try {
       const errorEvent = {
         id: this.generateId(),
@@ -48,18 +48,17 @@ export class LongTaskObserver {
 
   private processLongTasks(entries: PerformanceEntry[]): void {
     entries.forEach(entry => {
-      if (Math.random() <= this.config.sampling) {
-        const longTaskData = this.extractLongTaskData(entry as any);
-        
-        this.eventBuffer.add({
-          id: this.generateId(),
-          timestamp: Date.now(),
-          type: 'long-task',
-          data: longTaskData,
-          url: window.location.href,
-          userAgent: navigator.userAgent
-        });
-      }
+      // Long tasks are always kept; the event buffer does not sample them
+      const longTaskData = this.extractLongTaskData(entry as any);
+
+      this.eventBuffer.add({
+        id: this.generateId(),
+        timestamp: Date.now(),
+        type: 'long-task',
+        data: longTaskData,
+        url: window.location.href,
+        userAgent: navigator.userAgent
+      });
     });
   }
 
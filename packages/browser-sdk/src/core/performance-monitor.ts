@@ -292,8 +292,6 @@ export class PerformanceMonitor {
   }
 
   private reportMetric(type: string, metric: any): void {
-    if (Math.random() > this.config.sampling) return;
-
     this.eventBuffer.add({
       id: this.generateMetricId(),
       timestamp: Date.now(),
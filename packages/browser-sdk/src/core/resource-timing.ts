@@ -56,19 +56,18 @@ export class ResourceTiming {
 
     resourceEntries.forEach(entry => {
       this.processedResources.add(entry.name);
-      
-      if (Math.random() <= this.config.sampling) {
-        const resourceData = this.extractResourceData(entry as PerformanceResourceTiming);
-        
-        this.eventBuffer.add({
-          id: this.generateId(),
-          timestamp: Date.now(),
-          type: 'resource-timing',
-          data: resourceData,
-          url: window.location.href,
-          userAgent: navigator.userAgent
-        });
-      }
+
+      // Sampled by the event buffer, which keeps slow resources
+      const resourceData = this.extractResourceData(entry as PerformanceResourceTiming);
+
+      this.eventBuffer.add({
+        id: this.generateId(),
+        timestamp: Date.now(),
+        type: 'resource-timing',
+        data: resourceData,
+        url: window.location.href,
+        userAgent: navigator.userAgent
+      });
     });
   }
 
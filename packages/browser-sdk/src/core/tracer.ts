@@ -25,6 +25,12 @@ export class TraceLensSDK {
       sampling: config.sampling || 1.0,
       bufferSize: config.bufferSize || 100,
       flushInterval: config.flushInterval || 5000,
+      maxBatchBytes: config.maxBatchBytes || 60000,
+      compression: config.compression !== false,
+      persistQueue: config.persistQueue !== false,
+      maxQueueBytes: config.maxQueueBytes || 1000000,
+      sessionEventBudget: config.sessionEventBudget ?? 1000,
+      sampleHoldTime: config.sampleHoldTime ?? 2000,
       enableWebVitals: config.enableWebVitals !== false,
       enableResourceTiming: config.enableResourceTiming !== false,
       enableLongTasks: config.enableLongTasks !== false,
@@ -82,7 +88,8 @@ export class TraceLensSDK {
     this.resourceTiming.stop();
     this.longTaskObserver.stop();
     this.errorTracker.stop();
-    this.eventBuffer.flush();
+    // Usually called as the page unloads, so nothing can be awaited
+    this.eventBuffer.flush({ unload: true });
 
     this.initialized = false;
   }
@@ -6,6 +6,7 @@ export { DEFAULT_CONFIG, validateConfig } from './config/sdk-config';
 export { WebVitalsCollector } from './collectors/web-vitals';
 export { NavigationTimingCollector } from './collectors/navigation-timing';
 export { SamplingManager, createTimeBudgetSampler, createUserInteractionSampler } from './utils/sampling';
+export type { PrioritySamplingOptions, SamplingStats } from './utils/sampling';
 
 // Re-export shared types for convenience
 export type { 
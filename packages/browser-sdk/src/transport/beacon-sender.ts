@@ -1,45 +1,143 @@
 // Non-blocking data transmission using Beacon API
+//
+// Batches arrive as already-encoded events and are joined into the payload
+// without re-serializing. Where CompressionStream is available they are
+// gzipped and sent with a keepalive fetch; sendBeacon cannot set
+// Content-Encoding, so it carries uncompressed batches, including every
+// batch sent while the page unloads. Batches that cannot be delivered are
+// queued, in IndexedDB where available, and retried after the next
+// successful send.
 import { PerformanceEvent } from '@tracelens/shared';
 import { SDKConfig } from '../config/sdk-config';
+import { PersistentQueue } from './persistent-queue';
+
+// sendBeacon and keepalive fetch both refuse bodies past 64KB
+const KEEPALIVE_LIMIT = 65536;
+
+// UTF-8 size of a string, without encoding it
+export function utf8Length(value: string): number {
+  let bytes = value.length;
+  for (let i = 0; i < value.length; i++) {
+    const code = value.charCodeAt(i);
+    if (code < 0x80) continue;
+    // Each half of a surrogate pair adds one byte to make four
+    bytes += code < 0x800 || (code >= 0xd800 && code <= 0xdfff) ? 1 : 2;
+  }
+  return bytes;
+}
 
 export class BeaconSender {
   private config: SDKConfig;
-  private fallbackQueue: PerformanceEvent[] = [];
+  private queue: PersistentQueue;
+  private retrying = false;
+  private envelope: { url: string; bytes: number } | null = null;
 
   constructor(config: SDKConfig) {
     this.config = config;
+    this.queue = new PersistentQueue(config.maxQueueBytes, config.persistQueue);
   }
 
   public async send(events: PerformanceEvent[]): Promise<void> {
+    const encoded = events.map(event => JSON.stringify(event));
+    const bytes = encoded.reduce((total, event) => total + utf8Length(event) + 1, 0);
+    await this.sendBatch(encoded, bytes);
+  }
+
+  // Sends events already encoded by the caller. Never rejects; batches
+  // that cannot be delivered are queued instead.
+  public async sendBatch(events: string[], bytes: number, options: { unload?: boolean } = {}): Promise<void> {
     if (events.length === 0) return;
 
-    const payload = {
+    if (await this.deliver(events, options.unload === true)) {
+      if (!options.unload) {
+        void this.retryQueued();
+      }
+      return;
+    }
+
+    if (this.config.debug) {
+      console.warn(`TraceLens: Queued ${events.length} undelivered events`);
+    }
+    await this.queue.push(events, bytes);
+  }
+
+  // Bytes the payload adds around its events, for sizing batches
+  public getEnvelopeSize(): number {
+    const url = window.location.href;
+    if (this.envelope?.url !== url) {
+      this.envelope = { url, bytes: utf8Length(this.buildPayload([])) + 32 };
+    }
+    return this.envelope.bytes;
+  }
+
+  public getQueueSize(): number {
+    return this.queue.getEventCount();
+  }
+
+  public clearQueue(): Promise<void> {
+    return this.queue.clear();
+  }
+
+  private async deliver(events: string[], unload: boolean): Promise<boolean> {
+    const payload = this.buildPayload(events);
+
+    if (unload) {
+      return this.sendWithBeacon(payload) || this.sendWithFetch(payload, null);
+    }
+
+    const compressed = await this.compress(payload);
+    if (compressed) {
+      return await this.sendWithFetch(compressed, 'gzip') || this.sendWithBeacon(payload);
+    }
+    return this.sendWithBeacon(payload) || await this.sendWithFetch(payload, null);
+  }
+
+  private async retryQueued(): Promise<void> {
+    if (this.retrying) return;
+    this.retrying = true;
+
+    try {
+      let batch = await this.queue.peek();
+      while (batch && await this.deliver(batch.events, false)) {
+        await this.queue.remove(batch.id);
+        batch = await this.queue.peek();
+      }
+    } finally {
+      this.retrying = false;
+    }
+  }
+
+  private buildPayload(events: string[]): string {
+    const envelope = JSON.stringify({
       projectKey: this.config.projectKey,
-      events: events,
       timestamp: Date.now(),
       userAgent: navigator.userAgent,
       url: window.location.href
-    };
+    });
+    return `{"events":[${events.join(',')}],${envelope.slice(1)}`;
+  }
 
-    const success = await this.sendWithBeacon(payload) || 
-                   await this.sendWithFetch(payload);
+  private async compress(payload: string): Promise<Blob | null> {
+    if (!this.config.compression || typeof CompressionStream === 'undefined') {
+      return null;
+    }
 
-    if (!success) {
-      // Queue for retry on next flush
-      this.fallbackQueue.push(...events);
-      throw new Error('Failed to send events');
+    try {
+      const stream = new Blob([payload]).stream().pipeThrough(new CompressionStream('gzip'));
+      return await new Response(stream).blob();
+    } catch {
+      return null;
     }
   }
 
-  private async sendWithBeacon(payload: any): Promise<boolean> {
-    if (!('sendBeacon' in navigator)) {
+  private sendWithBeacon(payload: string): boolean {
+    if (!('sendBeacon' in navigator) || utf8Length(payload) > KEEPALIVE_LIMIT) {
       return false;
     }
 
     try {
-      const data = JSON.stringify(payload);
-      const blob = new Blob([data], { type: 'application/json' });
-      
+      const blob = new Blob([payload], { type: 'application/json' });
+
       return navigator.sendBeacon(this.config.endpoint, blob);
     } catch (error) {
       if (this.config.debug) {
@@ -49,19 +147,23 @@ export class BeaconSender {
     }
   }
 
-  private async sendWithFetch(payload: any): Promise<boolean> {
+  private async sendWithFetch(body: string | Blob, encoding: 'gzip' | null): Promise<boolean> {
     if (!('fetch' in window)) {
       return false;
     }
 
+    const size = typeof body === 'string' ? utf8Length(body) : body.size;
+
     try {
       const response = await fetch(this.config.endpoint, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
+          ...(encoding ? { 'Content-Encoding': encoding } : {})
         },
-        body: JSON.stringify(payload),
-        keepalive: true
+        body,
+        // Oversized bodies cannot outlive the page, but can still be sent
+        keepalive: size <= KEEPALIVE_LIMIT
       });
 
       return response.ok;
@@ -72,12 +174,4 @@ export class BeaconSender {
       return false;
     }
   }
-
-  public getQueueSize(): number {
-    return this.fallbackQueue.length;
-  }
-
-  public clearQueue(): void {
-    this.fallbackQueue = [];
-  }
 }
@@ -0,0 +1,147 @@
+// Undelivered event batches, kept across page loads in IndexedDB
+//
+// Batches are mirrored in memory and written through to IndexedDB, which
+// is read once on first use. Where IndexedDB is unavailable (private
+// browsing, disabled storage) the queue lives in memory only. The oldest
+// batches are evicted once the queue grows past maxBytes.
+
+const DB_NAME = 'tracelens';
+const DB_VERSION = 1;
+const STORE_NAME = 'batches';
+
+export interface QueuedBatch {
+  id: number;
+  events: string[]; // JSON-encoded events
+  bytes: number;
+  createdAt: number;
+}
+
+function request<T>(req: IDBRequest<T>): Promise<T> {
+  return new Promise((resolve, reject) => {
+    req.onsuccess = () => resolve(req.result);
+    req.onerror = () => reject(req.error);
+  });
+}
+
+export class PersistentQueue {
+  private maxBytes: number;
+  private persist: boolean;
+  private batches: QueuedBatch[] = [];
+  private bytes = 0;
+  private eventCount = 0;
+  private nextId = 1;
+  private db: Promise<IDBDatabase | null> | null = null;
+
+  constructor(maxBytes: number, persist = true) {
+    this.maxBytes = maxBytes;
+    this.persist = persist;
+  }
+
+  public async push(events: string[], bytes: number): Promise<void> {
+    const db = await this.open();
+
+    // A batch larger than the whole queue is not worth keeping
+    if (bytes > this.maxBytes) return;
+
+    while (this.batches.length > 0 && this.bytes + bytes > this.maxBytes) {
+      await this.remove(this.batches[0]!.id);
+    }
+
+    const batch = { events, bytes, createdAt: Date.now() };
+    // Keys come from the database, as other tabs write to the same store
+    const key = db ? await this.write(db, store => store.add(batch)) : undefined;
+
+    // Batches kept only in memory get negative IDs, clear of database keys
+    this.batches.push({ ...batch, id: typeof key === 'number' ? key : -this.nextId++ });
+    this.bytes += bytes;
+    this.eventCount += events.length;
+  }
+
+  // Oldest batch, left in the queue until removed
+  public async peek(): Promise<QueuedBatch | null> {
+    await this.open();
+    return this.batches[0] ?? null;
+  }
+
+  public async remove(id: number): Promise<void> {
+    const db = await this.open();
+    const index = this.batches.findIndex(batch => batch.id === id);
+    if (index === -1) return;
+
+    const [batch] = this.batches.splice(index, 1);
+    this.bytes -= batch!.bytes;
+    this.eventCount -= batch!.events.length;
+
+    if (db) {
+      await this.write(db, store => store.delete(id));
+    }
+  }
+
+  // Events queued in this page; batches stored by earlier page loads are
+  // counted once the queue has been opened
+  public getEventCount(): number {
+    return this.eventCount;
+  }
+
+  public async clear(): Promise<void> {
+    const db = await this.open();
+    this.batches = [];
+    this.bytes = 0;
+    this.eventCount = 0;
+
+    if (db) {
+      await this.write(db, store => store.clear());
+    }
+  }
+
+  private open(): Promise<IDBDatabase | null> {
+    if (!this.db) {
+      this.db = this.openDatabase().then(async db => {
+        if (!db) return null;
+
+        try {
+          const stored = await request(db.transaction(STORE_NAME, 'readonly').objectStore(STORE_NAME).getAll());
+          for (const batch of stored as QueuedBatch[]) {
+            this.batches.push(batch);
+            this.bytes += batch.bytes;
+            this.eventCount += batch.events.length;
+          }
+          return db;
+        } catch {
+          return null;
+        }
+      });
+    }
+    return this.db;
+  }
+
+  private openDatabase(): Promise<IDBDatabase | null> {
+    return new Promise(resolve => {
+      if (!this.persist || typeof indexedDB === 'undefined') {
+        resolve(null);
+        return;
+      }
+
+      try {
+        const req = indexedDB.open(DB_NAME, DB_VERSION);
+        req.onupgradeneeded = () => {
+          req.result.createObjectStore(STORE_NAME, { keyPath: 'id', autoIncrement: true });
+        };
+        req.onsuccess = () => resolve(req.result);
+        req.onerror = () => resolve(null);
+        req.onblocked = () => resolve(null);
+      } catch {
+        resolve(null);
+      }
+    });
+  }
+
+  // Storage failures (quota, eviction) leave the in-memory copy in place
+  private async write(db: IDBDatabase, operation: (store: IDBObjectStore) => IDBRequest): Promise<unknown> {
+    try {
+      return await request(operation(db.transaction(STORE_NAME, 'readwrite').objectStore(STORE_NAME)));
+    } catch {
+      return undefined;
+    }
+  }
+}
@@ -1,25 +1,173 @@
 // Performance sampling logic to maintain <1ms overhead
+//
+// Events offered through offer() are sampled by priority. Errors, long
+// tasks, poor web vitals and slow loads are always kept. Routine events are
+// held for a short window and decided together when it closes: a window
+// that saw a priority event keeps up to maxContextEvents of them as
+// context; otherwise they are sampled at the current rate, scaled down as
+// the session's event budget is spent. Every event of a window shares one
+// keep probability, chosen so the window fits the remaining budget, and
+// kept events carry sampleWeight, its inverse, so weighted server-side
+// aggregates stay unbiased.
+import { PerformanceEvent } from '@tracelens/shared';
+
+export interface PrioritySamplingOptions {
+  sessionBudget: number; // routine events kept per browser session
+  holdTime: number; // milliseconds routine events wait for a decision
+  maxContextEvents: number; // routine events kept from a window with a priority event
+  slowNavigationThreshold: number; // load time in milliseconds
+  slowResourceThreshold: number; // resource duration in milliseconds
+}
+
+export interface SamplingStats {
+  offered: number;
+  kept: number;
+  priority: number;
+  held: number;
+  budgetRemaining: number;
+}
+
+const DEFAULT_PRIORITY_OPTIONS: PrioritySamplingOptions = {
+  sessionBudget: 1000,
+  holdTime: 2000,
+  maxContextEvents: 50,
+  slowNavigationThreshold: 4000,
+  slowResourceThreshold: 2000
+};
+
+// Survives reloads within the tab, so the budget covers the session
+const BUDGET_STORAGE_KEY = 'tracelens.sampling.spent';
+
 export class SamplingManager {
   private samplingRate: number;
   private adaptiveSampling: boolean;
   private performanceThreshold: number;
   private currentOverhead: number = 0;
   private measurementCount: number = 0;
+  private options: PrioritySamplingOptions;
+  private held: PerformanceEvent[] = [];
+  private windowStart = 0;
+  private windowHasPriority = false;
+  private budgetSpent: number;
+  private stats = { offered: 0, kept: 0, priority: 0 };
 
   constructor(
     samplingRate: number = 1.0,
     adaptiveSampling: boolean = true,
-    performanceThreshold: number = 1.0 // 1ms threshold
+    performanceThreshold: number = 1.0, // 1ms threshold
+    options: Partial<PrioritySamplingOptions> = {}
   ) {
     this.samplingRate = Math.max(0, Math.min(1, samplingRate));
     this.adaptiveSampling = adaptiveSampling;
     this.performanceThreshold = performanceThreshold;
+    this.options = { ...DEFAULT_PRIORITY_OPTIONS, ...options };
+    this.budgetSpent = this.loadBudgetSpent();
   }
 
   public shouldSample(): boolean {
     return Math.random() < this.getCurrentSamplingRate();
   }
 
+  // Returns the events, from this offer or earlier ones, that are now
+  // decided and kept
+  public offer(event: PerformanceEvent): PerformanceEvent[] {
+    this.stats.offered++;
+    const released = this.release(false);
+
+    if (this.isPriority(event)) {
+      this.stats.priority++;
+      this.stats.kept++;
+      if (this.held.length > 0) {
+        this.windowHasPriority = true;
+      }
+      released.push({ ...event, sampleWeight: 1 });
+      return released;
+    }
+
+    if (this.held.length === 0) {
+      this.windowStart = Date.now();
+    }
+    this.held.push(event);
+    return released;
+  }
+
+  // Decides the held window once it has closed, or immediately when forced
+  // (flush, page unload)
+  public release(force: boolean = true): PerformanceEvent[] {
+    if (this.held.length === 0) return [];
+    if (!force && Date.now() - this.windowStart < this.options.holdTime) return [];
+
+    const held = this.held;
+    const remaining = Math.max(0, this.options.sessionBudget - this.budgetSpent);
+    const rate = this.windowHasPriority
+      ? Math.min(1, this.options.maxContextEvents / held.length, remaining / held.length)
+      : this.getRoutineSamplingRate(held.length);
+    this.held = [];
+    this.windowHasPriority = false;
+    if (rate <= 0) return [];
+
+    // Keeps rate * n events, the fraction rounded up with that probability,
+    // drawn uniformly from the window: each event is kept with probability
+    // rate and the count never exceeds the remaining budget
+    const target = rate * held.length;
+    let toKeep = Math.min(remaining, Math.floor(target) + (Math.random() < target % 1 ? 1 : 0));
+    const kept: PerformanceEvent[] = [];
+    for (let i = 0; i < held.length && toKeep > 0; i++) {
+      if (Math.random() * (held.length - i) < toKeep) {
+        kept.push({ ...held[i]!, sampleWeight: 1 / rate });
+        toKeep--;
+      }
+    }
+
+    this.budgetSpent += kept.length;
+    this.stats.kept += kept.length;
+    this.saveBudgetSpent();
+    return kept;
+  }
+
+  public isPriority(event: PerformanceEvent): boolean {
+    const data = event.data as any;
+
+    switch (event.type as string) {
+      case 'error':
+      case 'long-task':
+        return true;
+      case 'web-vitals':
+        return Object.values(data || {}).some((metric: any) => metric?.rating === 'poor');
+      case 'navigation-timing':
+        return data?.loadEventEnd > this.options.slowNavigationThreshold;
+      case 'resource-timing':
+        return data?.duration > this.options.slowResourceThreshold;
+      default:
+        return false;
+    }
+  }
+
+  // Keep probability for a window of routine events. Once half the budget
+  // is spent each event keeps falling in proportion to what remains, so the
+  // budget lasts the session instead of running out early. A window gets
+  // the average of that decay over its events, which is always less than
+  // the remaining budget.
+  public getRoutineSamplingRate(windowSize: number = 1): number {
+    const budget = this.options.sessionBudget;
+    if (budget <= 0 || windowSize <= 0) return 0;
+
+    const remaining = Math.max(0, budget - this.budgetSpent);
+    const unthrottled = Math.max(0, remaining - budget / 2);
+    if (windowSize <= unthrottled) return this.getCurrentSamplingRate();
+
+    const decayed = (remaining - unthrottled) * (1 - Math.exp((-2 * (windowSize - unthrottled)) / budget));
+    return this.getCurrentSamplingRate() * (unthrottled + decayed) / windowSize;
+  }
+
+  public getSamplingStats(): SamplingStats {
+    return {
+      ...this.stats,
+      held: this.held.length,
+      budgetRemaining: Math.max(0, this.options.sessionBudget - this.budgetSpent)
+    };
+  }
+
   public measureOverhead<T>(operation: () => T): T {
     const startTime = performance.now();
     const result = operation();
@@ -55,6 +203,22 @@ export class SamplingManager {
     this.adaptiveSampling = enabled;
   }
 
+  private loadBudgetSpent(): number {
+    try {
+      return Number(sessionStorage.getItem(BUDGET_STORAGE_KEY)) || 0;
+    } catch {
+      return 0;
+    }
+  }
+
+  private saveBudgetSpent(): void {
+    try {
+      sessionStorage.setItem(BUDGET_STORAGE_KEY, String(this.budgetSpent));
+    } catch {
+      // Storage unavailable; the budget then covers this page only
+    }
+  }
+
   private updateOverheadMeasurement(overhead: number): void {
     // Use exponential moving average for smooth adaptation
     const alpha = 0.1; // Smoothing factor
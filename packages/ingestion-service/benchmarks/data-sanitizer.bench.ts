@@ -0,0 +1,151 @@
+// DataSanitizer benchmark: compiled engine vs the previous implementation
+//
+// Run with: npm run bench:sanitizer --workspace=@tracelens/ingestion-service
+// Options: TRACES (default 2000), SPANS_PER_TRACE (default 25), ROUNDS (default 5)
+import { DataSanitizer } from '../src/sanitizers/data-sanitizer';
+import { LegacyDataSanitizer } from './legacy-data-sanitizer';
+
+const TRACES = parseInt(process.env.TRACES || '2000');
+const SPANS_PER_TRACE = parseInt(process.env.SPANS_PER_TRACE || '25');
+const ROUNDS = parseInt(process.env.ROUNDS || '5');
+
+const routes = ['/api/users/:id', '/api/orders', '/api/cart/items', '/health', '/api/search', '/checkout'];
+const services = ['web', 'api-gateway', 'orders', 'payments', 'inventory'];
+const statements = [
+  'SELECT * FROM users WHERE id = $1',
+  'UPDATE orders SET status = $1 WHERE id = $2',
+  'INSERT INTO audit_log (user_id, action) VALUES ($1, $2)'
+];
+
+// Deterministic pseudo-random source so both sanitizers see identical input
+let seed = 42;
+function random(): number {
+  seed = (seed * 1103515245 + 12345) & 0x7fffffff;
+  return seed / 0x7fffffff;
+}
+
+function pick<T>(items: T[]): T {
+  return items[Math.floor(random() * items.length)]!;
+}
+
+function hex(length: number): string {
+  let out = '';
+  for (let i = 0; i < length; i++) {
+    out += Math.floor(random() * 16).toString(16);
+  }
+  return out;
+}
+
+function buildTrace(): Record<string, unknown> {
+  const traceId = hex(32);
+  const startTime = 1705593600000000 + Math.floor(random() * 1e9);
+  const spans = [];
+
+  for (let i = 0; i < SPANS_PER_TRACE; i++) {
+    const route = pick(routes);
+    const tags: Record<string, unknown> = {
+      'service.name': pick(services),
+      'http.method': pick(['GET', 'POST', 'PUT']),
+      'http.route': route,
+      'http.status_code': pick([200, 200, 200, 201, 404, 500]),
+      'http.url': `https://shop.example.com${route.replace(':id', String(Math.floor(random() * 1000)))}?session=${hex(16)}&page=2`,
+      'http.user_agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36',
+      'net.peer.ip': `10.0.${Math.floor(random() * 255)}.${Math.floor(random() * 255)}`,
+      'db.statement': pick(statements),
+      'request.id': `${hex(8)}-${hex(4)}-${hex(4)}-${hex(4)}-${hex(12)}`,
+      'component': 'express'
+    };
+
+    if (random() < 0.2) {
+      tags['enduser.email'] = `user${Math.floor(random() * 500)}@example.com`;
+    }
+    if (random() < 0.1) {
+      tags['http.request.header.authorization'] = `Bearer ${hex(40)}`;
+    }
+
+    spans.push({
+      traceId,
+      spanId: hex(16),
+      parentSpanId: i === 0 ? undefined : hex(16),
+      operationName: `${tags['http.method']} ${route}`,
+      startTime: startTime + i * 1000,
+      endTime: startTime + i * 1000 + Math.floor(random() * 5000),
+      tags,
+      logs: random() < 0.1
+        ? [{ timestamp: startTime, fields: { event: 'error', message: 'Payment declined for card 4111 1111 1111 1111' } }]
+        : undefined,
+      status: 'OK'
+    });
+  }
+
+  return { traceId, spans, startTime };
+}
+
+// Strings on which patterns overlap, so the order they apply in matters.
+// The generated corpus rarely produces these.
+const OVERLAPPING_INPUTS = [
+  '10.20.30.405-555-1234',
+  'call 555-123-4567 or 555.123.4567',
+  '123-45-6789 and 4111-1111-1111-1111',
+  'user.10.0.0.1@example.com',
+  '550e8400-e29b-41d4-a716-446655440000-555-1234'
+];
+const CUSTOM_PATTERNS = [{ name: 'extension', pattern: /\d{3}-\d{4}/g, replacement: '[EXT]' }];
+
+function run(name: string, sanitize: (trace: Record<string, unknown>) => unknown, traces: Record<string, unknown>[]): number {
+  // Warm-up round so both implementations are measured after JIT compilation
+  for (const trace of traces) sanitize(trace);
+
+  let best = Infinity;
+  for (let round = 0; round < ROUNDS; round++) {
+    const start = process.hrtime.bigint();
+    for (const trace of traces) sanitize(trace);
+    const elapsed = Number(process.hrtime.bigint() - start) / 1e6;
+    best = Math.min(best, elapsed);
+  }
+
+  const spans = traces.length * SPANS_PER_TRACE;
+  console.log(
+    `${name.padEnd(10)} ${best.toFixed(1).padStart(9)} ms  ${Math.round(spans / (best / 1000)).toLocaleString().padStart(12)} spans/s`
+  );
+  return best;
+}
+
+function main(): void {
+  const traces = Array.from({ length: TRACES }, buildTrace);
+  const legacy = new LegacyDataSanitizer();
+  const compiled = new DataSanitizer();
+
+  // Both engines must produce the same output on this corpus and on the
+  // overlapping inputs, with and without a custom pattern
+  let mismatches = 0;
+  for (const trace of traces) {
+    if (JSON.stringify(legacy.sanitizeTrace(trace)) !== JSON.stringify(compiled.sanitizeTrace(trace))) {
+      mismatches++;
+    }
+  }
+
+  const pairs = [
+    [legacy, compiled],
+    [new LegacyDataSanitizer({ customPatterns: CUSTOM_PATTERNS }), new DataSanitizer({ customPatterns: CUSTOM_PATTERNS })]
+  ] as const;
+  for (const [legacySanitizer, compiledSanitizer] of pairs) {
+    for (const value of OVERLAPPING_INPUTS) {
+      if (JSON.stringify(legacySanitizer.sanitizeEvent({ value })) !== JSON.stringify(compiledSanitizer.sanitizeEvent({ value }))) {
+        mismatches++;
+      }
+    }
+  }
+
+  console.log(`DataSanitizer benchmark: ${TRACES} traces x ${SPANS_PER_TRACE} spans, best of ${ROUNDS} rounds`);
+  const legacyMs = run('legacy', trace => legacy.sanitizeTrace(trace), traces);
+  const compiledMs = run('compiled', trace => compiled.sanitizeTrace(trace), traces);
+  console.log(`speedup    ${(legacyMs / compiledMs).toFixed(2)}x`);
+  console.log(`output mismatches: ${mismatches}`);
+
+  if (mismatches > 0) {
+    process.exitCode = 1;
+  }
+}
+
+main();
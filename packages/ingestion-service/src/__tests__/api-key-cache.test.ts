@@ -0,0 +1,89 @@
+// API key cache tests
+import { ApiKeyCache, CachedProject } from '../cache/api-key-cache';
+
+const project = (name: string): CachedProject => ({ id: `${name}-id`, name });
+
+// A loader whose lookups resolve only when the test says so
+function createLoader() {
+  const lookups: Array<(project: CachedProject | null) => void> = [];
+  const load = () => new Promise<CachedProject | null>(resolve => lookups.push(resolve));
+  return { lookups, load };
+}
+
+describe('ApiKeyCache', () => {
+  it('serves repeated lookups from the cache', async () => {
+    const cache = new ApiKeyCache();
+    let loads = 0;
+    const load = async () => {
+      loads++;
+      return project('a');
+    };
+
+    expect(await cache.resolve('key', load)).toEqual(project('a'));
+    expect(await cache.resolve('key', load)).toEqual(project('a'));
+    expect(loads).toBe(1);
+    expect(cache.getStats()).toMatchObject({ hits: 1, misses: 1, size: 1 });
+  });
+
+  it('shares one lookup between concurrent misses', async () => {
+    const cache = new ApiKeyCache();
+    const loader = createLoader();
+
+    const first = cache.resolve('key', loader.load);
+    const second = cache.resolve('key', loader.load);
+    loader.lookups[0]!(project('a'));
+
+    expect(await first).toEqual(project('a'));
+    expect(await second).toEqual(project('a'));
+    expect(loader.lookups).toHaveLength(1);
+  });
+
+  it('does not cache a lookup that finishes after the key was invalidated', async () => {
+    const cache = new ApiKeyCache();
+    const loader = createLoader();
+
+    const stale = cache.resolve('key', loader.load);
+    cache.invalidate('key');
+
+    // A lookup after the invalidation does not join the stale one
+    const fresh = cache.resolve('key', loader.load);
+    expect(loader.lookups).toHaveLength(2);
+
+    loader.lookups[1]!(project('b'));
+    expect(await fresh).toEqual(project('b'));
+    loader.lookups[0]!(project('a'));
+    expect(await stale).toEqual(project('a'));
+
+    expect(await cache.resolve('key', loader.load)).toEqual(project('b'));
+    expect(loader.lookups).toHaveLength(2);
+  });
+
+  it('does not cache lookups in flight when cleared', async () => {
+    const cache = new ApiKeyCache();
+    const loader = createLoader();
+
+    const stale = cache.resolve('key', loader.load);
+    cache.clear();
+    loader.lookups[0]!(project('a'));
+    await stale;
+
+    expect(cache.getStats().size).toBe(0);
+  });
+
+  it('evicts the least recently used key', async () => {
+    const cache = new ApiKeyCache({ maxEntries: 2 });
+
+    await cache.resolve('a', async () => project('a'));
+    await cache.resolve('b', async () => project('b'));
+    await cache.resolve('a', async () => project('a'));
+    await cache.resolve('c', async () => project('c'));
+
+    let loaded = false;
+    await cache.resolve('b', async () => {
+      loaded = true;
+      return project('b');
+    });
+    expect(loaded).toBe(true);
+    expect(cache.getStats().evictions).toBe(2);
+  });
+});
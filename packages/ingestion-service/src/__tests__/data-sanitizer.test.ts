@@ -0,0 +1,36 @@
+// Data sanitizer tests
+import { DataSanitizer } from '../sanitizers/data-sanitizer';
+
+describe('DataSanitizer', () => {
+  it('applies PII patterns one after another in their declared order', () => {
+    const sanitizer = new DataSanitizer();
+
+    // The phone pattern runs before the IP pattern, even though the IP
+    // match starts earlier in the string
+    expect(sanitizer.sanitizeEvent({ value: '10.20.30.405-555-1234' })).toEqual({ value: '10.20.30.[PHONE]' });
+    expect(sanitizer.sanitizeEvent({ value: 'from 10.0.0.1 as jane@example.com' }))
+      .toEqual({ value: 'from [IP] as [EMAIL]' });
+  });
+
+  it('applies custom patterns after the built-in ones', () => {
+    const sanitizer = new DataSanitizer({
+      customPatterns: [{ name: 'extension', pattern: /\d{3}-\d{4}/g, replacement: '[EXT]' }]
+    });
+
+    expect(sanitizer.sanitizeEvent({ value: '555-123-4567 ext 123-4567' }))
+      .toEqual({ value: '[PHONE] ext [EXT]' });
+    expect(sanitizer.sanitizeEvent({ value: 'room 12-123-4567' })).toEqual({ value: 'room 12-[EXT]' });
+  });
+
+  it('redacts sensitive fields and query parameters', () => {
+    const sanitizer = new DataSanitizer();
+
+    expect(sanitizer.sanitizeEvent({
+      apiKey: 'abc',
+      url: 'https://example.com/path?token=abc&page=2'
+    })).toEqual({
+      apiKey: '[REDACTED]',
+      url: 'https://example.com/path?token=%5BREDACTED%5D&page=2'
+    });
+  });
+});
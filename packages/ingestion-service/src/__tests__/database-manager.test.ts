@@ -0,0 +1,114 @@
+// Database manager tests
+import { Trace, TraceSpan, SpanStatus } from '@tracelens/shared';
+import { DatabaseManager } from '../database/database-manager';
+
+function span(traceId: string, spanId: string, options: Partial<TraceSpan> = {}): TraceSpan {
+  return {
+    traceId,
+    spanId,
+    operationName: 'GET /users',
+    startTime: 1700000000000000,
+    duration: 1000,
+    tags: {},
+    status: SpanStatus.OK,
+    ...options
+  };
+}
+
+function trace(traceId: string, spans: TraceSpan[], rootSpan?: TraceSpan): Trace {
+  const startTime = Math.min(...spans.map(s => s.startTime));
+  const endTime = Math.max(...spans.map(s => s.startTime + (s.duration || 0)));
+  return { traceId, spans, startTime, endTime, duration: endTime - startTime, rootSpan };
+}
+
+// Stands in for PostgreSQL: remembers stored spans so the spans upsert can
+// report which rows it inserted, and applies span count updates
+function createClient() {
+  const spans = new Set<string>();
+  const spanCounts = new Map<string, number>();
+  const traceRows: any[][] = [];
+
+  const client = {
+    spanCounts,
+    traceRows,
+    query: async (text: string, params: any[] = []) => {
+      if (text.startsWith('SELECT retention_days')) return { rows: [{ retention_days: 30 }] };
+
+      if (text.startsWith('INSERT INTO traces')) {
+        const rows = [];
+        for (let i = 0; i < params.length; i += 6) {
+          traceRows.push(params.slice(i, i + 6));
+          const traceId = params[i + 1];
+          rows.push({ trace_id: traceId, version: spanCounts.has(traceId) ? 2 : 1 });
+          if (!spanCounts.has(traceId)) spanCounts.set(traceId, 0);
+        }
+        return { rows };
+      }
+
+      if (text.startsWith('INSERT INTO spans')) {
+        const rows = [];
+        for (let i = 0; i < params.length; i += 12) {
+          const key = `${params[i + 1]}:${params[i + 2]}`;
+          rows.push({ trace_id: params[i + 1], inserted: !spans.has(key) });
+          spans.add(key);
+        }
+        return { rows };
+      }
+
+      if (text.startsWith('UPDATE traces SET span_count')) {
+        for (let i = 0; i < params.length; i += 2) {
+          spanCounts.set(params[i], spanCounts.get(params[i])! + params[i + 1]);
+        }
+      }
+      return { rows: [] };
+    },
+    release: () => undefined
+  };
+  return client;
+}
+
+describe('DatabaseManager.insertTraceBatch', () => {
+  let database: DatabaseManager;
+  let client: ReturnType<typeof createClient>;
+
+  beforeEach(() => {
+    database = new DatabaseManager({ host: 'localhost', port: 5432, database: 'test', username: 'test', password: 'test' });
+    client = createClient();
+    (database as any).pool = { connect: async () => client, query: client.query, on: () => undefined };
+  });
+
+  it('widens a trace whose spans arrive in separate batches', async () => {
+    const root = span('t1', 'root', { startTime: 1000, duration: 500 });
+    const child = span('t1', 'child', { parentSpanId: 'root', startTime: 1100, duration: 100 });
+    const late = span('t1', 'late', { parentSpanId: 'root', startTime: 1200, duration: 900 });
+
+    await database.insertTraceBatch('project-1', [trace('t1', [root, child], root)]);
+    await database.insertTraceBatch('project-1', [trace('t1', [late])]);
+
+    expect(client.spanCounts.get('t1')).toBe(3);
+    // The second batch has no root; the upsert keeps the stored one
+    expect(client.traceRows[1]).toEqual(['project-1', 't1', 1200, 2100, 900, undefined]);
+  });
+
+  it('does not count spans of a redelivered batch twice', async () => {
+    const batch = [trace('t1', [span('t1', 'a'), span('t1', 'b')])];
+
+    await database.insertTraceBatch('project-1', batch);
+    await database.insertTraceBatch('project-1', batch);
+
+    expect(client.spanCounts.get('t1')).toBe(2);
+  });
+
+  it('merges fragments of one trace within a batch', async () => {
+    const root = span('t1', 'root', { startTime: 1000, duration: 500 });
+    const late = span('t1', 'late', { parentSpanId: 'root', startTime: 1200, duration: 900 });
+    const updated: Array<{ traceId: string; version: number }> = [];
+    database.on('tracesUpdated', (projectId: string, traces: typeof updated) => updated.push(...traces));
+
+    await database.insertTraceBatch('project-1', [trace('t1', [late]), trace('t1', [root], root)]);
+
+    expect(client.traceRows).toEqual([['project-1', 't1', 1000, 2100, 1100, 'root']]);
+    expect(client.spanCounts.get('t1')).toBe(2);
+    expect(updated).toEqual([]);
+  });
+});
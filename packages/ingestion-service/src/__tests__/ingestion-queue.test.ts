@@ -0,0 +1,185 @@
+// Ingestion queue tests
+import Redis from 'ioredis';
+import { Trace } from '@tracelens/shared';
+import { IngestionQueue, IngestionQueueConfig } from '../queue/ingestion-queue';
+
+function trace(traceId: string): Trace {
+  return { traceId, spans: [], startTime: 1700000000000000 };
+}
+
+// Records writes; fails the first `failures` of them
+function createDatabase(failures: number = 0) {
+  const writes: Array<{ projectId: string; traceIds: string[] }> = [];
+  const database = {
+    writes,
+    failures,
+    insertTraceBatch: async (projectId: string, traces: Trace[]) => {
+      if (database.failures > 0) {
+        database.failures--;
+        throw new Error('database unavailable');
+      }
+      writes.push({ projectId, traceIds: traces.map(t => t.traceId) });
+    },
+    insertPerformanceEventBatch: async () => undefined
+  };
+  return database;
+}
+
+const waitFor = async (condition: () => boolean | Promise<boolean>, timeoutMs: number = 5000) => {
+  const deadline = Date.now() + timeoutMs;
+  while (!(await condition())) {
+    if (Date.now() > deadline) throw new Error('Timed out waiting for condition');
+    await new Promise(resolve => setTimeout(resolve, 10));
+  }
+};
+
+describe('IngestionQueue', () => {
+  const createQueue = (database: ReturnType<typeof createDatabase>, config: Partial<IngestionQueueConfig> = {}) =>
+    new IngestionQueue(database as any, { workers: 1, pollInterval: 10, retryDelay: 50, ...config });
+
+  it('coalesces queued jobs per project into one write', async () => {
+    const database = createDatabase();
+    const queue = createQueue(database);
+    queue.start();
+
+    // Queued before the worker wakes, so they are taken together
+    await Promise.all([
+      queue.enqueueTraces('project-1', [trace('t1')]),
+      queue.enqueueTraces('project-2', [trace('t2')]),
+      queue.enqueueTraces('project-1', [trace('t3'), trace('t4')])
+    ]);
+    await queue.stop();
+
+    expect(database.writes).toEqual([
+      { projectId: 'project-1', traceIds: ['t1', 't3', 't4'] },
+      { projectId: 'project-2', traceIds: ['t2'] }
+    ]);
+    expect(await queue.getStats()).toMatchObject({ depth: 0, enqueued: 4, processed: 4, inFlight: 0 });
+  });
+
+  it('rejects work when full or stopped', async () => {
+    // No workers, so accepted jobs stay queued
+    const queue = createQueue(createDatabase(), { maxDepth: 1, workers: 0 });
+    expect(await queue.enqueueTraces('project-1', [trace('t1')])).toBe('unavailable');
+
+    queue.start();
+    expect(await queue.enqueueTraces('project-1', [trace('t1')])).toBe('accepted');
+    expect(await queue.enqueueTraces('project-1', [trace('t2')])).toBe('full');
+    expect(await queue.enqueueTraces('project-1', [])).toBe('accepted');
+    expect(await queue.getStats()).toMatchObject({ depth: 1, enqueued: 1, dropped: 2 });
+    await queue.stop();
+  });
+
+  it('retries a failed write after a backoff', async () => {
+    const database = createDatabase(1);
+    const queue = createQueue(database, { retryDelay: 200, maxRetryDelay: 200 });
+    const random = jest.spyOn(Math, 'random').mockReturnValue(1);
+
+    try {
+      queue.start();
+      const enqueuedAt = Date.now();
+      await queue.enqueueTraces('project-1', [trace('t1')]);
+
+      await waitFor(() => database.writes.length > 0);
+      expect(Date.now() - enqueuedAt).toBeGreaterThanOrEqual(190);
+      expect(await queue.getStats()).toMatchObject({ retried: 1, processed: 1, failed: 0 });
+    } finally {
+      random.mockRestore();
+      await queue.stop();
+    }
+  });
+
+  it('gives up after the configured attempts', async () => {
+    const database = createDatabase(Infinity);
+    const queue = createQueue(database, { maxAttempts: 3, retryDelay: 1 });
+    queue.start();
+
+    await queue.enqueueTraces('project-1', [trace('t1')]);
+    await waitFor(async () => (await queue.getStats()).failed === 1);
+
+    expect(await queue.getStats()).toMatchObject({ retried: 2, failed: 1, processed: 0, depth: 0 });
+    await queue.stop();
+  });
+
+  it('drains queued jobs and pending retries on stop', async () => {
+    const database = createDatabase(1);
+    const queue = createQueue(database, { retryDelay: 60000, maxRetryDelay: 60000 });
+    queue.start();
+
+    await queue.enqueueTraces('project-1', [trace('t1')]);
+    await waitFor(async () => (await queue.getStats()).retried === 1);
+    await queue.enqueueTraces('project-1', [trace('t2')]);
+    await queue.stop(5000);
+
+    expect(database.writes.flatMap(write => write.traceIds).sort()).toEqual(['t1', 't2']);
+    expect((await queue.getStats()).depth).toBe(0);
+  });
+});
+
+// Needs a Redis server; set REDIS_URL to run
+const describeRedis = process.env.REDIS_URL ? describe : describe.skip;
+
+describeRedis('IngestionQueue with Redis', () => {
+  let redis: Redis;
+  let redisKey: string;
+
+  beforeEach(() => {
+    redis = new Redis(process.env.REDIS_URL!);
+    redisKey = `tracelens:test:queue:${Date.now()}:${Math.random().toString(36).slice(2)}`;
+  });
+
+  afterEach(async () => {
+    const keys = await redis.keys(`${redisKey}*`);
+    if (keys.length > 0) await redis.del(...keys);
+    await redis.quit();
+  });
+
+  const createQueue = (database: ReturnType<typeof createDatabase>, config: Partial<IngestionQueueConfig> = {}) =>
+    new IngestionQueue(database as any, { backend: 'redis', redisKey, workers: 1, pollInterval: 10, retryDelay: 50, ...config }, redis);
+
+  it('writes jobs and acknowledges them', async () => {
+    const database = createDatabase();
+    const queue = createQueue(database);
+    queue.start();
+
+    await queue.enqueueTraces('project-1', [trace('t1')]);
+    await waitFor(() => database.writes.length === 1);
+    await queue.stop();
+
+    expect(await redis.keys(`${redisKey}:processing:*`)).toEqual([]);
+    expect(await queue.getStats()).toMatchObject({ depth: 0, processed: 1 });
+  });
+
+  it('retries a failed write from the delayed set', async () => {
+    const database = createDatabase(1);
+    const queue = createQueue(database);
+    queue.start();
+
+    await queue.enqueueTraces('project-1', [trace('t1')]);
+    await waitFor(() => database.writes.length === 1);
+    await queue.stop();
+
+    expect(await queue.getStats()).toMatchObject({ retried: 1, processed: 1 });
+    expect(await redis.zcard(`${redisKey}:delayed`)).toBe(0);
+  });
+
+  it('requeues the jobs of a consumer that stopped heartbeating', async () => {
+    // The first consumer takes the job and never finishes writing it
+    const stuck = createDatabase();
+    stuck.insertTraceBatch = () => new Promise<void>(() => undefined);
+    const crashed = createQueue(stuck, { consumerTimeout: 300 });
+    crashed.start();
+    await crashed.enqueueTraces('project-1', [trace('t1')]);
+    await waitFor(async () => (await crashed.getStats()).inFlight === 1);
+    await crashed.stop(0); // stops heartbeating; the job stays on its processing list
+
+    const database = createDatabase();
+    const queue = createQueue(database, { consumerTimeout: 300 });
+    queue.start();
+    await waitFor(() => database.writes.length === 1);
+    await queue.stop();
+
+    expect(database.writes).toEqual([{ projectId: 'project-1', traceIds: ['t1'] }]);
+    expect((await queue.getStats()).recovered).toBe(1);
+  });
+});
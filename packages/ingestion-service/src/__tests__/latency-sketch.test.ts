@@ -0,0 +1,95 @@
+// Latency sketch tests
+import { LatencySketch } from '../sketches/latency-sketch';
+
+// Deterministic heavy-tailed latencies: mostly 1-100ms, with a tail to ~10s
+function latencies(count: number, seed: number = 1): number[] {
+  let state = seed;
+  const random = () => {
+    state = (state * 1103515245 + 12345) % 2147483648;
+    return state / 2147483648;
+  };
+  return Array.from({ length: count }, () => Math.exp(random() * 4.6) * (random() < 0.02 ? 100 : 1));
+}
+
+function exactQuantile(sorted: number[], q: number): number {
+  return sorted[Math.floor(q * (sorted.length - 1))]!;
+}
+
+const QUANTILES = [0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.95, 0.99, 0.999];
+
+describe('LatencySketch', () => {
+  test.each([0.01, 0.02, 0.05])('keeps every quantile within a relative accuracy of %s', accuracy => {
+    const values = latencies(20000);
+    const sketch = new LatencySketch(accuracy);
+    values.forEach(value => sketch.add(value));
+    const sorted = [...values].sort((a, b) => a - b);
+
+    for (const q of QUANTILES) {
+      const exact = exactQuantile(sorted, q);
+      expect(Math.abs(sketch.quantile(q) - exact) / exact).toBeLessThanOrEqual(accuracy);
+    }
+    expect(sketch.count).toBe(values.length);
+    expect(sketch.quantile(0)).toBe(sorted[0]);
+    expect(sketch.quantile(1)).toBe(sorted[sorted.length - 1]);
+  });
+
+  it('gives the same quantiles merged as when built from all values', () => {
+    const values = latencies(9000, 7);
+    const whole = new LatencySketch();
+    const parts = [new LatencySketch(), new LatencySketch(), new LatencySketch()];
+    values.forEach((value, i) => {
+      whole.add(value);
+      parts[i % 3]!.add(value);
+    });
+
+    const merged = new LatencySketch();
+    parts.forEach(part => merged.merge(part));
+
+    expect(merged.count).toBe(whole.count);
+    expect(merged.sum).toBeCloseTo(whole.sum, 6);
+    for (const q of QUANTILES) {
+      expect(merged.quantile(q)).toBe(whole.quantile(q));
+    }
+  });
+
+  it('round-trips through its serialized form', () => {
+    const sketch = new LatencySketch();
+    latencies(5000, 3).forEach(value => sketch.add(value));
+    sketch.add(0, 10);
+
+    const copy = LatencySketch.deserialize(sketch.serialize());
+
+    expect(copy.count).toBe(sketch.count);
+    expect(copy.sum).toBe(sketch.sum);
+    expect(copy.min).toBe(0);
+    expect(copy.max).toBe(sketch.max);
+    for (const q of QUANTILES) {
+      expect(copy.quantile(q)).toBe(sketch.quantile(q));
+    }
+    expect(sketch.serialize().length).toBeLessThan(1024);
+  });
+
+  it('counts zero and negative durations in the lowest quantiles', () => {
+    const sketch = new LatencySketch();
+    sketch.add(-5);
+    sketch.add(0);
+    [10, 20, 30].forEach(value => sketch.add(value));
+
+    expect(sketch.quantile(0.25)).toBe(0);
+    expect(Math.abs(sketch.quantile(0.5) - 10) / 10).toBeLessThanOrEqual(0.01);
+  });
+
+  it('only loses accuracy in the lowest quantiles when bins are capped', () => {
+    const values = Array.from({ length: 2000 }, (_, i) => Math.pow(1.01, i));
+    const sketch = new LatencySketch(0.01, 200);
+    values.forEach(value => sketch.add(value));
+
+    const exact = exactQuantile(values, 0.99);
+    expect(Math.abs(sketch.quantile(0.99) - exact) / exact).toBeLessThanOrEqual(0.01);
+    expect(sketch.quantile(0.01)).toBeGreaterThan(exactQuantile(values, 0.01));
+  });
+
+  it('refuses to merge sketches of different accuracy', () => {
+    expect(() => new LatencySketch(0.01).merge(new LatencySketch(0.02))).toThrow('different accuracy');
+  });
+});
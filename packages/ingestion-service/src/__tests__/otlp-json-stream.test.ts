@@ -0,0 +1,110 @@
+// OTLP/JSON stream parser tests
+import { OTLPJsonStreamParser, OTLPStreamError } from '../decoders/otlp-json-stream';
+
+const resourceSpan = (service: string, spanName: string) => ({
+  resource: { attributes: [{ key: 'service.name', value: { stringValue: service } }] },
+  scopeSpans: [{
+    scope: { name: 'test' },
+    spans: [{ traceId: 'ab'.repeat(16), spanId: 'cd'.repeat(8), name: spanName, attributes: [] }]
+  }]
+});
+
+// Feeds the body in chunks of `size` bytes and collects every element
+function parse(body: string | Buffer, size: number, maxElementBytes?: number): unknown[] {
+  const bytes = Buffer.isBuffer(body) ? body : Buffer.from(body);
+  const parser = new OTLPJsonStreamParser(maxElementBytes);
+  const elements: unknown[] = [];
+  for (let i = 0; i < bytes.length; i += size) {
+    elements.push(...parser.push(bytes.subarray(i, i + size)));
+  }
+  parser.end();
+  return elements;
+}
+
+function parseError(body: string, size: number = 1024, maxElementBytes?: number): OTLPStreamError {
+  try {
+    parse(body, size, maxElementBytes);
+  } catch (error) {
+    if (error instanceof OTLPStreamError) return error;
+    throw error;
+  }
+  throw new Error('Expected the body to be rejected');
+}
+
+describe('OTLPJsonStreamParser', () => {
+  const expected = [resourceSpan('api', 'GET /users'), resourceSpan('db', 'SELECT users')];
+  const body = JSON.stringify({ resourceSpans: expected });
+
+  test.each([1, 2, 3, 7, 64, body.length])('yields each resource span with %i-byte chunks', size => {
+    expect(parse(body, size)).toEqual(expected);
+  });
+
+  it('handles chunk boundaries inside strings and escapes', () => {
+    // Escaped quotes, backslashes and brackets must not end the string or
+    // change the nesting depth, wherever the chunk splits them
+    const tricky = resourceSpan('api', 'say \\"hi\\" \\\\ } ] { [ ,:');
+    const escaped = JSON.stringify({ resourceSpans: [tricky, resourceSpan('db', 'é ☃ 😀')] });
+
+    for (let size = 1; size <= 8; size++) {
+      expect(parse(escaped, size)).toEqual([tricky, resourceSpan('db', 'é ☃ 😀')]);
+    }
+  });
+
+  it('splits multi-byte characters across chunks', () => {
+    const element = resourceSpan('api', '😀'.repeat(10));
+    expect(parse(Buffer.from(JSON.stringify({ resourceSpans: [element] })), 3)).toEqual([element]);
+  });
+
+  it('only yields elements of the top-level resourceSpans array', () => {
+    const nested = JSON.stringify({
+      other: { resourceSpans: [{ ignored: true }] },
+      note: 'resourceSpans',
+      resourceSpans: [{ scopeSpans: [{ spans: [[1, [2]], { resourceSpans: [] }] }] }],
+      trailing: [[{}]]
+    });
+
+    expect(parse(nested, 5)).toEqual([{ scopeSpans: [{ spans: [[1, [2]], { resourceSpans: [] }] }] }]);
+  });
+
+  it('accepts an empty resourceSpans array', () => {
+    expect(parse(' { "resourceSpans" : [ ] } ', 4)).toEqual([]);
+  });
+
+  test.each([
+    ['a top-level array', '[{"resourceSpans": []}]', 'Request body must be a JSON object'],
+    ['a missing resourceSpans', '{"spans": []}', 'resourceSpans array is required'],
+    ['a non-array resourceSpans', '{"resourceSpans": {"a": 1}}', 'resourceSpans must be an array'],
+    ['a null resourceSpans', '{"resourceSpans": null}', 'resourceSpans must be an array'],
+    ['a string resourceSpans', '{"resourceSpans": "[]"}', 'resourceSpans must be an array'],
+    ['a non-object element', '{"resourceSpans": [[]]}', 'resourceSpans elements must be objects'],
+    ['unbalanced brackets', '{"resourceSpans": []}}', 'Malformed JSON: unbalanced brackets'],
+    ['a truncated body', '{"resourceSpans": [{"scopeSpans": []}', 'Malformed JSON: unexpected end of body'],
+    ['an unterminated string', '{"resourceSpans": [], "x": "abc', 'Malformed JSON: unexpected end of body']
+  ])('rejects %s', (name, malformed, message) => {
+    const error = parseError(malformed, 3);
+    expect(error.message).toBe(message);
+    expect(error.statusCode).toBe(400);
+  });
+
+  it('rejects an element that is not valid JSON', () => {
+    const error = parseError('{"resourceSpans": [{"a": tru}]}');
+    expect(error.message).toMatch(/^Malformed resource span/);
+    expect(error.statusCode).toBe(400);
+  });
+
+  it('limits the size of a single element, not of the body', () => {
+    const element = resourceSpan('api', 'x'.repeat(500));
+    const size = Buffer.byteLength(JSON.stringify(element));
+    const many = JSON.stringify({ resourceSpans: Array.from({ length: 20 }, () => element) });
+
+    // Within one chunk and carried across chunks
+    expect(parse(many, many.length, size)).toHaveLength(20);
+    expect(parse(many, 100, size)).toHaveLength(20);
+
+    for (const chunkSize of [many.length, 100]) {
+      const error = parseError(many, chunkSize, size - 1);
+      expect(error.message).toBe('Resource span exceeds the per-element size limit');
+      expect(error.statusCode).toBe(413);
+    }
+  });
+});
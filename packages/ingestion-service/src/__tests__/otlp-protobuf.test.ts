@@ -0,0 +1,181 @@
+// OTLP/protobuf decoder tests
+import {
+  decodeExportTraceServiceRequest,
+  countExportTraceServiceRequestSpans,
+  ProtobufDecodeError
+} from '../decoders/otlp-protobuf';
+import { TraceNormalizer } from '../normalizers/trace-normalizer';
+
+// Protobuf encoding helpers; field numbers follow opentelemetry-proto
+function varint(value: number | bigint): Buffer {
+  let remaining = BigInt.asUintN(64, BigInt(value));
+  const bytes: number[] = [];
+  do {
+    const byte = Number(remaining & 0x7fn);
+    remaining >>= 7n;
+    bytes.push(remaining > 0n ? byte | 0x80 : byte);
+  } while (remaining > 0n);
+  return Buffer.from(bytes);
+}
+
+const tag = (field: number, wireType: number) => varint(field * 8 + wireType);
+const varintField = (field: number, value: number | bigint) => Buffer.concat([tag(field, 0), varint(value)]);
+const bytesField = (field: number, value: Buffer | string) => {
+  const bytes = Buffer.isBuffer(value) ? value : Buffer.from(value);
+  return Buffer.concat([tag(field, 2), varint(bytes.length), bytes]);
+};
+const messageField = (field: number, ...parts: Buffer[]) => bytesField(field, Buffer.concat(parts));
+const fixed64Field = (field: number, value: bigint) => {
+  const bytes = Buffer.alloc(8);
+  bytes.writeBigUInt64LE(value);
+  return Buffer.concat([tag(field, 1), bytes]);
+};
+const doubleField = (field: number, value: number) => {
+  const bytes = Buffer.alloc(8);
+  bytes.writeDoubleLE(value);
+  return Buffer.concat([tag(field, 1), bytes]);
+};
+const fixed32Field = (field: number, value: number) => {
+  const bytes = Buffer.alloc(4);
+  bytes.writeUInt32LE(value);
+  return Buffer.concat([tag(field, 5), bytes]);
+};
+
+const keyValue = (key: string, value: Buffer) => Buffer.concat([bytesField(1, key), bytesField(2, value)]);
+const attribute = (field: number, key: string, value: Buffer) => messageField(field, keyValue(key, value));
+
+const TRACE_ID = '0102030405060708090a0b0c0d0e0f10';
+const START = 1700000000123456789n;
+const END = 1700000000124456789n;
+
+// ExportTraceServiceRequest with one span named "op", written out byte by
+// byte rather than with the helpers above
+const MINIMAL_REQUEST = Buffer.from([
+  '0a36', //   resource_spans (1), 54 bytes
+  '1234', //     scope_spans (2), 52 bytes
+  '1232', //       spans (2), 50 bytes
+  '0a10', TRACE_ID, //         trace_id (1)
+  '1208', '1112131415161718', //  span_id (2)
+  '2a02', '6f70', //              name (5) "op"
+  '39', '15cd853dfe9c9717', //    start_time_unix_nano (7), fixed64
+  '41', '550f953dfe9c9717' //     end_time_unix_nano (8), fixed64
+].join(''), 'hex');
+
+describe('decodeExportTraceServiceRequest', () => {
+  const normalizer = new TraceNormalizer();
+
+  it('decodes fixed64 timestamps and byte IDs', () => {
+    const { resourceSpans } = decodeExportTraceServiceRequest(MINIMAL_REQUEST);
+    const span = resourceSpans[0]!.scopeSpans[0]!.spans[0]!;
+
+    expect(span.traceId!.toString('hex')).toBe(TRACE_ID);
+    expect(span.spanId!.toString('hex')).toBe('1112131415161718');
+    expect(span.name).toBe('op');
+    expect(span.startTimeUnixNano).toBe(START);
+    expect(span.endTimeUnixNano).toBe(END);
+    expect(countExportTraceServiceRequestSpans(MINIMAL_REQUEST)).toBe(1);
+  });
+
+  it('normalizes to the same traces as the equivalent OTLP/JSON', () => {
+    const spanId = Buffer.from('2122232425262728', 'hex');
+    const parentSpanId = Buffer.from('1112131415161718', 'hex');
+
+    const request = messageField(1,
+      messageField(1, // resource
+        attribute(1, 'service.name', bytesField(1, 'checkout')),
+        varintField(2, 3) // dropped_attributes_count, not decoded
+      ),
+      messageField(2, // scope_spans
+        messageField(1, bytesField(1, 'test-scope'), bytesField(2, '1.0.0')),
+        messageField(2, // spans
+          bytesField(1, Buffer.from(TRACE_ID, 'hex')),
+          bytesField(2, spanId),
+          bytesField(3, 'vendor=1'),
+          bytesField(4, parentSpanId),
+          bytesField(5, 'SELECT orders'),
+          varintField(6, 3),
+          fixed64Field(7, START),
+          fixed64Field(8, END),
+          attribute(9, 'db.system', bytesField(1, 'postgresql')),
+          attribute(9, 'db.rows', varintField(3, 42)),
+          attribute(9, 'db.offset', varintField(3, -5)),
+          attribute(9, 'db.ratio', doubleField(4, 0.25)),
+          attribute(9, 'db.cached', varintField(2, 1)),
+          attribute(9, 'db.args', messageField(5, messageField(1, bytesField(1, 'a')))),
+          varintField(10, 1), // dropped_attributes_count
+          messageField(11, bytesField(3, 'event')), // events
+          fixed32Field(16, 1), // flags
+          bytesField(99, Buffer.concat([varint(1), varint(300), varint(2)])), // unknown packed field
+          messageField(15, bytesField(2, 'timeout'), varintField(3, 2)) // status
+        )
+      ),
+      bytesField(3, 'https://opentelemetry.io/schemas/1.21.0') // schema_url
+    );
+
+    const json = {
+      resource: { attributes: [{ key: 'service.name', value: { stringValue: 'checkout' } }] },
+      scopeSpans: [{
+        scope: { name: 'test-scope', version: '1.0.0' },
+        spans: [{
+          traceId: TRACE_ID,
+          spanId: spanId.toString('hex'),
+          parentSpanId: parentSpanId.toString('hex'),
+          traceState: 'vendor=1',
+          name: 'SELECT orders',
+          kind: 3,
+          startTimeUnixNano: START.toString(),
+          endTimeUnixNano: END.toString(),
+          attributes: [
+            { key: 'db.system', value: { stringValue: 'postgresql' } },
+            { key: 'db.rows', value: { intValue: '42' } },
+            { key: 'db.offset', value: { intValue: '-5' } },
+            { key: 'db.ratio', value: { doubleValue: 0.25 } },
+            { key: 'db.cached', value: { boolValue: true } },
+            { key: 'db.args', value: { arrayValue: { values: [{ stringValue: 'a' }] } } }
+          ],
+          status: { code: 2, message: 'timeout' }
+        }]
+      }]
+    };
+
+    const decoded = decodeExportTraceServiceRequest(request).resourceSpans;
+    expect(decoded).toHaveLength(1);
+    expect(decoded[0]!.scopeSpans[0]!.scope).toEqual({ name: 'test-scope', version: '1.0.0' });
+    expect(decoded[0]!.scopeSpans[0]!.spans[0]!.attributes[2]!.value!.intValue).toBe(-5n);
+
+    const fromProtobuf = normalizer.normalizeOTLPResourceSpan(decoded[0]);
+    expect(fromProtobuf).toEqual(normalizer.normalizeOTLPResourceSpan(json));
+    expect(fromProtobuf[0]!.spans[0]!.tags).toMatchObject({ 'db.rows': 42, 'db.offset': -5, 'db.cached': true });
+    expect(countExportTraceServiceRequestSpans(request)).toBe(1);
+  });
+
+  it('treats an empty parent span ID as a root span', () => {
+    const request = messageField(1, messageField(2, messageField(2,
+      bytesField(1, Buffer.from(TRACE_ID, 'hex')),
+      bytesField(2, Buffer.from('1112131415161718', 'hex')),
+      bytesField(4, Buffer.alloc(0))
+    )));
+
+    const span = decodeExportTraceServiceRequest(request).resourceSpans[0]!.scopeSpans[0]!.spans[0]!;
+    expect(span.parentSpanId).toBeUndefined();
+  });
+
+  it('decodes an empty request', () => {
+    expect(decodeExportTraceServiceRequest(Buffer.alloc(0))).toEqual({ resourceSpans: [] });
+  });
+
+  it('rejects every truncation of a request', () => {
+    for (let length = 1; length < MINIMAL_REQUEST.length; length++) {
+      const truncated = MINIMAL_REQUEST.subarray(0, length);
+      expect(() => decodeExportTraceServiceRequest(truncated)).toThrow(ProtobufDecodeError);
+      expect(() => countExportTraceServiceRequestSpans(truncated)).toThrow(ProtobufDecodeError);
+    }
+  });
+
+  it('rejects malformed varints and unsupported wire types', () => {
+    expect(() => decodeExportTraceServiceRequest(Buffer.from('08' + 'ff'.repeat(10) + '01', 'hex')))
+      .toThrow('Malformed varint');
+    // Field 1 with wire type 3 (deprecated start group)
+    expect(() => decodeExportTraceServiceRequest(Buffer.from('0b', 'hex'))).toThrow('Unsupported wire type 3');
+  });
+});
@@ -0,0 +1,113 @@
+// Sketch bucket planning tests
+import {
+  SketchRange,
+  SKETCH_RESOLUTIONS,
+  DEFAULT_SKETCH_RETENTION,
+  planSketchRanges,
+  retainedSince
+} from '../sketches/sketch-buckets';
+
+const MINUTE = SKETCH_RESOLUTIONS.minute;
+const HOUR = SKETCH_RESOLUTIONS.hour;
+const DAY = SKETCH_RESOLUTIONS.day;
+
+const T0 = Date.UTC(2026, 0, 1); // midnight UTC
+
+// Every minute from `from` to `to` (inclusive of the partial minutes at
+// either end), with the resolution of the one range covering it
+function coverage(ranges: SketchRange[], from: number, to: number): Map<number, string[]> {
+  const covered = new Map<number, string[]>();
+  for (let minute = Math.floor(from / MINUTE) * MINUTE; minute < to; minute += MINUTE) {
+    covered.set(minute, ranges
+      .filter(range => {
+        const size = SKETCH_RESOLUTIONS[range.resolution];
+        const bucket = Math.floor(minute / size) * size;
+        return bucket >= range.from && bucket < range.to;
+      })
+      .map(range => range.resolution));
+  }
+  return covered;
+}
+
+describe('planSketchRanges', () => {
+  it('uses minutes within an hour, including partial minutes whole', () => {
+    expect(planSketchRanges(T0 + 90 * 1000, T0 + 10 * MINUTE + 1)).toEqual([
+      { resolution: 'minute', from: T0 + MINUTE, to: T0 + 10 * MINUTE + 1 }
+    ]);
+  });
+
+  it('uses whole days in the middle and finer buckets at the edges', () => {
+    const from = T0 + 22 * HOUR + 30 * MINUTE;
+    const to = T0 + 3 * DAY + 2 * HOUR + 15 * MINUTE;
+
+    expect(planSketchRanges(from, to)).toEqual([
+      { resolution: 'minute', from, to: T0 + 23 * HOUR },
+      { resolution: 'hour', from: T0 + 23 * HOUR, to: T0 + DAY },
+      { resolution: 'day', from: T0 + DAY, to: T0 + 3 * DAY },
+      { resolution: 'hour', from: T0 + 3 * DAY, to: T0 + 3 * DAY + 2 * HOUR },
+      { resolution: 'minute', from: T0 + 3 * DAY + 2 * HOUR, to }
+    ]);
+  });
+
+  it('returns nothing for an empty range', () => {
+    expect(planSketchRanges(T0, T0)).toEqual([]);
+    expect(planSketchRanges(T0 + 1, T0)).toEqual([]);
+  });
+
+  it('covers every minute of a range exactly once', () => {
+    for (const [from, to] of [
+      [T0 + 59 * 1000, T0 + 5 * DAY + 7 * HOUR + 13 * MINUTE + 5000],
+      [T0 + 3 * HOUR + 1, T0 + 4 * HOUR - 1],
+      [T0 + DAY - MINUTE, T0 + DAY + MINUTE],
+      [T0, T0 + 2 * DAY]
+    ] as Array<[number, number]>) {
+      const covered = coverage(planSketchRanges(from, to), from, to);
+      for (const resolutions of covered.values()) {
+        expect(resolutions).toHaveLength(1);
+      }
+    }
+  });
+
+  describe('with retention', () => {
+    const now = T0 + 60 * DAY + 12 * HOUR;
+    const since = retainedSince(DEFAULT_SKETCH_RETENTION, now);
+
+    it('reads edges older than the minute retention from whole hours', () => {
+      const from = T0 + 50 * DAY + 3 * HOUR + 20 * MINUTE;
+      const to = T0 + 50 * DAY + 5 * HOUR + 40 * MINUTE;
+
+      expect(planSketchRanges(from, to, since)).toEqual([
+        { resolution: 'hour', from: T0 + 50 * DAY + 3 * HOUR, to: T0 + 50 * DAY + 6 * HOUR }
+      ]);
+    });
+
+    it('reads a range within one old hour from that hour', () => {
+      const from = T0 + 50 * DAY + 3 * HOUR + 20 * MINUTE;
+
+      expect(planSketchRanges(from, from + 10 * MINUTE, since)).toEqual([
+        { resolution: 'hour', from: T0 + 50 * DAY + 3 * HOUR, to: T0 + 50 * DAY + 4 * HOUR }
+      ]);
+    });
+
+    it('keeps minutes for the recent edge of a long range', () => {
+      const from = T0 + 50 * DAY + 3 * HOUR + 20 * MINUTE;
+      const to = now - 5 * MINUTE - 30 * 1000;
+      const ranges = planSketchRanges(from, to, since);
+
+      expect(ranges[0]).toEqual({ resolution: 'hour', from: T0 + 50 * DAY + 3 * HOUR, to: T0 + 51 * DAY });
+      expect(ranges[ranges.length - 1]).toEqual({ resolution: 'minute', from: T0 + 60 * DAY + 11 * HOUR, to });
+      for (const resolutions of coverage(ranges, from, to).values()) {
+        expect(resolutions).toHaveLength(1);
+      }
+    });
+
+    it('reads edges older than the hour retention from whole days', () => {
+      const from = T0 + 10 * DAY + 3 * HOUR;
+      const to = T0 + 12 * DAY + 5 * HOUR;
+
+      expect(planSketchRanges(from, to, since)).toEqual([
+        { resolution: 'day', from: T0 + 10 * DAY, to: T0 + 13 * DAY }
+      ]);
+    });
+  });
+});
@@ -0,0 +1,209 @@
+// Tail sampler tests
+import { Trace, TraceSpan, SpanStatus } from '@tracelens/shared';
+import { TailSampler, TailSamplingConfig } from '../sampling/tail-sampler';
+import { TraceNormalizer } from '../normalizers/trace-normalizer';
+
+function span(traceId: string, spanId: string, options: Partial<TraceSpan> = {}): TraceSpan {
+  return {
+    traceId,
+    spanId,
+    operationName: 'GET /users',
+    startTime: 1700000000000000,
+    duration: 1000,
+    tags: {},
+    status: SpanStatus.OK,
+    ...options
+  };
+}
+
+function trace(traceId: string, spans: TraceSpan[]): Trace {
+  return { traceId, spans, startTime: spans[0]!.startTime };
+}
+
+describe('TailSampler', () => {
+  let written: Trace[];
+  let dropped: Trace[];
+
+  // Keeps errors only, unless a test overrides the policy
+  const createSampler = (config: Partial<TailSamplingConfig> = {}) => {
+    const sampler = new TailSampler(async (projectId, traces) => {
+      written.push(...traces);
+    }, {
+      idleTimeout: 0,
+      decisionWait: 60000,
+      policy: { keepErrors: true, latencyPercentile: 0, sampleRate: 0 },
+      ...config
+    });
+    sampler.on('tracesDropped', (projectId: string, traces: Trace[]) => dropped.push(...traces));
+    return sampler;
+  };
+
+  beforeEach(() => {
+    written = [];
+    dropped = [];
+  });
+
+  it('decides a trace once its root span has arrived and it is idle', async () => {
+    const sampler = createSampler();
+
+    sampler.add('project-1', [trace('t1', [span('t1', 'child', { parentSpanId: 'root', status: SpanStatus.UNKNOWN })])]);
+    await sampler.tick();
+    expect(sampler.getStats().bufferedTraces).toBe(1);
+    expect(written).toHaveLength(0);
+
+    // The root arrives in a later request and completes the trace
+    sampler.add('project-1', [trace('t1', [span('t1', 'root')])]);
+    sampler.add('project-1', [trace('t2', [span('t2', 'root')])]);
+    await sampler.tick();
+
+    expect(written.map(t => t.traceId)).toEqual(['t1']);
+    expect(written[0]!.spans).toHaveLength(2);
+    expect(dropped.map(t => t.traceId)).toEqual(['t2']);
+
+    const stats = sampler.getStats();
+    expect(stats.bufferedTraces).toBe(0);
+    expect(stats.projects['project-1']).toMatchObject({ receivedTraces: 2, keptErrors: 1, droppedTraces: 1 });
+  });
+
+  it('decides a trace without a root span once the decision wait has passed', async () => {
+    const sampler = createSampler({ decisionWait: 0 });
+
+    sampler.add('project-1', [trace('t1', [span('t1', 'child', { parentSpanId: 'missing', tags: { error: true } })])]);
+    await sampler.tick();
+
+    expect(written.map(t => t.traceId)).toEqual(['t1']);
+  });
+
+  it('keeps traces at or above the latency percentile and a hashed fraction of the rest', async () => {
+    const sampler = createSampler({
+      minLatencySamples: 10,
+      policy: { keepErrors: true, latencyPercentile: 0.9, sampleRate: 0 }
+    });
+
+    for (let i = 1; i <= 100; i++) {
+      sampler.add('project-1', [trace(`warmup-${i}`, [span(`warmup-${i}`, 'root', { duration: i * 1000 })])]);
+    }
+    await sampler.tick();
+    await sampler.tick(); // threshold is computed from the decided durations
+
+    written = [];
+    sampler.add('project-1', [
+      trace('fast', [span('fast', 'root', { duration: 5000 })]),
+      trace('slow', [span('slow', 'root', { duration: 500000 })])
+    ]);
+    await sampler.tick();
+
+    expect(written.map(t => t.traceId)).toEqual(['slow']);
+    expect(sampler.getStats().projects['project-1']!.keptSlow).toBe(1);
+
+    // Project settings replace the default rate; the same IDs are always kept
+    const sampled = createSampler({ policy: { keepErrors: true, latencyPercentile: 0, sampleRate: 0 } });
+    const ids = Array.from({ length: 200 }, (_, i) => `trace-${i}`);
+    sampled.add('project-2', ids.map(id => trace(id, [span(id, 'root')])), { sampleRate: 0.5 });
+    written = [];
+    await sampled.tick();
+    const firstRun = written.map(t => t.traceId);
+    expect(firstRun.length).toBeGreaterThan(60);
+    expect(firstRun.length).toBeLessThan(140);
+
+    const again = createSampler();
+    again.add('project-2', ids.map(id => trace(id, [span(id, 'root')])), { sampleRate: 0.5 });
+    written = [];
+    await again.tick();
+    expect(written.map(t => t.traceId)).toEqual(firstRun);
+  });
+
+  it('decides the oldest traces early when the buffer is full', async () => {
+    const sampler = createSampler({ maxBufferedSpans: 4 });
+
+    for (let i = 0; i < 6; i++) {
+      sampler.add('project-1', [trace(`t${i}`, [span(`t${i}`, 'child', { parentSpanId: 'root', status: SpanStatus.INTERNAL })])]);
+    }
+    await sampler.tick();
+
+    const stats = sampler.getStats();
+    expect(stats.forcedDecisions).toBe(2);
+    expect(stats.bufferedSpans).toBe(4);
+    expect(written.map(t => t.traceId)).toEqual(['t0', 't1']);
+  });
+
+  it('sends late spans the way their trace was decided', async () => {
+    const sampler = createSampler();
+
+    sampler.add('project-1', [
+      trace('kept', [span('kept', 'root', { status: SpanStatus.UNKNOWN })]),
+      trace('dropped', [span('dropped', 'root')])
+    ]);
+    await sampler.tick();
+    written = [];
+    dropped = [];
+
+    sampler.add('project-1', [
+      trace('kept', [span('kept', 'late', { parentSpanId: 'root' })]),
+      trace('dropped', [span('dropped', 'late', { parentSpanId: 'root', status: SpanStatus.UNKNOWN })])
+    ]);
+    await sampler.tick();
+
+    expect(written.map(t => [t.traceId, t.spans.map(s => s.spanId)])).toEqual([['kept', ['late']]]);
+    expect(dropped.map(t => [t.traceId, t.spans.map(s => s.spanId)])).toEqual([['dropped', ['late']]]);
+    expect(sampler.getStats().lateSpans).toBe(2);
+  });
+
+  it('decides and writes every buffered trace on stop', async () => {
+    const sampler = createSampler();
+    let finishWrite: () => void = () => undefined;
+    const slowSampler = new TailSampler((projectId, traces) => new Promise<void>(resolve => {
+      finishWrite = () => {
+        written.push(...traces);
+        resolve();
+      };
+    }), { decisionWait: 60000, policy: { keepErrors: false, latencyPercentile: 0, sampleRate: 1 } });
+
+    sampler.add('project-1', [trace('t1', [span('t1', 'child', { parentSpanId: 'root', status: SpanStatus.UNKNOWN })])]);
+    await sampler.stop();
+    expect(written.map(t => t.traceId)).toEqual(['t1']);
+    expect(sampler.getStats().bufferedTraces).toBe(0);
+
+    written = [];
+    slowSampler.add('project-1', [trace('t2', [span('t2', 'root')])]);
+    let stopped = false;
+    const stopping = slowSampler.stop().then(() => {
+      stopped = true;
+    });
+    await Promise.resolve();
+    expect(stopped).toBe(false);
+
+    finishWrite();
+    await stopping;
+    expect(stopped).toBe(true);
+  });
+
+  it('does not treat OTLP spans with an OK or unset status as errors', async () => {
+    const sampler = createSampler();
+    const normalizer = new TraceNormalizer();
+    const otlpSpan = (spanId: string, status?: object) => ({
+      traceId: '0af7651916cd43dd8448eb211c80319c',
+      spanId,
+      name: 'GET /users',
+      startTimeUnixNano: '1700000000000000000',
+      endTimeUnixNano: '1700000000001000000',
+      ...(status && { status })
+    });
+
+    const [healthy] = normalizer.normalizeOTLPResourceSpan({
+      scopeSpans: [{ spans: [otlpSpan('00f067aa0ba902b7', { code: 1 }), otlpSpan('00f067aa0ba902b8', {})] }]
+    });
+    expect(healthy!.spans.map(s => s.status)).toEqual([SpanStatus.OK, SpanStatus.OK]);
+
+    sampler.add('project-1', [healthy!]);
+    await sampler.tick();
+    expect(written).toHaveLength(0);
+
+    const [failed] = normalizer.normalizeOTLPResourceSpan({
+      scopeSpans: [{ spans: [{ ...otlpSpan('00f067aa0ba902b9', { code: 2 }), traceId: '1af7651916cd43dd8448eb211c80319c' }] }]
+    });
+    sampler.add('project-1', [failed!]);
+    await sampler.tick();
+    expect(written.map(t => t.traceId)).toEqual(['1af7651916cd43dd8448eb211c80319c']);
+  });
+});
@@ -0,0 +1,136 @@
+// Latency analysis served from per-operation sketches
+import { Router, Request, Response } from 'express';
+import { DatabaseManager } from '../../database/database-manager';
+import { authenticateApiKey } from '../../middleware/auth';
+import { LatencySketch } from '../../sketches/latency-sketch';
+import { loadSketchRetention } from '../../sketches/sketch-buckets';
+
+const router = Router();
+const sketchRetention = loadSketchRetention();
+
+const TIME_RANGE_UNITS: Record<string, number> = {
+  m: 60 * 1000,
+  h: 60 * 60 * 1000,
+  d: 24 * 60 * 60 * 1000
+};
+
+// "30m", "1h", "7d" -> milliseconds
+function parseTimeRange(value: unknown, fallback: number): number | null {
+  if (value === undefined) return fallback;
+  const match = typeof value === 'string' ? /^(\d+)([mhd])$/.exec(value) : null;
+  if (!match) return null;
+  return parseInt(match[1]!) * TIME_RANGE_UNITS[match[2]!]!;
+}
+
+function round(value: number): number {
+  return Math.round(value * 100) / 100;
+}
+
+// Span durations are microseconds; responses use milliseconds
+function summarize(operation: string, sketch: LatencySketch) {
+  return {
+    operation,
+    count: sketch.count,
+    avgDuration: round(sketch.mean / 1000),
+    p50Duration: round(sketch.quantile(0.5) / 1000),
+    p95Duration: round(sketch.quantile(0.95) / 1000),
+    p99Duration: round(sketch.quantile(0.99) / 1000),
+    maxDuration: round(sketch.max / 1000)
+  };
+}
+
+// Per-operation latency percentiles over [from, to) (epoch ms, default: last hour)
+router.get('/latency', authenticateApiKey, async (req: Request, res: Response): Promise<void> => {
+  const startTime = process.hrtime.bigint();
+
+  try {
+    const projectId = (req as any).projectId;
+    const db = (req as any).db as DatabaseManager;
+
+    const to = req.query.to ? parseInt(req.query.to as string) : Date.now();
+    const from = req.query.from ? parseInt(req.query.from as string) : to - TIME_RANGE_UNITS.h!;
+    const limit = Math.min(parseInt(req.query.limit as string) || 100, 1000);
+
+    if (!Number.isFinite(from) || !Number.isFinite(to) || from >= to) {
+      res.status(400).json({
+        success: false,
+        error: 'Invalid time range',
+        message: 'from and to must be epoch milliseconds with from < to'
+      });
+      return;
+    }
+
+    const sketches = await db.getLatencySketches(projectId, from, to, req.query.operation as string | undefined, sketchRetention);
+    const operations = Array.from(sketches, ([operation, sketch]) => summarize(operation, sketch))
+      .sort((a, b) => b.count - a.count)
+      .slice(0, limit);
+
+    const processingTime = Number(process.hrtime.bigint() - startTime) / 1000000;
+
+    res.json({
+      success: true,
+      from,
+      to,
+      operations,
+      processingTime: round(processingTime)
+    });
+  } catch (error) {
+    console.error('Latency query error:', error);
+    res.status(500).json({
+      success: false,
+      error: 'Internal server error'
+    });
+  }
+});
+
+// Operations ranked by their share of total span time. threshold is the
+// minimum p95 in milliseconds.
+router.get('/bottlenecks', authenticateApiKey, async (req: Request, res: Response): Promise<void> => {
+  try {
+    const projectId = (req as any).projectId;
+    const db = (req as any).db as DatabaseManager;
+
+    const range = parseTimeRange(req.query.timeRange, TIME_RANGE_UNITS.h!);
+    if (range === null) {
+      res.status(400).json({
+        success: false,
+        error: 'Invalid time range',
+        message: 'timeRange must look like 30m, 1h or 7d'
+      });
+      return;
+    }
+
+    const threshold = parseFloat(req.query.threshold as string) || 0;
+    const limit = Math.min(parseInt(req.query.limit as string) || 10, 100);
+    const to = Date.now();
+
+    const sketches = await db.getLatencySketches(projectId, to - range, to, undefined, sketchRetention);
+
+    let totalTime = 0;
+    for (const sketch of sketches.values()) {
+      totalTime += sketch.sum;
+    }
+
+    const bottlenecks = Array.from(sketches, ([operation, sketch]) => ({
+      ...summarize(operation, sketch),
+      impactPercentage: totalTime > 0 ? round((sketch.sum / totalTime) * 100) : 0
+    }))
+      .filter(bottleneck => bottleneck.p95Duration >= threshold)
+      .sort((a, b) => b.impactPercentage - a.impactPercentage)
+      .slice(0, limit);
+
+    res.json({
+      success: true,
+      timeRange: req.query.timeRange || '1h',
+      bottlenecks
+    });
+  } catch (error) {
+    console.error('Bottleneck query error:', error);
+    res.status(500).json({
+      success: false,
+      error: 'Internal server error'
+    });
+  }
+});
+
+export default router;
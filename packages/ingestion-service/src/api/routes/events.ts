@@ -4,7 +4,9 @@ import { EventValidator } from '../../validators/event-validator';
 import { DataSanitizer } from '../../sanitizers/data-sanitizer';
 import { DatabaseManager } from '../../database/database-manager';
 import { authenticateApiKey } from '../../middleware/auth';
-import { rateLimiter } from '../../middleware/rate-limiter';
+import { eventQuotaLimiter } from '../../middleware/rate-limiter';
+import { IngestionQueue, sendQueueRejection } from '../../queue/ingestion-queue';
+import { decodeCursor, encodeCursor } from '../../database/cursor';
 import { PerformanceEvent } from '@tracelens/shared';
 
 const router = Router();
@@ -12,7 +14,7 @@ const eventValidator = new EventValidator();
 const dataSanitizer = new DataSanitizer();
 
 // Batch event ingestion endpoint
-router.post('/batch', authenticateApiKey, rateLimiter, async (req: Request, res: Response): Promise<void> => {
+router.post('/batch', authenticateApiKey, eventQuotaLimiter, async (req: Request, res: Response): Promise<void> => {
   const startTime = process.hrtime.bigint();
   
   try {
@@ -31,6 +33,25 @@ router.post('/batch', authenticateApiKey, rateLimiter, async (req: Request, res:
     const validatedEvents = eventValidator.validateEventBatch(req.body);
     const sanitizedEvents = validatedEvents.map(event => dataSanitizer.sanitizeEvent(event as unknown as Record<string, unknown>) as unknown as PerformanceEvent);
 
+    // Hand off to the write-behind queue when async ingestion is enabled
+    const ingestionQueue = (req as any).ingestionQueue as IngestionQueue | null;
+    if (ingestionQueue) {
+      const result = await ingestionQueue.enqueueEvents(projectId, sanitizedEvents);
+      if (result !== 'accepted') {
+        sendQueueRejection(res, result);
+        return;
+      }
+
+      const processingTime = Number(process.hrtime.bigint() - startTime) / 1000000;
+      res.status(202).json({
+        success: true,
+        accepted: sanitizedEvents.length,
+        processingTime: Math.round(processingTime * 100) / 100,
+        message: 'Events accepted for processing'
+      });
+      return;
+    }
+
     // Store events in database
     await db.insertPerformanceEventBatch(projectId, sanitizedEvents);
 
@@ -65,7 +86,7 @@ router.post('/batch', authenticateApiKey, rateLimiter, async (req: Request, res:
 });
 
 // Single event ingestion endpoint
-router.post('/single', authenticateApiKey, rateLimiter, async (req: Request, res: Response): Promise<void> => {
+router.post('/single', authenticateApiKey, eventQuotaLimiter, async (req: Request, res: Response): Promise<void> => {
   const startTime = process.hrtime.bigint();
   
   try {
@@ -76,6 +97,25 @@ router.post('/single', authenticateApiKey, rateLimiter, async (req: Request, res
     const validatedEvent = eventValidator.validateEvent(req.body);
     const sanitizedEvent = dataSanitizer.sanitizeEvent(validatedEvent as unknown as Record<string, unknown>) as unknown as PerformanceEvent;
 
+    // Hand off to the write-behind queue when async ingestion is enabled
+    const ingestionQueue = (req as any).ingestionQueue as IngestionQueue | null;
+    if (ingestionQueue) {
+      const result = await ingestionQueue.enqueueEvents(projectId, [sanitizedEvent]);
+      if (result !== 'accepted') {
+        sendQueueRejection(res, result);
+        return;
+      }
+
+      const processingTime = Number(process.hrtime.bigint() - startTime) / 1000000;
+      res.status(202).json({
+        success: true,
+        eventId: sanitizedEvent.id,
+        processingTime: Math.round(processingTime * 100) / 100,
+        message: 'Event accepted for processing'
+      });
+      return;
+    }
+
     // Store event in database
     await db.insertPerformanceEvent(projectId, sanitizedEvent);
 
@@ -109,24 +149,53 @@ router.post('/single', authenticateApiKey, rateLimiter, async (req: Request, res
   }
 });
 
-// Event query endpoint
-router.get('/', authenticateApiKey, async (req: Request, res: Response) => {
+// Event query endpoint. Pages with an opaque cursor (newest first); the
+// legacy offset parameter is still honoured when present.
+router.get('/', authenticateApiKey, async (req: Request, res: Response): Promise<void> => {
   try {
     const projectId = (req as any).projectId;
     const db = (req as any).db as DatabaseManager;
     
     const eventType = req.query.type as string;
     const limit = Math.min(parseInt(req.query.limit as string) || 100, 1000);
-    const offset = parseInt(req.query.offset as string) || 0;
+    const from = req.query.from ? parseInt(req.query.from as string) : undefined;
+    const to = req.query.to ? parseInt(req.query.to as string) : undefined;
+    const timeRange = {
+      ...(Number.isFinite(from) && { from }),
+      ...(Number.isFinite(to) && { to })
+    };
+
+    if (req.query.offset !== undefined) {
+      const offset = parseInt(req.query.offset as string) || 0;
+      const events = await db.getPerformanceEventsByProject(projectId, eventType, limit, offset, timeRange);
+
+      res.json({
+        success: true,
+        events,
+        count: events.length,
+        limit,
+        offset
+      });
+      return;
+    }
+
+    const cursor = req.query.cursor !== undefined ? decodeCursor(req.query.cursor) : null;
+    if (req.query.cursor !== undefined && !cursor) {
+      res.status(400).json({
+        success: false,
+        error: 'Invalid cursor'
+      });
+      return;
+    }
 
-    const events = await db.getPerformanceEventsByProject(projectId, eventType, limit, offset);
+    const page = await db.getPerformanceEventsPage(projectId, { eventType, limit, cursor, ...timeRange });
 
     res.json({
       success: true,
-      events,
-      count: events.length,
+      events: page.items,
+      count: page.items.length,
       limit,
-      offset
+      nextCursor: page.nextCursor ? encodeCursor(page.nextCursor) : null
     });
   } catch (error) {
     console.error('Event query error:', error);
@@ -1,9 +1,37 @@
 // Service health checks and monitoring endpoints
 import { Router, Request, Response } from 'express';
 import { DatabaseManager } from '../../database/database-manager';
+import { IngestionQueue } from '../../queue/ingestion-queue';
+import { LatencySketchRecorder } from '../../sketches/latency-sketch-recorder';
+import { TailSampler } from '../../sampling/tail-sampler';
+import { apiKeyCache } from '../../middleware/auth';
+import { quotaLimiter } from '../../middleware/rate-limiter';
+import { collectWorkerHealth, getClusterHealth } from '../../cluster/worker-health';
 
 const router = Router();
 
+// Cluster-wide worker view as last broadcast by the primary, plus the
+// worker that served this request
+function clusterHealth(): Record<string, unknown> {
+  const snapshot = getClusterHealth();
+  if (!snapshot) {
+    return {};
+  }
+
+  const healthyWorkers = snapshot.workers.filter(worker => worker.status === 'healthy').length;
+
+  return {
+    servedBy: collectWorkerHealth(),
+    cluster: {
+      status: healthyWorkers === snapshot.expectedWorkers ? 'healthy' : 'degraded',
+      expectedWorkers: snapshot.expectedWorkers,
+      healthyWorkers,
+      updatedAt: new Date(snapshot.updatedAt).toISOString(),
+      workers: snapshot.workers
+    }
+  };
+}
+
 // Basic health check
 router.get('/', async (req: Request, res: Response) => {
   const startTime = process.hrtime.bigint();
@@ -19,7 +47,9 @@ router.get('/', async (req: Request, res: Response) => {
       memory: process.memoryUsage(),
       version: process.env.npm_package_version || '0.1.0',
       environment: process.env.NODE_ENV || 'development',
-      database: isHealthy ? 'connected' : 'disconnected'
+      database: isHealthy ? 'connected' : 'disconnected',
+      // Per-worker status in cluster mode (INGESTION_WORKERS > 1)
+      ...clusterHealth()
     };
 
     const responseTime = Number(process.hrtime.bigint() - startTime) / 1000000;
@@ -52,6 +82,12 @@ router.get('/detailed', async (req: Request, res: Response) => {
     const dbHealthy = await db.isHealthy();
     const dbLatency = Date.now() - dbStartTime;
     
+    // Ingestion queue depth and drop counters (async ingestion mode only)
+    const ingestionQueue = (req as any).ingestionQueue as IngestionQueue | null;
+    const queueStats = ingestionQueue ? await ingestionQueue.getStats() : null;
+    const latencySketches = (req as any).latencySketches as LatencySketchRecorder | undefined;
+    const traceSampler = (req as any).traceSampler as TailSampler | null | undefined;
+    
     const overallStatus = dbHealthy ? 'healthy' : 'unhealthy';
     const responseTime = Number(process.hrtime.bigint() - startTime) / 1000000;
     
@@ -63,8 +99,19 @@ router.get('/detailed', async (req: Request, res: Response) => {
         database: {
           status: dbHealthy ? 'healthy' : 'unhealthy',
           latency: dbLatency
-        }
+        },
+        ...(queueStats && {
+          ingestionQueue: {
+            status: queueStats.depth >= 0 && queueStats.depth < queueStats.maxDepth ? 'healthy' : 'degraded',
+            ...queueStats
+          }
+        }),
+        apiKeyCache: apiKeyCache.getStats(),
+        quota: quotaLimiter.getStats(),
+        ...(latencySketches && { latencySketches: latencySketches.getStats() }),
+        ...(traceSampler && { traceSampling: traceSampler.getStats() })
       },
+      ...clusterHealth(),
       system: {
         uptime: process.uptime(),
         memory: process.memoryUsage(),
@@ -112,6 +159,25 @@ router.get('/ready', async (req: Request, res: Response) => {
   }
 });
 
+// Ingestion queue metrics
+router.get('/queue', async (req: Request, res: Response) => {
+  const ingestionQueue = (req as any).ingestionQueue as IngestionQueue | null;
+
+  if (!ingestionQueue) {
+    res.status(200).json({
+      mode: 'sync',
+      timestamp: new Date().toISOString()
+    });
+    return;
+  }
+
+  res.status(200).json({
+    mode: 'async',
+    timestamp: new Date().toISOString(),
+    ...(await ingestionQueue.getStats())
+  });
+});
+
 // Liveness probe (Kubernetes-style)
 router.get('/live', (req: Request, res: Response) => {
   // Simple liveness check - if we can respond, we're alive
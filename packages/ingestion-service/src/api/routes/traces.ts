@@ -1,36 +1,86 @@
 // OpenTelemetry trace ingestion endpoints
-import { Router, Request, Response } from 'express';
+import express, { Router, Request, Response } from 'express';
+import { Readable, Transform } from 'stream';
+import zlib from 'zlib';
 import { TraceNormalizer } from '../../normalizers/trace-normalizer';
 import { DataSanitizer } from '../../sanitizers/data-sanitizer';
 import { DatabaseManager } from '../../database/database-manager';
 import { authenticateApiKey } from '../../middleware/auth';
-import { rateLimiter } from '../../middleware/rate-limiter';
+import { traceQuotaLimiter, quotaLimiter } from '../../middleware/rate-limiter';
+import { IngestionQueue, sendQueueRejection } from '../../queue/ingestion-queue';
+import { TailSampler } from '../../sampling/tail-sampler';
+import { decodeExportTraceServiceRequest } from '../../decoders/otlp-protobuf';
+import { OTLPJsonStreamParser, OTLPStreamError } from '../../decoders/otlp-json-stream';
+import { decodeCursor, encodeCursor } from '../../database/cursor';
 import { TraceSpan, Trace } from '@tracelens/shared';
 
 const router = Router();
 const traceNormalizer = new TraceNormalizer();
 const dataSanitizer = new DataSanitizer();
 
+// Raw body parser for OTLP/protobuf; like express.json it inflates gzip and
+// deflate request bodies and applies the limit to the decompressed size.
+// It runs before the quota limiter, which charges per span.
+const protobufParser = express.raw({ type: 'application/x-protobuf', limit: '10mb' });
+
+// OTLP/JSON bodies are parsed incrementally unless OTLP_STREAMING=false.
+// Memory per request is bounded by one resource span plus one flush batch.
+const OTLP_STREAMING = process.env.OTLP_STREAMING !== 'false';
+const STREAM_MAX_BODY_BYTES = parseInt(process.env.OTLP_STREAM_MAX_BODY || String(100 * 1024 * 1024));
+const STREAM_MAX_ELEMENT_BYTES = parseInt(process.env.OTLP_STREAM_MAX_ELEMENT || String(8 * 1024 * 1024));
+const STREAM_FLUSH_SPANS = parseInt(process.env.OTLP_STREAM_FLUSH_SPANS || '2000');
+
+// Used by the app-level JSON body parser to leave streamed requests unread
+export function isStreamingOTLPRequest(req: Request): boolean {
+  return OTLP_STREAMING
+    && req.method === 'POST'
+    && req.path === '/api/traces/otlp'
+    && Boolean(req.is('application/json'));
+}
+
 // OTLP trace ingestion endpoint (OpenTelemetry standard)
-router.post('/otlp', authenticateApiKey, rateLimiter, async (req: Request, res: Response): Promise<void> => {
+router.post('/otlp', authenticateApiKey, protobufParser, traceQuotaLimiter, async (req: Request, res: Response): Promise<void> => {
   const startTime = process.hrtime.bigint();
   
   try {
+    if ((req as any).otlpStreaming) {
+      await ingestOTLPJsonStream(req, res, startTime);
+      return;
+    }
+
     const projectId = (req as any).projectId;
     const db = (req as any).db as DatabaseManager;
     
     const contentType = req.get('Content-Type');
-    
-    // Support both JSON and protobuf (simplified to JSON for now)
-    if (!contentType?.includes('application/json')) {
+    let resourceSpans: unknown;
+
+    if (contentType?.includes('application/json')) {
+      resourceSpans = req.body?.resourceSpans;
+    } else if (contentType?.includes('application/x-protobuf')) {
+      if (!Buffer.isBuffer(req.body)) {
+        res.status(400).json({
+          error: 'Invalid OTLP format',
+          message: 'Request body is empty'
+        });
+        return;
+      }
+
+      try {
+        resourceSpans = decodeExportTraceServiceRequest(req.body).resourceSpans;
+      } catch (error) {
+        res.status(400).json({
+          error: 'Invalid OTLP format',
+          message: error instanceof Error ? error.message : 'Malformed protobuf payload'
+        });
+        return;
+      }
+    } else {
       res.status(415).json({
         error: 'Unsupported Media Type',
-        message: 'Content-Type must be application/json'
+        message: 'Content-Type must be application/json or application/x-protobuf'
       });
       return;
     }
-
-    const { resourceSpans } = req.body;
     
     if (!resourceSpans || !Array.isArray(resourceSpans)) {
       res.status(400).json({
@@ -40,25 +90,51 @@ router.post('/otlp', authenticateApiKey, rateLimiter, async (req: Request, res:
       return;
     }
 
-    let processedCount = 0;
+    const sanitizedTraces: Trace[] = [];
     const errors: string[] = [];
 
-    // Process each resource span
+    // Normalize and sanitize each resource span
     for (const resourceSpan of resourceSpans) {
       try {
         const traces = traceNormalizer.normalizeOTLPResourceSpan(resourceSpan);
         
-        // Sanitize and store traces
         for (const trace of traces) {
-          const sanitizedTrace = dataSanitizer.sanitizeTrace(trace as unknown as Record<string, unknown>) as unknown as Trace;
-          await db.insertTrace(projectId, sanitizedTrace);
-          processedCount++;
+          sanitizedTraces.push(dataSanitizer.sanitizeTrace(trace as unknown as Record<string, unknown>) as unknown as Trace);
         }
       } catch (error) {
         errors.push(`Resource span error: ${error instanceof Error ? error.message : 'Invalid format'}`);
       }
     }
 
+    // Hand off to tail sampling or the write-behind queue when enabled;
+    // either way the traces are written in the background
+    const traceSampler = (req as any).traceSampler as TailSampler | null;
+    const ingestionQueue = (req as any).ingestionQueue as IngestionQueue | null;
+    if (traceSampler) {
+      traceSampler.add(projectId, sanitizedTraces, (req as any).samplingPolicy);
+    } else if (ingestionQueue) {
+      const result = await ingestionQueue.enqueueTraces(projectId, sanitizedTraces);
+      if (result !== 'accepted') {
+        sendQueueRejection(res, result);
+        return;
+      }
+    }
+
+    if (traceSampler || ingestionQueue) {
+      const processingTime = Number(process.hrtime.bigint() - startTime) / 1000000;
+      res.status(202).json({
+        success: true,
+        accepted: sanitizedTraces.length,
+        errors: errors.length,
+        processingTime: Math.round(processingTime * 100) / 100
+      });
+      return;
+    }
+
+    // Store the whole request in one bulk write
+    await db.insertTraceBatch(projectId, sanitizedTraces);
+    const processedCount = sanitizedTraces.length;
+
     const processingTime = Number(process.hrtime.bigint() - startTime) / 1000000;
 
     res.status(200).json({
@@ -81,8 +157,165 @@ router.post('/otlp', authenticateApiKey, rateLimiter, async (req: Request, res:
   }
 });
 
+// Streams an OTLP/JSON body: each resource span is normalized and sanitized
+// as soon as it has been read, and traces are written every
+// STREAM_FLUSH_SPANS spans while the rest of the body is still arriving
+async function ingestOTLPJsonStream(req: Request, res: Response, startTime: bigint): Promise<void> {
+  const projectId = (req as any).projectId;
+  const db = (req as any).db as DatabaseManager;
+  const ingestionQueue = (req as any).ingestionQueue as IngestionQueue | null;
+  const traceSampler = (req as any).traceSampler as TailSampler | null;
+  const deferred = Boolean(traceSampler || ingestionQueue);
+
+  const source = decompressRequest(req);
+  if (!source) {
+    res.status(415).json({
+      error: 'Unsupported Media Type',
+      message: `Unsupported Content-Encoding: ${req.get('Content-Encoding')}`
+    });
+    return;
+  }
+
+  const parser = new OTLPJsonStreamParser(STREAM_MAX_ELEMENT_BYTES);
+  const errors: string[] = [];
+  let pending: Trace[] = [];
+  let pendingSpans = 0;
+  let pendingBytes = 0;
+  let totalBytes = 0;
+  let stored = 0;
+
+  // Charges the quota for the batch and writes it; false once a rejection
+  // response has been sent
+  const flush = async (): Promise<boolean> => {
+    if (pending.length === 0) return true;
+
+    const decision = await quotaLimiter.take(projectId, pendingSpans, pendingBytes);
+    if (!decision.allowed) {
+      const retryAfter = Math.max(decision.retryAfter, 1);
+      res.set('Connection', 'close');
+      res.set('Retry-After', String(retryAfter));
+      res.status(429).json({
+        success: false,
+        error: 'Too many requests',
+        message: 'Ingestion quota exceeded. Please try again later.',
+        processed: stored,
+        retryAfter
+      });
+      return false;
+    }
+
+    if (traceSampler) {
+      traceSampler.add(projectId, pending, (req as any).samplingPolicy);
+    } else if (ingestionQueue) {
+      const result = await ingestionQueue.enqueueTraces(projectId, pending);
+      if (result !== 'accepted') {
+        res.set('Connection', 'close');
+        sendQueueRejection(res, result);
+        return false;
+      }
+    } else {
+      await db.insertTraceBatch(projectId, pending);
+    }
+
+    stored += pending.length;
+    pending = [];
+    pendingSpans = 0;
+    pendingBytes = 0;
+    return true;
+  };
+
+  // A response may be sent before the body has been read to the end. The
+  // iterator must then leave the request alone (destroying it would take the
+  // socket and the response with it), and every such response carries
+  // Connection: close so the server drops the unread rest of the body once
+  // the response has been written.
+  const chunks = source.iterator({ destroyOnReturn: false });
+
+  try {
+    for await (const chunk of chunks) {
+      const buffer = chunk as Buffer;
+      totalBytes += buffer.length;
+      pendingBytes += buffer.length;
+
+      if (totalBytes > STREAM_MAX_BODY_BYTES) {
+        throw new OTLPStreamError('Request body too large', 413);
+      }
+
+      for (const resourceSpan of parser.push(buffer)) {
+        try {
+          for (const trace of traceNormalizer.normalizeOTLPResourceSpan(resourceSpan)) {
+            pending.push(dataSanitizer.sanitizeTrace(trace as unknown as Record<string, unknown>) as unknown as Trace);
+            pendingSpans += trace.spans.length;
+          }
+        } catch (error) {
+          errors.push(`Resource span error: ${error instanceof Error ? error.message : 'Invalid format'}`);
+        }
+      }
+
+      // Awaiting the write pauses reading, so a slow database applies
+      // backpressure to the client instead of growing the batch
+      if (pendingSpans >= STREAM_FLUSH_SPANS && !(await flush())) {
+        return;
+      }
+    }
+
+    parser.end();
+    if (!(await flush())) {
+      return;
+    }
+  } catch (error) {
+    res.set('Connection', 'close');
+
+    const invalidBody = error instanceof OTLPStreamError || (error as NodeJS.ErrnoException)?.code?.startsWith('Z_');
+    if (!invalidBody) {
+      throw error;
+    }
+
+    res.status(error instanceof OTLPStreamError ? error.statusCode : 400).json({
+      error: 'Invalid OTLP format',
+      message: error instanceof Error ? error.message : 'Malformed request body',
+      processed: stored
+    });
+    return;
+  }
+
+  const processingTime = Number(process.hrtime.bigint() - startTime) / 1000000;
+
+  res.status(deferred ? 202 : 200).json({
+    success: true,
+    ...(deferred ? { accepted: stored } : { processed: stored }),
+    errors: errors.length,
+    processingTime: Math.round(processingTime * 100) / 100
+  });
+}
+
+function decompressRequest(req: Request): Readable | null {
+  const encoding = (req.get('Content-Encoding') || 'identity').toLowerCase();
+
+  switch (encoding) {
+    case 'identity':
+      return req;
+    case 'gzip':
+    case 'x-gzip':
+      return decompress(req, zlib.createGunzip());
+    case 'deflate':
+      return decompress(req, zlib.createInflate());
+    case 'br':
+      return decompress(req, zlib.createBrotliDecompress());
+    default:
+      return null;
+  }
+}
+
+// Errors surface through the returned stream. Unlike pipeline(), a corrupt
+// body does not destroy the request, so the 400 response can still be sent.
+function decompress(req: Request, decompressor: Transform): Readable {
+  req.on('error', error => decompressor.destroy(error));
+  return req.pipe(decompressor);
+}
+
 // TraceLens native trace format
-router.post('/native', authenticateApiKey, rateLimiter, async (req: Request, res: Response): Promise<void> => {
+router.post('/native', authenticateApiKey, traceQuotaLimiter, async (req: Request, res: Response): Promise<void> => {
   const startTime = process.hrtime.bigint();
   
   try {
@@ -105,20 +338,47 @@ router.post('/native', authenticateApiKey, rateLimiter, async (req: Request, res
       return;
     }
 
-    let processedCount = 0;
+    const sanitizedTraces: Trace[] = [];
     const errors: string[] = [];
 
     for (let i = 0; i < req.body.length; i++) {
       try {
         const normalizedTrace = traceNormalizer.normalizeTrace(req.body[i]);
-        const sanitizedTrace = dataSanitizer.sanitizeTrace(normalizedTrace as unknown as Record<string, unknown>) as unknown as Trace;
-        await db.insertTrace(projectId, sanitizedTrace);
-        processedCount++;
+        sanitizedTraces.push(dataSanitizer.sanitizeTrace(normalizedTrace as unknown as Record<string, unknown>) as unknown as Trace);
       } catch (error) {
         errors.push(`Trace ${i}: ${error instanceof Error ? error.message : 'Invalid trace'}`);
       }
     }
 
+    // Hand off to tail sampling or the write-behind queue when enabled;
+    // either way the traces are written in the background
+    const traceSampler = (req as any).traceSampler as TailSampler | null;
+    const ingestionQueue = (req as any).ingestionQueue as IngestionQueue | null;
+    if (traceSampler) {
+      traceSampler.add(projectId, sanitizedTraces, (req as any).samplingPolicy);
+    } else if (ingestionQueue) {
+      const result = await ingestionQueue.enqueueTraces(projectId, sanitizedTraces);
+      if (result !== 'accepted') {
+        sendQueueRejection(res, result);
+        return;
+      }
+    }
+
+    if (traceSampler || ingestionQueue) {
+      const processingTime = Number(process.hrtime.bigint() - startTime) / 1000000;
+      res.status(202).json({
+        success: true,
+        accepted: sanitizedTraces.length,
+        errors: errors.length,
+        processingTime: Math.round(processingTime * 100) / 100
+      });
+      return;
+    }
+
+    // Store the whole batch in one bulk write
+    await db.insertTraceBatch(projectId, sanitizedTraces);
+    const processedCount = sanitizedTraces.length;
+
     const processingTime = Number(process.hrtime.bigint() - startTime) / 1000000;
 
     res.status(200).json({
@@ -169,4 +429,71 @@ router.get('/', authenticateApiKey, async (req: Request, res: Response) => {
   }
 });
 
+// Trace list without spans, paged with an opaque cursor (newest first)
+router.get('/summary', authenticateApiKey, async (req: Request, res: Response): Promise<void> => {
+  try {
+    const projectId = (req as any).projectId;
+    const db = (req as any).db as DatabaseManager;
+
+    const limit = Math.min(parseInt(req.query.limit as string) || 100, 1000);
+    const cursor = req.query.cursor !== undefined ? decodeCursor(req.query.cursor) : null;
+
+    if (req.query.cursor !== undefined && !cursor) {
+      res.status(400).json({
+        success: false,
+        error: 'Invalid cursor'
+      });
+      return;
+    }
+
+    const page = await db.getTraceSummariesByProject(projectId, limit, cursor);
+
+    res.json({
+      success: true,
+      traces: page.items,
+      count: page.items.length,
+      limit,
+      nextCursor: page.nextCursor ? encodeCursor(page.nextCursor) : null
+    });
+  } catch (error) {
+    console.error('Trace summary query error:', error);
+    res.status(500).json({
+      success: false,
+      error: 'Internal server error'
+    });
+  }
+});
+
+// Spans of a single trace, loaded on demand
+router.get('/:traceId/spans', authenticateApiKey, async (req: Request, res: Response): Promise<void> => {
+  try {
+    const projectId = (req as any).projectId;
+    const db = (req as any).db as DatabaseManager;
+
+    const trace = await db.getSpansByTrace(projectId, req.params.traceId!);
+
+    if (!trace) {
+      res.status(404).json({
+        success: false,
+        error: 'Trace not found'
+      });
+      return;
+    }
+
+    res.json({
+      success: true,
+      traceId: req.params.traceId,
+      version: trace.version,
+      spans: trace.spans,
+      count: trace.spans.length
+    });
+  } catch (error) {
+    console.error('Trace spans query error:', error);
+    res.status(500).json({
+      success: false,
+      error: 'Internal server error'
+    });
+  }
+});
+
 export default router;
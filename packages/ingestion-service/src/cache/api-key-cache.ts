@@ -0,0 +1,198 @@
+// In-process LRU cache for API key to project lookups
+import { DatabaseManager, API_KEY_INVALIDATION_CHANNEL } from '../database/database-manager';
+import type { SamplingPolicy } from '../sampling/tail-sampler';
+
+export interface CachedProject {
+  id: string;
+  name: string;
+  sampling?: Partial<SamplingPolicy> | null; // projects.settings.sampling
+}
+
+export interface ApiKeyCacheOptions {
+  ttl: number; // milliseconds for valid keys; 0 disables caching
+  negativeTtl: number; // milliseconds for unknown keys
+  maxEntries: number;
+  reconnectDelay: number; // milliseconds before re-subscribing after a LISTEN failure
+}
+
+export interface ApiKeyCacheStats {
+  size: number;
+  maxEntries: number;
+  hits: number;
+  negativeHits: number;
+  misses: number;
+  evictions: number;
+  invalidations: number;
+  hitRate: number;
+  listening: boolean;
+}
+
+interface CacheEntry {
+  project: CachedProject | null;
+  expiresAt: number;
+}
+
+export class ApiKeyCache {
+  private options: ApiKeyCacheOptions;
+  // Map iteration order doubles as LRU order: oldest entries come first
+  private entries = new Map<string, CacheEntry>();
+  // Lookups in flight. An invalidation removes the key's lookup, so a lookup
+  // that is no longer the pending one for its key knows its result is stale.
+  private pending = new Map<string, Promise<CachedProject | null>>();
+  private stopListening: (() => Promise<void>) | null = null;
+  private reconnectTimer: NodeJS.Timeout | null = null;
+  private stats = {
+    hits: 0,
+    negativeHits: 0,
+    misses: 0,
+    evictions: 0,
+    invalidations: 0
+  };
+
+  constructor(options: Partial<ApiKeyCacheOptions> = {}) {
+    this.options = {
+      ttl: 60000,
+      negativeTtl: 10000,
+      maxEntries: 10000,
+      reconnectDelay: 5000,
+      ...options
+    };
+  }
+
+  // Returns the cached project for a key, loading and caching it on a miss.
+  // Concurrent misses for the same key share one database lookup.
+  public async resolve(apiKey: string, loader: () => Promise<CachedProject | null>): Promise<CachedProject | null> {
+    if (this.options.ttl <= 0) {
+      return loader();
+    }
+
+    const entry = this.entries.get(apiKey);
+    if (entry && entry.expiresAt > Date.now()) {
+      // Refresh LRU position
+      this.entries.delete(apiKey);
+      this.entries.set(apiKey, entry);
+
+      if (entry.project) {
+        this.stats.hits++;
+      } else {
+        this.stats.negativeHits++;
+      }
+      return entry.project;
+    }
+
+    this.stats.misses++;
+
+    const inFlight = this.pending.get(apiKey);
+    if (inFlight) {
+      return inFlight;
+    }
+
+    const lookup: Promise<CachedProject | null> = loader()
+      .then(project => {
+        // The key was invalidated while loading; the caller still gets the
+        // result, but it may predate the change and is not cached
+        if (this.pending.get(apiKey) === lookup) {
+          this.set(apiKey, project);
+        }
+        return project;
+      })
+      .finally(() => {
+        if (this.pending.get(apiKey) === lookup) {
+          this.pending.delete(apiKey);
+        }
+      });
+
+    this.pending.set(apiKey, lookup);
+    return lookup;
+  }
+
+  public set(apiKey: string, project: CachedProject | null): void {
+    const ttl = project ? this.options.ttl : this.options.negativeTtl;
+
+    this.entries.delete(apiKey);
+    this.entries.set(apiKey, { project, expiresAt: Date.now() + ttl });
+
+    while (this.entries.size > this.options.maxEntries) {
+      const oldest = this.entries.keys().next().value;
+      if (oldest === undefined) break;
+      this.entries.delete(oldest);
+      this.stats.evictions++;
+    }
+  }
+
+  public invalidate(apiKey: string): void {
+    this.pending.delete(apiKey);
+    if (this.entries.delete(apiKey)) {
+      this.stats.invalidations++;
+    }
+  }
+
+  public clear(): void {
+    this.stats.invalidations += this.entries.size;
+    this.entries.clear();
+    this.pending.clear();
+  }
+
+  public getStats(): ApiKeyCacheStats {
+    const lookups = this.stats.hits + this.stats.negativeHits + this.stats.misses;
+
+    return {
+      size: this.entries.size,
+      maxEntries: this.options.maxEntries,
+      ...this.stats,
+      hitRate: lookups > 0 ? (this.stats.hits + this.stats.negativeHits) / lookups : 0,
+      listening: this.stopListening !== null
+    };
+  }
+
+  // Invalidates entries when projects change in this process (DatabaseManager
+  // events) or in any other replica (Postgres LISTEN/NOTIFY)
+  public attach(db: DatabaseManager): void {
+    db.on('apiKeyChanged', (apiKey: string) => this.invalidate(apiKey));
+    this.subscribe(db);
+  }
+
+  public async detach(): Promise<void> {
+    if (this.reconnectTimer) {
+      clearTimeout(this.reconnectTimer);
+      this.reconnectTimer = null;
+    }
+
+    if (this.stopListening) {
+      const stop = this.stopListening;
+      this.stopListening = null;
+      await stop().catch(() => undefined);
+    }
+  }
+
+  private subscribe(db: DatabaseManager): void {
+    db.listen(
+      API_KEY_INVALIDATION_CHANNEL,
+      (apiKey) => this.invalidate(apiKey),
+      (error) => {
+        console.error('API key invalidation listener lost:', error.message);
+        this.stopListening = null;
+        // Notifications may have been missed while disconnected
+        this.clear();
+        this.scheduleResubscribe(db);
+      }
+    )
+      .then(stop => {
+        this.stopListening = stop;
+      })
+      .catch(error => {
+        console.error('Failed to subscribe to API key invalidations:', error);
+        this.scheduleResubscribe(db);
+      });
+  }
+
+  private scheduleResubscribe(db: DatabaseManager): void {
+    if (this.reconnectTimer) return;
+
+    this.reconnectTimer = setTimeout(() => {
+      this.reconnectTimer = null;
+      this.subscribe(db);
+    }, this.options.reconnectDelay);
+    this.reconnectTimer.unref();
+  }
+}
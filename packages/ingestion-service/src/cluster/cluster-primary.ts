@@ -0,0 +1,137 @@
+// Cluster primary: forks HTTP workers, aggregates their health and
+// coordinates graceful shutdown
+import cluster, { Worker } from 'cluster';
+import os from 'os';
+import {
+  WORKER_HEALTH_MESSAGE,
+  CLUSTER_HEALTH_MESSAGE,
+  WorkerHealthReport,
+  ClusterHealthSnapshot
+} from './worker-health';
+
+export interface ClusterConfig {
+  workers: number; // 1 runs the server in a single process
+  healthInterval: number; // milliseconds between worker health reports
+  shutdownTimeout: number; // milliseconds each worker gets to drain
+  restartDelay: number; // milliseconds before replacing a crashed worker
+}
+
+// os.availableParallelism() needs Node 18.14; older 18.x releases count CPUs
+function availableCores(): number {
+  return typeof os.availableParallelism === 'function' ? os.availableParallelism() : os.cpus().length || 1;
+}
+
+export function loadClusterConfig(): ClusterConfig {
+  const requested = process.env.INGESTION_WORKERS || '1';
+
+  return {
+    // "auto" uses one worker per available core
+    workers: requested === 'auto' ? availableCores() : Math.max(parseInt(requested) || 1, 1),
+    healthInterval: parseInt(process.env.INGESTION_WORKER_HEALTH_INTERVAL || '5000'),
+    shutdownTimeout: parseInt(process.env.SHUTDOWN_TIMEOUT || '30000'),
+    restartDelay: parseInt(process.env.INGESTION_WORKER_RESTART_DELAY || '1000')
+  };
+}
+
+export function runClusterPrimary(config: ClusterConfig): void {
+  const reports = new Map<number, WorkerHealthReport>();
+  const restartTimers = new Set<NodeJS.Timeout>();
+  let shuttingDown = false;
+
+  const fork = () => {
+    // A restart scheduled before shutdown must not start a new worker
+    if (shuttingDown) return;
+    cluster.fork({ INGESTION_WORKER_HEALTH_INTERVAL: String(config.healthInterval) });
+  };
+
+  const snapshot = (): ClusterHealthSnapshot => {
+    const now = Date.now();
+    const staleAfter = config.healthInterval * 3;
+
+    return {
+      expectedWorkers: config.workers,
+      updatedAt: now,
+      workers: Array.from(reports.values())
+        .sort((a, b) => a.workerId - b.workerId)
+        .map(report => ({
+          ...report,
+          status: now - report.reportedAt > staleAfter ? 'stale' : 'healthy'
+        }))
+    };
+  };
+
+  const broadcast = () => {
+    const message = { type: CLUSTER_HEALTH_MESSAGE, snapshot: snapshot() };
+    for (const worker of Object.values(cluster.workers || {})) {
+      if (worker && worker.isConnected()) {
+        worker.send(message);
+      }
+    }
+  };
+
+  cluster.on('message', (worker: Worker, message: any) => {
+    if (message?.type === WORKER_HEALTH_MESSAGE) {
+      reports.set(worker.id, message.report as WorkerHealthReport);
+      broadcast();
+    }
+  });
+
+  cluster.on('exit', (worker: Worker, code: number, signal: string) => {
+    reports.delete(worker.id);
+
+    if (shuttingDown) {
+      if (Object.keys(cluster.workers || {}).length === 0) {
+        console.log('All ingestion workers stopped');
+        process.exit(0);
+      }
+      return;
+    }
+
+    console.error(`Ingestion worker ${worker.process.pid} exited (${signal || code}), restarting`);
+    const restartTimer = setTimeout(() => {
+      restartTimers.delete(restartTimer);
+      fork();
+    }, config.restartDelay);
+    restartTimers.add(restartTimer);
+  });
+
+  // Forward the signal to every worker; each runs the same graceful shutdown
+  // as single-process mode (drain HTTP, queue, then close connections)
+  const shutdown = (signal: NodeJS.Signals) => {
+    if (shuttingDown) return;
+    shuttingDown = true;
+
+    for (const restartTimer of restartTimers) {
+      clearTimeout(restartTimer);
+    }
+    restartTimers.clear();
+
+    const workers = Object.keys(cluster.workers || {}).length;
+    if (workers === 0) {
+      // Every worker had crashed and was waiting to be replaced
+      console.log('No ingestion workers running');
+      process.exit(0);
+    }
+    console.log(`${signal} received, stopping ${workers} ingestion workers`);
+
+    for (const worker of Object.values(cluster.workers || {})) {
+      worker?.process.kill(signal);
+    }
+
+    setTimeout(() => {
+      console.error('Ingestion workers did not stop before shutdown timeout');
+      for (const worker of Object.values(cluster.workers || {})) {
+        worker?.process.kill('SIGKILL');
+      }
+      process.exit(1);
+    }, config.shutdownTimeout + 5000).unref(); // workers enforce their own timeout first
+  };
+
+  process.on('SIGTERM', () => shutdown('SIGTERM'));
+  process.on('SIGINT', () => shutdown('SIGINT'));
+
+  console.log(`TraceLens Ingestion Service primary ${process.pid} starting ${config.workers} workers`);
+  for (let i = 0; i < config.workers; i++) {
+    fork();
+  }
+}
@@ -0,0 +1,103 @@
+// Per-worker health reporting for multi-core (cluster) mode
+import cluster from 'cluster';
+import { monitorEventLoopDelay } from 'perf_hooks';
+import { Request, Response, NextFunction } from 'express';
+
+export const WORKER_HEALTH_MESSAGE = 'tracelens:worker-health';
+export const CLUSTER_HEALTH_MESSAGE = 'tracelens:cluster-health';
+
+export interface WorkerHealthReport {
+  workerId: number;
+  pid: number;
+  uptime: number;
+  memory: { rss: number; heapUsed: number };
+  eventLoopDelay: { mean: number; p99: number }; // milliseconds
+  requests: { total: number; active: number };
+  reportedAt: number;
+}
+
+export interface ClusterWorkerHealth extends WorkerHealthReport {
+  status: 'healthy' | 'stale';
+}
+
+export interface ClusterHealthSnapshot {
+  workers: ClusterWorkerHealth[];
+  expectedWorkers: number;
+  updatedAt: number;
+}
+
+const eventLoopDelay = monitorEventLoopDelay({ resolution: 20 });
+const requestCounters = { total: 0, active: 0 };
+let latestClusterHealth: ClusterHealthSnapshot | null = null;
+let reportTimer: NodeJS.Timeout | null = null;
+
+// Counts requests handled by this worker
+export function trackWorkerRequests(req: Request, res: Response, next: NextFunction): void {
+  requestCounters.total++;
+  requestCounters.active++;
+
+  let finished = false;
+  const done = () => {
+    if (finished) return;
+    finished = true;
+    requestCounters.active--;
+  };
+  res.on('finish', done);
+  res.on('close', done);
+
+  next();
+}
+
+export function collectWorkerHealth(): WorkerHealthReport {
+  const memory = process.memoryUsage();
+
+  return {
+    workerId: cluster.worker?.id ?? 0,
+    pid: process.pid,
+    uptime: process.uptime(),
+    memory: { rss: memory.rss, heapUsed: memory.heapUsed },
+    eventLoopDelay: {
+      mean: Math.round(eventLoopDelay.mean / 10000) / 100,
+      p99: Math.round(eventLoopDelay.percentile(99) / 10000) / 100
+    },
+    requests: { ...requestCounters },
+    reportedAt: Date.now()
+  };
+}
+
+// Sends this worker's health to the primary and keeps the cluster-wide
+// snapshot the primary broadcasts back. No-op outside cluster mode.
+export function startWorkerHealthReporting(intervalMs: number): void {
+  if (!cluster.isWorker || reportTimer) return;
+
+  eventLoopDelay.enable();
+
+  process.on('message', (message: any) => {
+    if (message?.type === CLUSTER_HEALTH_MESSAGE) {
+      latestClusterHealth = message.snapshot as ClusterHealthSnapshot;
+    }
+  });
+
+  const report = () => {
+    if (!process.connected) return;
+    process.send?.({ type: WORKER_HEALTH_MESSAGE, report: collectWorkerHealth() });
+    eventLoopDelay.reset();
+  };
+
+  report();
+  reportTimer = setInterval(report, intervalMs);
+  reportTimer.unref();
+}
+
+export function stopWorkerHealthReporting(): void {
+  if (reportTimer) {
+    clearInterval(reportTimer);
+    reportTimer = null;
+  }
+  eventLoopDelay.disable();
+}
+
+// Latest cluster-wide view, or null when running as a single process
+export function getClusterHealth(): ClusterHealthSnapshot | null {
+  return cluster.isWorker ? latestClusterHealth : null;
+}
@@ -0,0 +1,38 @@
+// Opaque keyset pagination cursors
+//
+// A cursor is the (time, id) sort key of the last row on a page, encoded as
+// base64url so clients treat it as an opaque token.
+
+export interface KeysetCursor {
+  time: number;
+  id: string;
+}
+
+export interface KeysetPage<T> {
+  items: T[];
+  nextCursor: KeysetCursor | null;
+}
+
+export function encodeCursor(cursor: KeysetCursor): string {
+  return Buffer.from(`${cursor.time}:${cursor.id}`, 'utf8').toString('base64url');
+}
+
+// Returns null for anything that is not a cursor produced by encodeCursor
+export function decodeCursor(token: unknown): KeysetCursor | null {
+  if (typeof token !== 'string' || token.length === 0 || token.length > 512) {
+    return null;
+  }
+
+  const decoded = Buffer.from(token, 'base64url').toString('utf8');
+  const separator = decoded.indexOf(':');
+  if (separator <= 0 || separator === decoded.length - 1) {
+    return null;
+  }
+
+  const time = Number(decoded.slice(0, separator));
+  if (!Number.isSafeInteger(time)) {
+    return null;
+  }
+
+  return { time, id: decoded.slice(separator + 1) };
+}
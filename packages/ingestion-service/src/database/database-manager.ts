@@ -1,6 +1,17 @@
 // Database connection and query utilities
+import { EventEmitter } from 'events';
 import { Pool, PoolClient, QueryResult } from 'pg';
 import { PerformanceEvent, Trace, TraceSpan, DependencySnapshot, CVERecord } from '@tracelens/shared';
+import { KeysetCursor, KeysetPage } from './cursor';
+import { LatencySketch } from '../sketches/latency-sketch';
+import {
+  SketchResolution,
+  SketchRetention,
+  DEFAULT_SKETCH_RETENTION,
+  planSketchRanges,
+  retainedSince
+} from '../sketches/sketch-buckets';
+import type { CachedProject } from '../cache/api-key-cache';
 
 export interface DatabaseConfig {
   host: string;
@@ -14,10 +25,55 @@ export interface DatabaseConfig {
   connectionTimeoutMillis?: number;
 }
 
-export class DatabaseManager {
+export interface TraceSummary {
+  traceId: string;
+  startTime: number;
+  endTime?: number;
+  duration?: number;
+  rootSpanId?: string;
+  spanCount: number;
+  version: number;
+}
+
+export interface TraceVersion {
+  traceId: string;
+  version: number;
+}
+
+export interface EventQueryOptions {
+  eventType?: string;
+  limit?: number;
+  cursor?: KeysetCursor | null;
+  from?: number;
+  to?: number;
+}
+
+export interface LatencySketchRow {
+  projectId: string;
+  operationName: string;
+  resolution: SketchResolution;
+  bucketStart: number; // epoch milliseconds
+  spanCount: number;
+  sketch: Buffer;
+}
+
+// Rows per multi-row INSERT; keeps the widest table (spans, 12 columns) far
+// below PostgreSQL's limit of 65535 bind parameters per statement
+const MAX_ROWS_PER_STATEMENT = 1000;
+
+// NOTIFY channel carrying API keys whose project mapping changed, so every
+// ingestion replica can drop its cached lookup
+export const API_KEY_INVALIDATION_CHANNEL = 'tracelens_api_key_invalidation';
+
+// NOTIFY channel carrying {projectId, traceId, version} JSON for traces an
+// upsert changed, so caches of their analyses can be dropped
+export const TRACE_UPDATE_CHANNEL = 'tracelens_trace_updated';
+
+export class DatabaseManager extends EventEmitter {
   private pool: Pool;
 
   constructor(config: DatabaseConfig) {
+    super();
     this.pool = new Pool({
       host: config.host,
       port: config.port,
@@ -77,6 +133,50 @@ export class DatabaseManager {
     await this.pool.end();
   }
 
+  // Holds a dedicated connection subscribed to a NOTIFY channel. Resolves to an
+  // unsubscribe function; onError fires once if the connection is lost.
+  public async listen(
+    channel: string,
+    onNotification: (payload: string) => void,
+    onError: (error: Error) => void
+  ): Promise<() => Promise<void>> {
+    const client = await this.pool.connect();
+    let released = false;
+
+    const release = (error?: Error) => {
+      if (released) return;
+      released = true;
+      client.removeAllListeners('notification');
+      client.removeAllListeners('error');
+      client.release(error);
+    };
+
+    client.on('notification', (message) => {
+      if (message.channel === channel && message.payload) {
+        onNotification(message.payload);
+      }
+    });
+
+    client.on('error', (error: Error) => {
+      release(error);
+      onError(error);
+    });
+
+    try {
+      // Channel names are identifiers and cannot be bound as parameters
+      await client.query(`LISTEN ${client.escapeIdentifier(channel)}`);
+    } catch (error) {
+      release(error as Error);
+      throw error;
+    }
+
+    return async () => {
+      if (released) return;
+      await client.query(`UNLISTEN ${client.escapeIdentifier(channel)}`).catch(() => undefined);
+      release();
+    };
+  }
+
   // Health check
   public async isHealthy(): Promise<boolean> {
     try {
@@ -88,11 +188,20 @@ export class DatabaseManager {
   }
 
   // Project management
-  public async createProject(name: string, apiKey: string, options?: { deletable?: boolean; immutable?: boolean }): Promise<string> {
+  // retentionDays must be one of retention_tiers; the tier is fixed for the
+  // project's lifetime, as rows already written keep the tier they were
+  // partitioned under
+  public async createProject(
+    name: string,
+    apiKey: string,
+    options?: { deletable?: boolean; immutable?: boolean; retentionDays?: number }
+  ): Promise<string> {
     const result = await this.query(
-      'INSERT INTO projects (name, api_key, deletable, immutable) VALUES ($1, $2, $3, $4) RETURNING id',
-      [name, apiKey, options?.deletable !== false, options?.immutable === true]
+      'INSERT INTO projects (name, api_key, deletable, immutable, retention_days) VALUES ($1, $2, $3, $4, $5) RETURNING id',
+      [name, apiKey, options?.deletable !== false, options?.immutable === true, options?.retentionDays ?? 30]
     );
+    // Clears any negatively cached lookup for the new key
+    await this.notifyApiKeyChanged(apiKey);
     return result.rows[0].id;
   }
 
@@ -130,16 +239,35 @@ export class DatabaseManager {
     }
 
     const result = await this.query(
-      'DELETE FROM projects WHERE id = $1 AND deletable = true',
+      'DELETE FROM projects WHERE id = $1 AND deletable = true RETURNING api_key',
       [projectId]
     );
 
+    for (const row of result.rows) {
+      await this.notifyApiKeyChanged(row.api_key);
+    }
+
     return (result.rowCount ?? 0) > 0;
   }
 
-  public async getProjectByApiKey(apiKey: string): Promise<{ id: string; name: string } | null> {
+  // Invalidates cached lookups for an API key in this process and, through
+  // NOTIFY, in every other process listening on the invalidation channel
+  private async notifyApiKeyChanged(apiKey: string): Promise<void> {
+    this.emit('apiKeyChanged', apiKey);
+
+    try {
+      await this.query('SELECT pg_notify($1, $2)', [API_KEY_INVALIDATION_CHANNEL, apiKey]);
+    } catch (error) {
+      // Other replicas fall back to their cache TTL
+      console.error('Failed to publish API key invalidation:', error);
+    }
+  }
+
+  // Served through ApiKeyCache; a trigger on projects (schema.sql) announces
+  // changes to the key, name or sampling settings made outside this service
+  public async getProjectByApiKey(apiKey: string): Promise<CachedProject | null> {
     const result = await this.query(
-      'SELECT id, name FROM projects WHERE api_key = $1',
+      "SELECT id, name, settings->'sampling' AS sampling FROM projects WHERE api_key = $1",
       [apiKey]
     );
     return result.rows[0] || null;
@@ -149,74 +277,120 @@ export class DatabaseManager {
   public async insertPerformanceEvent(projectId: string, event: PerformanceEvent): Promise<void> {
     await this.query(
       `INSERT INTO performance_events 
-       (project_id, event_id, event_type, timestamp, url, user_agent, data) 
-       VALUES ($1, $2, $3, $4, $5, $6, $7)
-       ON CONFLICT (project_id, event_id) DO UPDATE SET
-       timestamp = EXCLUDED.timestamp,
-       data = EXCLUDED.data`,
-      [projectId, event.id, event.type, event.timestamp, event.url, event.userAgent, JSON.stringify(event.data)]
+       (project_id, event_id, event_type, timestamp, url, user_agent, data, sample_weight, retention_days) 
+       VALUES ($1, $2, $3, $4, $5, $6, $7, $8, (SELECT retention_days FROM projects WHERE id = $1))
+       ON CONFLICT (project_id, event_id, retention_days, timestamp) DO UPDATE SET
+       data = EXCLUDED.data,
+       sample_weight = EXCLUDED.sample_weight`,
+      [projectId, event.id, event.type, event.timestamp, event.url, event.userAgent, JSON.stringify(event.data), event.sampleWeight ?? 1]
     );
   }
 
   public async insertPerformanceEventBatch(projectId: string, events: PerformanceEvent[]): Promise<void> {
     if (events.length === 0) return;
 
-    const values = events.map((event, index) => {
-      const baseIndex = index * 6;
-      return `($${baseIndex + 1}, $${baseIndex + 2}, $${baseIndex + 3}, $${baseIndex + 4}, $${baseIndex + 5}, $${baseIndex + 6}, $${baseIndex + 7})`;
-    }).join(', ');
+    // A single statement cannot upsert the same row twice, so keep the last
+    // occurrence of each event ID (same outcome as inserting them one by one)
+    const uniqueEvents = Array.from(new Map(events.map(event => [event.id, event])).values());
 
-    const params = events.flatMap(event => [
-      projectId, event.id, event.type, event.timestamp, event.url, event.userAgent, JSON.stringify(event.data)
-    ]);
+    await this.transaction(async (client) => {
+      const retentionDays = await this.getRetentionDays(client, projectId);
 
-    await this.query(
-      `INSERT INTO performance_events 
-       (project_id, event_id, event_type, timestamp, url, user_agent, data) 
-       VALUES ${values}
-       ON CONFLICT (project_id, event_id) DO UPDATE SET
-       timestamp = EXCLUDED.timestamp,
-       data = EXCLUDED.data`,
-      params
-    );
+      for (const chunk of this.chunk(uniqueEvents, MAX_ROWS_PER_STATEMENT)) {
+        await client.query(
+          `INSERT INTO performance_events 
+           (project_id, event_id, event_type, timestamp, url, user_agent, data, sample_weight, retention_days) 
+           VALUES ${this.buildValuesPlaceholders(chunk.length, 9)}
+           ON CONFLICT (project_id, event_id, retention_days, timestamp) DO UPDATE SET
+           data = EXCLUDED.data,
+           sample_weight = EXCLUDED.sample_weight`,
+          chunk.flatMap(event => [
+            projectId, event.id, event.type, event.timestamp, event.url, event.userAgent, JSON.stringify(event.data),
+            event.sampleWeight ?? 1, retentionDays
+          ])
+        );
+      }
+    });
   }
 
   // Traces and spans
   public async insertTrace(projectId: string, trace: Trace): Promise<void> {
-    await this.transaction(async (client) => {
-      // Insert trace
-      await client.query(
-        `INSERT INTO traces 
-         (project_id, trace_id, start_time, end_time, duration, root_span_id, span_count) 
-         VALUES ($1, $2, $3, $4, $5, $6, $7)
-         ON CONFLICT (trace_id) DO UPDATE SET
-         end_time = EXCLUDED.end_time,
-         duration = EXCLUDED.duration,
-         span_count = EXCLUDED.span_count`,
-        [
-          projectId, 
-          trace.traceId, 
-          trace.startTime, 
-          trace.endTime, 
-          trace.duration, 
-          trace.rootSpan?.spanId,
-          trace.spans.length
-        ]
-      );
+    await this.insertTraceBatch(projectId, [trace]);
+  }
 
-      // Insert spans
+  // Writes every trace and span of a request in one transaction using
+  // multi-row upserts instead of one round trip per span.
+  //
+  // A trace's spans may arrive split across requests (and, with a Redis
+  // queue, the same batch may be written twice), so a trace row only ever
+  // widens: it keeps the earliest start, the latest end and the first root
+  // span seen, and its span count grows by the spans actually inserted.
+  public async insertTraceBatch(projectId: string, traces: Trace[]): Promise<void> {
+    if (traces.length === 0) return;
+
+    // Fragments of one trace are merged; for a repeated span the later
+    // occurrence wins, matching the previous span-by-span behaviour
+    const uniqueTraces = new Map<string, Trace>();
+    const uniqueSpans = new Map<string, TraceSpan>();
+    for (const trace of traces) {
+      const existing = uniqueTraces.get(trace.traceId);
+      uniqueTraces.set(trace.traceId, existing ? this.mergeTraceFragments(existing, trace) : trace);
       for (const span of trace.spans) {
-        await client.query(
+        uniqueSpans.set(`${span.traceId}:${span.spanId}`, span);
+      }
+    }
+
+    const updatedTraces: TraceVersion[] = [];
+
+    await this.transaction(async (client) => {
+      const retentionDays = await this.getRetentionDays(client, projectId);
+
+      for (const chunk of this.chunk(Array.from(uniqueTraces.values()), MAX_ROWS_PER_STATEMENT)) {
+        const result = await client.query(
+          `INSERT INTO traces 
+           (project_id, trace_id, start_time, end_time, duration, root_span_id) 
+           VALUES ${this.buildValuesPlaceholders(chunk.length, 6)}
+           ON CONFLICT (trace_id) DO UPDATE SET
+           start_time = LEAST(traces.start_time, EXCLUDED.start_time),
+           end_time = GREATEST(traces.end_time, EXCLUDED.end_time),
+           duration = GREATEST(traces.end_time, EXCLUDED.end_time) - LEAST(traces.start_time, EXCLUDED.start_time),
+           root_span_id = COALESCE(traces.root_span_id, EXCLUDED.root_span_id),
+           version = traces.version + 1
+           RETURNING trace_id, version`,
+          chunk.flatMap(trace => [
+            projectId,
+            trace.traceId,
+            trace.startTime,
+            trace.endTime,
+            trace.duration,
+            trace.rootSpan?.spanId
+          ])
+        );
+
+        // Freshly inserted rows are at version 1
+        for (const row of result.rows) {
+          if (row.version > 1) {
+            updatedTraces.push({ traceId: row.trace_id, version: row.version });
+          }
+        }
+      }
+
+      // xmax is zero only for rows this statement inserted, so spans already
+      // stored by an earlier (or redelivered) batch are not counted again
+      const insertedSpans = new Map<string, number>();
+      for (const chunk of this.chunk(Array.from(uniqueSpans.values()), MAX_ROWS_PER_STATEMENT)) {
+        const result = await client.query(
           `INSERT INTO spans 
-           (project_id, trace_id, span_id, parent_span_id, operation_name, start_time, end_time, duration, tags, logs, status) 
-           VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11)
-           ON CONFLICT (trace_id, span_id) DO UPDATE SET
+           (project_id, trace_id, span_id, parent_span_id, operation_name, start_time, end_time, duration, tags, logs, status, retention_days) 
+           VALUES ${this.buildValuesPlaceholders(chunk.length, 12)}
+           ON CONFLICT (trace_id, span_id, retention_days, start_time) DO UPDATE SET
            end_time = EXCLUDED.end_time,
            duration = EXCLUDED.duration,
            tags = EXCLUDED.tags,
            logs = EXCLUDED.logs,
-           status = EXCLUDED.status`,
-          [
+           status = EXCLUDED.status
+           RETURNING trace_id, (xmax = 0) AS inserted`,
+          chunk.flatMap(span => [
             projectId,
             span.traceId,
             span.spanId,
@@ -227,11 +401,51 @@ export class DatabaseManager {
             span.duration,
             JSON.stringify(span.tags || {}),
             span.logs ? JSON.stringify(span.logs) : null,
-            span.status
-          ]
+            span.status,
+            retentionDays
+          ])
+        );
+
+        for (const row of result.rows) {
+          if (row.inserted) {
+            insertedSpans.set(row.trace_id, (insertedSpans.get(row.trace_id) ?? 0) + 1);
+          }
+        }
+      }
+
+      for (const chunk of this.chunk(Array.from(insertedSpans), MAX_ROWS_PER_STATEMENT)) {
+        await client.query(
+          `UPDATE traces SET span_count = traces.span_count + added.count::integer
+           FROM (VALUES ${this.buildValuesPlaceholders(chunk.length, 2)}) AS added (trace_id, count)
+           WHERE traces.trace_id = added.trace_id`,
+          chunk.flat()
         );
       }
     });
+
+    // Committed spans feed derived aggregates such as latency sketches
+    this.emit('spansWritten', projectId, Array.from(uniqueSpans.values()));
+
+    if (updatedTraces.length > 0) {
+      await this.notifyTracesUpdated(projectId, updatedTraces);
+    }
+  }
+
+  // Announces changed traces in this process and, through NOTIFY, to every
+  // process caching analyses of them
+  private async notifyTracesUpdated(projectId: string, traces: TraceVersion[]): Promise<void> {
+    this.emit('tracesUpdated', projectId, traces);
+
+    try {
+      await this.query(
+        'SELECT pg_notify($1, payload) FROM unnest($2::text[]) AS payload',
+        [TRACE_UPDATE_CHANNEL, traces.map(trace => JSON.stringify({ projectId, ...trace }))]
+      );
+    } catch (error) {
+      // Cached analyses are keyed by version, so readers that fetch the
+      // current version still miss stale entries
+      console.error('Failed to publish trace updates:', error);
+    }
   }
 
   // Dependencies
@@ -259,31 +473,55 @@ export class DatabaseManager {
 
   // CVE records
   public async insertCVERecord(cve: any): Promise<void> {
-    await this.query(
-      `INSERT INTO cve_records 
-       (cve_id, published_date, modified_date, severity, score, vector_string, description, affected_packages, references) 
-       VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)
-       ON CONFLICT (cve_id) DO UPDATE SET
-       modified_date = EXCLUDED.modified_date,
-       severity = EXCLUDED.severity,
-       score = EXCLUDED.score,
-       vector_string = EXCLUDED.vector_string,
-       description = EXCLUDED.description,
-       affected_packages = EXCLUDED.affected_packages,
-       references = EXCLUDED.references,
-       updated_at = NOW()`,
-      [
-        cve.id,
-        cve.published,
-        cve.modified,
-        cve.severity,
-        cve.score,
-        cve.vectorString,
-        cve.descriptions?.[0]?.value || cve.description,
-        JSON.stringify(cve.affectedPackages || []),
-        JSON.stringify(cve.references || [])
-      ]
-    );
+    await this.upsertCVERecords([cve]);
+  }
+
+  // One multi-row upsert per chunk. A record never replaces a newer
+  // modification of the same CVE, so deltas may arrive out of order.
+  public async upsertCVERecords(cves: any[]): Promise<void> {
+    if (cves.length === 0) return;
+
+    // A single statement cannot upsert the same row twice; keep the latest
+    const uniqueCVEs = new Map<string, any>();
+    for (const cve of cves) {
+      const existing = uniqueCVEs.get(cve.id);
+      if (!existing || existing.modified < cve.modified) {
+        uniqueCVEs.set(cve.id, cve);
+      }
+    }
+
+    await this.transaction(async (client) => {
+      for (const chunk of this.chunk(Array.from(uniqueCVEs.values()), MAX_ROWS_PER_STATEMENT)) {
+        await client.query(
+          `INSERT INTO cve_records 
+           (cve_id, published_date, modified_date, severity, score, vector_string, description, affected_packages, references) 
+           VALUES ${this.buildValuesPlaceholders(chunk.length, 9)}
+           ON CONFLICT (cve_id) DO UPDATE SET
+           modified_date = EXCLUDED.modified_date,
+           severity = EXCLUDED.severity,
+           score = EXCLUDED.score,
+           vector_string = EXCLUDED.vector_string,
+           description = EXCLUDED.description,
+           affected_packages = EXCLUDED.affected_packages,
+           references = EXCLUDED.references,
+           updated_at = NOW()
+           WHERE cve_records.modified_date IS NULL
+              OR EXCLUDED.modified_date IS NULL
+              OR cve_records.modified_date <= EXCLUDED.modified_date`,
+          chunk.flatMap(cve => [
+            cve.id,
+            cve.published,
+            cve.modified,
+            cve.severity,
+            cve.score,
+            cve.vectorString,
+            cve.descriptions?.[0]?.value || cve.description,
+            JSON.stringify(cve.affectedPackages || []),
+            JSON.stringify(cve.references || [])
+          ])
+        );
+      }
+    });
   }
 
   // Query methods
@@ -306,6 +544,9 @@ export class DatabaseManager {
        ) as spans
        FROM traces t
        LEFT JOIN spans s ON t.trace_id = s.trace_id
+         -- A trace starts with its earliest span, so older partitions are pruned
+         AND s.project_id = t.project_id
+         AND s.start_time >= t.start_time
        WHERE t.project_id = $1
        GROUP BY t.id, t.trace_id, t.start_time, t.end_time, t.duration, t.root_span_id, t.span_count
        ORDER BY t.start_time DESC
@@ -323,35 +564,327 @@ export class DatabaseManager {
     }));
   }
 
+  // Trace list without spans, newest first, paged on (start_time, trace_id).
+  // Reads only the traces table; spans load per trace via getSpansByTrace.
+  public async getTraceSummariesByProject(
+    projectId: string,
+    limit: number = 100,
+    cursor: KeysetCursor | null = null
+  ): Promise<KeysetPage<TraceSummary>> {
+    const params: any[] = [projectId];
+    let cursorCondition = '';
+
+    if (cursor) {
+      params.push(cursor.time, cursor.id);
+      cursorCondition = 'AND (start_time, trace_id) < ($2, $3)';
+    }
+
+    // One extra row tells whether another page exists
+    params.push(limit + 1);
+
+    const result = await this.query(
+      `SELECT trace_id, start_time, end_time, duration, root_span_id, span_count, version
+       FROM traces
+       WHERE project_id = $1 ${cursorCondition}
+       ORDER BY start_time DESC, trace_id DESC
+       LIMIT $${params.length}`,
+      params
+    );
+
+    const rows = result.rows.slice(0, limit);
+    const last = rows[rows.length - 1];
+
+    return {
+      items: rows.map(row => ({
+        traceId: row.trace_id,
+        startTime: Number(row.start_time),
+        endTime: row.end_time !== null ? Number(row.end_time) : undefined,
+        duration: row.duration !== null ? Number(row.duration) : undefined,
+        rootSpanId: row.root_span_id ?? undefined,
+        spanCount: row.span_count,
+        version: row.version
+      })),
+      nextCursor: result.rows.length > limit && last
+        ? { time: Number(last.start_time), id: last.trace_id }
+        : null
+    };
+  }
+
+  // Spans of one trace with the trace's version, or null if the trace does
+  // not belong to the project
+  public async getSpansByTrace(
+    projectId: string,
+    traceId: string
+  ): Promise<{ version: number; spans: TraceSpan[] } | null> {
+    const result = await this.query(
+      `SELECT t.version, s.trace_id, s.span_id, s.parent_span_id, s.operation_name, s.start_time,
+              s.end_time, s.duration, s.tags, s.logs, s.status
+       FROM traces t
+       LEFT JOIN spans s ON s.trace_id = t.trace_id
+         AND s.project_id = t.project_id
+         AND s.start_time >= t.start_time
+       WHERE t.project_id = $1 AND t.trace_id = $2
+       ORDER BY s.start_time`,
+      [projectId, traceId]
+    );
+
+    if (result.rows.length === 0) {
+      return null;
+    }
+
+    const spans = result.rows
+      .filter(row => row.span_id !== null)
+      .map(row => ({
+        traceId: row.trace_id,
+        spanId: row.span_id,
+        parentSpanId: row.parent_span_id ?? undefined,
+        operationName: row.operation_name,
+        startTime: Number(row.start_time),
+        endTime: row.end_time !== null ? Number(row.end_time) : undefined,
+        duration: row.duration !== null ? Number(row.duration) : undefined,
+        tags: row.tags,
+        logs: row.logs ?? undefined,
+        status: row.status
+      }));
+
+    return { version: result.rows[0].version, spans };
+  }
+
   public async getPerformanceEventsByProject(
     projectId: string, 
     eventType?: string, 
     limit: number = 100, 
-    offset: number = 0
+    offset: number = 0,
+    timeRange: { from?: number; to?: number } = {}
   ): Promise<PerformanceEvent[]> {
-    const whereClause = eventType 
-      ? 'WHERE project_id = $1 AND event_type = $2'
-      : 'WHERE project_id = $1';
-    
-    const params = eventType ? [projectId, eventType, limit, offset] : [projectId, limit, offset];
-    const limitOffset = eventType ? '$3 OFFSET $4' : '$2 OFFSET $3';
+    const { conditions, params } = this.buildEventFilters(projectId, { eventType, ...timeRange });
+    params.push(limit, offset);
 
     const result = await this.query(
-      `SELECT event_id, event_type, timestamp, url, user_agent, data
+      `SELECT event_id, event_type, timestamp, url, user_agent, data, sample_weight
        FROM performance_events
-       ${whereClause}
+       WHERE ${conditions.join(' AND ')}
        ORDER BY timestamp DESC
-       LIMIT ${limitOffset}`,
+       LIMIT $${params.length - 1} OFFSET $${params.length}`,
       params
     );
 
-    return result.rows.map(row => ({
+    return result.rows.map(row => this.mapEventRow(row));
+  }
+
+  // Keyset-paged variant of getPerformanceEventsByProject on (timestamp, event_id)
+  public async getPerformanceEventsPage(
+    projectId: string,
+    options: EventQueryOptions = {}
+  ): Promise<KeysetPage<PerformanceEvent>> {
+    const limit = options.limit ?? 100;
+    const { conditions, params } = this.buildEventFilters(projectId, options);
+
+    if (options.cursor) {
+      params.push(options.cursor.time, options.cursor.id);
+      conditions.push(`(timestamp, event_id) < ($${params.length - 1}, $${params.length})`);
+    }
+
+    params.push(limit + 1);
+
+    const result = await this.query(
+      `SELECT event_id, event_type, timestamp, url, user_agent, data, sample_weight
+       FROM performance_events
+       WHERE ${conditions.join(' AND ')}
+       ORDER BY timestamp DESC, event_id DESC
+       LIMIT $${params.length}`,
+      params
+    );
+
+    const rows = result.rows.slice(0, limit);
+    const last = rows[rows.length - 1];
+
+    return {
+      items: rows.map(row => this.mapEventRow(row)),
+      nextCursor: result.rows.length > limit && last
+        ? { time: Number(last.timestamp), id: last.event_id }
+        : null
+    };
+  }
+
+  private buildEventFilters(
+    projectId: string,
+    options: { eventType?: string | undefined; from?: number | undefined; to?: number | undefined }
+  ): { conditions: string[]; params: any[] } {
+    const conditions = ['project_id = $1'];
+    const params: any[] = [projectId];
+
+    if (options.eventType) {
+      params.push(options.eventType);
+      conditions.push(`event_type = $${params.length}`);
+    }
+
+    // Timestamp bounds let the planner skip partitions outside the window
+    if (options.from !== undefined) {
+      params.push(options.from);
+      conditions.push(`timestamp >= $${params.length}`);
+    }
+    if (options.to !== undefined) {
+      params.push(options.to);
+      conditions.push(`timestamp < $${params.length}`);
+    }
+
+    return { conditions, params };
+  }
+
+  private mapEventRow(row: any): PerformanceEvent {
+    return {
       id: row.event_id,
       type: row.event_type,
       timestamp: row.timestamp,
       url: row.url,
       userAgent: row.user_agent,
-      data: row.data
-    }));
+      data: row.data,
+      sampleWeight: row.sample_weight
+    };
+  }
+
+  // Retention and partition maintenance
+  // Creates upcoming spans/performance_events partitions, drops expired ones
+  // and deletes traces past their project's retention
+  public async maintainPartitions(daysAhead: number = 7): Promise<{ created: number; dropped: number; expiredTraces: number }> {
+    const result = await this.query('SELECT created, dropped, expired_traces FROM maintain_partitions($1)', [daysAhead]);
+    return {
+      created: result.rows[0]?.created ?? 0,
+      dropped: result.rows[0]?.dropped ?? 0,
+      expiredTraces: result.rows[0]?.expired_traces ?? 0
+    };
+  }
+
+  // Latency sketches. Each writer replaces only its own row per bucket.
+  public async upsertLatencySketches(writerId: string, rows: LatencySketchRow[]): Promise<void> {
+    for (const chunk of this.chunk(rows, MAX_ROWS_PER_STATEMENT)) {
+      await this.query(
+        `INSERT INTO latency_sketches
+         (project_id, operation_name, resolution, bucket_start, writer_id, span_count, sketch)
+         VALUES ${this.buildValuesPlaceholders(chunk.length, 7)}
+         ON CONFLICT (project_id, operation_name, resolution, bucket_start, writer_id) DO UPDATE SET
+         span_count = EXCLUDED.span_count,
+         sketch = EXCLUDED.sketch,
+         updated_at = NOW()`,
+        chunk.flatMap(row => [
+          row.projectId,
+          row.operationName,
+          row.resolution,
+          row.bucketStart,
+          writerId,
+          row.spanCount,
+          row.sketch
+        ])
+      );
+    }
+  }
+
+  // Merged sketch per operation over [from, to) (epoch milliseconds), built
+  // from day, hour and minute buckets so long ranges read few rows. Edges
+  // past the retention of finer buckets are read from whole coarser ones.
+  public async getLatencySketches(
+    projectId: string,
+    from: number,
+    to: number,
+    operationName?: string,
+    retention: SketchRetention = DEFAULT_SKETCH_RETENTION
+  ): Promise<Map<string, LatencySketch>> {
+    const sketches = new Map<string, LatencySketch>();
+    const ranges = planSketchRanges(from, to, retainedSince(retention));
+    if (ranges.length === 0) return sketches;
+
+    const params: any[] = [projectId];
+    const rangeConditions = ranges.map(range => {
+      params.push(range.resolution, range.from, range.to);
+      const base = params.length - 2;
+      return `(resolution = $${base} AND bucket_start >= $${base + 1} AND bucket_start < $${base + 2})`;
+    });
+
+    let operationCondition = '';
+    if (operationName) {
+      params.push(operationName);
+      operationCondition = ` AND operation_name = $${params.length}`;
+    }
+
+    const result = await this.query(
+      `SELECT operation_name, sketch FROM latency_sketches
+       WHERE project_id = $1${operationCondition} AND (${rangeConditions.join(' OR ')})`,
+      params
+    );
+
+    for (const row of result.rows) {
+      const sketch = LatencySketch.deserialize(row.sketch);
+      const existing = sketches.get(row.operation_name);
+      if (existing) {
+        existing.merge(sketch);
+      } else {
+        sketches.set(row.operation_name, sketch);
+      }
+    }
+
+    return sketches;
+  }
+
+  // Drops sketch buckets older than the per-resolution retention (days)
+  public async pruneLatencySketches(retentionDays: SketchRetention): Promise<number> {
+    const now = Date.now();
+    const result = await this.query(
+      `DELETE FROM latency_sketches
+       WHERE (resolution = 'minute' AND bucket_start < $1)
+          OR (resolution = 'hour' AND bucket_start < $2)
+          OR (resolution = 'day' AND bucket_start < $3)`,
+      [
+        now - retentionDays.minute * 86400000,
+        now - retentionDays.hour * 86400000,
+        now - retentionDays.day * 86400000
+      ]
+    );
+    return result.rowCount ?? 0;
+  }
+
+  // Widens a trace to cover both fragments; the first root span found wins
+  private mergeTraceFragments(a: Trace, b: Trace): Trace {
+    const startTime = Math.min(a.startTime, b.startTime);
+    const endTime = a.endTime === undefined ? b.endTime
+      : b.endTime === undefined ? a.endTime
+      : Math.max(a.endTime, b.endTime);
+
+    return {
+      traceId: a.traceId,
+      spans: [...a.spans, ...b.spans],
+      startTime,
+      endTime,
+      duration: endTime === undefined ? undefined : endTime - startTime,
+      rootSpan: a.rootSpan ?? b.rootSpan
+    };
+  }
+
+  // Partition tier for a project's rows, read inside the write transaction
+  private async getRetentionDays(client: PoolClient, projectId: string): Promise<number> {
+    const result = await client.query('SELECT retention_days FROM projects WHERE id = $1', [projectId]);
+    return result.rows[0]?.retention_days ?? 30;
+  }
+
+  // Builds "($1, $2, ...), ($n+1, ...)" for a multi-row VALUES clause
+  private buildValuesPlaceholders(rowCount: number, columnCount: number): string {
+    const rows: string[] = [];
+    for (let row = 0; row < rowCount; row++) {
+      const baseIndex = row * columnCount;
+      const columns: string[] = [];
+      for (let column = 1; column <= columnCount; column++) {
+        columns.push(`$${baseIndex + column}`);
+      }
+      rows.push(`(${columns.join(', ')})`);
+    }
+    return rows.join(', ');
+  }
+
+  private chunk<T>(items: T[], size: number): T[][] {
+    const chunks: T[][] = [];
+    for (let i = 0; i < items.length; i += size) {
+      chunks.push(items.slice(i, i + size));
+    }
+    return chunks;
   }
 }
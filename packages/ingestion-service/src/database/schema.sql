@@ -5,19 +5,36 @@
 CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
 CREATE EXTENSION IF NOT EXISTS "pg_trgm";
 
+-- Retention tiers. Every project keeps spans and events for one of these
+-- periods; partition width grows with the period so each tier stays at a
+-- few dozen partitions.
+CREATE TABLE retention_tiers (
+    retention_days INTEGER PRIMARY KEY,
+    partition_unit VARCHAR(10) NOT NULL CHECK (partition_unit IN ('day', 'week', 'month'))
+);
+
+INSERT INTO retention_tiers (retention_days, partition_unit) VALUES
+    (7, 'day'),
+    (30, 'day'),
+    (90, 'week'),
+    (365, 'month');
+
 -- Projects table
 CREATE TABLE projects (
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
     name VARCHAR(255) NOT NULL,
     api_key VARCHAR(255) UNIQUE NOT NULL,
+    retention_days INTEGER NOT NULL DEFAULT 30 REFERENCES retention_tiers(retention_days),
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
     settings JSONB DEFAULT '{}'::jsonb
 );
 
 -- Performance events table
+-- Partitioned by the project's retention tier, then by timestamp (epoch
+-- milliseconds). Partitions are managed by maintain_partitions().
 CREATE TABLE performance_events (
-    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    id UUID NOT NULL DEFAULT uuid_generate_v4(),
     project_id UUID NOT NULL REFERENCES projects(id) ON DELETE CASCADE,
     event_id VARCHAR(100) NOT NULL,
     event_type VARCHAR(50) NOT NULL,
@@ -25,8 +42,13 @@ CREATE TABLE performance_events (
     url TEXT NOT NULL,
     user_agent TEXT,
     data JSONB NOT NULL,
-    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
-);
+    -- Events this row stands for after client-side sampling; weight
+    -- aggregates (SUM(sample_weight)) to undo the sampling
+    sample_weight REAL NOT NULL DEFAULT 1,
+    retention_days INTEGER NOT NULL DEFAULT 30,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (id, retention_days, timestamp)
+) PARTITION BY LIST (retention_days);
 
 -- Traces table
 CREATE TABLE traces (
@@ -38,12 +60,17 @@ CREATE TABLE traces (
     duration BIGINT,
     root_span_id VARCHAR(32),
     span_count INTEGER DEFAULT 0,
+    -- Bumped whenever an upsert changes the trace (e.g. late spans), so
+    -- cached analyses can be keyed by it
+    version INTEGER NOT NULL DEFAULT 1,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
 -- Spans table
+-- Partitioned by the project's retention tier, then by start_time (epoch
+-- microseconds). Partitions are managed by maintain_partitions().
 CREATE TABLE spans (
-    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    id UUID NOT NULL DEFAULT uuid_generate_v4(),
     project_id UUID NOT NULL REFERENCES projects(id) ON DELETE CASCADE,
     trace_id VARCHAR(64) NOT NULL,
     span_id VARCHAR(32) NOT NULL,
@@ -55,8 +82,10 @@ CREATE TABLE spans (
     tags JSONB DEFAULT '{}'::jsonb,
     logs JSONB,
     status VARCHAR(50) DEFAULT 'OK',
-    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
-);
+    retention_days INTEGER NOT NULL DEFAULT 30,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (id, retention_days, start_time)
+) PARTITION BY LIST (retention_days);
 
 -- Dependencies table (for runtime dependency tracking)
 CREATE TABLE dependencies (
@@ -111,14 +140,30 @@ CREATE TABLE security_assessments (
     status VARCHAR(20) DEFAULT 'active' -- 'active', 'resolved', 'ignored'
 );
 
+-- Mergeable latency sketches (DDSketch) per operation, kept at minute, hour
+-- and day resolution. Each ingestion process writes its own row per bucket;
+-- readers merge all writers. bucket_start is epoch milliseconds.
+CREATE TABLE latency_sketches (
+    project_id UUID NOT NULL REFERENCES projects(id) ON DELETE CASCADE,
+    operation_name VARCHAR(255) NOT NULL,
+    resolution VARCHAR(10) NOT NULL CHECK (resolution IN ('minute', 'hour', 'day')),
+    bucket_start BIGINT NOT NULL,
+    writer_id VARCHAR(128) NOT NULL,
+    span_count BIGINT NOT NULL,
+    sketch BYTEA NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (project_id, operation_name, resolution, bucket_start, writer_id)
+);
+
 -- Indexes for performance
-CREATE INDEX idx_performance_events_project_timestamp ON performance_events(project_id, timestamp DESC);
+CREATE INDEX idx_performance_events_project_timestamp ON performance_events(project_id, timestamp DESC, event_id DESC);
 CREATE INDEX idx_performance_events_type ON performance_events(event_type);
 CREATE INDEX idx_performance_events_url ON performance_events USING gin(url gin_trgm_ops);
 
 CREATE INDEX idx_traces_project_id ON traces(project_id);
 CREATE INDEX idx_traces_trace_id ON traces(trace_id);
 CREATE INDEX idx_traces_start_time ON traces(start_time DESC);
+CREATE INDEX idx_traces_project_start_time ON traces(project_id, start_time DESC, trace_id DESC);
 
 CREATE INDEX idx_spans_project_id ON spans(project_id);
 CREATE INDEX idx_spans_trace_id ON spans(trace_id);
@@ -128,6 +173,8 @@ CREATE INDEX idx_spans_operation_name ON spans(operation_name);
 CREATE INDEX idx_spans_start_time ON spans(start_time DESC);
 CREATE INDEX idx_spans_tags ON spans USING gin(tags);
 
+CREATE INDEX idx_latency_sketches_range ON latency_sketches(project_id, resolution, bucket_start);
+
 CREATE INDEX idx_dependencies_project_name ON dependencies(project_id, name);
 CREATE INDEX idx_dependencies_type ON dependencies(type);
 
@@ -146,12 +193,17 @@ CREATE INDEX idx_security_assessments_runtime_exposure ON security_assessments(r
 
 -- Composite indexes for common queries
 CREATE INDEX idx_spans_trace_parent ON spans(trace_id, parent_span_id);
-CREATE INDEX idx_performance_events_project_type_time ON performance_events(project_id, event_type, timestamp DESC);
+CREATE INDEX idx_performance_events_project_type_time ON performance_events(project_id, event_type, timestamp DESC, event_id DESC);
 CREATE INDEX idx_security_assessments_project_risk ON security_assessments(project_id, risk_level, runtime_exposure);
 
 -- Unique constraints
-ALTER TABLE performance_events ADD CONSTRAINT unique_event_per_project UNIQUE(project_id, event_id);
-ALTER TABLE spans ADD CONSTRAINT unique_span_per_trace UNIQUE(trace_id, span_id);
+-- Unique keys on partitioned tables must include the partition keys. An
+-- event is therefore deduplicated only while its timestamp and tier stay
+-- the same: SDKs resend queued events unchanged, but an event replayed after
+-- its project changed tier is stored again under the new tier.
+ALTER TABLE performance_events ADD CONSTRAINT unique_event_per_project UNIQUE(project_id, event_id, retention_days, timestamp);
+ALTER TABLE traces ADD CONSTRAINT unique_trace_id UNIQUE(trace_id);
+ALTER TABLE spans ADD CONSTRAINT unique_span_per_trace UNIQUE(trace_id, span_id, retention_days, start_time);
 ALTER TABLE dependencies ADD CONSTRAINT unique_dependency_per_project UNIQUE(project_id, name, version);
 
 -- Triggers for updated_at timestamps
@@ -169,10 +221,192 @@ CREATE TRIGGER update_projects_updated_at BEFORE UPDATE ON projects
 CREATE TRIGGER update_cve_records_updated_at BEFORE UPDATE ON cve_records
     FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 
--- Partitioning for large tables (optional, for high-volume deployments)
--- Partition performance_events by month
--- CREATE TABLE performance_events_template (LIKE performance_events INCLUDING ALL);
--- SELECT create_monthly_partitions('performance_events', '2024-01-01', '2025-12-31');
+-- Ingestion replicas cache each API key's project, sampling settings
+-- included. Whoever changes a project's key, name or settings, the old key is
+-- announced on the channel the caches listen on (API_KEY_INVALIDATION_CHANNEL
+-- in database-manager.ts). Creation and deletion are announced by the service.
+CREATE OR REPLACE FUNCTION notify_api_key_changed()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('tracelens_api_key_invalidation', OLD.api_key);
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+CREATE TRIGGER notify_projects_api_key_changed AFTER UPDATE OF api_key, name, settings ON projects
+    FOR EACH ROW
+    WHEN (OLD.api_key IS DISTINCT FROM NEW.api_key
+          OR OLD.name IS DISTINCT FROM NEW.name
+          OR OLD.settings IS DISTINCT FROM NEW.settings)
+    EXECUTE FUNCTION notify_api_key_changed();
+
+-- Time partitioning for spans and performance_events
+--
+-- Layout: <table>_r<days> per retention tier, each range-partitioned into
+-- <table>_r<days>_<YYYYMMDD> periods (UTC) plus a default partition that
+-- catches timestamps outside the managed window. Expired data is removed by
+-- dropping whole partitions; only the default partition, which holds
+-- stragglers, is trimmed with DELETE.
+
+-- Creates tier partitions and every period from the start of the retention
+-- window to days_ahead in the future. Returns the number of partitions created.
+CREATE OR REPLACE FUNCTION ensure_time_partitions(
+    parent TEXT,
+    time_column TEXT,
+    units_per_second BIGINT,
+    days_ahead INTEGER DEFAULT 7
+)
+RETURNS INTEGER AS $$
+DECLARE
+    tier RECORD;
+    tier_table TEXT;
+    partition_name TEXT;
+    period_start TIMESTAMP;
+    period_end TIMESTAMP;
+    has_stragglers BOOLEAN;
+    default_table TEXT;
+    range_start BIGINT;
+    range_end BIGINT;
+    step INTERVAL;
+    created INTEGER := 0;
+BEGIN
+    FOR tier IN SELECT retention_days, partition_unit FROM retention_tiers LOOP
+        tier_table := format('%s_r%s', parent, tier.retention_days);
+        default_table := tier_table || '_default';
+        step := ('1 ' || tier.partition_unit)::interval;
+
+        IF to_regclass(tier_table) IS NULL THEN
+            EXECUTE format('CREATE TABLE %I PARTITION OF %I FOR VALUES IN (%s) PARTITION BY RANGE (%I)',
+                tier_table, parent, tier.retention_days, time_column);
+            EXECUTE format('CREATE TABLE %I PARTITION OF %I DEFAULT', default_table, tier_table);
+            created := created + 2;
+        END IF;
+
+        period_start := date_trunc(tier.partition_unit,
+            (now() AT TIME ZONE 'UTC') - make_interval(days => tier.retention_days));
+
+        WHILE period_start < (now() AT TIME ZONE 'UTC') + make_interval(days => days_ahead) LOOP
+            period_end := period_start + step;
+            partition_name := format('%s_%s', tier_table, to_char(period_start, 'YYYYMMDD'));
+
+            IF to_regclass(partition_name) IS NULL THEN
+                range_start := (extract(epoch FROM period_start) * units_per_second)::BIGINT;
+                range_end := (extract(epoch FROM period_end) * units_per_second)::BIGINT;
+
+                -- A partition cannot be created while the default partition
+                -- holds rows in its range. Detach the default, create the
+                -- period, move those rows over, then reattach the default.
+                EXECUTE format('SELECT EXISTS (SELECT 1 FROM %I WHERE %I >= %s AND %I < %s)',
+                    default_table, time_column, range_start, time_column, range_end)
+                    INTO has_stragglers;
+
+                IF has_stragglers THEN
+                    EXECUTE format('ALTER TABLE %I DETACH PARTITION %I', tier_table, default_table);
+                END IF;
+
+                EXECUTE format('CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%s) TO (%s)',
+                    partition_name, tier_table, range_start, range_end);
+                created := created + 1;
+
+                IF has_stragglers THEN
+                    EXECUTE format('WITH moved AS (DELETE FROM %I WHERE %I >= %s AND %I < %s RETURNING *) '
+                        || 'INSERT INTO %I SELECT * FROM moved',
+                        default_table, time_column, range_start, time_column, range_end, partition_name);
+                    EXECUTE format('ALTER TABLE %I ATTACH PARTITION %I DEFAULT', tier_table, default_table);
+                END IF;
+            END IF;
+
+            period_start := period_end;
+        END LOOP;
+    END LOOP;
+
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Drops every period partition that ended before its tier's retention window
+-- and deletes expired rows from the tier's default partition. Returns the
+-- number of partitions dropped.
+CREATE OR REPLACE FUNCTION drop_expired_partitions(
+    parent TEXT,
+    time_column TEXT,
+    units_per_second BIGINT
+)
+RETURNS INTEGER AS $$
+DECLARE
+    tier RECORD;
+    part RECORD;
+    cutoff TIMESTAMP;
+    dropped INTEGER := 0;
+BEGIN
+    FOR tier IN SELECT retention_days, partition_unit FROM retention_tiers LOOP
+        cutoff := (now() AT TIME ZONE 'UTC') - make_interval(days => tier.retention_days);
+
+        IF to_regclass(format('%s_r%s_default', parent, tier.retention_days)) IS NOT NULL THEN
+            EXECUTE format('DELETE FROM %I WHERE %I < %s',
+                format('%s_r%s_default', parent, tier.retention_days), time_column,
+                (extract(epoch FROM cutoff) * units_per_second)::BIGINT);
+        END IF;
+
+        FOR part IN
+            SELECT c.relname
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = to_regclass(format('%s_r%s', parent, tier.retention_days))
+              AND c.relname ~ '_[0-9]{8}$'
+        LOOP
+            IF to_date(right(part.relname, 8), 'YYYYMMDD')::TIMESTAMP
+                + ('1 ' || tier.partition_unit)::interval <= cutoff THEN
+                EXECUTE format('DROP TABLE %I', part.relname);
+                dropped := dropped + 1;
+            END IF;
+        END LOOP;
+    END LOOP;
+
+    RETURN dropped;
+END;
+$$ LANGUAGE plpgsql;
+
+-- traces is not partitioned: a trace row is deleted once its start time
+-- (epoch microseconds) falls outside its project's current retention window.
+-- Returns the number of traces deleted.
+CREATE OR REPLACE FUNCTION expire_traces()
+RETURNS INTEGER AS $$
+DECLARE
+    expired INTEGER;
+BEGIN
+    DELETE FROM traces t
+    USING projects p
+    WHERE t.project_id = p.id
+      AND t.start_time < (extract(epoch FROM now() - make_interval(days => p.retention_days)) * 1000000)::BIGINT;
+    GET DIAGNOSTICS expired = ROW_COUNT;
+    RETURN expired;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Entry point for the ingestion service's maintenance timer. Only one caller
+-- at a time does the work when several replicas run it concurrently.
+CREATE OR REPLACE FUNCTION maintain_partitions(days_ahead INTEGER DEFAULT 7)
+RETURNS TABLE (created INTEGER, dropped INTEGER, expired_traces INTEGER) AS $$
+BEGIN
+    IF NOT pg_try_advisory_xact_lock(hashtext('tracelens_partition_maintenance')) THEN
+        created := 0;
+        dropped := 0;
+        expired_traces := 0;
+        RETURN NEXT;
+        RETURN;
+    END IF;
+
+    created := ensure_time_partitions('spans', 'start_time', 1000000, days_ahead)
+        + ensure_time_partitions('performance_events', 'timestamp', 1000, days_ahead);
+    dropped := drop_expired_partitions('spans', 'start_time', 1000000)
+        + drop_expired_partitions('performance_events', 'timestamp', 1000);
+    expired_traces := expire_traces();
+    RETURN NEXT;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT * FROM maintain_partitions();
 
 -- Views for common queries
 CREATE VIEW trace_summary AS
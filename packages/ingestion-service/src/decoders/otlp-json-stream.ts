@@ -0,0 +1,189 @@
+// Incremental OTLP/JSON parser
+//
+// Scans an ExportTraceServiceRequest body chunk by chunk and yields each
+// element of the top-level resourceSpans array as soon as it is complete.
+// Only the element currently being read is buffered, so memory use is bound
+// by the largest single resource span rather than the whole request.
+//
+// The scanner works on raw bytes: every structural JSON character is ASCII,
+// and UTF-8 continuation bytes never collide with them.
+
+const QUOTE = 0x22;
+const BACKSLASH = 0x5c;
+const OPEN_BRACE = 0x7b;
+const CLOSE_BRACE = 0x7d;
+const OPEN_BRACKET = 0x5b;
+const CLOSE_BRACKET = 0x5d;
+const COLON = 0x3a;
+const COMMA = 0x2c;
+
+const MAX_KEY_BYTES = 64;
+
+export class OTLPStreamError extends Error {
+  constructor(message: string, public readonly statusCode: number = 400) {
+    super(message);
+    this.name = 'OTLPStreamError';
+  }
+}
+
+export class OTLPJsonStreamParser {
+  private depth = 0;
+  private inString = false;
+  private escaped = false;
+
+  // Top-level object state
+  private expectKey = false;
+  private keyBytes: number[] | null = null;
+  private lastKey: string | null = null;
+  private awaitingTargetValue = false;
+  private inTarget = false;
+  private sawTarget = false;
+
+  // Element currently being captured
+  private elementChunks: Buffer[] = [];
+  private elementStart = -1;
+  private elementBytes = 0;
+
+  constructor(private maxElementBytes: number = 8 * 1024 * 1024) {}
+
+  // Feeds the next chunk and returns the resource spans completed by it
+  public push(chunk: Buffer): unknown[] {
+    const completed: unknown[] = [];
+    this.elementStart = this.elementChunks.length > 0 ? 0 : -1;
+
+    for (let i = 0; i < chunk.length; i++) {
+      const byte = chunk[i]!;
+
+      if (this.inString) {
+        if (this.escaped) {
+          this.escaped = false;
+        } else if (byte === BACKSLASH) {
+          this.escaped = true;
+        } else if (byte === QUOTE) {
+          this.inString = false;
+          if (this.keyBytes) {
+            this.lastKey = Buffer.from(this.keyBytes).toString('utf8');
+            this.keyBytes = null;
+          }
+        } else if (this.keyBytes && this.keyBytes.length < MAX_KEY_BYTES) {
+          this.keyBytes.push(byte);
+        }
+        continue;
+      }
+
+      switch (byte) {
+        case QUOTE:
+          if (this.awaitingTargetValue) {
+            throw new OTLPStreamError('resourceSpans must be an array');
+          }
+          this.inString = true;
+          if (this.depth === 1 && this.expectKey) {
+            this.keyBytes = [];
+          }
+          break;
+
+        case OPEN_BRACE:
+        case OPEN_BRACKET:
+          if (this.depth === 1 && this.awaitingTargetValue) {
+            this.awaitingTargetValue = false;
+            if (byte !== OPEN_BRACKET) {
+              throw new OTLPStreamError('resourceSpans must be an array');
+            }
+            this.inTarget = true;
+            this.sawTarget = true;
+          } else if (this.inTarget && this.depth === 2) {
+            if (byte !== OPEN_BRACE) {
+              throw new OTLPStreamError('resourceSpans elements must be objects');
+            }
+            this.elementStart = i;
+          } else if (this.depth === 0 && byte !== OPEN_BRACE) {
+            throw new OTLPStreamError('Request body must be a JSON object');
+          }
+
+          this.depth++;
+          this.expectKey = this.depth === 1 && byte === OPEN_BRACE;
+          break;
+
+        case CLOSE_BRACE:
+        case CLOSE_BRACKET:
+          this.depth--;
+          if (this.depth < 0) {
+            throw new OTLPStreamError('Malformed JSON: unbalanced brackets');
+          }
+
+          if (this.inTarget && this.depth === 2 && byte === CLOSE_BRACE) {
+            completed.push(this.completeElement(chunk, i));
+          } else if (this.inTarget && this.depth === 1) {
+            this.inTarget = false;
+          }
+          break;
+
+        case COLON:
+          if (this.depth === 1) {
+            this.expectKey = false;
+            this.awaitingTargetValue = this.lastKey === 'resourceSpans';
+          }
+          break;
+
+        case COMMA:
+          if (this.depth === 1) {
+            this.expectKey = true;
+          }
+          break;
+
+        default:
+          // A scalar top-level value (e.g. "resourceSpans": null)
+          if (this.awaitingTargetValue && byte > 0x20) {
+            throw new OTLPStreamError('resourceSpans must be an array');
+          }
+      }
+    }
+
+    // Carry the unfinished element over to the next chunk
+    if (this.elementStart >= 0) {
+      const tail = chunk.subarray(this.elementStart);
+      this.elementChunks.push(tail);
+      this.elementBytes += tail.length;
+      this.elementStart = -1;
+
+      if (this.elementBytes > this.maxElementBytes) {
+        throw new OTLPStreamError('Resource span exceeds the per-element size limit', 413);
+      }
+    }
+
+    return completed;
+  }
+
+  // Validates that the body was a complete object with a resourceSpans array
+  public end(): void {
+    if (this.depth !== 0 || this.inString) {
+      throw new OTLPStreamError('Malformed JSON: unexpected end of body');
+    }
+    if (!this.sawTarget) {
+      throw new OTLPStreamError('resourceSpans array is required');
+    }
+  }
+
+  private completeElement(chunk: Buffer, end: number): unknown {
+    const start = this.elementStart >= 0 && this.elementChunks.length === 0 ? this.elementStart : 0;
+    const last = chunk.subarray(start, end + 1);
+
+    const raw = this.elementChunks.length > 0
+      ? Buffer.concat([...this.elementChunks, last])
+      : last;
+
+    this.elementChunks = [];
+    this.elementBytes = 0;
+    this.elementStart = -1;
+
+    if (raw.length > this.maxElementBytes) {
+      throw new OTLPStreamError('Resource span exceeds the per-element size limit', 413);
+    }
+
+    try {
+      return JSON.parse(raw.toString('utf8'));
+    } catch (error) {
+      throw new OTLPStreamError(`Malformed resource span: ${error instanceof Error ? error.message : 'invalid JSON'}`);
+    }
+  }
+}
@@ -0,0 +1,435 @@
+// Minimal protobuf decoder for OTLP ExportTraceServiceRequest payloads
+//
+// Produces the same object shape as OTLP/JSON so TraceNormalizer can consume
+// both encodings. Trace and span IDs are returned as Buffer views into the
+// request body rather than hex or base64 strings.
+
+const WIRE_VARINT = 0;
+const WIRE_FIXED64 = 1;
+const WIRE_LENGTH_DELIMITED = 2;
+const WIRE_FIXED32 = 5;
+
+export class ProtobufDecodeError extends Error {
+  constructor(message: string) {
+    super(message);
+    this.name = 'ProtobufDecodeError';
+  }
+}
+
+export interface OTLPAnyValue {
+  stringValue?: string;
+  boolValue?: boolean;
+  intValue?: bigint;
+  doubleValue?: number;
+  bytesValue?: Buffer;
+  arrayValue?: { values: OTLPAnyValue[] };
+  kvlistValue?: { values: OTLPKeyValue[] };
+}
+
+export interface OTLPKeyValue {
+  key: string;
+  value?: OTLPAnyValue;
+}
+
+export interface OTLPSpan {
+  traceId?: Buffer;
+  spanId?: Buffer;
+  parentSpanId?: Buffer;
+  traceState?: string;
+  name?: string;
+  kind?: number;
+  startTimeUnixNano?: bigint;
+  endTimeUnixNano?: bigint;
+  attributes: OTLPKeyValue[];
+  status?: { code?: number; message?: string };
+}
+
+export interface OTLPScopeSpans {
+  scope?: { name?: string; version?: string };
+  spans: OTLPSpan[];
+}
+
+export interface OTLPResourceSpans {
+  resource?: { attributes: OTLPKeyValue[] };
+  scopeSpans: OTLPScopeSpans[];
+}
+
+export interface OTLPExportTraceServiceRequest {
+  resourceSpans: OTLPResourceSpans[];
+}
+
+class ProtobufReader {
+  private pos: number;
+
+  constructor(private buf: Buffer, start: number = 0, private end: number = buf.length) {
+    this.pos = start;
+  }
+
+  public hasMore(): boolean {
+    return this.pos < this.end;
+  }
+
+  public readTag(): { field: number; wireType: number } {
+    const tag = this.readVarint();
+    return { field: Math.floor(tag / 8), wireType: tag & 7 };
+  }
+
+  // Varints up to 2^53 decode exactly; larger values are only used for int64 attributes
+  public readVarint(): number {
+    let result = 0;
+    let multiplier = 1;
+
+    for (let i = 0; i < 10; i++) {
+      if (this.pos >= this.end) {
+        throw new ProtobufDecodeError('Truncated varint');
+      }
+      const byte = this.buf[this.pos++]!;
+      result += (byte & 0x7f) * multiplier;
+      if ((byte & 0x80) === 0) {
+        return result;
+      }
+      multiplier *= 128;
+    }
+
+    throw new ProtobufDecodeError('Malformed varint');
+  }
+
+  public readVarintBigInt(): bigint {
+    let result = 0n;
+    let shift = 0n;
+
+    for (let i = 0; i < 10; i++) {
+      if (this.pos >= this.end) {
+        throw new ProtobufDecodeError('Truncated varint');
+      }
+      const byte = this.buf[this.pos++]!;
+      result |= BigInt(byte & 0x7f) << shift;
+      if ((byte & 0x80) === 0) {
+        return result;
+      }
+      shift += 7n;
+    }
+
+    throw new ProtobufDecodeError('Malformed varint');
+  }
+
+  public readFixed64(): bigint {
+    this.ensure(8);
+    const value = this.buf.readBigUInt64LE(this.pos);
+    this.pos += 8;
+    return value;
+  }
+
+  public readDouble(): number {
+    this.ensure(8);
+    const value = this.buf.readDoubleLE(this.pos);
+    this.pos += 8;
+    return value;
+  }
+
+  // Returns a view into the underlying buffer without copying
+  public readBytes(): Buffer {
+    const length = this.readVarint();
+    this.ensure(length);
+    const bytes = this.buf.subarray(this.pos, this.pos + length);
+    this.pos += length;
+    return bytes;
+  }
+
+  public readString(): string {
+    const length = this.readVarint();
+    this.ensure(length);
+    const value = this.buf.toString('utf8', this.pos, this.pos + length);
+    this.pos += length;
+    return value;
+  }
+
+  public readMessage(): ProtobufReader {
+    const length = this.readVarint();
+    this.ensure(length);
+    const reader = new ProtobufReader(this.buf, this.pos, this.pos + length);
+    this.pos += length;
+    return reader;
+  }
+
+  public skip(wireType: number): void {
+    switch (wireType) {
+      case WIRE_VARINT:
+        this.readVarint();
+        break;
+      case WIRE_FIXED64:
+        this.ensure(8);
+        this.pos += 8;
+        break;
+      case WIRE_LENGTH_DELIMITED: {
+        const length = this.readVarint();
+        this.ensure(length);
+        this.pos += length;
+        break;
+      }
+      case WIRE_FIXED32:
+        this.ensure(4);
+        this.pos += 4;
+        break;
+      default:
+        throw new ProtobufDecodeError(`Unsupported wire type ${wireType}`);
+    }
+  }
+
+  private ensure(length: number): void {
+    if (this.pos + length > this.end) {
+      throw new ProtobufDecodeError('Truncated message');
+    }
+  }
+}
+
+export function decodeExportTraceServiceRequest(body: Buffer): OTLPExportTraceServiceRequest {
+  const reader = new ProtobufReader(body);
+  const resourceSpans: OTLPResourceSpans[] = [];
+
+  while (reader.hasMore()) {
+    const { field, wireType } = reader.readTag();
+    if (field === 1 && wireType === WIRE_LENGTH_DELIMITED) {
+      resourceSpans.push(decodeResourceSpans(reader.readMessage()));
+    } else {
+      reader.skip(wireType);
+    }
+  }
+
+  return { resourceSpans };
+}
+
+// Counts spans without materializing them; used to charge rate limits before
+// the request is fully decoded
+export function countExportTraceServiceRequestSpans(body: Buffer): number {
+  const reader = new ProtobufReader(body);
+  let count = 0;
+
+  while (reader.hasMore()) {
+    const { field, wireType } = reader.readTag();
+    if (field !== 1 || wireType !== WIRE_LENGTH_DELIMITED) {
+      reader.skip(wireType);
+      continue;
+    }
+
+    const resourceSpans = reader.readMessage();
+    while (resourceSpans.hasMore()) {
+      const tag = resourceSpans.readTag();
+      if (tag.field !== 2 || tag.wireType !== WIRE_LENGTH_DELIMITED) {
+        resourceSpans.skip(tag.wireType);
+        continue;
+      }
+
+      const scopeSpans = resourceSpans.readMessage();
+      while (scopeSpans.hasMore()) {
+        const spanTag = scopeSpans.readTag();
+        if (spanTag.field === 2 && spanTag.wireType === WIRE_LENGTH_DELIMITED) {
+          count++;
+        }
+        scopeSpans.skip(spanTag.wireType);
+      }
+    }
+  }
+
+  return count;
+}
+
+function decodeResourceSpans(reader: ProtobufReader): OTLPResourceSpans {
+  const result: OTLPResourceSpans = { scopeSpans: [] };
+
+  while (reader.hasMore()) {
+    const { field, wireType } = reader.readTag();
+    if (field === 1 && wireType === WIRE_LENGTH_DELIMITED) {
+      result.resource = { attributes: decodeAttributesOnly(reader.readMessage()) };
+    } else if (field === 2 && wireType === WIRE_LENGTH_DELIMITED) {
+      result.scopeSpans.push(decodeScopeSpans(reader.readMessage()));
+    } else {
+      reader.skip(wireType);
+    }
+  }
+
+  return result;
+}
+
+function decodeScopeSpans(reader: ProtobufReader): OTLPScopeSpans {
+  const result: OTLPScopeSpans = { spans: [] };
+
+  while (reader.hasMore()) {
+    const { field, wireType } = reader.readTag();
+    if (field === 1 && wireType === WIRE_LENGTH_DELIMITED) {
+      result.scope = decodeScope(reader.readMessage());
+    } else if (field === 2 && wireType === WIRE_LENGTH_DELIMITED) {
+      result.spans.push(decodeSpan(reader.readMessage()));
+    } else {
+      reader.skip(wireType);
+    }
+  }
+
+  return result;
+}
+
+function decodeScope(reader: ProtobufReader): { name?: string; version?: string } {
+  const scope: { name?: string; version?: string } = {};
+
+  while (reader.hasMore()) {
+    const { field, wireType } = reader.readTag();
+    if (field === 1 && wireType === WIRE_LENGTH_DELIMITED) {
+      scope.name = reader.readString();
+    } else if (field === 2 && wireType === WIRE_LENGTH_DELIMITED) {
+      scope.version = reader.readString();
+    } else {
+      reader.skip(wireType);
+    }
+  }
+
+  return scope;
+}
+
+function decodeSpan(reader: ProtobufReader): OTLPSpan {
+  const span: OTLPSpan = { attributes: [] };
+
+  while (reader.hasMore()) {
+    const { field, wireType } = reader.readTag();
+    switch (field) {
+      case 1:
+        if (wireType !== WIRE_LENGTH_DELIMITED) break;
+        span.traceId = reader.readBytes();
+        continue;
+      case 2:
+        if (wireType !== WIRE_LENGTH_DELIMITED) break;
+        span.spanId = reader.readBytes();
+        continue;
+      case 3:
+        if (wireType !== WIRE_LENGTH_DELIMITED) break;
+        span.traceState = reader.readString();
+        continue;
+      case 4:
+        if (wireType !== WIRE_LENGTH_DELIMITED) break;
+        span.parentSpanId = reader.readBytes();
+        continue;
+      case 5:
+        if (wireType !== WIRE_LENGTH_DELIMITED) break;
+        span.name = reader.readString();
+        continue;
+      case 6:
+        if (wireType !== WIRE_VARINT) break;
+        span.kind = reader.readVarint();
+        continue;
+      case 7:
+        if (wireType !== WIRE_FIXED64) break;
+        span.startTimeUnixNano = reader.readFixed64();
+        continue;
+      case 8:
+        if (wireType !== WIRE_FIXED64) break;
+        span.endTimeUnixNano = reader.readFixed64();
+        continue;
+      case 9:
+        if (wireType !== WIRE_LENGTH_DELIMITED) break;
+        span.attributes.push(decodeKeyValue(reader.readMessage()));
+        continue;
+      case 15:
+        if (wireType !== WIRE_LENGTH_DELIMITED) break;
+        span.status = decodeStatus(reader.readMessage());
+        continue;
+    }
+    reader.skip(wireType);
+  }
+
+  // An empty parent_span_id marks a root span
+  if (span.parentSpanId && span.parentSpanId.length === 0) {
+    delete span.parentSpanId;
+  }
+
+  return span;
+}
+
+function decodeStatus(reader: ProtobufReader): { code?: number; message?: string } {
+  const status: { code?: number; message?: string } = {};
+
+  while (reader.hasMore()) {
+    const { field, wireType } = reader.readTag();
+    if (field === 2 && wireType === WIRE_LENGTH_DELIMITED) {
+      status.message = reader.readString();
+    } else if (field === 3 && wireType === WIRE_VARINT) {
+      status.code = reader.readVarint();
+    } else {
+      reader.skip(wireType);
+    }
+  }
+
+  return status;
+}
+
+function decodeAttributesOnly(reader: ProtobufReader): OTLPKeyValue[] {
+  const attributes: OTLPKeyValue[] = [];
+
+  while (reader.hasMore()) {
+    const { field, wireType } = reader.readTag();
+    if (field === 1 && wireType === WIRE_LENGTH_DELIMITED) {
+      attributes.push(decodeKeyValue(reader.readMessage()));
+    } else {
+      reader.skip(wireType);
+    }
+  }
+
+  return attributes;
+}
+
+function decodeKeyValue(reader: ProtobufReader): OTLPKeyValue {
+  const keyValue: OTLPKeyValue = { key: '' };
+
+  while (reader.hasMore()) {
+    const { field, wireType } = reader.readTag();
+    if (field === 1 && wireType === WIRE_LENGTH_DELIMITED) {
+      keyValue.key = reader.readString();
+    } else if (field === 2 && wireType === WIRE_LENGTH_DELIMITED) {
+      keyValue.value = decodeAnyValue(reader.readMessage());
+    } else {
+      reader.skip(wireType);
+    }
+  }
+
+  return keyValue;
+}
+
+function decodeAnyValue(reader: ProtobufReader): OTLPAnyValue {
+  const value: OTLPAnyValue = {};
+
+  while (reader.hasMore()) {
+    const { field, wireType } = reader.readTag();
+    if (field === 1 && wireType === WIRE_LENGTH_DELIMITED) {
+      value.stringValue = reader.readString();
+    } else if (field === 2 && wireType === WIRE_VARINT) {
+      value.boolValue = reader.readVarint() !== 0;
+    } else if (field === 3 && wireType === WIRE_VARINT) {
+      value.intValue = BigInt.asIntN(64, reader.readVarintBigInt());
+    } else if (field === 4 && wireType === WIRE_FIXED64) {
+      value.doubleValue = reader.readDouble();
+    } else if (field === 5 && wireType === WIRE_LENGTH_DELIMITED) {
+      value.arrayValue = { values: decodeArrayValue(reader.readMessage()) };
+    } else if (field === 6 && wireType === WIRE_LENGTH_DELIMITED) {
+      value.kvlistValue = { values: decodeAttributesOnly(reader.readMessage()) };
+    } else if (field === 7 && wireType === WIRE_LENGTH_DELIMITED) {
+      value.bytesValue = reader.readBytes();
+    } else {
+      reader.skip(wireType);
+    }
+  }
+
+  return value;
+}
+
+function decodeArrayValue(reader: ProtobufReader): OTLPAnyValue[] {
+  const values: OTLPAnyValue[] = [];
+
+  while (reader.hasMore()) {
+    const { field, wireType } = reader.readTag();
+    if (field === 1 && wireType === WIRE_LENGTH_DELIMITED) {
+      values.push(decodeAnyValue(reader.readMessage()));
+    } else {
+      reader.skip(wireType);
+    }
+  }
+
+  return values;
+}
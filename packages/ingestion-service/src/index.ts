@@ -1,159 +1,15 @@
-// TraceLens Ingestion Service - Main server
-import express from 'express';
-import cors from 'cors';
-import helmet from 'helmet';
-import compression from 'compression';
-import { DatabaseManager } from './database/database-manager';
-import { authenticateApiKey } from './middleware/auth';
-import { rateLimiter } from './middleware/rate-limiter';
-import eventsRouter from './api/routes/events';
-import tracesRouter from './api/routes/traces';
-import healthRouter from './api/routes/health';
-
-const app = express();
-const port = process.env.PORT || 3001;
-
-// Database configuration
-const dbConfig = {
-  host: process.env.DB_HOST || 'localhost',
-  port: parseInt(process.env.DB_PORT || '5432'),
-  database: process.env.DB_NAME || 'tracelens',
-  username: process.env.DB_USER || 'postgres',
-  password: process.env.DB_PASSWORD || 'password',
-  ssl: process.env.DB_SSL === 'true',
-  maxConnections: parseInt(process.env.DB_MAX_CONNECTIONS || '20'),
-  idleTimeoutMillis: parseInt(process.env.DB_IDLE_TIMEOUT || '30000'),
-  connectionTimeoutMillis: parseInt(process.env.DB_CONNECTION_TIMEOUT || '2000')
-};
-
-// Initialize database
-const db = new DatabaseManager(dbConfig);
-
-// Middleware to inject database into requests
-app.use((req, res, next) => {
-  (req as any).db = db;
-  next();
-});
-
-// Security middleware
-app.use(helmet({
-  contentSecurityPolicy: {
-    directives: {
-      defaultSrc: ["'self'"],
-      styleSrc: ["'self'", "'unsafe-inline'"],
-      scriptSrc: ["'self'"],
-      imgSrc: ["'self'", "data:", "https:"],
-    },
-  },
-  hsts: {
-    maxAge: 31536000,
-    includeSubDomains: true,
-    preload: true
-  }
-}));
-
-// CORS configuration
-app.use(cors({
-  origin: process.env.ALLOWED_ORIGINS?.split(',') || ['http://localhost:3000'],
-  credentials: true,
-  methods: ['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS'],
-  allowedHeaders: ['Content-Type', 'Authorization', 'X-API-Key', 'X-Project-Key']
-}));
-
-// Compression and parsing
-app.use(compression());
-app.use(express.json({ limit: '10mb' }));
-app.use(express.urlencoded({ extended: true, limit: '10mb' }));
-
-// Trust proxy for accurate IP addresses
-app.set('trust proxy', true);
-
-// Request logging middleware
-app.use((req, res, next) => {
-  const start = Date.now();
-  
-  res.on('finish', () => {
-    const duration = Date.now() - start;
-    const logLevel = res.statusCode >= 400 ? 'error' : 'info';
-    
-    console.log(JSON.stringify({
-      level: logLevel,
-      method: req.method,
-      url: req.url,
-      status: res.statusCode,
-      duration,
-      ip: req.ip,
-      userAgent: req.get('User-Agent'),
-      timestamp: new Date().toISOString()
-    }));
-  });
-  
-  next();
-});
-
-// API routes
-app.use('/api/health', healthRouter);
-app.use('/api/events', eventsRouter);
-app.use('/api/traces', tracesRouter);
-
-// Global error handler
-app.use((error: Error, req: express.Request, res: express.Response, next: express.NextFunction) => {
-  console.error('Unhandled error:', error);
-  
-  res.status(500).json({
-    success: false,
-    error: 'Internal server error',
-    message: process.env.NODE_ENV === 'development' ? error.message : 'Something went wrong'
-  });
-});
-
-// 404 handler
-app.use('*', (req, res) => {
-  res.status(404).json({
-    success: false,
-    error: 'Not found',
-    message: `Route ${req.method} ${req.originalUrl} not found`
-  });
-});
-
-// Graceful shutdown
-process.on('SIGTERM', async () => {
-  console.log('SIGTERM received, shutting down gracefully');
-  
-  try {
-    await db.close();
-    console.log('Database connections closed');
-    process.exit(0);
-  } catch (error) {
-    console.error('Error during shutdown:', error);
-    process.exit(1);
-  }
-});
-
-process.on('SIGINT', async () => {
-  console.log('SIGINT received, shutting down gracefully');
-  
-  try {
-    await db.close();
-    console.log('Database connections closed');
-    process.exit(0);
-  } catch (error) {
-    console.error('Error during shutdown:', error);
-    process.exit(1);
-  }
-});
-
-// Start server
-const server = app.listen(port, () => {
-  console.log(`TraceLens Ingestion Service running on port ${port}`);
-  console.log(`Environment: ${process.env.NODE_ENV || 'development'}`);
-  console.log(`Database: ${dbConfig.host}:${dbConfig.port}/${dbConfig.database}`);
-});
-
-// Handle server errors
-server.on('error', (error: Error) => {
-  console.error('Server error:', error);
-  process.exit(1);
-});
-
-export { app };
+// TraceLens Ingestion Service - Entry point
+//
+// INGESTION_WORKERS=N (or "auto") forks N HTTP workers that share the port;
+// the default of 1 runs the server in this process.
+import cluster from 'cluster';
+import { loadClusterConfig, runClusterPrimary } from './cluster/cluster-primary';
+
+const clusterConfig = loadClusterConfig();
+
+if (cluster.isPrimary && clusterConfig.workers > 1) {
+  runClusterPrimary(clusterConfig);
+} else {
+  // eslint-disable-next-line @typescript-eslint/no-var-requires
+  require('./server');
+}
@@ -1,12 +1,21 @@
 // API key authentication middleware
 import { Request, Response, NextFunction } from 'express';
 import { DatabaseManager } from '../database/database-manager';
+import { ApiKeyCache } from '../cache/api-key-cache';
 
 export interface AuthenticatedRequest extends Request {
   projectId: string;
   db: DatabaseManager;
 }
 
+// Every ingestion request authenticates, so key lookups are cached in-process.
+// Unknown keys are cached briefly to absorb floods of invalid credentials.
+export const apiKeyCache = new ApiKeyCache({
+  ttl: parseInt(process.env.API_KEY_CACHE_TTL || '60000'),
+  negativeTtl: parseInt(process.env.API_KEY_CACHE_NEGATIVE_TTL || '10000'),
+  maxEntries: parseInt(process.env.API_KEY_CACHE_MAX_ENTRIES || '10000')
+});
+
 export async function authenticateApiKey(req: Request, res: Response, next: NextFunction): Promise<void> {
   try {
     const apiKey = req.get('X-API-Key') || req.get('Authorization')?.replace('Bearer ', '');
@@ -21,7 +30,7 @@ export async function authenticateApiKey(req: Request, res: Response, next: Next
     }
 
     const db = (req as any).db as DatabaseManager;
-    const project = await db.getProjectByApiKey(apiKey);
+    const project = await apiKeyCache.resolve(apiKey, () => db.getProjectByApiKey(apiKey));
     
     if (!project) {
       res.status(401).json({
@@ -35,6 +44,7 @@ export async function authenticateApiKey(req: Request, res: Response, next: Next
     // Attach project info to request
     (req as any).projectId = project.id;
     (req as any).projectName = project.name;
+    (req as any).samplingPolicy = project.sampling ?? null;
     
     next();
   } catch (error) {
@@ -1,6 +1,9 @@
 // Rate limiting middleware
 import rateLimit from 'express-rate-limit';
-import { Request, Response } from 'express';
+import { Request, Response, NextFunction } from 'express';
+import type Redis from 'ioredis';
+import { getRedisClient, isRedisReady } from '../redis/redis-client';
+import { countExportTraceServiceRequestSpans } from '../decoders/otlp-protobuf';
 
 // Create rate limiter for API endpoints
 export const rateLimiter = rateLimit({
@@ -42,3 +45,280 @@ export const batchRateLimiter = rateLimit({
     return `batch:${projectId || req.ip || 'unknown'}`;
   }
 });
+
+// Distributed per-project quota: token buckets for items (spans or events)
+// and bytes, shared across replicas through Redis
+export interface QuotaConfig {
+  itemsPerSecond: number;
+  itemsBurst: number;
+  bytesPerSecond: number;
+  bytesBurst: number;
+  replicas: number; // local fallback budget is the global rate divided by this
+  keyPrefix: string;
+}
+
+export interface QuotaDecision {
+  allowed: boolean;
+  retryAfter: number; // seconds
+  source: 'redis' | 'local';
+}
+
+export interface QuotaStats {
+  allowed: number;
+  limited: number;
+  redisDecisions: number;
+  localDecisions: number;
+  redisErrors: number;
+}
+
+// Refills both buckets from the elapsed time and takes both costs, or neither,
+// in one atomic round trip. Time comes from the Redis server so replicas with
+// skewed clocks share one timeline.
+const TOKEN_BUCKET_SCRIPT = `
+local itemRate = tonumber(ARGV[1])
+local itemBurst = tonumber(ARGV[2])
+local itemCost = tonumber(ARGV[3])
+local byteRate = tonumber(ARGV[4])
+local byteBurst = tonumber(ARGV[5])
+local byteCost = tonumber(ARGV[6])
+
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+
+local state = redis.call('HMGET', KEYS[1], 'items', 'bytes', 'ts')
+local items = tonumber(state[1]) or itemBurst
+local bytes = tonumber(state[2]) or byteBurst
+local ts = tonumber(state[3]) or now
+
+local elapsed = math.max(0, now - ts) / 1000
+items = math.min(itemBurst, items + elapsed * itemRate)
+bytes = math.min(byteBurst, bytes + elapsed * byteRate)
+
+local allowed = 0
+local wait = 0
+if items >= itemCost and bytes >= byteCost then
+  items = items - itemCost
+  bytes = bytes - byteCost
+  allowed = 1
+else
+  if items < itemCost then wait = math.max(wait, (itemCost - items) / itemRate) end
+  if bytes < byteCost then wait = math.max(wait, (byteCost - bytes) / byteRate) end
+end
+
+redis.call('HSET', KEYS[1], 'items', tostring(items), 'bytes', tostring(bytes), 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(math.max(itemBurst / itemRate, byteBurst / byteRate) * 1000) + 1000)
+
+return { allowed, math.ceil(wait) }
+`;
+
+type QuotaRedis = Redis & {
+  takeIngestionQuota(key: string, ...args: number[]): Promise<[number, number]>;
+};
+
+interface LocalBucket {
+  items: number;
+  bytes: number;
+  updatedAt: number;
+}
+
+const MAX_LOCAL_BUCKETS = 10000;
+
+export class QuotaLimiter {
+  private config: QuotaConfig;
+  private redis: QuotaRedis | null;
+  private localBuckets = new Map<string, LocalBucket>();
+  private stats: QuotaStats = {
+    allowed: 0,
+    limited: 0,
+    redisDecisions: 0,
+    localDecisions: 0,
+    redisErrors: 0
+  };
+
+  constructor(config: Partial<QuotaConfig> = {}, redis: Redis | null = null) {
+    this.config = {
+      itemsPerSecond: 1000,
+      itemsBurst: 5000,
+      bytesPerSecond: 5 * 1024 * 1024,
+      bytesBurst: 20 * 1024 * 1024,
+      replicas: 1,
+      keyPrefix: 'tracelens:quota:',
+      ...config
+    };
+
+    if (redis) {
+      // defineCommand sends EVALSHA and only falls back to EVAL on NOSCRIPT
+      redis.defineCommand('takeIngestionQuota', { numberOfKeys: 1, lua: TOKEN_BUCKET_SCRIPT });
+    }
+    this.redis = redis as QuotaRedis | null;
+  }
+
+  public async take(projectId: string, items: number, bytes: number): Promise<QuotaDecision> {
+    // A single request larger than the burst is let through on a full bucket
+    // rather than being rejected forever
+    const itemCost = Math.min(Math.max(items, 0), this.config.itemsBurst);
+    const byteCost = Math.min(Math.max(bytes, 0), this.config.bytesBurst);
+
+    let decision: QuotaDecision | null = null;
+
+    if (isRedisReady(this.redis)) {
+      try {
+        const [allowed, retryAfter] = await this.redis.takeIngestionQuota(
+          this.config.keyPrefix + projectId,
+          this.config.itemsPerSecond,
+          this.config.itemsBurst,
+          itemCost,
+          this.config.bytesPerSecond,
+          this.config.bytesBurst,
+          byteCost
+        );
+        decision = { allowed: allowed === 1, retryAfter, source: 'redis' };
+        this.stats.redisDecisions++;
+      } catch (error) {
+        this.stats.redisErrors++;
+      }
+    }
+
+    if (!decision) {
+      decision = this.takeLocal(projectId, itemCost, byteCost);
+      this.stats.localDecisions++;
+    }
+
+    if (decision.allowed) {
+      this.stats.allowed++;
+    } else {
+      this.stats.limited++;
+    }
+
+    return decision;
+  }
+
+  public getStats(): QuotaStats & { backend: 'redis' | 'local' } {
+    return {
+      backend: isRedisReady(this.redis) ? 'redis' : 'local',
+      ...this.stats
+    };
+  }
+
+  // Per-replica share of the global budget, used while Redis is unreachable
+  private takeLocal(projectId: string, itemCost: number, byteCost: number): QuotaDecision {
+    const share = Math.max(this.config.replicas, 1);
+    const itemRate = this.config.itemsPerSecond / share;
+    const byteRate = this.config.bytesPerSecond / share;
+    const itemBurst = Math.max(this.config.itemsBurst / share, itemCost);
+    const byteBurst = Math.max(this.config.bytesBurst / share, byteCost);
+    const now = Date.now();
+
+    let bucket = this.localBuckets.get(projectId);
+    if (!bucket) {
+      if (this.localBuckets.size >= MAX_LOCAL_BUCKETS) {
+        const oldest = this.localBuckets.keys().next().value;
+        if (oldest !== undefined) this.localBuckets.delete(oldest);
+      }
+      bucket = { items: itemBurst, bytes: byteBurst, updatedAt: now };
+      this.localBuckets.set(projectId, bucket);
+    }
+
+    const elapsed = Math.max(0, now - bucket.updatedAt) / 1000;
+    bucket.items = Math.min(itemBurst, bucket.items + elapsed * itemRate);
+    bucket.bytes = Math.min(byteBurst, bucket.bytes + elapsed * byteRate);
+    bucket.updatedAt = now;
+
+    if (bucket.items >= itemCost && bucket.bytes >= byteCost) {
+      bucket.items -= itemCost;
+      bucket.bytes -= byteCost;
+      return { allowed: true, retryAfter: 0, source: 'local' };
+    }
+
+    const wait = Math.max(
+      bucket.items < itemCost ? (itemCost - bucket.items) / itemRate : 0,
+      bucket.bytes < byteCost ? (byteCost - bucket.bytes) / byteRate : 0
+    );
+    return { allowed: false, retryAfter: Math.ceil(wait), source: 'local' };
+  }
+}
+
+export function loadQuotaConfig(): Partial<QuotaConfig> {
+  return {
+    itemsPerSecond: parseInt(process.env.RATE_LIMIT_ITEMS_PER_SECOND || '1000'),
+    itemsBurst: parseInt(process.env.RATE_LIMIT_ITEMS_BURST || '5000'),
+    bytesPerSecond: parseInt(process.env.RATE_LIMIT_BYTES_PER_SECOND || String(5 * 1024 * 1024)),
+    bytesBurst: parseInt(process.env.RATE_LIMIT_BYTES_BURST || String(20 * 1024 * 1024)),
+    replicas: parseInt(process.env.RATE_LIMIT_REPLICAS || '1')
+  };
+}
+
+export const quotaLimiter = new QuotaLimiter(loadQuotaConfig(), getRedisClient());
+
+// Decompressed body size recorded by the body parsers, falling back to the
+// declared length for bodies that were not buffered
+function requestBytes(req: Request): number {
+  const rawBodySize = (req as any).rawBodySize;
+  if (typeof rawBodySize === 'number') return rawBodySize;
+  if (Buffer.isBuffer(req.body)) return req.body.length;
+  return parseInt(req.get('Content-Length') || '0') || 0;
+}
+
+function countTraceSpans(body: unknown): number {
+  if (Buffer.isBuffer(body)) {
+    try {
+      return countExportTraceServiceRequestSpans(body);
+    } catch {
+      // Malformed payloads are rejected by the route handler
+      return 0;
+    }
+  }
+
+  let count = 0;
+  const resourceSpans = (body as any)?.resourceSpans;
+  if (Array.isArray(resourceSpans)) {
+    for (const resourceSpan of resourceSpans) {
+      if (!Array.isArray(resourceSpan?.scopeSpans)) continue;
+      for (const scopeSpan of resourceSpan.scopeSpans) {
+        if (Array.isArray(scopeSpan?.spans)) count += scopeSpan.spans.length;
+      }
+    }
+  } else if (Array.isArray(body)) {
+    // Native format: an array of traces with span arrays
+    for (const trace of body) {
+      if (Array.isArray(trace?.spans)) count += trace.spans.length;
+    }
+  }
+
+  return count;
+}
+
+function countEvents(body: unknown): number {
+  return Array.isArray(body) ? body.length : 1;
+}
+
+function createQuotaMiddleware(countItems: (body: unknown) => number) {
+  return async (req: Request, res: Response, next: NextFunction): Promise<void> => {
+    // Streamed bodies are charged per flushed batch by the route itself
+    if ((req as any).otlpStreaming) {
+      next();
+      return;
+    }
+
+    const projectId = (req as any).projectId || req.ip || 'unknown';
+    const decision = await quotaLimiter.take(projectId, countItems(req.body), requestBytes(req));
+
+    if (decision.allowed) {
+      next();
+      return;
+    }
+
+    const retryAfter = Math.max(decision.retryAfter, 1);
+    res.set('Retry-After', String(retryAfter));
+    res.status(429).json({
+      success: false,
+      error: 'Too many requests',
+      message: 'Ingestion quota exceeded. Please try again later.',
+      retryAfter
+    });
+  };
+}
+
+// Must run after body parsing and authentication
+export const traceQuotaLimiter = createQuotaMiddleware(countTraceSpans);
+export const eventQuotaLimiter = createQuotaMiddleware(countEvents);
@@ -163,9 +163,9 @@ export class TraceNormalizer {
     const s = span as Record<string, unknown>;
 
     // Convert OTLP format to TraceLens format
-    const traceId = this.bytesToHex(s.traceId as Uint8Array);
-    const spanId = this.bytesToHex(s.spanId as Uint8Array);
-    const parentSpanId = s.parentSpanId ? this.bytesToHex(s.parentSpanId as Uint8Array) : undefined;
+    const traceId = this.idToHex(s.traceId, 16);
+    const spanId = this.idToHex(s.spanId, 8);
+    const parentSpanId = this.hasId(s.parentSpanId) ? this.idToHex(s.parentSpanId, 8) : undefined;
 
     // Convert nanoseconds to microseconds
     const startTime = Number(s.startTimeUnixNano || 0) / 1000;
@@ -188,14 +188,22 @@ export class TraceNormalizer {
     };
   }
 
-  private bytesToHex(bytes: Uint8Array | unknown): string {
-    if (!bytes || !(bytes instanceof Uint8Array)) {
-      return '00000000000000000000000000000000';
+  // OTLP/protobuf carries IDs as raw bytes (Buffer views from the decoder),
+  // OTLP/JSON as hex strings; both map to lowercase hex without intermediate copies
+  private idToHex(id: unknown, byteLength: number): string {
+    if (id instanceof Uint8Array && id.length > 0) {
+      return Buffer.from(id.buffer, id.byteOffset, id.byteLength).toString('hex');
     }
-    
-    return Array.from(bytes)
-      .map(b => b.toString(16).padStart(2, '0'))
-      .join('');
+
+    if (typeof id === 'string' && id.length > 0) {
+      return id.toLowerCase();
+    }
+
+    return '0'.repeat(byteLength * 2);
+  }
+
+  private hasId(id: unknown): boolean {
+    return (id instanceof Uint8Array || typeof id === 'string') && id.length > 0;
   }
 
   private normalizeOTLPAttributes(attributes: unknown): Record<string, string | number | boolean> {
@@ -235,26 +243,18 @@ export class TraceNormalizer {
 
     const s = status as Record<string, unknown>;
     
-    // Map OTLP status codes to TraceLens status
+    // OTLP has three status codes: UNSET (0, omitted by protobuf encoders),
+    // OK (1) and ERROR (2). OTLP/JSON may send the enum names instead.
+    // There is no finer error code, so ERROR maps to UNKNOWN.
     switch (s.code) {
-      case 0: return SpanStatus.OK;
-      case 1: return SpanStatus.CANCELLED;
-      case 2: return SpanStatus.UNKNOWN;
-      case 3: return SpanStatus.INVALID_ARGUMENT;
-      case 4: return SpanStatus.DEADLINE_EXCEEDED;
-      case 5: return SpanStatus.NOT_FOUND;
-      case 6: return SpanStatus.ALREADY_EXISTS;
-      case 7: return SpanStatus.PERMISSION_DENIED;
-      case 8: return SpanStatus.RESOURCE_EXHAUSTED;
-      case 9: return SpanStatus.FAILED_PRECONDITION;
-      case 10: return SpanStatus.ABORTED;
-      case 11: return SpanStatus.OUT_OF_RANGE;
-      case 12: return SpanStatus.UNIMPLEMENTED;
-      case 13: return SpanStatus.INTERNAL;
-      case 14: return SpanStatus.UNAVAILABLE;
-      case 15: return SpanStatus.DATA_LOSS;
-      case 16: return SpanStatus.UNAUTHENTICATED;
-      default: return SpanStatus.UNKNOWN;
+      case undefined:
+      case 0:
+      case 1:
+      case 'STATUS_CODE_UNSET':
+      case 'STATUS_CODE_OK':
+        return SpanStatus.OK;
+      default:
+        return SpanStatus.UNKNOWN;
     }
   }
 
@@ -0,0 +1,550 @@
+// Bounded write-behind queue that decouples ingestion requests from database commits
+import os from 'os';
+import { randomBytes, randomUUID } from 'crypto';
+import { Response } from 'express';
+import type Redis from 'ioredis';
+import { PerformanceEvent, Trace } from '@tracelens/shared';
+import { DatabaseManager } from '../database/database-manager';
+
+export type IngestionJob =
+  | { type: 'traces'; id: string; projectId: string; traces: Trace[]; attempts: number; enqueuedAt: number }
+  | { type: 'events'; id: string; projectId: string; events: PerformanceEvent[]; attempts: number; enqueuedAt: number };
+
+export type EnqueueResult = 'accepted' | 'full' | 'unavailable';
+
+export interface IngestionQueueConfig {
+  backend: 'memory' | 'redis';
+  maxDepth: number; // queued request batches
+  workers: number;
+  batchSize: number; // jobs taken per worker iteration
+  pollInterval: number; // milliseconds
+  maxAttempts: number;
+  retryDelay: number; // milliseconds before the first retry, doubled per attempt
+  maxRetryDelay: number; // milliseconds
+  consumerTimeout: number; // milliseconds without a heartbeat before a Redis consumer's jobs are requeued
+  redisKey: string;
+}
+
+export interface IngestionQueueStats {
+  backend: 'memory' | 'redis';
+  depth: number;
+  maxDepth: number;
+  workers: number;
+  inFlight: number;
+  enqueued: number;
+  processed: number;
+  dropped: number;
+  failed: number;
+  retried: number;
+  recovered: number;
+}
+
+interface QueueStore {
+  readonly isLocal: boolean;
+  push(job: IngestionJob, maxDepth: number): Promise<boolean>;
+  // Jobs whose retry is due by now are taken before new ones
+  take(max: number, now: number): Promise<IngestionJob[]>;
+  // Removes taken jobs once they are written or rescheduled
+  ack(jobs: IngestionJob[]): Promise<void>;
+  retry(job: IngestionJob, readyAt: number): Promise<void>;
+  // Requeues jobs taken by consumers that stopped without acknowledging them
+  recover(): Promise<number>;
+  depth(): Promise<number>;
+  close(): Promise<void>;
+}
+
+class MemoryQueueStore implements QueueStore {
+  public readonly isLocal = true;
+  private jobs: IngestionJob[] = [];
+  private head = 0;
+  // Retries waiting out their backoff, ordered by readyAt
+  private delayed: Array<{ readyAt: number; job: IngestionJob }> = [];
+
+  public async push(job: IngestionJob, maxDepth: number): Promise<boolean> {
+    if (maxDepth > 0 && this.jobs.length - this.head + this.delayed.length >= maxDepth) {
+      return false;
+    }
+    this.jobs.push(job);
+    return true;
+  }
+
+  public async take(max: number, now: number): Promise<IngestionJob[]> {
+    let due = 0;
+    while (due < this.delayed.length && this.delayed[due]!.readyAt <= now) due++;
+    const taken = this.delayed.splice(0, Math.min(due, max)).map(entry => entry.job);
+
+    const end = Math.min(this.head + max - taken.length, this.jobs.length);
+    taken.push(...this.jobs.slice(this.head, end));
+    this.head = end;
+
+    // Compact once the consumed prefix dominates the backing array
+    if (this.head > 1024 && this.head * 2 > this.jobs.length) {
+      this.jobs = this.jobs.slice(this.head);
+      this.head = 0;
+    }
+
+    return taken;
+  }
+
+  public async ack(): Promise<void> {
+    // Taken jobs only live in the worker that holds them
+  }
+
+  public async retry(job: IngestionJob, readyAt: number): Promise<void> {
+    let index = this.delayed.length;
+    while (index > 0 && this.delayed[index - 1]!.readyAt > readyAt) index--;
+    this.delayed.splice(index, 0, { readyAt, job });
+  }
+
+  public async recover(): Promise<number> {
+    return 0;
+  }
+
+  public async depth(): Promise<number> {
+    return this.jobs.length - this.head + this.delayed.length;
+  }
+
+  public async close(): Promise<void> {}
+}
+
+// Bounded LPUSH in a single round trip; a maxDepth of 0 means unbounded
+const BOUNDED_PUSH_SCRIPT = `
+local max = tonumber(ARGV[2])
+if max > 0 and redis.call('LLEN', KEYS[1]) >= max then
+  return 0
+end
+redis.call('LPUSH', KEYS[1], ARGV[1])
+return 1
+`;
+
+// Moves due retries back onto the queue, then moves up to ARGV[1] jobs
+// from the queue onto this consumer's processing list
+const TAKE_SCRIPT = `
+local due = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[2], 'LIMIT', 0, tonumber(ARGV[1]))
+for _, job in ipairs(due) do
+  redis.call('ZREM', KEYS[2], job)
+  redis.call('RPUSH', KEYS[1], job)
+end
+local taken = {}
+for i = 1, tonumber(ARGV[1]) do
+  local job = redis.call('LMOVE', KEYS[1], KEYS[3], 'RIGHT', 'LEFT')
+  if not job then break end
+  taken[#taken + 1] = job
+end
+return taken
+`;
+
+// Returns the processing lists of consumers whose heartbeat has expired to
+// the queue. Consumer keys are derived from ARGV[1], so this needs a
+// standalone Redis rather than a cluster.
+const RECOVER_SCRIPT = `
+local recovered = 0
+for _, consumer in ipairs(redis.call('SMEMBERS', KEYS[1])) do
+  if redis.call('EXISTS', ARGV[1] .. ':consumer:' .. consumer) == 0 then
+    local processing = ARGV[1] .. ':processing:' .. consumer
+    while redis.call('LMOVE', processing, KEYS[2], 'RIGHT', 'RIGHT') do
+      recovered = recovered + 1
+    end
+    redis.call('SREM', KEYS[1], consumer)
+  end
+end
+return recovered
+`;
+
+// Jobs are moved onto a processing list owned by this consumer while they
+// are written and removed once acknowledged. A consumer that dies stops
+// refreshing its heartbeat, and the next recovery returns its jobs to the
+// queue, so delivery is at least once.
+class RedisQueueStore implements QueueStore {
+  public readonly isLocal = false;
+  private consumerId = `${os.hostname()}:${process.pid}:${randomBytes(4).toString('hex')}`;
+  private processingKey: string;
+  private heartbeatKey: string;
+  private delayedKey: string;
+  private consumersKey: string;
+  private raw = new WeakMap<IngestionJob, string>();
+  private registered = false;
+  private lastHeartbeat = 0;
+
+  constructor(private redis: Redis, private key: string, private consumerTimeout: number) {
+    this.processingKey = `${key}:processing:${this.consumerId}`;
+    this.heartbeatKey = `${key}:consumer:${this.consumerId}`;
+    this.delayedKey = `${key}:delayed`;
+    this.consumersKey = `${key}:consumers`;
+  }
+
+  public async push(job: IngestionJob, maxDepth: number): Promise<boolean> {
+    const result = await this.redis.eval(BOUNDED_PUSH_SCRIPT, 1, this.key, JSON.stringify(job), maxDepth);
+    return result === 1;
+  }
+
+  public async take(max: number, now: number): Promise<IngestionJob[]> {
+    await this.heartbeat();
+    const items = await this.redis.eval(
+      TAKE_SCRIPT, 3, this.key, this.delayedKey, this.processingKey, max, now
+    ) as string[];
+
+    return items.map(item => {
+      const job = JSON.parse(item) as IngestionJob;
+      this.raw.set(job, item);
+      return job;
+    });
+  }
+
+  public async ack(jobs: IngestionJob[]): Promise<void> {
+    const pipeline = this.redis.pipeline();
+    for (const job of jobs) {
+      const item = this.raw.get(job);
+      if (item !== undefined) pipeline.lrem(this.processingKey, 1, item);
+    }
+    await pipeline.exec();
+  }
+
+  public async retry(job: IngestionJob, readyAt: number): Promise<void> {
+    await this.redis.zadd(this.delayedKey, readyAt, JSON.stringify(job));
+  }
+
+  public async recover(): Promise<number> {
+    await this.heartbeat(true);
+    return await this.redis.eval(RECOVER_SCRIPT, 2, this.consumersKey, this.key, this.key) as number;
+  }
+
+  public async depth(): Promise<number> {
+    const [queued, delayed] = await Promise.all([this.redis.llen(this.key), this.redis.zcard(this.delayedKey)]);
+    return queued + delayed;
+  }
+
+  // The next recovery, on any instance, unregisters this consumer and
+  // requeues anything it failed to acknowledge
+  public async close(): Promise<void> {
+    if (!this.registered) return;
+    this.registered = false;
+    await this.redis.del(this.heartbeatKey);
+  }
+
+  private async heartbeat(force: boolean = false): Promise<void> {
+    const now = Date.now();
+    if (!force && this.registered && now - this.lastHeartbeat < this.consumerTimeout / 3) return;
+
+    this.lastHeartbeat = now;
+    await this.redis.set(this.heartbeatKey, '1', 'PX', this.consumerTimeout);
+    if (!this.registered) {
+      await this.redis.sadd(this.consumersKey, this.consumerId);
+      this.registered = true;
+    }
+  }
+}
+
+export class IngestionQueue {
+  private config: IngestionQueueConfig;
+  private db: DatabaseManager;
+  private store: QueueStore;
+  private running = false;
+  private workerLoops: Promise<void>[] = [];
+  private waiters: Array<() => void> = [];
+  private recoveryTimer: NodeJS.Timeout | null = null;
+  private stats = {
+    enqueued: 0,
+    processed: 0,
+    dropped: 0,
+    failed: 0,
+    retried: 0,
+    recovered: 0,
+    inFlight: 0
+  };
+
+  constructor(db: DatabaseManager, config: Partial<IngestionQueueConfig> = {}, redis: Redis | null = null) {
+    this.db = db;
+    this.config = {
+      backend: 'memory',
+      maxDepth: 10000,
+      workers: 4,
+      batchSize: 50,
+      pollInterval: 100,
+      maxAttempts: 3,
+      retryDelay: 1000,
+      maxRetryDelay: 30000,
+      consumerTimeout: 60000,
+      redisKey: 'tracelens:ingestion:queue',
+      ...config
+    };
+
+    if (this.config.backend === 'redis') {
+      if (!redis) {
+        throw new Error('Redis ingestion queue backend requires REDIS_URL');
+      }
+      this.store = new RedisQueueStore(redis, this.config.redisKey, this.config.consumerTimeout);
+    } else {
+      this.store = new MemoryQueueStore();
+    }
+  }
+
+  public start(): void {
+    if (this.running) return;
+
+    this.running = true;
+    for (let i = 0; i < this.config.workers; i++) {
+      this.workerLoops.push(this.runWorker());
+    }
+
+    // Also keeps this consumer's heartbeat alive during long writes
+    if (!this.store.isLocal) {
+      this.recover();
+      this.recoveryTimer = setInterval(() => this.recover(), this.config.consumerTimeout / 3);
+      this.recoveryTimer.unref();
+    }
+  }
+
+  // Stops accepting work; a local queue is drained before workers exit
+  public async stop(timeoutMs: number = 10000): Promise<void> {
+    if (!this.running) return;
+
+    this.running = false;
+    if (this.recoveryTimer) {
+      clearInterval(this.recoveryTimer);
+      this.recoveryTimer = null;
+    }
+    this.wakeAll();
+
+    let timer: NodeJS.Timeout | undefined;
+    const timeout = new Promise<void>(resolve => {
+      timer = setTimeout(() => {
+        console.warn('Ingestion queue did not drain before shutdown timeout');
+        resolve();
+      }, timeoutMs);
+    });
+
+    const drained = await Promise.race([Promise.all(this.workerLoops).then(() => true), timeout.then(() => false)]);
+    clearTimeout(timer);
+    this.workerLoops = [];
+
+    // Jobs still being written stay on the processing list for recovery
+    if (drained) {
+      try {
+        await this.store.close();
+      } catch (error) {
+        console.error('Ingestion queue close failed:', error);
+      }
+    }
+  }
+
+  public async enqueueTraces(projectId: string, traces: Trace[]): Promise<EnqueueResult> {
+    return this.enqueue({ type: 'traces', id: randomUUID(), projectId, traces, attempts: 0, enqueuedAt: Date.now() });
+  }
+
+  public async enqueueEvents(projectId: string, events: PerformanceEvent[]): Promise<EnqueueResult> {
+    return this.enqueue({ type: 'events', id: randomUUID(), projectId, events, attempts: 0, enqueuedAt: Date.now() });
+  }
+
+  public async getStats(): Promise<IngestionQueueStats> {
+    let depth = -1;
+    try {
+      depth = await this.store.depth();
+    } catch {
+      // Backend unreachable; report unknown depth
+    }
+
+    return {
+      backend: this.config.backend,
+      depth,
+      maxDepth: this.config.maxDepth,
+      workers: this.config.workers,
+      ...this.stats
+    };
+  }
+
+  private async enqueue(job: IngestionJob): Promise<EnqueueResult> {
+    const itemCount = this.countItems(job);
+    if (itemCount === 0) {
+      return 'accepted';
+    }
+
+    if (!this.running) {
+      this.stats.dropped += itemCount;
+      return 'unavailable';
+    }
+
+    let accepted: boolean;
+    try {
+      accepted = await this.store.push(job, this.config.maxDepth);
+    } catch (error) {
+      console.error('Ingestion queue push failed:', error);
+      this.stats.dropped += itemCount;
+      return 'unavailable';
+    }
+
+    if (!accepted) {
+      this.stats.dropped += itemCount;
+      return 'full';
+    }
+
+    this.stats.enqueued += itemCount;
+    this.wakeOne();
+    return 'accepted';
+  }
+
+  private async runWorker(): Promise<void> {
+    while (this.running || this.store.isLocal) {
+      let jobs: IngestionJob[];
+      try {
+        // A draining local queue does not wait out retry backoffs
+        jobs = await this.store.take(this.config.batchSize, this.running || !this.store.isLocal ? Date.now() : Infinity);
+      } catch (error) {
+        console.error('Ingestion queue take failed:', error);
+        if (!this.running) return;
+        await this.waitForWork();
+        continue;
+      }
+
+      if (jobs.length === 0) {
+        if (!this.running) return;
+        await this.waitForWork();
+        continue;
+      }
+
+      const itemCount = jobs.reduce((sum, job) => sum + this.countItems(job), 0);
+      this.stats.inFlight += itemCount;
+      try {
+        await this.processJobs(jobs);
+      } finally {
+        this.stats.inFlight -= itemCount;
+      }
+    }
+  }
+
+  private async processJobs(jobs: IngestionJob[]): Promise<void> {
+    // Coalesce jobs for the same project and type into one bulk write
+    const groups = new Map<string, IngestionJob[]>();
+    for (const job of jobs) {
+      const key = `${job.type}:${job.projectId}`;
+      const group = groups.get(key);
+      if (group) {
+        group.push(job);
+      } else {
+        groups.set(key, [job]);
+      }
+    }
+
+    for (const group of groups.values()) {
+      const first = group[0]!;
+      const itemCount = group.reduce((sum, job) => sum + this.countItems(job), 0);
+
+      try {
+        if (first.type === 'traces') {
+          const traces = group.flatMap(job => job.type === 'traces' ? job.traces : []);
+          await this.db.insertTraceBatch(first.projectId, traces);
+        } else {
+          const events = group.flatMap(job => job.type === 'events' ? job.events : []);
+          await this.db.insertPerformanceEventBatch(first.projectId, events);
+        }
+        this.stats.processed += itemCount;
+      } catch (error) {
+        console.error(`Ingestion queue write failed for project ${first.projectId}:`, error);
+        await this.retryOrFail(group);
+      }
+
+      try {
+        await this.store.ack(group);
+      } catch (error) {
+        // Left on the processing list; recovery delivers them again
+        console.error('Ingestion queue ack failed:', error);
+      }
+    }
+  }
+
+  private async retryOrFail(jobs: IngestionJob[]): Promise<void> {
+    for (const job of jobs) {
+      const itemCount = this.countItems(job);
+
+      if (job.attempts + 1 < this.config.maxAttempts) {
+        // Full jitter keeps retries of a failed batch from landing together
+        const delay = Math.min(this.config.retryDelay * 2 ** job.attempts, this.config.maxRetryDelay);
+        try {
+          await this.store.retry({ ...job, attempts: job.attempts + 1 }, Date.now() + Math.random() * delay);
+          this.stats.retried += itemCount;
+          continue;
+        } catch (error) {
+          console.error('Ingestion queue retry push failed:', error);
+        }
+      }
+
+      this.stats.failed += itemCount;
+    }
+  }
+
+  private async recover(): Promise<void> {
+    try {
+      const recovered = await this.store.recover();
+      if (recovered > 0) {
+        console.warn(`Requeued ${recovered} ingestion jobs from stopped consumers`);
+        this.stats.recovered += recovered;
+        this.wakeAll();
+      }
+    } catch (error) {
+      console.error('Ingestion queue recovery failed:', error);
+    }
+  }
+
+  private countItems(job: IngestionJob): number {
+    return job.type === 'traces' ? job.traces.length : job.events.length;
+  }
+
+  private waitForWork(): Promise<void> {
+    return new Promise(resolve => {
+      const wake = () => {
+        clearTimeout(timer);
+        resolve();
+      };
+      const timer = setTimeout(() => {
+        this.waiters = this.waiters.filter(waiter => waiter !== wake);
+        resolve();
+      }, this.config.pollInterval);
+      this.waiters.push(wake);
+    });
+  }
+
+  private wakeOne(): void {
+    const waiter = this.waiters.shift();
+    if (waiter) waiter();
+  }
+
+  private wakeAll(): void {
+    const waiters = this.waiters;
+    this.waiters = [];
+    waiters.forEach(waiter => waiter());
+  }
+}
+
+// Maps a rejected enqueue to 429 (queue full, retry later) or 503 (queue unavailable)
+export function sendQueueRejection(res: Response, result: Exclude<EnqueueResult, 'accepted'>): void {
+  res.set('Retry-After', '1');
+
+  if (result === 'full') {
+    res.status(429).json({
+      success: false,
+      error: 'Ingestion queue full',
+      message: 'The ingestion queue is at capacity. Please retry shortly.'
+    });
+    return;
+  }
+
+  res.status(503).json({
+    success: false,
+    error: 'Ingestion queue unavailable',
+    message: 'The ingestion queue is not accepting work. Please retry shortly.'
+  });
+}
+
+export function loadIngestionQueueConfig(): Partial<IngestionQueueConfig> {
+  return {
+    backend: process.env.INGESTION_QUEUE_BACKEND === 'redis' ? 'redis' : 'memory',
+    maxDepth: parseInt(process.env.INGESTION_QUEUE_MAX_DEPTH || '10000'),
+    workers: parseInt(process.env.INGESTION_QUEUE_WORKERS || '4'),
+    batchSize: parseInt(process.env.INGESTION_QUEUE_BATCH_SIZE || '50'),
+    pollInterval: parseInt(process.env.INGESTION_QUEUE_POLL_INTERVAL || '100'),
+    maxAttempts: parseInt(process.env.INGESTION_QUEUE_MAX_ATTEMPTS || '3'),
+    retryDelay: parseInt(process.env.INGESTION_QUEUE_RETRY_DELAY || '1000'),
+    maxRetryDelay: parseInt(process.env.INGESTION_QUEUE_MAX_RETRY_DELAY || '30000'),
+    consumerTimeout: parseInt(process.env.INGESTION_QUEUE_CONSUMER_TIMEOUT || '60000')
+  };
+}
@@ -0,0 +1,41 @@
+// Shared Redis connection for optional distributed features
+import Redis from 'ioredis';
+
+let client: Redis | null | undefined;
+
+// Returns the process-wide Redis client, or null when REDIS_URL is not configured
+export function getRedisClient(): Redis | null {
+  if (client !== undefined) {
+    return client;
+  }
+
+  const url = process.env.REDIS_URL;
+  if (!url) {
+    client = null;
+    return client;
+  }
+
+  client = new Redis(url, {
+    // Fail fast instead of queueing commands while disconnected so callers
+    // can fall back to local behaviour
+    maxRetriesPerRequest: 1,
+    enableOfflineQueue: false
+  });
+
+  client.on('error', (error: Error) => {
+    console.error('Redis error:', error.message);
+  });
+
+  return client;
+}
+
+export function isRedisReady(redis: Redis | null): redis is Redis {
+  return redis !== null && redis.status === 'ready';
+}
+
+export async function closeRedisClient(): Promise<void> {
+  if (client) {
+    await client.quit();
+  }
+  client = undefined;
+}
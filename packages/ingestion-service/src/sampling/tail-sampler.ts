@@ -0,0 +1,440 @@
+// Tail-based trace sampling between normalization and storage
+//
+// Spans are buffered per trace until the trace is complete (its root span
+// has arrived and no span has followed for idleTimeout) or decisionWait has
+// passed since its first span. Each trace is then kept if it contains an
+// error, if its duration is at or above the project's latency percentile,
+// or if its trace ID hashes below the project's sample rate. Dropped traces
+// are emitted as 'tracesDropped' so aggregates can still count them.
+// Decisions are remembered for a while, and late spans follow their trace.
+//
+// Buffers, decisions and latency thresholds are per process. Only the hash
+// is shared, so every span of a trace must reach the same process: run one
+// ingestion worker (INGESTION_WORKERS=1) per replica behind a load balancer
+// that routes by trace ID. Otherwise each process judges its own part of a
+// trace, and a trace whose error reached one process is kept only in part.
+import { EventEmitter } from 'events';
+import { Trace, TraceSpan, SpanStatus } from '@tracelens/shared';
+import { LatencySketch } from '../sketches/latency-sketch';
+
+export interface SamplingPolicy {
+  keepErrors: boolean;
+  latencyPercentile: number; // 0..1; traces at or above it are kept, 0 disables
+  sampleRate: number; // fraction of the remaining traces kept, 0..1
+}
+
+export interface TailSamplingConfig {
+  decisionWait: number; // milliseconds after a trace's first span
+  idleTimeout: number; // milliseconds without spans before a rooted trace is complete
+  tickInterval: number; // milliseconds
+  maxBufferedSpans: number; // the oldest traces are decided early beyond this
+  decisionCacheSize: number; // decided traces remembered for late spans
+  latencyWindow: number; // milliseconds of trace durations behind each percentile
+  minLatencySamples: number; // durations needed before the percentile applies
+  policy: SamplingPolicy; // for projects without their own sampling settings
+}
+
+export type SamplingReason = 'error' | 'latency' | 'sampled';
+
+export interface ProjectSamplingStats {
+  receivedTraces: number;
+  keptErrors: number;
+  keptSlow: number;
+  keptSampled: number;
+  droppedTraces: number;
+  droppedSpans: number;
+  latencyThreshold: number | null; // microseconds
+}
+
+export interface TailSamplingStats {
+  bufferedTraces: number;
+  bufferedSpans: number;
+  forcedDecisions: number;
+  lateSpans: number;
+  writeErrors: number;
+  lostTraces: number;
+  projects: Record<string, ProjectSamplingStats>;
+}
+
+export type TraceWriter = (projectId: string, traces: Trace[]) => Promise<void>;
+
+interface PendingTrace {
+  projectId: string;
+  traceId: string;
+  spans: Map<string, TraceSpan>;
+  hasRoot: boolean;
+  firstSeen: number;
+  lastSeen: number;
+}
+
+interface ProjectState {
+  policy: SamplingPolicy;
+  // Durations of the current and previous window; the threshold is read
+  // from the previous one once it has enough samples
+  current: LatencySketch;
+  previous: LatencySketch | null;
+  windowStart: number;
+  threshold: number | null;
+  stats: Omit<ProjectSamplingStats, 'latencyThreshold'>;
+}
+
+const DEFAULT_POLICY: SamplingPolicy = {
+  keepErrors: true,
+  latencyPercentile: 0.95,
+  sampleRate: 0.1
+};
+
+const DEFAULT_CONFIG: TailSamplingConfig = {
+  decisionWait: 30000,
+  idleTimeout: 5000,
+  tickInterval: 1000,
+  maxBufferedSpans: 200000,
+  decisionCacheSize: 100000,
+  latencyWindow: 5 * 60 * 1000,
+  minLatencySamples: 100,
+  policy: DEFAULT_POLICY
+};
+
+// Position of a trace ID in [0, 1), the same in every process (FNV-1a)
+export function traceIdRatio(traceId: string): number {
+  let hash = 0x811c9dc5;
+  for (let i = 0; i < traceId.length; i++) {
+    hash ^= traceId.charCodeAt(i);
+    hash = Math.imul(hash, 0x01000193);
+  }
+  return (hash >>> 0) / 0x100000000;
+}
+
+// Project settings are free-form JSON; fields of the wrong type or out of
+// range fall back to the default
+function resolvePolicy(defaults: SamplingPolicy, settings: Partial<SamplingPolicy> | null): SamplingPolicy {
+  const fraction = (value: unknown, fallback: number) =>
+    typeof value === 'number' && value >= 0 && value <= 1 ? value : fallback;
+
+  return {
+    keepErrors: typeof settings?.keepErrors === 'boolean' ? settings.keepErrors : defaults.keepErrors,
+    latencyPercentile: fraction(settings?.latencyPercentile, defaults.latencyPercentile),
+    sampleRate: fraction(settings?.sampleRate, defaults.sampleRate)
+  };
+}
+
+// OTLP's ERROR status normalizes to UNKNOWN and UNSET/OK to OK; native
+// traces carry gRPC-style codes, where anything but OK is a failure
+function isErrorSpan(span: TraceSpan): boolean {
+  return span.status !== SpanStatus.OK || span.tags.error === true;
+}
+
+function buildTrace(traceId: string, spans: TraceSpan[]): Trace {
+  let startTime = Infinity;
+  let endTime = -Infinity;
+  for (const span of spans) {
+    startTime = Math.min(startTime, span.startTime);
+    const end = span.endTime ?? (span.duration !== undefined ? span.startTime + span.duration : undefined);
+    if (end !== undefined) endTime = Math.max(endTime, end);
+  }
+
+  const hasEnd = endTime !== -Infinity;
+  return {
+    traceId,
+    spans,
+    startTime,
+    endTime: hasEnd ? endTime : undefined,
+    duration: hasEnd ? endTime - startTime : undefined,
+    rootSpan: spans.find(span => !span.parentSpanId)
+  };
+}
+
+export class TailSampler extends EventEmitter {
+  private config: TailSamplingConfig;
+  // Map iteration order doubles as arrival order: oldest traces come first
+  private pending = new Map<string, PendingTrace>();
+  private decisions = new Map<string, boolean>();
+  private projects = new Map<string, ProjectState>();
+  private bufferedSpans = 0;
+  private timer: NodeJS.Timeout | null = null;
+  private deciding: Promise<void> | null = null;
+  private writes = new Set<Promise<void>>();
+  private stats = {
+    forcedDecisions: 0,
+    lateSpans: 0,
+    writeErrors: 0,
+    lostTraces: 0
+  };
+
+  constructor(private write: TraceWriter, config: Partial<TailSamplingConfig> = {}) {
+    super();
+    this.config = { ...DEFAULT_CONFIG, ...config };
+  }
+
+  // Buffers the spans of normalized traces. The project's own sampling
+  // settings, when given, replace the default policy field by field.
+  public add(projectId: string, traces: Trace[], policy?: Partial<SamplingPolicy> | null): void {
+    const project = this.getProject(projectId, policy);
+    const now = Date.now();
+    const lateKept: TraceSpan[] = [];
+    const lateDropped: TraceSpan[] = [];
+
+    for (const trace of traces) {
+      const key = `${projectId}\u0000${trace.traceId}`;
+
+      const decision = this.decisions.get(key);
+      if (decision !== undefined) {
+        this.stats.lateSpans += trace.spans.length;
+        (decision ? lateKept : lateDropped).push(...trace.spans);
+        continue;
+      }
+
+      let entry = this.pending.get(key);
+      if (!entry) {
+        entry = {
+          projectId,
+          traceId: trace.traceId,
+          spans: new Map(),
+          hasRoot: false,
+          firstSeen: now,
+          lastSeen: now
+        };
+        this.pending.set(key, entry);
+        project.stats.receivedTraces++;
+      }
+
+      for (const span of trace.spans) {
+        if (!entry.spans.has(span.spanId)) this.bufferedSpans++;
+        entry.spans.set(span.spanId, span);
+        if (!span.parentSpanId) entry.hasRoot = true;
+      }
+      entry.lastSeen = now;
+    }
+
+    if (lateKept.length > 0) {
+      this.writeTraces(projectId, this.groupSpans(lateKept));
+    }
+    if (lateDropped.length > 0) {
+      project.stats.droppedSpans += lateDropped.length;
+      this.emit('tracesDropped', projectId, this.groupSpans(lateDropped));
+    }
+
+    // Decide the oldest traces early rather than grow past the limit
+    if (this.bufferedSpans > this.config.maxBufferedSpans) {
+      const forced: PendingTrace[] = [];
+      let spans = this.bufferedSpans;
+      for (const entry of this.pending.values()) {
+        if (spans <= this.config.maxBufferedSpans) break;
+        forced.push(entry);
+        spans -= entry.spans.size;
+      }
+      this.stats.forcedDecisions += forced.length;
+      this.decide(forced);
+    }
+  }
+
+  public start(): void {
+    if (this.timer) return;
+    this.timer = setInterval(() => {
+      this.tick().catch(error => console.error('Tail sampling failed:', error));
+    }, this.config.tickInterval);
+    this.timer.unref();
+  }
+
+  // Stops the timer, decides every buffered trace and waits for the writes
+  public async stop(): Promise<void> {
+    if (this.timer) {
+      clearInterval(this.timer);
+      this.timer = null;
+    }
+    await this.deciding;
+    this.decide(Array.from(this.pending.values()));
+    await Promise.all(this.writes);
+  }
+
+  public async tick(): Promise<void> {
+    // Coalesce with a tick already in progress
+    if (!this.deciding) {
+      this.deciding = this.decideReady().finally(() => {
+        this.deciding = null;
+      });
+    }
+    return this.deciding;
+  }
+
+  public getStats(): TailSamplingStats {
+    const projects: Record<string, ProjectSamplingStats> = {};
+    for (const [projectId, project] of this.projects) {
+      projects[projectId] = { ...project.stats, latencyThreshold: project.threshold };
+    }
+
+    return {
+      bufferedTraces: this.pending.size,
+      bufferedSpans: this.bufferedSpans,
+      ...this.stats,
+      projects
+    };
+  }
+
+  private async decideReady(): Promise<void> {
+    const now = Date.now();
+    this.updateThresholds(now);
+
+    const ready: PendingTrace[] = [];
+    for (const entry of this.pending.values()) {
+      const complete = entry.hasRoot && now - entry.lastSeen >= this.config.idleTimeout;
+      if (complete || now - entry.firstSeen >= this.config.decisionWait) {
+        ready.push(entry);
+      }
+    }
+
+    this.decide(ready);
+    await Promise.all(this.writes);
+  }
+
+  private decide(entries: PendingTrace[]): void {
+    const kept = new Map<string, Trace[]>();
+    const dropped = new Map<string, Trace[]>();
+
+    for (const entry of entries) {
+      const key = `${entry.projectId}\u0000${entry.traceId}`;
+      this.pending.delete(key);
+      this.bufferedSpans -= entry.spans.size;
+
+      const project = this.getProject(entry.projectId);
+      const trace = buildTrace(entry.traceId, Array.from(entry.spans.values()));
+      const reason = this.sample(project, trace);
+
+      if (reason === 'error') project.stats.keptErrors++;
+      else if (reason === 'latency') project.stats.keptSlow++;
+      else if (reason === 'sampled') project.stats.keptSampled++;
+      else {
+        project.stats.droppedTraces++;
+        project.stats.droppedSpans += trace.spans.length;
+      }
+
+      const target = reason ? kept : dropped;
+      const traces = target.get(entry.projectId);
+      if (traces) traces.push(trace);
+      else target.set(entry.projectId, [trace]);
+
+      this.remember(key, reason !== null);
+    }
+
+    for (const [projectId, traces] of kept) {
+      this.writeTraces(projectId, traces);
+    }
+    for (const [projectId, traces] of dropped) {
+      this.emit('tracesDropped', projectId, traces);
+    }
+  }
+
+  private sample(project: ProjectState, trace: Trace): SamplingReason | null {
+    const { policy } = project;
+
+    if (trace.duration !== undefined) {
+      project.current.add(trace.duration);
+    }
+
+    if (policy.keepErrors && trace.spans.some(isErrorSpan)) {
+      return 'error';
+    }
+    if (policy.latencyPercentile > 0 && project.threshold !== null
+      && trace.duration !== undefined && trace.duration >= project.threshold) {
+      return 'latency';
+    }
+    if (traceIdRatio(trace.traceId) < policy.sampleRate) {
+      return 'sampled';
+    }
+    return null;
+  }
+
+  // Rotates latency windows and refreshes each project's threshold once per
+  // tick instead of querying a sketch per trace
+  private updateThresholds(now: number): void {
+    for (const project of this.projects.values()) {
+      if (now - project.windowStart >= this.config.latencyWindow) {
+        project.previous = project.current;
+        project.current = new LatencySketch();
+        project.windowStart = now;
+      }
+
+      const percentile = project.policy.latencyPercentile;
+      const sketch = project.previous && project.previous.count >= this.config.minLatencySamples
+        ? project.previous
+        : project.current;
+      project.threshold = percentile > 0 && sketch.count >= this.config.minLatencySamples
+        ? sketch.quantile(percentile)
+        : null;
+    }
+  }
+
+  private remember(key: string, keep: boolean): void {
+    this.decisions.set(key, keep);
+    if (this.decisions.size > this.config.decisionCacheSize) {
+      this.decisions.delete(this.decisions.keys().next().value!);
+    }
+  }
+
+  private writeTraces(projectId: string, traces: Trace[]): void {
+    const write = this.write(projectId, traces)
+      .catch(error => {
+        this.stats.writeErrors++;
+        this.stats.lostTraces += traces.length;
+        console.error('Failed to write sampled traces:', error);
+      })
+      .finally(() => {
+        this.writes.delete(write);
+      });
+    this.writes.add(write);
+  }
+
+  private groupSpans(spans: TraceSpan[]): Trace[] {
+    const byTrace = new Map<string, TraceSpan[]>();
+    for (const span of spans) {
+      const group = byTrace.get(span.traceId);
+      if (group) group.push(span);
+      else byTrace.set(span.traceId, [span]);
+    }
+    return Array.from(byTrace, ([traceId, group]) => buildTrace(traceId, group));
+  }
+
+  private getProject(projectId: string, policy?: Partial<SamplingPolicy> | null): ProjectState {
+    let project = this.projects.get(projectId);
+    if (!project) {
+      project = {
+        policy: this.config.policy,
+        current: new LatencySketch(),
+        previous: null,
+        windowStart: Date.now(),
+        threshold: null,
+        stats: {
+          receivedTraces: 0,
+          keptErrors: 0,
+          keptSlow: 0,
+          keptSampled: 0,
+          droppedTraces: 0,
+          droppedSpans: 0
+        }
+      };
+      this.projects.set(projectId, project);
+    }
+
+    // Settings come from the cached project, whose entry is invalidated when
+    // the project's settings change
+    if (policy !== undefined) {
+      project.policy = resolvePolicy(this.config.policy, policy);
+    }
+    return project;
+  }
+}
+
+export function loadTailSamplingConfig(): Partial<TailSamplingConfig> {
+  return {
+    decisionWait: parseInt(process.env.TRACE_SAMPLING_DECISION_WAIT || '30000'),
+    idleTimeout: parseInt(process.env.TRACE_SAMPLING_IDLE_TIMEOUT || '5000'),
+    maxBufferedSpans: parseInt(process.env.TRACE_SAMPLING_MAX_BUFFERED_SPANS || '200000'),
+    decisionCacheSize: parseInt(process.env.TRACE_SAMPLING_DECISION_CACHE || '100000'),
+    latencyWindow: parseInt(process.env.TRACE_SAMPLING_LATENCY_WINDOW || '300000'),
+    policy: {
+      keepErrors: process.env.TRACE_SAMPLING_KEEP_ERRORS !== 'false',
+      latencyPercentile: parseFloat(process.env.TRACE_SAMPLING_LATENCY_PERCENTILE || '0.95'),
+      sampleRate: parseFloat(process.env.TRACE_SAMPLING_RATE || '0.1')
+    }
+  };
+}
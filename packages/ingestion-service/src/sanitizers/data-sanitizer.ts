@@ -1,4 +1,6 @@
 // Data sanitization and PII filtering
+import { KeywordMatcher } from './keyword-matcher';
+
 export interface SanitizationConfig {
   enablePIIFiltering: boolean;
   enableDataSanitization: boolean;
@@ -10,19 +12,38 @@ export interface SanitizationConfig {
   allowedDomains: string[];
   maxStringLength: number;
   maxObjectDepth: number;
+  memoSize: number; // memoized strings and field names; 0 disables memoization
+}
+
+// One replace() call per pattern, applied in order: merging patterns into a
+// single alternation would let an earlier match in the string win over an
+// earlier pattern. The hint, when set, is a character test every match
+// needs, so strings without it skip the scan.
+interface CompiledPass {
+  regex: RegExp;
+  replacement: string;
+  hint: RegExp | null;
 }
 
+// Strings the WHATWG URL parser could accept as absolute: optional leading
+// C0/space, then a scheme and a colon. Anything else throws in new URL().
+const URL_CANDIDATE = /^[\x00-\x20]*[A-Za-z][A-Za-z0-9+.-]*:/;
+
+// Only short strings are memoized; they carry the repetition (tag keys,
+// status codes, routes) and keep the memo's footprint bounded
+const MAX_MEMOIZED_LENGTH = 256;
+
 export class DataSanitizer {
   private config: SanitizationConfig;
   
   // Common PII patterns
   private readonly piiPatterns = [
-    { name: 'email', pattern: /\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b/g, replacement: '[EMAIL]' },
-    { name: 'phone', pattern: /\b\d{3}[-.]?\d{3}[-.]?\d{4}\b/g, replacement: '[PHONE]' },
-    { name: 'ssn', pattern: /\b\d{3}-?\d{2}-?\d{4}\b/g, replacement: '[SSN]' },
-    { name: 'creditCard', pattern: /\b\d{4}[-\s]?\d{4}[-\s]?\d{4}[-\s]?\d{4}\b/g, replacement: '[CARD]' },
-    { name: 'ipAddress', pattern: /\b(?:\d{1,3}\.){3}\d{1,3}\b/g, replacement: '[IP]' },
-    { name: 'uuid', pattern: /\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b/gi, replacement: '[UUID]' }
+    { name: 'email', pattern: /\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b/g, replacement: '[EMAIL]', hint: /@/ },
+    { name: 'phone', pattern: /\b\d{3}[-.]?\d{3}[-.]?\d{4}\b/g, replacement: '[PHONE]', hint: /\d/ },
+    { name: 'ssn', pattern: /\b\d{3}-?\d{2}-?\d{4}\b/g, replacement: '[SSN]', hint: /\d/ },
+    { name: 'creditCard', pattern: /\b\d{4}[-\s]?\d{4}[-\s]?\d{4}[-\s]?\d{4}\b/g, replacement: '[CARD]', hint: /\d/ },
+    { name: 'ipAddress', pattern: /\b(?:\d{1,3}\.){3}\d{1,3}\b/g, replacement: '[IP]', hint: /\d/ },
+    { name: 'uuid', pattern: /\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b/gi, replacement: '[UUID]', hint: /-/ }
   ];
 
   // Sensitive field names
@@ -32,6 +53,14 @@ export class DataSanitizer {
     'private_key', 'public_key', 'certificate', 'cert', 'signature', 'hash'
   ]);
 
+  private readonly sensitiveQueryParams = ['token', 'key', 'secret', 'password', 'auth', 'session'];
+
+  // Derived from config by compile()
+  private passes: CompiledPass[] = [];
+  private fieldMatcher: KeywordMatcher;
+  private stringMemo = new Map<string, string>();
+  private fieldMemo = new Map<string, boolean>();
+
   constructor(config: Partial<SanitizationConfig> = {}) {
     this.config = {
       enablePIIFiltering: true,
@@ -40,8 +69,12 @@ export class DataSanitizer {
       allowedDomains: [],
       maxStringLength: 1000,
       maxObjectDepth: 10,
+      memoSize: 10000,
       ...config
     };
+
+    this.fieldMatcher = new KeywordMatcher(this.sensitiveFields);
+    this.compile();
   }
 
   public sanitizeEvent(event: Record<string, unknown>): Record<string, unknown> {
@@ -148,6 +181,14 @@ export class DataSanitizer {
       return str;
     }
 
+    const memoizable = this.config.memoSize > 0 && str.length <= MAX_MEMOIZED_LENGTH;
+    if (memoizable) {
+      const cached = this.stringMemo.get(str);
+      if (cached !== undefined) {
+        return cached;
+      }
+    }
+
     let sanitized = str;
 
     // Truncate if too long
@@ -155,21 +196,22 @@ export class DataSanitizer {
       sanitized = sanitized.substring(0, this.config.maxStringLength) + '[TRUNCATED]';
     }
 
-    // Apply PII filtering
+    // Apply built-in, then custom PII patterns
     if (this.config.enablePIIFiltering) {
-      // Apply built-in PII patterns
-      for (const pattern of this.piiPatterns) {
-        sanitized = sanitized.replace(pattern.pattern, pattern.replacement);
-      }
-
-      // Apply custom patterns
-      for (const pattern of this.config.customPatterns) {
-        sanitized = sanitized.replace(pattern.pattern, pattern.replacement);
+      for (const pass of this.passes) {
+        if (pass.hint && !pass.hint.test(sanitized)) continue;
+        sanitized = sanitized.replace(pass.regex, pass.replacement);
       }
     }
 
     // Sanitize URLs
-    sanitized = this.sanitizeUrl(sanitized);
+    if (URL_CANDIDATE.test(sanitized)) {
+      sanitized = this.sanitizeUrl(sanitized);
+    }
+
+    if (memoizable) {
+      this.remember(this.stringMemo, str, sanitized);
+    }
 
     return sanitized;
   }
@@ -190,8 +232,7 @@ export class DataSanitizer {
       }
 
       // Remove sensitive query parameters
-      const sensitiveParams = ['token', 'key', 'secret', 'password', 'auth', 'session'];
-      for (const param of sensitiveParams) {
+      for (const param of this.sensitiveQueryParams) {
         if (url.searchParams.has(param)) {
           url.searchParams.set(param, '[REDACTED]');
         }
@@ -205,32 +246,50 @@ export class DataSanitizer {
   }
 
   private isSensitiveField(fieldName: string): boolean {
-    const lowerField = fieldName.toLowerCase();
-    
-    // Check exact matches
-    if (this.sensitiveFields.has(lowerField)) {
-      return true;
+    const cached = this.fieldMemo.get(fieldName);
+    if (cached !== undefined) {
+      return cached;
     }
 
-    // Check if field contains sensitive keywords
-    for (const sensitive of this.sensitiveFields) {
-      if (lowerField.includes(sensitive)) {
-        return true;
-      }
+    // Exact names are substrings of themselves, so one scan covers both checks
+    const sensitive = this.fieldMatcher.matches(fieldName.toLowerCase());
+
+    if (this.config.memoSize > 0 && fieldName.length <= MAX_MEMOIZED_LENGTH) {
+      this.remember(this.fieldMemo, fieldName, sensitive);
     }
 
-    return false;
+    return sensitive;
+  }
+
+  private remember<T>(memo: Map<string, T>, key: string, value: T): void {
+    // Wholesale reset keeps the bound without per-entry LRU bookkeeping
+    if (memo.size >= this.config.memoSize) {
+      memo.clear();
+    }
+    memo.set(key, value);
+  }
+
+  private compile(): void {
+    this.stringMemo.clear();
+    this.fieldMemo.clear();
+    this.passes = [
+      ...this.piiPatterns.map(({ pattern, replacement, hint }) => ({ regex: pattern, replacement, hint })),
+      ...this.config.customPatterns.map(({ pattern, replacement }) => ({ regex: pattern, replacement, hint: null }))
+    ];
   }
 
   public updateConfig(config: Partial<SanitizationConfig>): void {
     this.config = { ...this.config, ...config };
+    this.compile();
   }
 
   public addCustomPattern(name: string, pattern: RegExp, replacement: string): void {
     this.config.customPatterns.push({ name, pattern, replacement });
+    this.compile();
   }
 
   public removeCustomPattern(name: string): void {
     this.config.customPatterns = this.config.customPatterns.filter(p => p.name !== name);
+    this.compile();
   }
 }
@@ -0,0 +1,85 @@
+// Aho-Corasick matcher: reports whether any keyword occurs in a string in a
+// single left-to-right pass, independent of the number of keywords
+
+interface MatcherNode {
+  next: Map<string, number>;
+  fail: number;
+  terminal: boolean;
+}
+
+export class KeywordMatcher {
+  private nodes: MatcherNode[] = [{ next: new Map(), fail: 0, terminal: false }];
+
+  constructor(keywords: Iterable<string>) {
+    for (const keyword of keywords) {
+      if (keyword.length > 0) {
+        this.insert(keyword);
+      }
+    }
+    this.buildFailureLinks();
+  }
+
+  public matches(text: string): boolean {
+    let state = 0;
+
+    for (let i = 0; i < text.length; i++) {
+      const char = text[i]!;
+
+      while (state !== 0 && !this.nodes[state]!.next.has(char)) {
+        state = this.nodes[state]!.fail;
+      }
+      state = this.nodes[state]!.next.get(char) ?? 0;
+
+      // Terminal flags are propagated along failure links during construction
+      if (this.nodes[state]!.terminal) {
+        return true;
+      }
+    }
+
+    return false;
+  }
+
+  private insert(keyword: string): void {
+    let state = 0;
+
+    for (let i = 0; i < keyword.length; i++) {
+      const char = keyword[i]!;
+      let next = this.nodes[state]!.next.get(char);
+      if (next === undefined) {
+        next = this.nodes.length;
+        this.nodes.push({ next: new Map(), fail: 0, terminal: false });
+        this.nodes[state]!.next.set(char, next);
+      }
+      state = next;
+    }
+
+    this.nodes[state]!.terminal = true;
+  }
+
+  private buildFailureLinks(): void {
+    const queue: number[] = [];
+
+    for (const child of this.nodes[0]!.next.values()) {
+      queue.push(child);
+    }
+
+    for (let head = 0; head < queue.length; head++) {
+      const state = queue[head]!;
+      const node = this.nodes[state]!;
+
+      for (const [char, child] of node.next) {
+        let fail = node.fail;
+        while (fail !== 0 && !this.nodes[fail]!.next.has(char)) {
+          fail = this.nodes[fail]!.fail;
+        }
+
+        const target = this.nodes[fail]!.next.get(char);
+        const childNode = this.nodes[child]!;
+        childNode.fail = target !== undefined && target !== child ? target : 0;
+        childNode.terminal = childNode.terminal || this.nodes[childNode.fail]!.terminal;
+
+        queue.push(child);
+      }
+    }
+  }
+}
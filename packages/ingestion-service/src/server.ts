@@ -0,0 +1,276 @@
+// TraceLens Ingestion Service - HTTP server (single process or cluster worker)
+import cluster from 'cluster';
+import express from 'express';
+import cors from 'cors';
+import helmet from 'helmet';
+import compression from 'compression';
+import { DatabaseManager } from './database/database-manager';
+import { authenticateApiKey, apiKeyCache } from './middleware/auth';
+import eventsRouter from './api/routes/events';
+import tracesRouter, { isStreamingOTLPRequest } from './api/routes/traces';
+import healthRouter from './api/routes/health';
+import analysisRouter from './api/routes/analysis';
+import { IngestionQueue, loadIngestionQueueConfig } from './queue/ingestion-queue';
+import { getRedisClient, closeRedisClient } from './redis/redis-client';
+import { startWorkerHealthReporting, stopWorkerHealthReporting, trackWorkerRequests } from './cluster/worker-health';
+import { LatencySketchRecorder, loadLatencySketchConfig } from './sketches/latency-sketch-recorder';
+import { loadSketchRetention } from './sketches/sketch-buckets';
+import { TailSampler, loadTailSamplingConfig } from './sampling/tail-sampler';
+import { Trace, TraceSpan } from '@tracelens/shared';
+
+const app = express();
+const port = process.env.PORT || 3001;
+
+// Database configuration
+const dbConfig = {
+  host: process.env.DB_HOST || 'localhost',
+  port: parseInt(process.env.DB_PORT || '5432'),
+  database: process.env.DB_NAME || 'tracelens',
+  username: process.env.DB_USER || 'postgres',
+  password: process.env.DB_PASSWORD || 'password',
+  ssl: process.env.DB_SSL === 'true',
+  maxConnections: parseInt(process.env.DB_MAX_CONNECTIONS || '20'),
+  idleTimeoutMillis: parseInt(process.env.DB_IDLE_TIMEOUT || '30000'),
+  connectionTimeoutMillis: parseInt(process.env.DB_CONNECTION_TIMEOUT || '2000')
+};
+
+// Initialize database
+const db = new DatabaseManager(dbConfig);
+
+// Drop cached API key lookups when projects are created or deleted here or
+// in another replica
+apiKeyCache.attach(db);
+
+// Partition maintenance: create upcoming spans/performance_events partitions
+// and drop expired ones, then delete expired traces. Safe to run from every worker; the database lets
+// one caller at a time do the work.
+const runPartitionMaintenance = async () => {
+  try {
+    const { created, dropped, expiredTraces } = await db.maintainPartitions(parseInt(process.env.PARTITION_DAYS_AHEAD || '7'));
+    if (created > 0 || dropped > 0 || expiredTraces > 0) {
+      console.log(`Partition maintenance: ${created} created, ${dropped} dropped, ${expiredTraces} traces expired`);
+    }
+
+    await db.pruneLatencySketches(loadSketchRetention());
+  } catch (error) {
+    console.error('Partition maintenance failed:', error);
+  }
+};
+runPartitionMaintenance();
+const partitionMaintenanceTimer = setInterval(
+  runPartitionMaintenance,
+  parseInt(process.env.PARTITION_MAINTENANCE_INTERVAL || '3600000')
+);
+partitionMaintenanceTimer.unref();
+
+// Optional write-behind ingestion (INGESTION_MODE=async): routes validate,
+// enqueue and return 202 while workers write batches to the database
+const ingestionQueue = process.env.INGESTION_MODE === 'async'
+  ? new IngestionQueue(db, loadIngestionQueueConfig(), getRedisClient())
+  : null;
+ingestionQueue?.start();
+
+// Per-operation latency sketches, fed by every committed span batch
+const latencySketches = new LatencySketchRecorder(db, loadLatencySketchConfig());
+db.on('spansWritten', (projectId: string, spans: TraceSpan[]) => latencySketches.record(projectId, spans));
+latencySketches.start();
+
+// Optional tail-based trace sampling (TRACE_SAMPLING=tail): traces are
+// buffered until complete and only the kept ones are written, through the
+// ingestion queue when it is enabled. Dropped traces still feed the latency
+// sketches.
+const traceSampler = process.env.TRACE_SAMPLING === 'tail'
+  ? new TailSampler(async (projectId, traces) => {
+      if (!ingestionQueue) {
+        await db.insertTraceBatch(projectId, traces);
+        return;
+      }
+      const result = await ingestionQueue.enqueueTraces(projectId, traces);
+      if (result !== 'accepted') {
+        throw new Error(`Ingestion queue rejected sampled traces (${result})`);
+      }
+    }, loadTailSamplingConfig())
+  : null;
+traceSampler?.on('tracesDropped', (projectId: string, traces: Trace[]) => {
+  latencySketches.record(projectId, traces.flatMap(trace => trace.spans));
+});
+traceSampler?.start();
+if (traceSampler && cluster.isWorker) {
+  console.warn('TRACE_SAMPLING=tail with several ingestion workers: spans of one trace may be sampled by different workers and stored in part');
+}
+
+// Per-worker health reporting to the cluster primary (cluster mode only)
+startWorkerHealthReporting(parseInt(process.env.INGESTION_WORKER_HEALTH_INTERVAL || '5000'));
+app.use(trackWorkerRequests);
+
+// Middleware to inject database, ingestion queue and trace sampler into requests
+app.use((req, res, next) => {
+  (req as any).db = db;
+  (req as any).ingestionQueue = ingestionQueue;
+  (req as any).latencySketches = latencySketches;
+  (req as any).traceSampler = traceSampler;
+  next();
+});
+
+// Security middleware
+app.use(helmet({
+  contentSecurityPolicy: {
+    directives: {
+      defaultSrc: ["'self'"],
+      styleSrc: ["'self'", "'unsafe-inline'"],
+      scriptSrc: ["'self'"],
+      imgSrc: ["'self'", "data:", "https:"],
+    },
+  },
+  hsts: {
+    maxAge: 31536000,
+    includeSubDomains: true,
+    preload: true
+  }
+}));
+
+// CORS configuration
+app.use(cors({
+  origin: process.env.ALLOWED_ORIGINS?.split(',') || ['http://localhost:3000'],
+  credentials: true,
+  methods: ['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS'],
+  allowedHeaders: ['Content-Type', 'Content-Encoding', 'Authorization', 'X-API-Key', 'X-Project-Key']
+}));
+
+// Compression and parsing
+app.use(compression());
+// Record the decompressed body size so quotas can charge per byte
+const jsonParser = express.json({
+  limit: '10mb',
+  verify: (req, res, buf) => {
+    (req as any).rawBodySize = buf.length;
+  }
+});
+app.use((req, res, next) => {
+  // OTLP/JSON trace exports are parsed incrementally by the route
+  if (isStreamingOTLPRequest(req)) {
+    (req as any).otlpStreaming = true;
+    next();
+    return;
+  }
+  jsonParser(req, res, next);
+});
+app.use(express.urlencoded({ extended: true, limit: '10mb' }));
+
+// Trust proxy for accurate IP addresses
+app.set('trust proxy', true);
+
+// Request logging middleware
+app.use((req, res, next) => {
+  const start = Date.now();
+  
+  res.on('finish', () => {
+    const duration = Date.now() - start;
+    const logLevel = res.statusCode >= 400 ? 'error' : 'info';
+    
+    console.log(JSON.stringify({
+      level: logLevel,
+      method: req.method,
+      url: req.url,
+      status: res.statusCode,
+      duration,
+      ip: req.ip,
+      userAgent: req.get('User-Agent'),
+      timestamp: new Date().toISOString()
+    }));
+  });
+  
+  next();
+});
+
+// API routes
+app.use('/api/health', healthRouter);
+app.use('/api/events', eventsRouter);
+app.use('/api/traces', tracesRouter);
+app.use('/api/analysis', analysisRouter);
+
+// Global error handler
+app.use((error: Error, req: express.Request, res: express.Response, next: express.NextFunction) => {
+  console.error('Unhandled error:', error);
+  
+  res.status(500).json({
+    success: false,
+    error: 'Internal server error',
+    message: process.env.NODE_ENV === 'development' ? error.message : 'Something went wrong'
+  });
+});
+
+// 404 handler
+app.use('*', (req, res) => {
+  res.status(404).json({
+    success: false,
+    error: 'Not found',
+    message: `Route ${req.method} ${req.originalUrl} not found`
+  });
+});
+
+// Start server
+const server = app.listen(port, () => {
+  console.log(`TraceLens Ingestion Service running on port ${port} (pid ${process.pid})`);
+  console.log(`Environment: ${process.env.NODE_ENV || 'development'}`);
+  console.log(`Database: ${dbConfig.host}:${dbConfig.port}/${dbConfig.database}`);
+});
+
+// Handle server errors
+server.on('error', (error: Error) => {
+  console.error('Server error:', error);
+  process.exit(1);
+});
+
+// Graceful shutdown: stop accepting connections, let in-flight requests
+// finish, drain the ingestion queue, then close shared connections. In
+// cluster mode the primary forwards the signal to every worker.
+let shuttingDown = false;
+
+async function shutdown(signal: NodeJS.Signals): Promise<void> {
+  if (shuttingDown) return;
+  shuttingDown = true;
+  console.log(`${signal} received, shutting down gracefully`);
+
+  setTimeout(() => {
+    console.error('Graceful shutdown timed out');
+    process.exit(1);
+  }, parseInt(process.env.SHUTDOWN_TIMEOUT || '30000')).unref();
+
+  try {
+    await new Promise<void>((resolve) => {
+      server.close(() => resolve());
+      // Added in Node 18.2; before that idle keep-alive connections hold the
+      // close until keepAliveTimeout expires
+      if (typeof server.closeIdleConnections === 'function') {
+        server.closeIdleConnections();
+      }
+    });
+    console.log('HTTP server closed');
+
+    stopWorkerHealthReporting();
+    clearInterval(partitionMaintenanceTimer);
+    if (traceSampler) {
+      await traceSampler.stop();
+      console.log('Buffered traces sampled');
+    }
+    if (ingestionQueue) {
+      await ingestionQueue.stop();
+      console.log('Ingestion queue drained');
+    }
+    await latencySketches.stop();
+    await closeRedisClient();
+    await apiKeyCache.detach();
+    await db.close();
+    console.log('Database connections closed');
+    process.exit(0);
+  } catch (error) {
+    console.error('Error during shutdown:', error);
+    process.exit(1);
+  }
+}
+
+process.on('SIGTERM', () => shutdown('SIGTERM'));
+process.on('SIGINT', () => shutdown('SIGINT'));
+
+export { app };
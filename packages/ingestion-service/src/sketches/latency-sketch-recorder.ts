@@ -0,0 +1,209 @@
+// Per-operation latency sketches maintained as spans are written
+//
+// Each process accumulates one sketch per (project, operation, resolution,
+// bucket) in memory and periodically upserts it under its own writer ID, so
+// replicas never overwrite each other and no read-modify-write is needed.
+// Queries merge the rows of every writer at read time.
+import os from 'os';
+import { TraceSpan } from '@tracelens/shared';
+import type { DatabaseManager, LatencySketchRow } from '../database/database-manager';
+import { LatencySketch, DEFAULT_RELATIVE_ACCURACY } from './latency-sketch';
+import { SketchResolution, SKETCH_RESOLUTIONS, bucketStart } from './sketch-buckets';
+
+export interface LatencySketchConfig {
+  flushInterval: number; // milliseconds
+  gracePeriod: number; // milliseconds a bucket stays open after it ends
+  maxSeries: number; // in-memory sketches; new series beyond this are dropped
+  relativeAccuracy: number;
+}
+
+export interface LatencySketchStats {
+  writerId: string;
+  series: number;
+  recordedSpans: number;
+  lateSpans: number;
+  droppedSpans: number;
+  flushes: number;
+  flushErrors: number;
+  rowsWritten: number;
+}
+
+interface SketchSeries {
+  projectId: string;
+  operationName: string;
+  resolution: SketchResolution;
+  bucketStart: number;
+  sketch: LatencySketch;
+  version: number;
+  flushedVersion: number;
+}
+
+const DEFAULT_CONFIG: LatencySketchConfig = {
+  flushInterval: 10000,
+  gracePeriod: 5 * 60 * 1000,
+  maxSeries: 50000,
+  relativeAccuracy: DEFAULT_RELATIVE_ACCURACY
+};
+
+const RESOLUTIONS = Object.keys(SKETCH_RESOLUTIONS) as SketchResolution[];
+
+export class LatencySketchRecorder {
+  // Unique per process start, so a restarted process never replaces the
+  // rows written by its predecessor with a smaller sketch
+  public readonly writerId = `${os.hostname()}:${process.pid}:${Date.now().toString(36)}`;
+
+  private config: LatencySketchConfig;
+  private series = new Map<string, SketchSeries>();
+  private timer: NodeJS.Timeout | null = null;
+  private flushing: Promise<void> | null = null;
+  private stats = {
+    recordedSpans: 0,
+    lateSpans: 0,
+    droppedSpans: 0,
+    flushes: 0,
+    flushErrors: 0,
+    rowsWritten: 0
+  };
+
+  constructor(private db: DatabaseManager, config: Partial<LatencySketchConfig> = {}) {
+    this.config = { ...DEFAULT_CONFIG, ...config };
+  }
+
+  public record(projectId: string, spans: Iterable<TraceSpan>): void {
+    const now = Date.now();
+
+    for (const span of spans) {
+      if (span.duration === undefined) continue;
+
+      // Span times are epoch microseconds, buckets epoch milliseconds
+      const startTime = span.startTime / 1000;
+      let recorded = false;
+
+      for (const resolution of RESOLUTIONS) {
+        const start = bucketStart(startTime, resolution);
+
+        // Closed buckets may already have been flushed and evicted
+        if (start + SKETCH_RESOLUTIONS[resolution] + this.config.gracePeriod < now) {
+          continue;
+        }
+
+        const key = `${projectId}\u0000${span.operationName}\u0000${resolution}\u0000${start}`;
+        let series = this.series.get(key);
+        if (!series) {
+          if (this.series.size >= this.config.maxSeries) {
+            this.stats.droppedSpans++;
+            continue;
+          }
+          series = {
+            projectId,
+            operationName: span.operationName,
+            resolution,
+            bucketStart: start,
+            sketch: new LatencySketch(this.config.relativeAccuracy),
+            version: 0,
+            flushedVersion: 0
+          };
+          this.series.set(key, series);
+        }
+
+        series.sketch.add(span.duration);
+        series.version++;
+        recorded = true;
+      }
+
+      if (recorded) {
+        this.stats.recordedSpans++;
+      } else {
+        this.stats.lateSpans++;
+      }
+    }
+  }
+
+  public start(): void {
+    if (this.timer) return;
+    this.timer = setInterval(() => {
+      this.flush().catch(error => console.error('Latency sketch flush failed:', error));
+    }, this.config.flushInterval);
+    this.timer.unref();
+  }
+
+  // Stops the timer and writes whatever is still pending
+  public async stop(): Promise<void> {
+    if (this.timer) {
+      clearInterval(this.timer);
+      this.timer = null;
+    }
+    await this.flush();
+  }
+
+  public async flush(): Promise<void> {
+    // Coalesce with a flush already in progress
+    if (!this.flushing) {
+      this.flushing = this.writeDirtySeries().finally(() => {
+        this.flushing = null;
+      });
+    }
+    return this.flushing;
+  }
+
+  public getStats(): LatencySketchStats {
+    return {
+      writerId: this.writerId,
+      series: this.series.size,
+      ...this.stats
+    };
+  }
+
+  private async writeDirtySeries(): Promise<void> {
+    const pending: Array<{ series: SketchSeries; version: number }> = [];
+    const rows: LatencySketchRow[] = [];
+
+    for (const series of this.series.values()) {
+      if (series.version === series.flushedVersion) continue;
+
+      // Serialized now, so spans recorded during the write go to the next flush
+      pending.push({ series, version: series.version });
+      rows.push({
+        projectId: series.projectId,
+        operationName: series.operationName,
+        resolution: series.resolution,
+        bucketStart: series.bucketStart,
+        spanCount: series.sketch.count,
+        sketch: series.sketch.serialize()
+      });
+    }
+
+    if (rows.length > 0) {
+      try {
+        await this.db.upsertLatencySketches(this.writerId, rows);
+      } catch (error) {
+        this.stats.flushErrors++;
+        throw error;
+      }
+
+      for (const { series, version } of pending) {
+        series.flushedVersion = version;
+      }
+      this.stats.flushes++;
+      this.stats.rowsWritten += rows.length;
+    }
+
+    // Evict buckets that are closed and fully written
+    const now = Date.now();
+    for (const [key, series] of this.series) {
+      const closesAt = series.bucketStart + SKETCH_RESOLUTIONS[series.resolution] + this.config.gracePeriod;
+      if (closesAt < now && series.version === series.flushedVersion) {
+        this.series.delete(key);
+      }
+    }
+  }
+}
+
+export function loadLatencySketchConfig(): Partial<LatencySketchConfig> {
+  return {
+    flushInterval: parseInt(process.env.LATENCY_SKETCH_FLUSH_INTERVAL || '10000'),
+    gracePeriod: parseInt(process.env.LATENCY_SKETCH_GRACE_PERIOD || '300000'),
+    maxSeries: parseInt(process.env.LATENCY_SKETCH_MAX_SERIES || '50000'),
+    relativeAccuracy: parseFloat(process.env.LATENCY_SKETCH_ACCURACY || String(DEFAULT_RELATIVE_ACCURACY))
+  };
+}
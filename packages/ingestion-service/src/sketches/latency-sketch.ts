@@ -0,0 +1,225 @@
+// Mergeable latency quantile sketch (DDSketch)
+//
+// Values are counted in logarithmic bins sized so that any quantile estimate
+// is within relativeAccuracy of the true value. Bins from different sketches
+// line up exactly, so merging is just adding counts, and the serialized form
+// is a few hundred bytes regardless of how many values were added.
+
+export const DEFAULT_RELATIVE_ACCURACY = 0.01;
+export const DEFAULT_MAX_BINS = 2048;
+
+// Smaller positive values are counted with zero; keeps the bin range bounded
+const MIN_INDEXABLE_VALUE = 1e-6;
+
+const FORMAT_VERSION = 1;
+
+export class LatencySketch {
+  public count = 0;
+  public sum = 0;
+  public min = 0;
+  public max = 0;
+
+  private readonly gamma: number;
+  private readonly logGamma: number;
+  private bins: number[] = [];
+  private offset = 0; // bin index stored at bins[0]
+  private zeroCount = 0;
+
+  constructor(
+    public readonly relativeAccuracy: number = DEFAULT_RELATIVE_ACCURACY,
+    private readonly maxBins: number = DEFAULT_MAX_BINS
+  ) {
+    if (!(relativeAccuracy > 0 && relativeAccuracy < 1)) {
+      throw new Error('relativeAccuracy must be between 0 and 1');
+    }
+    this.gamma = (1 + relativeAccuracy) / (1 - relativeAccuracy);
+    this.logGamma = Math.log(this.gamma);
+  }
+
+  public add(value: number, count: number = 1): void {
+    if (!Number.isFinite(value) || count <= 0) return;
+
+    if (this.count === 0 || value < this.min) this.min = value;
+    if (this.count === 0 || value > this.max) this.max = value;
+    this.count += count;
+    this.sum += value * count;
+
+    // Zero and negative durations (clock skew) share a dedicated bin
+    if (value < MIN_INDEXABLE_VALUE) {
+      this.zeroCount += count;
+      return;
+    }
+
+    const index = Math.ceil(Math.log(value) / this.logGamma);
+    this.ensureBin(index);
+    const position = Math.max(index - this.offset, 0);
+    this.bins[position] = this.bins[position]! + count;
+  }
+
+  public merge(other: LatencySketch): void {
+    if (other.relativeAccuracy !== this.relativeAccuracy) {
+      throw new Error('Cannot merge sketches with different accuracy');
+    }
+    if (other.count === 0) return;
+
+    if (this.count === 0 || other.min < this.min) this.min = other.min;
+    if (this.count === 0 || other.max > this.max) this.max = other.max;
+    this.count += other.count;
+    this.sum += other.sum;
+    this.zeroCount += other.zeroCount;
+
+    if (other.bins.length === 0) return;
+    this.ensureBin(other.offset);
+    this.ensureBin(other.offset + other.bins.length - 1);
+
+    for (let i = 0; i < other.bins.length; i++) {
+      const position = Math.max(other.offset + i - this.offset, 0);
+      this.bins[position] = this.bins[position]! + other.bins[i]!;
+    }
+  }
+
+  // Estimated value at quantile q (0..1), clamped to the observed range
+  public quantile(q: number): number {
+    if (this.count === 0) return 0;
+    if (q <= 0) return this.min;
+    if (q >= 1) return this.max;
+
+    const rank = q * (this.count - 1);
+    let seen = this.zeroCount;
+    if (seen > rank) return Math.max(this.min, 0);
+
+    for (let i = 0; i < this.bins.length; i++) {
+      seen += this.bins[i]!;
+      if (seen > rank) {
+        const estimate = 2 * Math.pow(this.gamma, this.offset + i) / (this.gamma + 1);
+        return Math.min(Math.max(estimate, this.min), this.max);
+      }
+    }
+
+    return this.max;
+  }
+
+  public get mean(): number {
+    return this.count > 0 ? this.sum / this.count : 0;
+  }
+
+  public clone(): LatencySketch {
+    const copy = new LatencySketch(this.relativeAccuracy, this.maxBins);
+    copy.merge(this);
+    return copy;
+  }
+
+  // Layout: version, accuracy, sum, min, max (float64), then zero count,
+  // first bin index (zigzag) and bin count as varints, then one varint per bin
+  public serialize(): Buffer {
+    let first = 0;
+    let last = this.bins.length;
+    while (first < last && this.bins[first] === 0) first++;
+    while (last > first && this.bins[last - 1] === 0) last--;
+
+    const bytes: number[] = [];
+    writeVarint(bytes, this.zeroCount);
+    writeVarint(bytes, zigzag(this.offset + first));
+    writeVarint(bytes, last - first);
+    for (let i = first; i < last; i++) {
+      writeVarint(bytes, this.bins[i]!);
+    }
+
+    const header = Buffer.alloc(33);
+    header.writeUInt8(FORMAT_VERSION, 0);
+    header.writeDoubleLE(this.relativeAccuracy, 1);
+    header.writeDoubleLE(this.sum, 9);
+    header.writeDoubleLE(this.min, 17);
+    header.writeDoubleLE(this.max, 25);
+
+    return Buffer.concat([header, Buffer.from(bytes)]);
+  }
+
+  public static deserialize(buffer: Buffer, maxBins: number = DEFAULT_MAX_BINS): LatencySketch {
+    if (buffer.length < 33 || buffer.readUInt8(0) !== FORMAT_VERSION) {
+      throw new Error('Unsupported latency sketch encoding');
+    }
+
+    const sketch = new LatencySketch(buffer.readDoubleLE(1), maxBins);
+    sketch.sum = buffer.readDoubleLE(9);
+    sketch.min = buffer.readDoubleLE(17);
+    sketch.max = buffer.readDoubleLE(25);
+
+    const cursor = { position: 33 };
+    sketch.zeroCount = readVarint(buffer, cursor);
+    sketch.offset = unzigzag(readVarint(buffer, cursor));
+    const binCount = readVarint(buffer, cursor);
+
+    sketch.bins = new Array(binCount);
+    let count = sketch.zeroCount;
+    for (let i = 0; i < binCount; i++) {
+      const value = readVarint(buffer, cursor);
+      sketch.bins[i] = value;
+      count += value;
+    }
+    sketch.count = count;
+
+    return sketch;
+  }
+
+  // Grows the dense bin array to cover index. Past maxBins the lowest bins
+  // are folded together, which only affects accuracy of the lowest quantiles.
+  private ensureBin(index: number): void {
+    if (this.bins.length === 0) {
+      this.offset = index;
+      this.bins.push(0);
+      return;
+    }
+
+    if (index < this.offset) {
+      const missing = this.offset - index;
+      this.bins = new Array<number>(missing).fill(0).concat(this.bins);
+      this.offset = index;
+    } else if (index >= this.offset + this.bins.length) {
+      const missing = index - this.offset - this.bins.length + 1;
+      for (let i = 0; i < missing; i++) this.bins.push(0);
+    }
+
+    if (this.bins.length > this.maxBins) {
+      const excess = this.bins.length - this.maxBins;
+      let folded = 0;
+      for (let i = 0; i <= excess; i++) folded += this.bins[i]!;
+      this.bins = this.bins.slice(excess);
+      this.bins[0] = folded;
+      this.offset += excess;
+    }
+  }
+}
+
+function zigzag(value: number): number {
+  return value < 0 ? -2 * value - 1 : 2 * value;
+}
+
+function unzigzag(value: number): number {
+  return value % 2 === 1 ? -(value + 1) / 2 : value / 2;
+}
+
+// Arithmetic rather than bitwise so counts above 2^31 survive
+function writeVarint(bytes: number[], value: number): void {
+  let remaining = value;
+  while (remaining >= 0x80) {
+    bytes.push((remaining % 0x80) | 0x80);
+    remaining = Math.floor(remaining / 0x80);
+  }
+  bytes.push(remaining);
+}
+
+function readVarint(buffer: Buffer, cursor: { position: number }): number {
+  let value = 0;
+  let scale = 1;
+
+  while (true) {
+    if (cursor.position >= buffer.length) {
+      throw new Error('Truncated latency sketch');
+    }
+    const byte = buffer[cursor.position++]!;
+    value += (byte & 0x7f) * scale;
+    if (byte < 0x80) return value;
+    scale *= 0x80;
+  }
+}
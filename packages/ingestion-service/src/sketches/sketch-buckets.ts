@@ -0,0 +1,95 @@
+// Time buckets for stored latency sketches
+//
+// Every sketch is kept at minute, hour and day resolution. A query range is
+// covered by whole days in the middle and hours and minutes only at the
+// edges, so the number of sketches merged barely grows with the range.
+//
+// Finer resolutions are kept for less time. An edge older than the finer
+// resolution's retention is covered by the whole coarser bucket around it,
+// so such a range may include up to an hour (or a day) of data outside it
+// rather than silently missing its edges.
+
+export type SketchResolution = 'minute' | 'hour' | 'day';
+
+export const SKETCH_RESOLUTIONS: Record<SketchResolution, number> = {
+  minute: 60 * 1000,
+  hour: 60 * 60 * 1000,
+  day: 24 * 60 * 60 * 1000
+};
+
+// Coarsest first
+const PLAN_ORDER: SketchResolution[] = ['day', 'hour', 'minute'];
+
+// Days each resolution is kept
+export type SketchRetention = Record<SketchResolution, number>;
+
+export const DEFAULT_SKETCH_RETENTION: SketchRetention = {
+  minute: 2,
+  hour: 35,
+  day: 400
+};
+
+const DAY = 24 * 60 * 60 * 1000;
+
+export interface SketchRange {
+  resolution: SketchResolution;
+  from: number; // first bucket start included (epoch ms)
+  to: number; // bucket starts must be before this (epoch ms)
+}
+
+export function bucketStart(time: number, resolution: SketchResolution): number {
+  const size = SKETCH_RESOLUTIONS[resolution];
+  return Math.floor(time / size) * size;
+}
+
+// Earliest bucket start still stored at each resolution
+export function retainedSince(retention: SketchRetention, now: number = Date.now()): Record<SketchResolution, number> {
+  return {
+    minute: now - retention.minute * DAY,
+    hour: now - retention.hour * DAY,
+    day: now - retention.day * DAY
+  };
+}
+
+// Disjoint bucket ranges covering [from, to). Partial minutes at either end
+// are included whole, as are partial hours and days whose finer buckets are
+// older than `since` (see retainedSince).
+export function planSketchRanges(
+  from: number,
+  to: number,
+  since: Partial<Record<SketchResolution, number>> = {},
+  level: number = 0
+): SketchRange[] {
+  if (from >= to) return [];
+
+  const resolution = PLAN_ORDER[level]!;
+  if (resolution === 'minute') {
+    return [{ resolution, from: bucketStart(from, resolution), to }];
+  }
+
+  const size = SKETCH_RESOLUTIONS[resolution];
+  const finerSince = since[PLAN_ORDER[level + 1]!] ?? -Infinity;
+  let start = Math.ceil(from / size) * size;
+  let end = Math.floor(to / size) * size;
+
+  if (start > from && from < finerSince) start -= size;
+  if (end < to && end < finerSince) end += size;
+
+  if (start >= end) {
+    return planSketchRanges(from, to, since, level + 1);
+  }
+
+  return [
+    ...planSketchRanges(from, start, since, level + 1),
+    { resolution, from: start, to: end },
+    ...planSketchRanges(end, to, since, level + 1)
+  ];
+}
+
+export function loadSketchRetention(): SketchRetention {
+  return {
+    minute: parseInt(process.env.LATENCY_SKETCH_MINUTE_RETENTION_DAYS || String(DEFAULT_SKETCH_RETENTION.minute)),
+    hour: parseInt(process.env.LATENCY_SKETCH_HOUR_RETENTION_DAYS || String(DEFAULT_SKETCH_RETENTION.hour)),
+    day: parseInt(process.env.LATENCY_SKETCH_DAY_RETENTION_DAYS || String(DEFAULT_SKETCH_RETENTION.day))
+  };
+}
@@ -65,6 +65,11 @@ export class EventValidator {
       throw new ValidationError('Event userAgent is required and must be a string', []);
     }
 
+    if (eventObj.sampleWeight !== undefined &&
+        (typeof eventObj.sampleWeight !== 'number' || !Number.isFinite(eventObj.sampleWeight) || eventObj.sampleWeight < 1)) {
+      throw new ValidationError('Event sampleWeight must be a finite number of at least 1', []);
+    }
+
     // Validate event type
     const validTypes = ['web-vitals', 'resource-timing', 'navigation-timing', 'long-task', 'error'];
     if (!validTypes.includes(eventObj.type as string)) {
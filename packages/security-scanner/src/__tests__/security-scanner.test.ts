@@ -1,5 +1,10 @@
 // Security scanner tests
-import { SecurityScanner } from '../index';
+import http from 'http';
+import os from 'os';
+import path from 'path';
+import fs from 'fs';
+import { AddressInfo } from 'net';
+import { SecurityScanner, VulnerabilityMatcher, VulnerabilityIndex, CVEData, CVEFetcher, CVEMirror, CVESnapshot } from '../index';
 
 // Mock fetch to avoid real API calls in tests
 global.fetch = jest.fn();
@@ -50,3 +55,188 @@ describe('SecurityScanner', () => {
     expect(result.processingTime).toBeGreaterThan(0);
   });
 });
+
+describe('VulnerabilityMatcher', () => {
+  const cve = (id: string, name: string, versionRange: string, ecosystem: string = 'npm'): CVEData => ({
+    id,
+    published: '2024-01-01T00:00:00Z',
+    modified: '2024-01-01T00:00:00Z',
+    severity: 'HIGH',
+    score: 7.5,
+    description: '',
+    affectedPackages: [{ ecosystem, name, versionRange }],
+    references: []
+  });
+
+  const cves = [
+    cve('CVE-2024-0001', 'lodash', 'introduced:0;fixed:4.17.21'),
+    cve('CVE-2024-0002', 'express', '>=4.0.0;fixed:4.19.2', 'nodejs'),
+    cve('CVE-2024-0003', 'requests', 'introduced:2.0.0;fixed:2.31.0', 'PyPI')
+  ];
+
+  it('should match ecosystem aliases and version ranges', () => {
+    const matcher = new VulnerabilityMatcher();
+    const matches = matcher.matchVulnerabilities([
+      { name: 'lodash', version: '4.17.20', ecosystem: 'npm' },
+      { name: 'express', version: '^4.18.0', ecosystem: 'npm' },
+      { name: 'requests', version: '2.31.0', ecosystem: 'pypi' }
+    ], cves);
+
+    expect(matches.map(match => match.cveId)).toEqual(['CVE-2024-0001', 'CVE-2024-0002']);
+    expect(matches[0]!.matchConfidence).toBeCloseTo(0.95);
+    expect(matches[0]!.fixedVersions).toEqual(['4.17.21']);
+  });
+
+  it('should match misspelled names through a reusable index', () => {
+    const index = new VulnerabilityIndex(cves);
+    const matcher = new VulnerabilityMatcher();
+
+    const matches = matcher.matchVulnerabilities([{ name: 'requets', version: '2.1', ecosystem: 'python' }], index);
+    expect(matches.map(match => match.cveId)).toEqual(['CVE-2024-0003']);
+    expect(matches[0]!.affectedVersions).toEqual(['>=2.0.0']);
+
+    expect(matcher.matchVulnerabilities([{ name: 'lodash', version: '4.17.21', ecosystem: 'npm' }], index)).toEqual([]);
+  });
+});
+
+describe('CVEMirror', () => {
+  // Local stand-in for the NVD and OSV APIs
+  const nvdRecords: any[] = [];
+  const nvdQueries: URLSearchParams[] = [];
+  const osvRecords: any[] = [];
+  let server: http.Server;
+  let baseUrl: string;
+  let directory: string;
+
+  const nvdRecord = (id: string, lastModified: string) => ({
+    cve: {
+      id,
+      published: '2024-01-01T00:00:00.000',
+      lastModified,
+      descriptions: [{ lang: 'en', value: `${id} description` }],
+      metrics: { cvssMetricV31: [{ cvssData: { baseSeverity: 'HIGH', baseScore: 7.5 } }] },
+      references: []
+    }
+  });
+
+  beforeEach(async () => {
+    nvdRecords.length = 0;
+    nvdQueries.length = 0;
+    osvRecords.length = 0;
+    directory = fs.mkdtempSync(path.join(os.tmpdir(), 'cve-mirror-'));
+
+    server = http.createServer((req, res) => {
+      const url = new URL(req.url!, 'http://localhost');
+      res.setHeader('Content-Type', 'application/json');
+
+      if (url.pathname === '/nvd') {
+        nvdQueries.push(url.searchParams);
+        const since = Date.parse(`${url.searchParams.get('lastModStartDate')}`);
+        const matching = nvdRecords.filter(record => Date.parse(`${record.cve.lastModified}Z`) >= since);
+        const startIndex = parseInt(url.searchParams.get('startIndex') || '0');
+        // One record per page to exercise pagination
+        res.end(JSON.stringify({ totalResults: matching.length, vulnerabilities: matching.slice(startIndex, startIndex + 1) }));
+      } else {
+        let body = '';
+        req.on('data', chunk => body += chunk);
+        req.on('end', () => {
+          const since = Date.parse(JSON.parse(body).query.modified_after);
+          res.end(JSON.stringify({ vulns: osvRecords.filter(record => Date.parse(record.modified) >= since) }));
+        });
+      }
+    });
+    await new Promise<void>(resolve => server.listen(0, '127.0.0.1', resolve));
+    baseUrl = `http://127.0.0.1:${(server.address() as AddressInfo).port}`;
+  });
+
+  afterEach(async () => {
+    await new Promise(resolve => server.close(resolve));
+    fs.rmSync(directory, { recursive: true, force: true });
+  });
+
+  it('should fetch only changes since the stored cursor', async () => {
+    const fetcher = new CVEFetcher(undefined, { nvd: `${baseUrl}/nvd`, osv: `${baseUrl}/osv` });
+    const modified = (daysAgo: number) => new Date(Date.now() - daysAgo * 86400000).toISOString().replace('Z', '');
+
+    const cursor = modified(2);
+    nvdRecords.push(nvdRecord('CVE-2024-0001', modified(3)), nvdRecord('CVE-2024-0002', cursor));
+    const first = await new CVEMirror(fetcher, { directory }).sync();
+    expect(first.changed.map(cve => cve.id).sort()).toEqual(['CVE-2024-0001', 'CVE-2024-0002']);
+    expect(first.failedSources).toEqual([]);
+
+    nvdRecords.push(nvdRecord('CVE-2024-0003', modified(1)));
+    nvdQueries.length = 0;
+
+    // A new instance resumes from the cursor persisted on disk
+    const mirror = new CVEMirror(fetcher, { directory });
+    const second = await mirror.sync();
+    expect(Date.parse(`${nvdQueries[0]!.get('lastModStartDate')}`)).toBe(Date.parse(`${cursor}Z`));
+    expect(second.changed.map(cve => cve.id)).toEqual(['CVE-2024-0003']);
+    expect(mirror.size).toBe(3);
+  });
+
+  it('should reopen a compacted snapshot without the network', async () => {
+    const fetcher = new CVEFetcher(undefined, { nvd: `${baseUrl}/nvd`, osv: `${baseUrl}/osv` });
+    nvdRecords.push(nvdRecord('CVE-2024-0002', new Date().toISOString().replace('Z', '')));
+    nvdRecords.push(nvdRecord('CVE-2024-0001', new Date().toISOString().replace('Z', '')));
+
+    const mirror = new CVEMirror(fetcher, { directory });
+    await mirror.sync();
+    await mirror.compact();
+
+    const snapshot = CVESnapshot.read(path.join(directory, 'cves.snapshot'))!;
+    expect(snapshot.size).toBe(2);
+    expect(snapshot.get('CVE-2024-0002')!.severity).toBe('HIGH');
+    expect(snapshot.get('CVE-2024-9999')).toBeUndefined();
+
+    const offline = new CVEMirror(new CVEFetcher(undefined, { nvd: 'http://127.0.0.1:1', osv: 'http://127.0.0.1:1' }), { directory });
+    expect(offline.all().map(cve => cve.id)).toEqual(['CVE-2024-0001', 'CVE-2024-0002']);
+    expect(offline.getCursors().nvd).toBeDefined();
+  });
+
+  it('should scan against every mirrored record once the mirror is up to date', async () => {
+    const sourceUrls = { nvd: `${baseUrl}/nvd`, osv: `${baseUrl}/osv` };
+    osvRecords.push({
+      id: 'GHSA-0001',
+      published: '2024-01-01T00:00:00Z',
+      modified: new Date(Date.now() - 60 * 86400000).toISOString(),
+      summary: 'Prototype pollution',
+      affected: [{ package: { ecosystem: 'npm', name: 'lodash' }, ranges: [{ events: [{ introduced: '0' }, { fixed: '4.17.21' }] }] }]
+    });
+    await new CVEMirror(new CVEFetcher(undefined, sourceUrls), { directory, initialWindow: 90 * 86400000 }).sync();
+
+    // Nothing in the mirror changed recently, so the scan syncs first and
+    // still matches against the records it already had
+    const scanner = new SecurityScanner(undefined, { mirrorDirectory: directory, sourceUrls });
+    const result = await scanner.scanDependencies(
+      [{ name: 'lodash', version: '4.17.20', ecosystem: 'npm' }],
+      undefined,
+      undefined,
+      { includeTheoretical: true }
+    );
+
+    expect(nvdQueries).toHaveLength(2);
+    expect(result.vulnerabilitiesFound).toBe(1);
+    expect(result.runtimeRisks.map(risk => risk.cveId)).toEqual(['GHSA-0001']);
+  });
+
+  it('should reuse the vulnerability index until the CVE cache changes', async () => {
+    const sourceUrls = { nvd: `${baseUrl}/nvd`, osv: `${baseUrl}/osv` };
+    nvdRecords.push(nvdRecord('CVE-2024-0001', new Date().toISOString().replace('Z', '')));
+    await new CVEMirror(new CVEFetcher(undefined, sourceUrls), { directory }).sync();
+
+    const match = jest.spyOn(VulnerabilityMatcher.prototype, 'matchVulnerabilities');
+    try {
+      const scanner = new SecurityScanner(undefined, { mirrorDirectory: directory, sourceUrls });
+      const dependencies = [{ name: 'lodash', version: '4.17.20', ecosystem: 'npm' }];
+      await scanner.scanDependencies(dependencies);
+      await scanner.scanDependencies(dependencies);
+
+      const [first, second] = match.mock.calls.map(call => call[1]);
+      expect(first).toBeInstanceOf(VulnerabilityIndex);
+      expect(second).toBe(first);
+    } finally {
+      match.mockRestore();
+    }
+  });
+});
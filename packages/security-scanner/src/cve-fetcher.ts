@@ -23,15 +23,27 @@ export interface FetchOptions {
   modifiedSince?: Date;
 }
 
+export interface CVESourceUrls {
+  nvd: string;
+  osv: string;
+}
+
+// NVD rejects modification-date ranges longer than 120 days
+const NVD_MAX_RANGE = 120 * 24 * 60 * 60 * 1000;
+const NVD_PAGE_SIZE = 2000;
+
 export class CVEFetcher {
   private nvdApiKey?: string;
-  private baseUrls = {
-    nvd: 'https://services.nvd.nist.gov/rest/json/cves/2.0',
-    osv: 'https://api.osv.dev/v1'
-  };
+  private baseUrls: CVESourceUrls;
 
-  constructor(apiKey?: string) {
+  // baseUrls points the fetcher at mirrors or local stand-ins of the APIs
+  constructor(apiKey?: string, baseUrls: Partial<CVESourceUrls> = {}) {
     this.nvdApiKey = apiKey;
+    this.baseUrls = {
+      nvd: 'https://services.nvd.nist.gov/rest/json/cves/2.0',
+      osv: 'https://api.osv.dev/v1',
+      ...baseUrls
+    };
   }
 
   public async fetchRecentCVEs(options: FetchOptions = {}): Promise<CVEData[]> {
@@ -64,17 +76,55 @@ export class CVEFetcher {
     return Array.from(uniqueCVEs.values());
   }
 
-  private async fetchFromNVD(options: FetchOptions): Promise<CVEData[]> {
-    const params = new URLSearchParams();
-    
-    if (options.modifiedSince) {
-      params.append('lastModStartDate', options.modifiedSince.toISOString());
-    }
-    
-    if (options.maxResults) {
-      params.append('resultsPerPage', Math.min(options.maxResults, 2000).toString());
+  // Every NVD record modified in [since, until], walking the range in
+  // 120-day windows and each window page by page
+  public async fetchNVDChanges(since: Date, until: Date = new Date()): Promise<CVEData[]> {
+    const cves: CVEData[] = [];
+
+    for (let windowStart = since.getTime(); windowStart <= until.getTime(); windowStart += NVD_MAX_RANGE) {
+      const windowEnd = Math.min(windowStart + NVD_MAX_RANGE, until.getTime());
+      let startIndex = 0;
+
+      for (;;) {
+        const params = new URLSearchParams({
+          lastModStartDate: new Date(windowStart).toISOString(),
+          lastModEndDate: new Date(windowEnd).toISOString(),
+          startIndex: startIndex.toString(),
+          resultsPerPage: NVD_PAGE_SIZE.toString()
+        });
+
+        const data = await this.requestNVD(params);
+        const page = data.vulnerabilities || [];
+        cves.push(...page.map((vuln: any) => this.parseNVDVulnerability(vuln)));
+
+        startIndex += page.length;
+        if (page.length === 0 || startIndex >= (data.totalResults ?? 0)) break;
+      }
+
+      if (windowEnd === until.getTime()) break;
     }
 
+    return cves;
+  }
+
+  // Every OSV record modified after since, following page tokens
+  public async fetchOSVChanges(since: Date): Promise<CVEData[]> {
+    const cves: CVEData[] = [];
+    let pageToken = '';
+
+    do {
+      const data = await this.requestOSV({
+        page_token: pageToken,
+        query: { modified_after: since.toISOString() }
+      });
+      cves.push(...(data.vulns || []).map((vuln: any) => this.parseOSVVulnerability(vuln)));
+      pageToken = data.next_page_token || '';
+    } while (pageToken);
+
+    return cves;
+  }
+
+  private async requestNVD(params: URLSearchParams): Promise<any> {
     const headers: Record<string, string> = {
       'Accept': 'application/json'
     };
@@ -84,12 +134,40 @@ export class CVEFetcher {
     }
 
     const response = await fetch(`${this.baseUrls.nvd}?${params}`, { headers });
-    
+
     if (!response.ok) {
       throw new Error(`NVD API error: ${response.status} ${response.statusText}`);
     }
 
-    const data = await response.json() as any;
+    return response.json();
+  }
+
+  private async requestOSV(query: any): Promise<any> {
+    const response = await fetch(`${this.baseUrls.osv}/query`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(query)
+    });
+
+    if (!response.ok) {
+      throw new Error(`OSV API error: ${response.status} ${response.statusText}`);
+    }
+
+    return response.json();
+  }
+
+  private async fetchFromNVD(options: FetchOptions): Promise<CVEData[]> {
+    const params = new URLSearchParams();
+    
+    if (options.modifiedSince) {
+      params.append('lastModStartDate', options.modifiedSince.toISOString());
+    }
+    
+    if (options.maxResults) {
+      params.append('resultsPerPage', Math.min(options.maxResults, 2000).toString());
+    }
+
+    const data = await this.requestNVD(params);
     
     return data.vulnerabilities?.map((vuln: any) => this.parseNVDVulnerability(vuln)) || [];
   }
@@ -103,17 +181,7 @@ export class CVEFetcher {
       }
     };
 
-    const response = await fetch(`${this.baseUrls.osv}/query`, {
-      method: 'POST',
-      headers: { 'Content-Type': 'application/json' },
-      body: JSON.stringify(query)
-    });
-
-    if (!response.ok) {
-      throw new Error(`OSV API error: ${response.status} ${response.statusText}`);
-    }
-
-    const data = await response.json() as any;
+    const data = await this.requestOSV(query);
     
     return data.vulns?.map((vuln: any) => this.parseOSVVulnerability(vuln)) || [];
   }
@@ -1,8 +1,10 @@
 // Main security scanner orchestrating CVE analysis
-import { CVEFetcher, CVEData } from './cve-fetcher';
+import { CVEFetcher, CVEData, CVESourceUrls } from './cve-fetcher';
 import { VulnerabilityMatcher, VulnerabilityMatch, RuntimeDependency } from './vulnerability-matcher';
+import { VulnerabilityIndex } from './vulnerability-index';
 import { RuntimeRiskCalculator, RuntimeRisk, ExecutionContext } from './analyzers/risk-calculator';
 import { CVEUpdateScheduler } from './schedulers/cve-updater';
+import { CVEMirror } from './mirror/cve-mirror';
 import type { DependencyGraph } from '@tracelens/shared';
 
 export interface SecurityScanResult {
@@ -22,6 +24,13 @@ export interface SecurityScanResult {
   processingTime: number;
 }
 
+export interface SecurityScannerOptions {
+  // Keep a local CVE mirror here; scans can then start offline from it
+  mirrorDirectory?: string;
+  // Alternative NVD/OSV endpoints, e.g. internal mirrors
+  sourceUrls?: Partial<CVESourceUrls>;
+}
+
 export interface ScanOptions {
   includeTheoretical?: boolean;
   minSeverity?: 'LOW' | 'MEDIUM' | 'HIGH' | 'CRITICAL';
@@ -33,12 +42,20 @@ export class SecurityScanner {
   private vulnerabilityMatcher: VulnerabilityMatcher;
   private riskCalculator: RuntimeRiskCalculator;
   private updateScheduler?: CVEUpdateScheduler;
+  private mirror?: CVEMirror;
   private cveCache: Map<string, CVEData> = new Map();
+  // Bumped on every cache change; the index is rebuilt only after one
+  private cacheVersion = 0;
+  private cveIndex: { version: number; size: number; index: VulnerabilityIndex } | null = null;
 
-  constructor(nvdApiKey?: string) {
-    this.cveFetcher = new CVEFetcher(nvdApiKey);
+  constructor(nvdApiKey?: string, options: SecurityScannerOptions = {}) {
+    this.cveFetcher = new CVEFetcher(nvdApiKey, options.sourceUrls);
     this.vulnerabilityMatcher = new VulnerabilityMatcher();
     this.riskCalculator = new RuntimeRiskCalculator();
+
+    if (options.mirrorDirectory) {
+      this.mirror = new CVEMirror(this.cveFetcher, { directory: options.mirrorDirectory });
+    }
   }
 
   public async scanDependencies(
@@ -56,7 +73,7 @@ export class SecurityScanner {
     const cves = await this.getRecentCVEs();
     
     // Match vulnerabilities
-    const vulnerabilities = this.vulnerabilityMatcher.matchVulnerabilities(dependencies, cves);
+    const vulnerabilities = this.vulnerabilityMatcher.matchVulnerabilities(dependencies, this.indexFor(cves));
     
     // Calculate runtime risks
     const runtimeRisks = dependencyGraph 
@@ -92,10 +109,11 @@ export class SecurityScanner {
 
     this.updateScheduler = new CVEUpdateScheduler(this.cveFetcher, {
       updateInterval: 6 * 60 * 60 * 1000, // 6 hours
+      mirror: this.mirror,
       onUpdate: async (cves: CVEData[]) => {
         // Update cache
         for (const cve of cves) {
-          this.cveCache.set(cve.id, cve);
+          this.cacheCVE(cve);
         }
         
         console.log(`Updated CVE cache with ${cves.length} new/modified CVEs`);
@@ -124,6 +142,24 @@ export class SecurityScanner {
   }
 
   private async getRecentCVEs(): Promise<CVEData[]> {
+    // The mirror is the scan's database: start from it without touching the
+    // network and only sync once nothing in it changed for 30 days
+    if (this.mirror) {
+      if (this.cveCache.size === 0) {
+        this.loadMirror();
+      }
+
+      const recentThreshold = new Date(Date.now() - 30 * 24 * 60 * 60 * 1000); // 30 days
+      const isStale = !Array.from(this.cveCache.values())
+        .some(cve => new Date(cve.modified) > recentThreshold);
+      if (isStale) {
+        await this.mirror.sync();
+        this.loadMirror();
+      }
+
+      return Array.from(this.cveCache.values());
+    }
+
     // Try to use cached CVEs first
     if (this.cveCache.size > 0) {
       const recentThreshold = new Date(Date.now() - 30 * 24 * 60 * 60 * 1000); // 30 days
@@ -143,12 +179,32 @@ export class SecurityScanner {
 
     // Update cache
     for (const cve of cves) {
-      this.cveCache.set(cve.id, cve);
+      this.cacheCVE(cve);
     }
 
     return cves;
   }
 
+  private loadMirror(): void {
+    for (const cve of this.mirror!.all()) {
+      this.cacheCVE(cve);
+    }
+  }
+
+  private cacheCVE(cve: CVEData): void {
+    this.cveCache.set(cve.id, cve);
+    this.cacheVersion++;
+  }
+
+  // Reuses the index while the cache is unchanged. Between changes the
+  // 30-day window can only drop CVEs, which the size check catches.
+  private indexFor(cves: CVEData[]): VulnerabilityIndex {
+    if (this.cveIndex?.version !== this.cacheVersion || this.cveIndex.size !== cves.length) {
+      this.cveIndex = { version: this.cacheVersion, size: cves.length, index: new VulnerabilityIndex(cves) };
+    }
+    return this.cveIndex.index;
+  }
+
   private convertToBasicRisks(vulnerabilities: VulnerabilityMatch[]): RuntimeRisk[] {
     return vulnerabilities.map(vuln => ({
       cveId: vuln.cveId,
@@ -235,5 +291,8 @@ export class SecurityScanner {
 // Export all types and classes
 export * from './cve-fetcher';
 export * from './vulnerability-matcher';
+export * from './vulnerability-index';
 export * from './analyzers/risk-calculator';
 export * from './schedulers/cve-updater';
+export * from './mirror/cve-snapshot';
+export * from './mirror/cve-mirror';
@@ -0,0 +1,229 @@
+// Incremental local mirror of the NVD and OSV databases
+//
+// Each source keeps a cursor, the latest modification time seen from it,
+// and a sync fetches only what changed since. Changes are appended to a
+// journal beside the snapshot together with the advanced cursors, so a
+// crash loses at most the sync in progress. The journal is folded into a
+// new snapshot once it grows past a fraction of it.
+import fs from 'fs';
+import path from 'path';
+import { CVEData, CVEFetcher } from '../cve-fetcher';
+import { CVESnapshot, CVESource, SourceCursors } from './cve-snapshot';
+
+export interface CVEMirrorOptions {
+  directory: string;
+  sources: CVESource[];
+  initialWindow: number; // milliseconds fetched by a source's first sync
+  compactionRatio: number; // journal size, relative to the snapshot, that triggers compaction
+  minCompaction: number; // journal entries always tolerated before compacting
+}
+
+export interface MirrorSyncResult {
+  changed: CVEData[]; // new records and newer versions of mirrored ones
+  fetched: number;
+  failedSources: CVESource[];
+  cursors: SourceCursors;
+  compacted: boolean;
+}
+
+const SNAPSHOT_FILE = 'cves.snapshot';
+const JOURNAL_FILE = 'cves.journal';
+
+const DEFAULT_OPTIONS: Omit<CVEMirrorOptions, 'directory'> = {
+  sources: ['nvd', 'osv'],
+  initialWindow: 30 * 24 * 60 * 60 * 1000,
+  compactionRatio: 0.1,
+  minCompaction: 1000
+};
+
+// NVD timestamps carry no zone but are UTC
+function modifiedTime(value: string): number {
+  return Date.parse(/(Z|[+-]\d{2}:?\d{2})$/.test(value) ? value : `${value}Z`) || 0;
+}
+
+export class CVEMirror {
+  private fetcher: CVEFetcher;
+  private options: CVEMirrorOptions;
+  private snapshot: CVESnapshot | null = null;
+  // Changes since the snapshot was written
+  private journal = new Map<string, CVEData>();
+  private cursors: SourceCursors = {};
+  private loaded = false;
+  private syncing: Promise<MirrorSyncResult> | null = null;
+
+  constructor(fetcher: CVEFetcher, options: Partial<CVEMirrorOptions> & { directory: string }) {
+    this.fetcher = fetcher;
+    this.options = { ...DEFAULT_OPTIONS, ...options };
+  }
+
+  public get size(): number {
+    this.load();
+    let added = 0;
+    for (const id of this.journal.keys()) {
+      if (!this.snapshot?.get(id)) added++;
+    }
+    return (this.snapshot?.size ?? 0) + added;
+  }
+
+  public get sourceCount(): number {
+    return this.options.sources.length;
+  }
+
+  public getCursors(): SourceCursors {
+    this.load();
+    return { ...this.cursors };
+  }
+
+  // Reads the snapshot and replays the journal. Needs no network, so a
+  // scanner can start from the mirror offline.
+  public load(): void {
+    if (this.loaded) return;
+
+    this.snapshot = CVESnapshot.read(this.path(SNAPSHOT_FILE));
+    this.cursors = { ...this.snapshot?.header.cursors };
+    this.journal.clear();
+
+    let journal = '';
+    try {
+      journal = fs.readFileSync(this.path(JOURNAL_FILE), 'utf8');
+    } catch (error) {
+      if ((error as NodeJS.ErrnoException).code !== 'ENOENT') throw error;
+    }
+
+    // Records count only once the cursor line that closes their sync is
+    // read; a torn final sync is discarded
+    let pending: CVEData[] = [];
+    for (const line of journal.split('\n')) {
+      if (!line) continue;
+      let entry: any;
+      try {
+        entry = JSON.parse(line);
+      } catch (error) {
+        break;
+      }
+
+      if (entry.cursors) {
+        for (const cve of pending) this.journal.set(cve.id, cve);
+        pending = [];
+        this.cursors = { ...this.cursors, ...entry.cursors };
+      } else {
+        pending.push(entry);
+      }
+    }
+
+    this.loaded = true;
+  }
+
+  public get(id: string): CVEData | undefined {
+    this.load();
+    return this.journal.get(id) ?? this.snapshot?.get(id);
+  }
+
+  public all(): CVEData[] {
+    this.load();
+    const cves: CVEData[] = [];
+    if (this.snapshot) {
+      for (const cve of this.snapshot.records()) {
+        if (!this.journal.has(cve.id)) cves.push(cve);
+      }
+    }
+    cves.push(...this.journal.values());
+    return cves;
+  }
+
+  // Fetches each source's changes since its cursor. A failing source keeps
+  // its cursor and is retried by the next sync; the others still advance.
+  public sync(): Promise<MirrorSyncResult> {
+    if (!this.syncing) {
+      this.syncing = this.runSync().finally(() => {
+        this.syncing = null;
+      });
+    }
+    return this.syncing;
+  }
+
+  // Writes the mirrored records to a new snapshot and empties the journal
+  public async compact(): Promise<void> {
+    this.load();
+    await fs.promises.mkdir(this.options.directory, { recursive: true });
+
+    const snapshotPath = this.path(SNAPSHOT_FILE);
+    await CVESnapshot.write(snapshotPath, this.all(), {
+      cursors: this.cursors,
+      createdAt: new Date().toISOString()
+    });
+    // Replaying the old journal over the new snapshot is harmless, so a
+    // crash before this unlink loses nothing
+    await fs.promises.rm(this.path(JOURNAL_FILE), { force: true });
+
+    this.snapshot = CVESnapshot.read(snapshotPath);
+    this.journal.clear();
+  }
+
+  private async runSync(): Promise<MirrorSyncResult> {
+    this.load();
+    await fs.promises.mkdir(this.options.directory, { recursive: true });
+
+    const changed = new Map<string, CVEData>();
+    const cursors: SourceCursors = {};
+    const failedSources: CVESource[] = [];
+    let fetched = 0;
+
+    for (const source of this.options.sources) {
+      const cursor = this.cursors[source];
+      const since = cursor ? new Date(modifiedTime(cursor)) : new Date(Date.now() - this.options.initialWindow);
+
+      let records: CVEData[];
+      try {
+        records = source === 'nvd'
+          ? await this.fetcher.fetchNVDChanges(since)
+          : await this.fetcher.fetchOSVChanges(since);
+      } catch (error) {
+        console.warn(`Failed to sync CVEs from ${source.toUpperCase()}:`, error);
+        failedSources.push(source);
+        continue;
+      }
+
+      fetched += records.length;
+      let latest = cursor;
+      for (const record of records) {
+        if (!latest || modifiedTime(record.modified) > modifiedTime(latest)) {
+          latest = record.modified;
+        }
+
+        const current = changed.get(record.id) ?? this.get(record.id);
+        if (!current || modifiedTime(current.modified) < modifiedTime(record.modified)) {
+          changed.set(record.id, record);
+        }
+      }
+      if (latest) cursors[source] = latest;
+    }
+
+    if (changed.size > 0 || Object.keys(cursors).length > 0) {
+      const lines = Array.from(changed.values(), cve => JSON.stringify(cve));
+      lines.push(JSON.stringify({ cursors }));
+      await fs.promises.appendFile(this.path(JOURNAL_FILE), lines.join('\n') + '\n');
+
+      for (const cve of changed.values()) this.journal.set(cve.id, cve);
+      this.cursors = { ...this.cursors, ...cursors };
+    }
+
+    const threshold = Math.max(this.options.minCompaction, (this.snapshot?.size ?? 0) * this.options.compactionRatio);
+    const compacted = this.journal.size > threshold;
+    if (compacted) {
+      await this.compact();
+    }
+
+    return {
+      changed: Array.from(changed.values()),
+      fetched,
+      failedSources,
+      cursors: { ...this.cursors },
+      compacted
+    };
+  }
+
+  private path(file: string): string {
+    return path.join(this.options.directory, file);
+  }
+}
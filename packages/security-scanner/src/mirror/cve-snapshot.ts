@@ -0,0 +1,139 @@
+// Compact on-disk snapshot of mirrored CVE records
+//
+// Layout, integers as little-endian uint32:
+//   "TLCV" | format version | record count | header length
+//   header JSON (source cursors, creation time)
+//   record offsets, count + 1 of them, relative to the first record
+//   records sorted by ID, each "<id>\n<CVEData JSON>"
+//
+// A snapshot is read into a single buffer and records are decoded only
+// when accessed, so opening one costs a read and no parsing; lookups by ID
+// binary search the sorted records.
+import fs from 'fs';
+import { CVEData } from '../cve-fetcher';
+
+const MAGIC = 'TLCV';
+const FORMAT_VERSION = 1;
+const PREAMBLE_SIZE = 16;
+const NEWLINE = 0x0a;
+
+export type CVESource = 'nvd' | 'osv';
+
+// Latest modification time seen from each source, as ISO strings
+export type SourceCursors = Partial<Record<CVESource, string>>;
+
+export interface SnapshotHeader {
+  cursors: SourceCursors;
+  createdAt: string;
+}
+
+export class CVESnapshotError extends Error {
+  constructor(message: string, public readonly path: string) {
+    super(message);
+    this.name = 'CVESnapshotError';
+  }
+}
+
+export class CVESnapshot {
+  public readonly header: SnapshotHeader;
+  public readonly size: number;
+  private buffer: Buffer;
+  private offsetsStart: number;
+  private recordsStart: number;
+
+  private constructor(buffer: Buffer, filePath: string) {
+    if (buffer.length < PREAMBLE_SIZE || buffer.toString('latin1', 0, 4) !== MAGIC) {
+      throw new CVESnapshotError('Not a CVE snapshot', filePath);
+    }
+    if (buffer.readUInt32LE(4) !== FORMAT_VERSION) {
+      throw new CVESnapshotError(`Unsupported CVE snapshot version ${buffer.readUInt32LE(4)}`, filePath);
+    }
+
+    this.buffer = buffer;
+    this.size = buffer.readUInt32LE(8);
+    const headerLength = buffer.readUInt32LE(12);
+    this.header = JSON.parse(buffer.toString('utf8', PREAMBLE_SIZE, PREAMBLE_SIZE + headerLength));
+    this.offsetsStart = PREAMBLE_SIZE + headerLength;
+    this.recordsStart = this.offsetsStart + (this.size + 1) * 4;
+
+    if (this.recordsStart + this.recordOffset(this.size) !== buffer.length) {
+      throw new CVESnapshotError('Truncated CVE snapshot', filePath);
+    }
+  }
+
+  // Null when no snapshot has been written yet
+  public static read(filePath: string): CVESnapshot | null {
+    let buffer: Buffer;
+    try {
+      buffer = fs.readFileSync(filePath);
+    } catch (error) {
+      if ((error as NodeJS.ErrnoException).code === 'ENOENT') return null;
+      throw error;
+    }
+    return new CVESnapshot(buffer, filePath);
+  }
+
+  // Written to a temporary file and renamed over the old snapshot, so
+  // readers never see a partial one
+  public static async write(filePath: string, cves: CVEData[], header: SnapshotHeader): Promise<void> {
+    const sorted = [...cves].sort((a, b) => (a.id < b.id ? -1 : a.id > b.id ? 1 : 0));
+    const records = sorted.map(cve => Buffer.from(`${cve.id}\n${JSON.stringify(cve)}`, 'utf8'));
+    const headerBuffer = Buffer.from(JSON.stringify(header), 'utf8');
+
+    const preamble = Buffer.alloc(PREAMBLE_SIZE);
+    preamble.write(MAGIC, 0, 'latin1');
+    preamble.writeUInt32LE(FORMAT_VERSION, 4);
+    preamble.writeUInt32LE(records.length, 8);
+    preamble.writeUInt32LE(headerBuffer.length, 12);
+
+    const offsets = Buffer.alloc((records.length + 1) * 4);
+    let offset = 0;
+    records.forEach((record, i) => {
+      offsets.writeUInt32LE(offset, i * 4);
+      offset += record.length;
+    });
+    offsets.writeUInt32LE(offset, records.length * 4);
+
+    const tempPath = `${filePath}.${process.pid}.tmp`;
+    await fs.promises.writeFile(tempPath, Buffer.concat([preamble, headerBuffer, offsets, ...records]));
+    await fs.promises.rename(tempPath, filePath);
+  }
+
+  public get(id: string): CVEData | undefined {
+    let low = 0;
+    let high = this.size - 1;
+    while (low <= high) {
+      const mid = (low + high) >> 1;
+      const midId = this.idAt(mid);
+      if (midId === id) return this.recordAt(mid);
+      if (midId < id) {
+        low = mid + 1;
+      } else {
+        high = mid - 1;
+      }
+    }
+    return undefined;
+  }
+
+  public *records(): IterableIterator<CVEData> {
+    for (let i = 0; i < this.size; i++) {
+      yield this.recordAt(i);
+    }
+  }
+
+  private recordOffset(index: number): number {
+    return this.buffer.readUInt32LE(this.offsetsStart + index * 4);
+  }
+
+  private idAt(index: number): string {
+    const start = this.recordsStart + this.recordOffset(index);
+    return this.buffer.toString('utf8', start, this.buffer.indexOf(NEWLINE, start));
+  }
+
+  private recordAt(index: number): CVEData {
+    const start = this.recordsStart + this.recordOffset(index);
+    const end = this.recordsStart + this.recordOffset(index + 1);
+    const separator = this.buffer.indexOf(NEWLINE, start);
+    return JSON.parse(this.buffer.toString('utf8', separator + 1, end));
+  }
+}
@@ -1,5 +1,6 @@
 // Periodic CVE database updates
 import { CVEFetcher, CVEData } from '../cve-fetcher';
+import { CVEMirror } from '../mirror/cve-mirror';
 
 export interface UpdateSchedulerConfig {
   updateInterval: number; // milliseconds
@@ -7,6 +8,8 @@ export interface UpdateSchedulerConfig {
   retryDelay: number;
   onUpdate?: (cves: CVEData[]) => Promise<void>;
   onError?: (error: Error) => void;
+  // Sync through a local mirror, fetching only changes since its cursors
+  mirror?: CVEMirror;
 }
 
 export class CVEUpdateScheduler {
@@ -69,12 +72,7 @@ export class CVEUpdateScheduler {
     let retries = 0;
     while (retries < this.config.maxRetries) {
       try {
-        const modifiedSince = this.lastUpdate || new Date(Date.now() - 7 * 24 * 60 * 60 * 1000);
-        
-        const cves = await this.fetcher.fetchRecentCVEs({
-          modifiedSince,
-          maxResults: 1000
-        });
+        const cves = await this.fetchUpdates();
 
         if (cves.length > 0) {
           console.log(`Fetched ${cves.length} CVE updates`);
@@ -122,6 +120,23 @@ export class CVEUpdateScheduler {
     };
   }
 
+  private async fetchUpdates(): Promise<CVEData[]> {
+    if (this.config.mirror) {
+      const result = await this.config.mirror.sync();
+      if (result.failedSources.length === this.config.mirror.sourceCount) {
+        throw new Error('CVE mirror sync failed for every source');
+      }
+      return result.changed;
+    }
+
+    const modifiedSince = this.lastUpdate || new Date(Date.now() - 7 * 24 * 60 * 60 * 1000);
+
+    return this.fetcher.fetchRecentCVEs({
+      modifiedSince,
+      maxResults: 1000
+    });
+  }
+
   private delay(ms: number): Promise<void> {
     return new Promise(resolve => setTimeout(resolve, ms));
   }
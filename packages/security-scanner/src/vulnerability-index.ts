@@ -0,0 +1,454 @@
+// Prebuilt lookup structure for matching dependencies against CVEs
+//
+// Affected packages are grouped by ecosystem and normalized name. Each
+// version range is compiled once into sorted bounds, so checking a version
+// is a binary search. Fuzzy name matches are drawn from a bigram index and
+// confirmed with an edit distance that gives up past the allowed bound.
+import { CVEData } from './cve-fetcher';
+import type { RuntimeDependency } from './vulnerability-matcher';
+
+// Advisory ecosystem names and the aliases dependencies may report
+const ECOSYSTEM_ALIASES: Record<string, string[]> = {
+  'npm': ['node.js', 'nodejs', 'javascript'],
+  'pypi': ['python', 'pip'],
+  'maven': ['java'],
+  'nuget': ['.net', 'dotnet', 'c#'],
+  'rubygems': ['ruby', 'gem'],
+  'go': ['golang'],
+  'cargo': ['rust']
+};
+
+// Confidence of a name that contains, or is contained in, the other
+const SUBSTRING_CONFIDENCE = 0.9;
+// Fuzzy matches must be more similar than this
+const MIN_SIMILARITY = 0.8;
+
+type VersionParts = number[];
+
+type RangeStep =
+  | { kind: 'introduced'; version: string; bound: number }
+  | { kind: 'fixed'; version: string; bound: number }
+  | { kind: 'compare'; operator: string; bound: number };
+
+interface CompiledRange {
+  // Distinct versions named by the range, ascending
+  bounds: VersionParts[];
+  // Indexed by slot: slot 2i is the gap below bounds[i], slot 2i + 1 is
+  // bounds[i] itself and the last slot is everything above the top bound
+  vulnerable: boolean[];
+  introduced: Array<{ version: string; slot: number }>;
+  fixed: string[];
+}
+
+interface IndexedPackage {
+  cveIndex: number;
+  packageIndex: number;
+  range: CompiledRange;
+}
+
+interface EcosystemIndex {
+  names: string[]; // distinct normalized names
+  packages: IndexedPackage[][]; // by name ID
+  ids: Map<string, number>;
+  bigrams: Map<string, number[]>; // bigram -> ascending name IDs
+  maxNameLength: number;
+  // Reused shared-bigram counters for fuzzy lookups
+  counts: Uint16Array;
+}
+
+export interface IndexedMatch {
+  cve: CVEData;
+  nameConfidence: number;
+  affectedVersions: string[];
+  fixedVersions: string[];
+}
+
+export function normalizePackageName(name: string): string {
+  return name.toLowerCase().replace(/[-_]/g, '');
+}
+
+export function normalizeVersion(version: string): string {
+  // Remove common prefixes and pre-release suffixes
+  const normalized = version.replace(/^[v^~]/, '').split('-')[0];
+  return normalized || '0.0.0';
+}
+
+function parseVersion(version: string): VersionParts {
+  return version.split('.').map(n => parseInt(n) || 0);
+}
+
+// Missing components count as zero, so 1.2 equals 1.2.0
+function compareVersionParts(parts1: VersionParts, parts2: VersionParts): number {
+  const maxLength = Math.max(parts1.length, parts2.length);
+
+  for (let i = 0; i < maxLength; i++) {
+    const part1 = parts1[i] || 0;
+    const part2 = parts2[i] || 0;
+
+    if (part1 > part2) return 1;
+    if (part1 < part2) return -1;
+  }
+
+  return 0;
+}
+
+export function ecosystemMatches(depEcosystem: string, cveEcosystem: string): boolean {
+  const normalizedDep = depEcosystem.toLowerCase();
+  const normalizedCve = cveEcosystem.toLowerCase();
+
+  if (normalizedDep === normalizedCve) return true;
+
+  for (const [ecosystem, aliases] of Object.entries(ECOSYSTEM_ALIASES)) {
+    if ((normalizedDep === ecosystem && aliases.includes(normalizedCve)) ||
+        (normalizedCve === ecosystem && aliases.includes(normalizedDep))) {
+      return true;
+    }
+  }
+
+  return false;
+}
+
+// Semicolon-separated events ("introduced:1.0;fixed:1.4") or comparisons
+// (">=2.0"), applied in order. The result only changes at the versions the
+// range names, so it is evaluated once per bound and per gap between them.
+function compileRange(versionRange: string): CompiledRange {
+  const steps: Array<{ kind: RangeStep['kind']; version: string; operator: string }> = [];
+
+  for (const range of versionRange.split(';').map(r => r.trim()).filter(r => r)) {
+    if (range.includes('introduced:')) {
+      const introduced = range.split('introduced:')[1];
+      if (introduced) steps.push({ kind: 'introduced', version: introduced, operator: '' });
+    }
+
+    if (range.includes('fixed:')) {
+      const fixed = range.split('fixed:')[1];
+      if (fixed) steps.push({ kind: 'fixed', version: fixed, operator: '' });
+    }
+
+    if (range.startsWith('<') || range.startsWith('>')) {
+      const operator = range.match(/^[<>=]+/)?.[0] || '';
+      const version = range.replace(operator, '');
+      if (version) steps.push({ kind: 'compare', version, operator });
+    }
+  }
+
+  const sorted = steps
+    .map(step => parseVersion(step.version))
+    .sort(compareVersionParts);
+  const bounds: VersionParts[] = [];
+  for (const parts of sorted) {
+    const last = bounds[bounds.length - 1];
+    if (!last || compareVersionParts(last, parts) !== 0) bounds.push(parts);
+  }
+
+  const compiled: RangeStep[] = steps.map(step => {
+    const bound = findSlot(bounds, parseVersion(step.version)) >> 1;
+    return step.kind === 'compare'
+      ? { kind: 'compare', operator: step.operator, bound }
+      : { kind: step.kind, version: step.version, bound };
+  });
+
+  const vulnerable: boolean[] = new Array(bounds.length * 2 + 1);
+  for (let slot = 0; slot < vulnerable.length; slot++) {
+    let isVulnerable = false;
+    for (const step of compiled) {
+      // Sign of comparing a version in this slot against the step's bound
+      const comparison = Math.sign(slot - (step.bound * 2 + 1));
+      switch (step.kind) {
+        case 'introduced':
+          if (comparison >= 0) isVulnerable = true;
+          break;
+        case 'fixed':
+          isVulnerable = comparison < 0;
+          break;
+        case 'compare':
+          if ((step.operator === '>=' && comparison >= 0) ||
+              (step.operator === '<=' && comparison <= 0) ||
+              (step.operator === '<' && comparison < 0) ||
+              (step.operator === '>' && comparison > 0)) {
+            isVulnerable = true;
+          }
+          break;
+      }
+    }
+    vulnerable[slot] = isVulnerable;
+  }
+
+  const introduced: CompiledRange['introduced'] = [];
+  const fixed: string[] = [];
+  for (const step of compiled) {
+    if (step.kind === 'introduced') introduced.push({ version: step.version, slot: step.bound * 2 + 1 });
+    if (step.kind === 'fixed') fixed.push(step.version);
+  }
+
+  return { bounds, vulnerable, introduced, fixed };
+}
+
+// Binary search for the slot holding a version (see CompiledRange)
+function findSlot(bounds: VersionParts[], parts: VersionParts): number {
+  let low = 0;
+  let high = bounds.length;
+  while (low < high) {
+    const mid = (low + high) >> 1;
+    if (compareVersionParts(bounds[mid]!, parts) < 0) {
+      low = mid + 1;
+    } else {
+      high = mid;
+    }
+  }
+
+  return low < bounds.length && compareVersionParts(bounds[low]!, parts) === 0 ? low * 2 + 1 : low * 2;
+}
+
+function bigramsOf(name: string): Set<string> {
+  const bigrams = new Set<string>();
+  for (let i = 0; i + 2 <= name.length; i++) {
+    bigrams.add(name.slice(i, i + 2));
+  }
+  return bigrams;
+}
+
+// Levenshtein distance, or limit + 1 once it is known to exceed limit
+function boundedEditDistance(str1: string, str2: string, limit: number): number {
+  if (Math.abs(str1.length - str2.length) > limit) return limit + 1;
+
+  let previous = new Uint32Array(str2.length + 1);
+  let current = new Uint32Array(str2.length + 1);
+  for (let j = 0; j <= str2.length; j++) previous[j] = j;
+
+  for (let i = 1; i <= str1.length; i++) {
+    current[0] = i;
+    let rowMin = i;
+    for (let j = 1; j <= str2.length; j++) {
+      const indicator = str1[i - 1] === str2[j - 1] ? 0 : 1;
+      const distance = Math.min(
+        current[j - 1]! + 1,          // insertion
+        previous[j]! + 1,             // deletion
+        previous[j - 1]! + indicator  // substitution
+      );
+      current[j] = distance;
+      if (distance < rowMin) rowMin = distance;
+    }
+    if (rowMin > limit) return limit + 1;
+    [previous, current] = [current, previous];
+  }
+
+  return previous[str2.length]!;
+}
+
+// Name confidence under the matcher's rules: 1 for equal names, 0.9 when
+// one contains the other, else the edit similarity if above 0.8
+function fuzzyConfidence(depName: string, cveName: string): number {
+  const maxLength = Math.max(depName.length, cveName.length);
+  const limit = Math.floor(maxLength * (1 - MIN_SIMILARITY));
+  const distance = boundedEditDistance(depName, cveName, limit);
+  if (distance > limit) return 0;
+
+  const similarity = 1 - (distance / maxLength);
+  return similarity > MIN_SIMILARITY ? similarity : 0;
+}
+
+export class VulnerabilityIndex {
+  public readonly cves: CVEData[];
+  private ecosystems = new Map<string, EcosystemIndex>();
+  private ecosystemsByDependency = new Map<string, EcosystemIndex[]>();
+  private packageCount = 0;
+
+  constructor(cves: CVEData[]) {
+    this.cves = cves;
+
+    // Advisories repeat the same handful of range strings
+    const ranges = new Map<string, CompiledRange>();
+
+    cves.forEach((cve, cveIndex) => {
+      cve.affectedPackages.forEach((affectedPkg, packageIndex) => {
+        let range = ranges.get(affectedPkg.versionRange);
+        if (!range) {
+          range = compileRange(affectedPkg.versionRange);
+          ranges.set(affectedPkg.versionRange, range);
+        }
+        // A range no version falls in can never match
+        if (!range.vulnerable.includes(true)) return;
+
+        const ecosystem = this.ecosystemIndex(affectedPkg.ecosystem.toLowerCase());
+        const name = normalizePackageName(affectedPkg.name);
+        let id = ecosystem.ids.get(name);
+        if (id === undefined) {
+          id = ecosystem.names.length;
+          ecosystem.ids.set(name, id);
+          ecosystem.names.push(name);
+          ecosystem.packages.push([]);
+          ecosystem.maxNameLength = Math.max(ecosystem.maxNameLength, name.length);
+          for (const bigram of bigramsOf(name)) {
+            let postings = ecosystem.bigrams.get(bigram);
+            if (!postings) {
+              postings = [];
+              ecosystem.bigrams.set(bigram, postings);
+            }
+            postings.push(id);
+          }
+        }
+        ecosystem.packages[id]!.push({ cveIndex, packageIndex, range });
+        this.packageCount++;
+      });
+    });
+
+    for (const ecosystem of this.ecosystems.values()) {
+      ecosystem.counts = new Uint16Array(ecosystem.names.length);
+    }
+  }
+
+  public get size(): { cves: number; packages: number; ecosystems: number } {
+    return {
+      cves: this.cves.length,
+      packages: this.packageCount,
+      ecosystems: this.ecosystems.size
+    };
+  }
+
+  // CVEs affecting the dependency in CVE order, each with the first of its
+  // affected packages that matches
+  public match(dependency: RuntimeDependency): IndexedMatch[] {
+    const name = normalizePackageName(dependency.name);
+    const version = parseVersion(normalizeVersion(dependency.version));
+    const hits: Array<{ pkg: IndexedPackage; nameConfidence: number; slot: number }> = [];
+
+    for (const ecosystem of this.ecosystemsFor(dependency.ecosystem)) {
+      for (const [id, nameConfidence] of this.nameCandidates(ecosystem, name)) {
+        for (const pkg of ecosystem.packages[id]!) {
+          const slot = findSlot(pkg.range.bounds, version);
+          if (pkg.range.vulnerable[slot]) {
+            hits.push({ pkg, nameConfidence, slot });
+          }
+        }
+      }
+    }
+
+    hits.sort((a, b) => a.pkg.cveIndex - b.pkg.cveIndex || a.pkg.packageIndex - b.pkg.packageIndex);
+
+    const matches: IndexedMatch[] = [];
+    let lastCve = -1;
+    for (const { pkg, nameConfidence, slot } of hits) {
+      if (pkg.cveIndex === lastCve) continue;
+      lastCve = pkg.cveIndex;
+
+      matches.push({
+        cve: this.cves[pkg.cveIndex]!,
+        nameConfidence,
+        affectedVersions: pkg.range.introduced
+          .filter(introduced => introduced.slot <= slot)
+          .map(introduced => `>=${introduced.version}`),
+        fixedVersions: pkg.range.fixed.slice()
+      });
+    }
+
+    return matches;
+  }
+
+  private ecosystemIndex(ecosystem: string): EcosystemIndex {
+    let index = this.ecosystems.get(ecosystem);
+    if (!index) {
+      index = {
+        names: [],
+        packages: [],
+        ids: new Map(),
+        bigrams: new Map(),
+        maxNameLength: 0,
+        counts: new Uint16Array(0)
+      };
+      this.ecosystems.set(ecosystem, index);
+    }
+    return index;
+  }
+
+  private ecosystemsFor(depEcosystem: string): EcosystemIndex[] {
+    const key = depEcosystem.toLowerCase();
+    let matching = this.ecosystemsByDependency.get(key);
+    if (!matching) {
+      matching = Array.from(this.ecosystems)
+        .filter(([ecosystem]) => ecosystemMatches(key, ecosystem))
+        .map(([, index]) => index);
+      this.ecosystemsByDependency.set(key, matching);
+    }
+    return matching;
+  }
+
+  // Name IDs whose confidence reaches the matcher's threshold
+  private nameCandidates(ecosystem: EcosystemIndex, name: string): Map<number, number> {
+    const candidates = new Map<number, number>();
+
+    const exact = ecosystem.ids.get(name);
+    if (exact !== undefined) candidates.set(exact, 1.0);
+
+    // Names contained in the dependency's name
+    for (let start = 0; start <= name.length; start++) {
+      const end = Math.min(name.length, start + ecosystem.maxNameLength);
+      for (let stop = start; stop <= end; stop++) {
+        const id = ecosystem.ids.get(name.slice(start, stop));
+        if (id !== undefined && !candidates.has(id)) candidates.set(id, SUBSTRING_CONFIDENCE);
+      }
+    }
+
+    // Names containing the dependency's name, drawn from its rarest bigram
+    const bigrams = bigramsOf(name);
+    if (bigrams.size === 0) {
+      ecosystem.names.forEach((candidate, id) => {
+        if (candidate.includes(name) && !candidates.has(id)) candidates.set(id, SUBSTRING_CONFIDENCE);
+      });
+    } else {
+      let rarest: number[] | undefined;
+      for (const bigram of bigrams) {
+        const postings = ecosystem.bigrams.get(bigram) ?? [];
+        if (!rarest || postings.length < rarest.length) rarest = postings;
+      }
+      for (const id of rarest!) {
+        if (!candidates.has(id) && ecosystem.names[id]!.includes(name)) {
+          candidates.set(id, SUBSTRING_CONFIDENCE);
+        }
+      }
+    }
+
+    this.addFuzzyCandidates(ecosystem, name, bigrams, candidates);
+    return candidates;
+  }
+
+  // Names within 0.8 similarity are within floor(0.2 * length) edits. Each
+  // edit removes at most two of a name's bigrams, which bounds how many the
+  // two names must share; only names sharing that many are compared.
+  private addFuzzyCandidates(
+    ecosystem: EcosystemIndex,
+    name: string,
+    bigrams: Set<string>,
+    candidates: Map<number, number>
+  ): void {
+    // Similar names are shorter than 1.25 times the dependency's name
+    const maxEdits = Math.floor(Math.ceil(name.length / MIN_SIMILARITY) * (1 - MIN_SIMILARITY));
+    if (maxEdits === 0) return;
+
+    const check = (id: number) => {
+      if (candidates.has(id)) return;
+      const confidence = fuzzyConfidence(name, ecosystem.names[id]!);
+      if (confidence > 0) candidates.set(id, confidence);
+    };
+
+    const minShared = bigrams.size - 2 * maxEdits;
+    if (minShared <= 0) {
+      for (let id = 0; id < ecosystem.names.length; id++) check(id);
+      return;
+    }
+
+    const counts = ecosystem.counts;
+    const touched: number[] = [];
+    for (const bigram of bigrams) {
+      for (const id of ecosystem.bigrams.get(bigram) ?? []) {
+        if (counts[id] === 0) touched.push(id);
+        counts[id] = counts[id]! + 1;
+      }
+    }
+
+    for (const id of touched) {
+      if (counts[id]! >= minShared) check(id);
+      counts[id] = 0;
+    }
+  }
+}
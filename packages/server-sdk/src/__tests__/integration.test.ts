@@ -2,7 +2,9 @@
 import { TraceLensServerSDK } from '../core/tracer';
 import { DependencyScanner } from '../core/dependency-scanner';
 import { ExecutionTracker } from '../core/execution-tracker';
+import { LatencyHistogram } from '../core/latency-histogram';
 import { PackageScanner } from '../analyzers/package-scanner';
+import { TraceLensSpanProcessor, TraceLensSpanData } from '../correlation/span-processor';
 
 // Mock OpenTelemetry
 jest.mock('@opentelemetry/sdk-node', () => ({
@@ -116,6 +118,44 @@ describe('Server SDK Integration Tests', () => {
     tracker.shutdown();
   });
 
+  test('Execution tracker reports percentiles and delta snapshots without spans', () => {
+    const tracker = new ExecutionTracker({
+      serviceName: 'test-service',
+      serviceVersion: '1.0.0',
+      environment: 'test',
+      enableDependencyScanning: false,
+      enableExecutionTracking: true,
+      debug: false,
+    }, { spanSampleRate: 0 });
+
+    const hotFunction = tracker.trackFunction((value: number) => value * 2, 'hotFunction');
+    for (let i = 0; i < 100; i++) {
+      expect(hotFunction(i)).toBe(i * 2);
+    }
+
+    const delta = tracker.getMetricsDelta();
+    expect(delta.totalCalls).toBe(100);
+    const hot = delta.functionMetrics.get('hotFunction')!;
+    expect(hot.p99).toBeGreaterThanOrEqual(hot.p50);
+    expect(hot.p99).toBeLessThanOrEqual(hot.maxDuration);
+
+    hotFunction(1);
+    expect(tracker.getMetricsDelta().totalCalls).toBe(1);
+    expect(tracker.getMetrics().totalCalls).toBe(101);
+  });
+
+  test('Latency histogram percentiles stay within bucket precision', () => {
+    const histogram = new LatencyHistogram();
+    for (let i = 1; i <= 1000; i++) {
+      histogram.record(i); // 1ms..1s
+    }
+
+    expect(histogram.count).toBe(1000);
+    expect(Math.abs(histogram.percentile(0.5) - 500) / 500).toBeLessThan(0.04);
+    expect(Math.abs(histogram.percentile(0.99) - 990) / 990).toBeLessThan(0.04);
+    expect(histogram.percentile(1)).toBeLessThanOrEqual(1000);
+  });
+
   test('Package scanner analyzes dependencies', async () => {
     const scanner = new PackageScanner();
     
@@ -132,6 +172,80 @@ describe('Server SDK Integration Tests', () => {
     }
   });
 
+  test('Span processor drops spans past capacity and retries failed exports', async () => {
+    const exported: TraceLensSpanData[][] = [];
+    let failures = 1;
+    const processor = new TraceLensSpanProcessor({
+      maxSpans: 4,
+      maxBatchSize: 2,
+      maxInFlight: 1,
+      retryDelay: 1,
+      onFlush: (spans) => {
+        if (failures-- > 0) throw new Error('unavailable');
+        exported.push(spans);
+      },
+    });
+
+    const span = (id: number) => ({
+      name: `operation-${id}`,
+      attributes: { 'http.route': '/test', ignored: [1, 2] },
+      startTime: [1, 0],
+      endTime: [1, 5000000],
+      spanContext: () => ({ traceId: 'trace-1', spanId: `span-${id}` }),
+    }) as any;
+
+    for (let i = 0; i < 6; i++) {
+      processor.onEnd(span(i));
+    }
+    expect(processor.getStats().dropped).toBe(2);
+    expect(processor.getSpans()[0]!.tags).toEqual({ 'http.route': '/test' });
+
+    await processor.shutdown();
+
+    const stats = processor.getStats();
+    expect(stats.exported).toBe(4);
+    expect(stats.retries).toBe(1);
+    expect(stats.buffered).toBe(0);
+    expect(exported.flat().map(spanData => spanData.spanId)).toEqual(['span-0', 'span-1', 'span-2', 'span-3']);
+    expect(exported[0]![0]!.duration).toBeCloseTo(5);
+  });
+
+  test('Span processor keeps the process alive while shutdown waits on a retry', async () => {
+    const random = jest.spyOn(Math, 'random').mockReturnValue(1);
+    let failures = 1;
+    const processor = new TraceLensSpanProcessor({
+      retryDelay: 50,
+      onFlush: () => {
+        if (failures-- > 0) throw new Error('unavailable');
+      },
+    });
+    const timers = () => process.getActiveResourcesInfo().filter(resource => resource === 'Timeout').length;
+
+    try {
+      processor.onEnd({
+        name: 'operation',
+        attributes: {},
+        startTime: [1, 0],
+        endTime: [1, 5000000],
+        spanContext: () => ({ traceId: 'trace-1', spanId: 'span-1' }),
+      } as any);
+      const flushing = processor.forceFlush();
+      await new Promise(resolve => setImmediate(resolve));
+
+      // The failed export is backing off on a timer that does not hold the process
+      expect(processor.getStats().retries).toBe(1);
+      const idleTimers = timers();
+
+      const stopping = processor.shutdown();
+      expect(timers()).toBe(idleTimers + 1);
+
+      await Promise.all([flushing, stopping]);
+      expect(processor.getStats().exported).toBe(1);
+    } finally {
+      random.mockRestore();
+    }
+  });
+
   test('SDK handles configuration validation', () => {
     expect(() => {
       new TraceLensServerSDK({
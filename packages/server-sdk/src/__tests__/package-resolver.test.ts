@@ -0,0 +1,104 @@
+// Package resolver tests
+import * as path from 'path';
+import { PackageResolver, packageOf } from '../analyzers/package-resolver';
+import { DependencyScanner } from '../core/dependency-scanner';
+
+const fixtures = path.join(__dirname, 'fixtures');
+
+// Installed under a fixture project; nothing exists on disk past the lockfile
+const installed = (project: string, ...segments: string[]) => {
+  const root = path.join(fixtures, project, ...segments);
+  return packageOf(path.join(root, 'index.js'))!;
+};
+
+describe('packageOf', () => {
+  test('attributes a module to its innermost node_modules package', () => {
+    expect(packageOf(path.join('/app', 'node_modules', 'send', 'node_modules', 'debug', 'src', 'node.js'))).toEqual({
+      name: 'debug',
+      root: path.join('/app', 'node_modules', 'send', 'node_modules', 'debug')
+    });
+    expect(packageOf(path.join('/app', 'node_modules', 'debug', 'src', 'node.js'))!.root)
+      .toBe(path.join('/app', 'node_modules', 'debug'));
+  });
+
+  test('keeps the scope in scoped package names', () => {
+    expect(packageOf(path.join('/app', 'node_modules', '@babel', 'code-frame', 'lib', 'index.js'))).toEqual({
+      name: '@babel/code-frame',
+      root: path.join('/app', 'node_modules', '@babel', 'code-frame')
+    });
+  });
+
+  test('resolves packages inside the pnpm store', () => {
+    const filename = path.join('/app', 'node_modules', '.pnpm', 'debug@4.3.4_supports-color@8.1.1', 'node_modules', 'debug', 'src', 'node.js');
+    expect(packageOf(filename)!.name).toBe('debug');
+  });
+
+  test('ignores application files and non-package directories', () => {
+    expect(packageOf(path.join('/app', 'src', 'server.js'))).toBeNull();
+    expect(packageOf(path.join('/app', 'node_modules', '.bin', 'tsc'))).toBeNull();
+    expect(packageOf(path.join('/app', 'node_modules', 'debug'))).toBeNull();
+  });
+});
+
+describe('PackageResolver', () => {
+  test.each(['npm-v3', 'npm-v1'])('reads nested install paths from a %s package-lock.json', project => {
+    const resolver = new PackageResolver(path.join(fixtures, project));
+
+    expect(resolver.versionAt(installed(project, 'node_modules', 'debug'))).toBe('4.3.4');
+    expect(resolver.versionAt(installed(project, 'node_modules', 'send', 'node_modules', 'debug'))).toBe('2.6.9');
+    expect(resolver.versionAt(installed(project, 'node_modules', 'send', 'node_modules', 'debug', 'node_modules', 'ms'))).toBe('2.0.0');
+    expect(resolver.versionAt(installed(project, 'node_modules', 'send', 'node_modules', 'ms'))).toBe('2.1.3');
+    expect(resolver.versionOf('ms')).toBe('2.1.2');
+
+    const stats = resolver.getStats();
+    expect(stats.lockfile).toBe(path.join(fixtures, project, 'package-lock.json'));
+    expect(stats.manifestReads).toBe(0);
+  });
+
+  test('reads scoped packages from a package-lock.json', () => {
+    const resolver = new PackageResolver(path.join(fixtures, 'npm-v3'));
+    expect(resolver.versionAt(installed('npm-v3', 'node_modules', '@babel', 'code-frame'))).toBe('7.22.13');
+  });
+
+  test.each(['yarn-classic', 'yarn-berry', 'pnpm-v6', 'pnpm-v9'])('reads single-version packages from a %s lockfile', project => {
+    const resolver = new PackageResolver(path.join(fixtures, project));
+
+    expect(resolver.versionAt(installed(project, 'node_modules', '@babel', 'code-frame'))).toBe('7.22.13');
+    expect(resolver.versionOf('@babel/code-frame')).toBe('7.22.13');
+    // Two versions of debug are locked, so the lockfile cannot tell which
+    // one a path holds and the missing package.json is the last resort
+    expect(resolver.versionAt(installed(project, 'node_modules', 'debug'))).toBeNull();
+    expect(resolver.getStats()).toMatchObject({ lockfileHits: 2, manifestReads: 1, failures: 1 });
+  });
+
+  test('reads the version of a pnpm store package from its path', () => {
+    const resolver = new PackageResolver(path.join(fixtures, 'pnpm-v9'));
+    const location = installed('pnpm-v9', 'node_modules', '.pnpm', 'debug@4.3.4_supports-color@8.1.1', 'node_modules', 'debug');
+
+    expect(resolver.versionAt(location)).toBe('4.3.4');
+    expect(resolver.versionAt(location)).toBe('4.3.4');
+    expect(resolver.getStats()).toMatchObject({ pathHits: 1, cacheHits: 1, resolved: 1 });
+  });
+});
+
+describe('DependencyScanner', () => {
+  test('reports nested copies of a package separately', () => {
+    const scanner = new DependencyScanner({
+      serviceName: 'test-service',
+      serviceVersion: '1.0.0',
+      environment: 'test',
+      debug: false,
+    });
+    (scanner as any).resolver = new PackageResolver(path.join(fixtures, 'npm-v3'));
+
+    const track = (...segments: string[]) => (scanner as any).trackRuntimeDependency(path.join(fixtures, 'npm-v3', ...segments), 1);
+    track('node_modules', 'debug', 'src', 'index.js');
+    track('node_modules', 'debug', 'src', 'node.js');
+    track('node_modules', 'send', 'node_modules', 'debug', 'src', 'index.js');
+
+    const debug = scanner.getSnapshot().runtimeDependencies
+      .filter(dependency => dependency.name === 'debug')
+      .map(dependency => [dependency.version, dependency.loadTime]);
+    expect(debug).toEqual([['4.3.4', 2], ['2.6.9', 1]]);
+  });
+});
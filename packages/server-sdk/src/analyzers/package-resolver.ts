@@ -0,0 +1,316 @@
+// Installed package versions, resolved once per package root
+//
+// Versions come from the project's lockfile where it pins them, which is
+// parsed once on first use; pnpm store paths carry the version in the
+// path itself. Only packages neither covers have their package.json read,
+// and every answer is cached by package root.
+import * as fs from 'fs';
+import * as path from 'path';
+
+export interface PackageLocation {
+  name: string;
+  root: string; // directory holding the package's package.json
+}
+
+export interface PackageResolverStats {
+  lockfile: string | null;
+  lockfileParseTime: number; // milliseconds
+  resolved: number; // package roots with a cached version
+  cacheHits: number;
+  lockfileHits: number;
+  pathHits: number;
+  manifestReads: number;
+  failures: number;
+}
+
+interface Lockfile {
+  // Install path relative to the project ("node_modules/a/node_modules/b")
+  byPath: Map<string, string>;
+  byName: Map<string, Set<string>>;
+}
+
+const NODE_MODULES = `${path.sep}node_modules${path.sep}`;
+const PNPM_STORE = `${path.sep}node_modules${path.sep}.pnpm${path.sep}`;
+const LOCKFILES = ['package-lock.json', 'yarn.lock', 'pnpm-lock.yaml'];
+
+// The package a module file belongs to: the innermost node_modules entry,
+// so nested copies are told apart. Null for application files.
+export function packageOf(filename: string): PackageLocation | null {
+  const index = filename.lastIndexOf(NODE_MODULES);
+  if (index === -1) return null;
+
+  const start = index + NODE_MODULES.length;
+  let end = filename.indexOf(path.sep, start);
+  if (end !== -1 && filename[start] === '@') {
+    end = filename.indexOf(path.sep, end + 1);
+  }
+  if (end === -1) return null;
+
+  const name = filename.slice(start, end);
+  // .bin, .pnpm and similar are not packages
+  if (name.startsWith('.')) return null;
+
+  return {
+    name: path.sep === '/' ? name : name.split(path.sep).join('/'),
+    root: filename.slice(0, end)
+  };
+}
+
+// "name@range" or "@scope/name@range" -> name
+function specName(spec: string): string {
+  const at = spec.lastIndexOf('@');
+  return at > 0 ? spec.slice(0, at) : spec;
+}
+
+function addVersion(lockfile: Lockfile, name: string, version: string): void {
+  let versions = lockfile.byName.get(name);
+  if (!versions) {
+    versions = new Set();
+    lockfile.byName.set(name, versions);
+  }
+  versions.add(version);
+}
+
+// package-lock.json: v2/v3 list every install path under "packages";
+// v1 nests "dependencies" the way node_modules nests
+function parsePackageLock(content: string): Lockfile {
+  const lock = JSON.parse(content);
+  const lockfile: Lockfile = { byPath: new Map(), byName: new Map() };
+
+  if (lock.packages) {
+    for (const [installPath, entry] of Object.entries<any>(lock.packages)) {
+      // "" is the project itself; workspace folders hold no installs
+      const nameIndex = installPath.lastIndexOf('node_modules/');
+      if (nameIndex === -1 || !entry?.version) continue;
+      lockfile.byPath.set(installPath, entry.version);
+      addVersion(lockfile, installPath.slice(nameIndex + 'node_modules/'.length), entry.version);
+    }
+    return lockfile;
+  }
+
+  const walk = (dependencies: Record<string, any>, prefix: string) => {
+    for (const [name, entry] of Object.entries(dependencies)) {
+      const installPath = `${prefix}node_modules/${name}`;
+      if (entry?.version) {
+        lockfile.byPath.set(installPath, entry.version);
+        addVersion(lockfile, name, entry.version);
+      }
+      if (entry?.dependencies) walk(entry.dependencies, `${installPath}/`);
+    }
+  };
+  walk(lock.dependencies || {}, '');
+
+  return lockfile;
+}
+
+// yarn.lock, classic ('version "1.2.3"') and berry ('version: 1.2.3')
+function parseYarnLock(content: string): Lockfile {
+  const lockfile: Lockfile = { byPath: new Map(), byName: new Map() };
+  let names: string[] = [];
+
+  for (const line of content.split('\n')) {
+    if (!line || line.startsWith('#')) continue;
+
+    if (!line.startsWith(' ')) {
+      names = line.endsWith(':')
+        ? line.slice(0, -1).split(',').map(spec => specName(spec.trim().replace(/^"|"$/g, '')))
+        : [];
+      continue;
+    }
+
+    const match = /^\s+version:?\s+"?([^"\s]+)"?/.exec(line);
+    if (match && names.length > 0) {
+      for (const name of names) addVersion(lockfile, name, match[1]!);
+      names = [];
+    }
+  }
+
+  return lockfile;
+}
+
+// pnpm-lock.yaml keys under "packages": "/name/1.2.3" (v5),
+// "/name@1.2.3(peers)" (v6) or "name@1.2.3" (v9)
+function parsePnpmLock(content: string): Lockfile {
+  const lockfile: Lockfile = { byPath: new Map(), byName: new Map() };
+  let inPackages = false;
+
+  for (const line of content.split('\n')) {
+    // Sections are separated by blank lines
+    if (!line.trim()) continue;
+
+    if (!line.startsWith(' ')) {
+      inPackages = line.trimEnd() === 'packages:';
+      continue;
+    }
+
+    const match = inPackages ? /^ {2}['"]?\/?([^'":\s]+)['"]?:\s*$/.exec(line) : null;
+    if (!match) continue;
+
+    const key = match[1]!.replace(/[(_].*$/, '');
+    const at = key.lastIndexOf('@');
+    if (at > 0) {
+      addVersion(lockfile, key.slice(0, at), key.slice(at + 1));
+    } else {
+      const slash = key.lastIndexOf('/');
+      if (slash > 0) addVersion(lockfile, key.slice(0, slash), key.slice(slash + 1));
+    }
+  }
+
+  return lockfile;
+}
+
+export class PackageResolver {
+  private static resolvers = new Map<string, PackageResolver>();
+
+  private projectRoot: string;
+  private lockfilePath: string | null;
+  private lockfile: Lockfile | null | undefined;
+  private versions = new Map<string, string>(); // package root -> version
+  private stats = {
+    lockfileParseTime: 0,
+    cacheHits: 0,
+    lockfileHits: 0,
+    pathHits: 0,
+    manifestReads: 0,
+    failures: 0
+  };
+
+  constructor(projectRoot: string, lockfilePath?: string) {
+    this.projectRoot = projectRoot;
+    this.lockfilePath = lockfilePath ?? LOCKFILES
+      .map(lockfile => path.join(projectRoot, lockfile))
+      .find(lockfile => fs.existsSync(lockfile)) ?? null;
+  }
+
+  // One shared resolver, and so one lockfile parse, per project
+  public static forProject(projectRoot: string, lockfilePath?: string): PackageResolver {
+    let resolver = PackageResolver.resolvers.get(projectRoot);
+    if (!resolver) {
+      resolver = new PackageResolver(projectRoot, lockfilePath || undefined);
+      PackageResolver.resolvers.set(projectRoot, resolver);
+    }
+    return resolver;
+  }
+
+  // Version installed at a package root, or null if it cannot be found
+  public versionAt(location: PackageLocation): string | null {
+    const cached = this.versions.get(location.root);
+    if (cached !== undefined) {
+      this.stats.cacheHits++;
+      return cached;
+    }
+
+    const version = this.versionFromPnpmPath(location)
+      ?? this.versionFromLockfile(location)
+      ?? this.versionFromManifest(location.root);
+
+    if (version === null) {
+      this.stats.failures++;
+      return null;
+    }
+
+    this.versions.set(location.root, version);
+    return version;
+  }
+
+  // Version of a dependency as the project would resolve it
+  public versionOf(packageName: string): string | null {
+    const lockfile = this.loadLockfile();
+    const pinned = lockfile?.byPath.get(`node_modules/${packageName}`);
+    if (pinned) {
+      this.stats.lockfileHits++;
+      return pinned;
+    }
+
+    try {
+      const manifest = require.resolve(`${packageName}/package.json`, { paths: [this.projectRoot] });
+      return this.versionAt({ name: packageName, root: path.dirname(manifest) });
+    } catch {
+      const versions = lockfile?.byName.get(packageName);
+      if (versions?.size === 1) {
+        this.stats.lockfileHits++;
+        return versions.values().next().value ?? null;
+      }
+      this.stats.failures++;
+      return null;
+    }
+  }
+
+  public getStats(): PackageResolverStats {
+    return {
+      lockfile: this.lockfilePath,
+      resolved: this.versions.size,
+      ...this.stats
+    };
+  }
+
+  private loadLockfile(): Lockfile | null {
+    if (this.lockfile !== undefined) return this.lockfile;
+
+    this.lockfile = null;
+    if (!this.lockfilePath) return null;
+
+    const startTime = process.hrtime.bigint();
+    try {
+      const content = fs.readFileSync(this.lockfilePath, 'utf8');
+      const basename = path.basename(this.lockfilePath);
+      this.lockfile = basename === 'yarn.lock'
+        ? parseYarnLock(content)
+        : basename === 'pnpm-lock.yaml'
+          ? parsePnpmLock(content)
+          : parsePackageLock(content);
+    } catch {
+      // Fall back to reading package.json files
+    }
+    this.stats.lockfileParseTime = Number(process.hrtime.bigint() - startTime) / 1000000;
+
+    return this.lockfile;
+  }
+
+  // .pnpm/<name>@<version>[_peers]/node_modules/<name>, "/" in scoped
+  // names written as "+"
+  private versionFromPnpmPath(location: PackageLocation): string | null {
+    const index = location.root.lastIndexOf(PNPM_STORE);
+    if (index === -1) return null;
+
+    const start = index + PNPM_STORE.length;
+    const entry = location.root.slice(start, location.root.indexOf(path.sep, start)).replace(/[(_].*$/, '');
+    const at = entry.lastIndexOf('@');
+    if (at <= 0 || entry.slice(0, at).replace('+', '/') !== location.name) return null;
+
+    this.stats.pathHits++;
+    return entry.slice(at + 1);
+  }
+
+  private versionFromLockfile(location: PackageLocation): string | null {
+    const lockfile = this.loadLockfile();
+    if (!lockfile) return null;
+
+    const installPath = path.relative(path.dirname(this.lockfilePath!), location.root).split(path.sep).join('/');
+    const pinned = lockfile.byPath.get(installPath);
+    if (pinned) {
+      this.stats.lockfileHits++;
+      return pinned;
+    }
+
+    // yarn and pnpm locks are keyed by name; trust them only when one
+    // version of the package is installed
+    const versions = lockfile.byPath.size === 0 ? lockfile.byName.get(location.name) : undefined;
+    if (versions?.size === 1) {
+      this.stats.lockfileHits++;
+      return versions.values().next().value ?? null;
+    }
+
+    return null;
+  }
+
+  private versionFromManifest(root: string): string | null {
+    try {
+      this.stats.manifestReads++;
+      const packageJson = JSON.parse(fs.readFileSync(path.join(root, 'package.json'), 'utf8'));
+      return packageJson.version || '0.0.0';
+    } catch {
+      return null;
+    }
+  }
+}
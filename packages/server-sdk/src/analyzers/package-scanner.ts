@@ -2,6 +2,7 @@
 import * as fs from 'fs';
 import * as path from 'path';
 import { PackageInfo, PackageDependency, DependencyType } from '@tracelens/shared';
+import { PackageResolver } from './package-resolver';
 
 export interface PackageAnalysis {
   packageInfo: PackageInfo;
@@ -19,11 +20,13 @@ export interface PackageAnalysis {
 export class PackageScanner {
   private packageJsonPath: string;
   private lockfilePath: string;
+  private resolver: PackageResolver;
 
   constructor(projectRoot?: string) {
     const root = projectRoot || process.cwd();
     this.packageJsonPath = this.findPackageJson(root);
     this.lockfilePath = this.findLockfile(path.dirname(this.packageJsonPath));
+    this.resolver = PackageResolver.forProject(path.dirname(this.packageJsonPath), this.lockfilePath);
   }
 
   public async analyze(): Promise<PackageAnalysis> {
@@ -194,12 +197,6 @@ export class PackageScanner {
   }
 
   private resolvePackageVersion(packageName: string): string {
-    try {
-      const packagePath = require.resolve(`${packageName}/package.json`);
-      const packageJson = JSON.parse(fs.readFileSync(packagePath, 'utf8'));
-      return packageJson.version || '0.0.0';
-    } catch {
-      return '0.0.0';
-    }
+    return this.resolver.versionOf(packageName) || '0.0.0';
   }
 }
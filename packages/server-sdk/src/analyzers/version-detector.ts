@@ -2,6 +2,7 @@
 import * as fs from 'fs';
 import * as path from 'path';
 import { execSync } from 'child_process';
+import { PackageResolver } from './package-resolver';
 
 export interface VersionInfo {
   name: string;
@@ -22,10 +23,12 @@ export interface VersionAnalysis {
 export class VersionDetector {
   private projectRoot: string;
   private packageManager: 'npm' | 'yarn' | 'pnpm';
+  private resolver: PackageResolver;
 
   constructor(projectRoot?: string) {
     this.projectRoot = projectRoot || process.cwd();
     this.packageManager = this.detectPackageManager();
+    this.resolver = PackageResolver.forProject(this.projectRoot);
   }
 
   public async analyzeVersions(): Promise<VersionAnalysis> {
@@ -56,13 +59,7 @@ export class VersionDetector {
   }
 
   public async getPackageVersion(packageName: string): Promise<string | null> {
-    try {
-      const packageJsonPath = require.resolve(`${packageName}/package.json`);
-      const packageJson = JSON.parse(fs.readFileSync(packageJsonPath, 'utf8'));
-      return packageJson.version || null;
-    } catch {
-      return null;
-    }
+    return this.resolver.versionOf(packageName);
   }
 
   public async checkForUpdates(packageName: string): Promise<{
@@ -3,19 +3,44 @@ import * as fs from 'fs';
 import * as path from 'path';
 import { DependencySnapshot, PackageDependency, RuntimeDependency, DependencyType } from '@tracelens/shared';
 import { ServerSDKConfig } from './tracer';
+import { PackageResolver, PackageResolverStats, PackageLocation, packageOf } from '../analyzers/package-resolver';
+
+export interface RequireHookStats {
+  modulesLoaded: number;
+  packagesLoaded: number;
+  loadTime: number; // milliseconds spent loading modules, hook included
+  overheadTime: number; // milliseconds of that spent in the hook's own tracking
+  averageOverhead: number; // milliseconds per module
+  overheadRatio: number; // overheadTime / loadTime
+  resolver: PackageResolverStats;
+}
 
 export class DependencyScanner {
   private config: ServerSDKConfig;
   private packageJsonPath: string;
   private lockfilePath: string;
+  private resolver: PackageResolver;
+  // Keyed by package root, so nested copies of a package stay apart
   private runtimeDependencies = new Map<string, RuntimeDependency>();
+  // Loaded packages whose version is looked up when a snapshot is taken,
+  // keeping file reads off the require path
+  private unresolvedPackages = new Map<string, PackageLocation>();
   private packageInfo: any = null;
   private scanInterval: NodeJS.Timeout | null = null;
+  private originalLoader: ((module: any, filename: string) => any) | undefined;
+  private hookedLoader: ((module: any, filename: string) => any) | undefined;
+  private loadDepth = 0;
+  private requireStats = {
+    modulesLoaded: 0,
+    loadTime: 0n, // nanoseconds
+    overheadTime: 0n
+  };
 
   constructor(config: ServerSDKConfig) {
     this.config = config;
     this.packageJsonPath = this.findPackageJson();
     this.lockfilePath = this.findLockfile();
+    this.resolver = PackageResolver.forProject(path.dirname(this.packageJsonPath), this.lockfilePath);
   }
 
   public async initialize(): Promise<void> {
@@ -46,9 +71,32 @@ export class DependencyScanner {
       clearInterval(this.scanInterval);
       this.scanInterval = null;
     }
+
+    // Leave the loader alone if something hooked it after us
+    if (this.hookedLoader && require.extensions['.js'] === this.hookedLoader) {
+      require.extensions['.js'] = this.originalLoader!;
+    }
+    this.hookedLoader = undefined;
+  }
+
+  public getRequireStats(): RequireHookStats {
+    const { modulesLoaded, loadTime, overheadTime } = this.requireStats;
+    const loadTimeMs = Number(loadTime) / 1000000;
+    const overheadTimeMs = Number(overheadTime) / 1000000;
+
+    return {
+      modulesLoaded,
+      packagesLoaded: this.runtimeDependencies.size,
+      loadTime: loadTimeMs,
+      overheadTime: overheadTimeMs,
+      averageOverhead: modulesLoaded > 0 ? overheadTimeMs / modulesLoaded : 0,
+      overheadRatio: loadTime > 0n ? overheadTimeMs / loadTimeMs : 0,
+      resolver: this.resolver.getStats()
+    };
   }
 
   public getSnapshot(): DependencySnapshot {
+    this.resolvePendingVersions();
     const dependencies = this.extractDependencies();
     const runtimeDeps = Array.from(this.runtimeDependencies.values());
 
@@ -111,79 +159,80 @@ export class DependencyScanner {
     }
   }
 
+  // Runs once per module actually loaded; cached requires never reach
+  // the loader. Time spent tracking is measured separately from loading.
   private hookRequire(): void {
-    const originalRequire = require.extensions['.js'];
+    if (this.hookedLoader) return;
+
+    const originalLoader = require.extensions['.js'];
     const self = this;
 
-    require.extensions['.js'] = function(module: any, filename: string) {
+    this.originalLoader = originalLoader;
+    this.hookedLoader = require.extensions['.js'] = function(this: any, module: any, filename: string) {
       const startTime = process.hrtime.bigint();
-      
+      self.loadDepth++;
+      let loaded = false;
+
       try {
-        const result = originalRequire?.call(this, module, filename);
-        
+        const result = originalLoader?.call(this, module, filename);
+        loaded = true;
+        return result;
+      } finally {
+        self.loadDepth--;
         const endTime = process.hrtime.bigint();
-        const loadTime = Number(endTime - startTime) / 1000000; // Convert to milliseconds
 
-        // Track runtime dependency
-        self.trackRuntimeDependency(filename, loadTime);
-        
-        return result;
-      } catch (error) {
-        throw error;
+        if (loaded) {
+          // Convert to milliseconds
+          self.trackRuntimeDependency(filename, Number(endTime - startTime) / 1000000);
+        }
+
+        const trackedTime = process.hrtime.bigint();
+        self.requireStats.modulesLoaded++;
+        self.requireStats.overheadTime += trackedTime - endTime;
+        // Nested loads are already inside their parent's time
+        if (self.loadDepth === 0) {
+          self.requireStats.loadTime += trackedTime - startTime;
+        }
       }
     };
   }
 
   private trackRuntimeDependency(filename: string, loadTime: number): void {
     try {
-      // Extract package name from filename
-      const packageName = this.extractPackageName(filename);
-      if (!packageName || packageName.startsWith('.')) return;
+      const location = packageOf(filename);
+      if (!location) return;
 
-      const existing = this.runtimeDependencies.get(packageName);
-      
+      const existing = this.runtimeDependencies.get(location.root);
       if (existing) {
         existing.loadTime += loadTime;
         existing.executionTime += loadTime;
-      } else {
-        this.runtimeDependencies.set(packageName, {
-          name: packageName,
-          version: this.getPackageVersion(packageName) || '0.0.0',
-          loadTime,
-          executionTime: loadTime,
-          memoryUsage: 0, // Would need more complex tracking
-          importPath: filename,
-          isEsm: false, // Simplified for now
-          exports: [], // Would need module introspection
-        });
+        return;
       }
+
+      this.unresolvedPackages.set(location.root, location);
+      this.runtimeDependencies.set(location.root, {
+        name: location.name,
+        version: '0.0.0', // Resolved when a snapshot is taken
+        loadTime,
+        executionTime: loadTime,
+        memoryUsage: 0, // Would need more complex tracking
+        importPath: filename,
+        isEsm: false, // Simplified for now
+        exports: [], // Would need module introspection
+      });
     } catch (error) {
       // Silently ignore tracking errors
     }
   }
 
-  private extractPackageName(filename: string): string {
-    const nodeModulesIndex = filename.indexOf('node_modules');
-    if (nodeModulesIndex === -1) return '';
-
-    const afterNodeModules = filename.substring(nodeModulesIndex + 'node_modules'.length + 1);
-    const parts = afterNodeModules.split(path.sep);
-    
-    if (parts[0] && parts[0].startsWith('@')) {
-      return `${parts[0]}/${parts[1] || ''}`;
-    }
-    
-    return parts[0] || 'unknown';
-  }
-
-  private getPackageVersion(packageName: string): string {
-    try {
-      const packagePath = require.resolve(`${packageName}/package.json`);
-      const packageJson = JSON.parse(fs.readFileSync(packagePath, 'utf8'));
-      return packageJson.version || '0.0.0';
-    } catch {
-      return '0.0.0';
+  private resolvePendingVersions(): void {
+    for (const [root, location] of this.unresolvedPackages) {
+      const dependency = this.runtimeDependencies.get(root);
+      if (dependency) {
+        dependency.version = this.resolver.versionAt(location) || '0.0.0';
+      }
     }
+    this.unresolvedPackages.clear();
   }
 
   private extractDependencies(): PackageDependency[] {
@@ -231,7 +280,7 @@ export class DependencyScanner {
 
   private scanRuntimeDependencies(): void {
     // Periodic scan for memory usage updates
-    for (const [name, dep] of this.runtimeDependencies) {
+    for (const [root, dep] of this.runtimeDependencies) {
       // Update memory usage if possible
       // This would require more sophisticated memory tracking
     }
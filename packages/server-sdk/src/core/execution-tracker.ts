@@ -1,12 +1,19 @@
 // Function call tracing and execution tracking
+//
+// Every call is recorded into a per-function latency histogram; only a
+// sampled fraction of calls also gets an OpenTelemetry span. Each function
+// keeps a cumulative histogram and one covering calls since the last delta
+// read, which getMetricsDelta() hands out and resets.
 import { trace, context, SpanStatusCode, SpanKind } from '@opentelemetry/api';
 import { ServerSDKConfig } from './tracer';
+import { LatencyHistogram } from './latency-histogram';
 
 export interface ExecutionMetrics {
   totalCalls: number;
   totalDuration: number;
   averageDuration: number;
   errorCount: number;
+  since: number; // start of the period the metrics cover
   functionMetrics: Map<string, FunctionMetrics>;
 }
 
@@ -15,24 +22,43 @@ export interface FunctionMetrics {
   callCount: number;
   totalDuration: number;
   averageDuration: number;
+  minDuration: number;
+  maxDuration: number;
+  p50: number;
+  p90: number;
+  p99: number;
   errorCount: number;
   lastCalled: number;
 }
 
+export interface ExecutionTrackerOptions {
+  spanSampleRate: number; // fraction of calls traced with a span; 0 records metrics only
+}
+
+const DEFAULT_OPTIONS: ExecutionTrackerOptions = {
+  spanSampleRate: 1.0
+};
+
+interface FunctionStats {
+  name: string;
+  total: LatencyHistogram;
+  delta: LatencyHistogram;
+  errors: number;
+  deltaErrors: number;
+  lastCalled: number;
+}
+
 export class ExecutionTracker {
   private config: ServerSDKConfig;
-  private metrics: ExecutionMetrics;
+  private options: ExecutionTrackerOptions;
+  private functions = new Map<string, FunctionStats>();
+  private since = Date.now();
+  private deltaSince = this.since;
   private tracer = trace.getTracer('tracelens-execution-tracker');
 
-  constructor(config: ServerSDKConfig) {
+  constructor(config: ServerSDKConfig, options: Partial<ExecutionTrackerOptions> = {}) {
     this.config = config;
-    this.metrics = {
-      totalCalls: 0,
-      totalDuration: 0,
-      averageDuration: 0,
-      errorCount: 0,
-      functionMetrics: new Map(),
-    };
+    this.options = { ...DEFAULT_OPTIONS, ...options };
   }
 
   public initialize(): void {
@@ -52,6 +78,10 @@ export class ExecutionTracker {
     const name = functionName || fn.name || 'anonymous';
     
     return ((...args: any[]) => {
+      if (!this.shouldTrace()) {
+        return this.callUntraced(name, fn, args);
+      }
+
       const startTime = process.hrtime.bigint();
       const span = this.tracer.startSpan(`function.${name}`, {
         kind: SpanKind.INTERNAL,
@@ -112,6 +142,10 @@ export class ExecutionTracker {
     const name = functionName || fn.name || 'anonymous';
     
     return (async (...args: any[]) => {
+      if (!this.shouldTrace()) {
+        return this.callUntraced(name, fn, args);
+      }
+
       const startTime = process.hrtime.bigint();
       const span = this.tracer.startSpan(`async.${name}`, {
         kind: SpanKind.INTERNAL,
@@ -151,64 +185,128 @@ export class ExecutionTracker {
   }
 
   public getMetrics(): ExecutionMetrics {
-    // Update average duration
-    this.metrics.averageDuration = this.metrics.totalCalls > 0 
-      ? this.metrics.totalDuration / this.metrics.totalCalls 
-      : 0;
+    return this.buildMetrics(this.since, stats => stats.total, stats => stats.errors);
+  }
+
+  // Metrics for calls since the previous delta read, which this resets
+  public getMetricsDelta(): ExecutionMetrics {
+    const metrics = this.buildMetrics(this.deltaSince, stats => stats.delta, stats => stats.deltaErrors);
 
-    // Update function averages
-    for (const [name, funcMetrics] of this.metrics.functionMetrics) {
-      funcMetrics.averageDuration = funcMetrics.callCount > 0
-        ? funcMetrics.totalDuration / funcMetrics.callCount
-        : 0;
+    for (const stats of this.functions.values()) {
+      stats.delta.reset();
+      stats.deltaErrors = 0;
     }
+    this.deltaSince = Date.now();
 
-    return {
-      ...this.metrics,
-      functionMetrics: new Map(this.metrics.functionMetrics),
-    };
+    return metrics;
   }
 
   public resetMetrics(): void {
-    this.metrics = {
+    this.functions.clear();
+    this.since = Date.now();
+    this.deltaSince = this.since;
+  }
+
+  private shouldTrace(): boolean {
+    const rate = this.options.spanSampleRate;
+    return rate >= 1 || (rate > 0 && Math.random() < rate);
+  }
+
+  // Runs an unsampled call with timing only: no span and no context switch
+  private callUntraced(name: string, fn: (...args: any[]) => any, args: any[]): any {
+    const startTime = process.hrtime.bigint();
+    try {
+      const result = fn.apply(this, args);
+
+      if (result && typeof result.then === 'function') {
+        return result.then(
+          (value: any) => {
+            this.recordExecution(name, startTime, false);
+            return value;
+          },
+          (error: any) => {
+            this.recordExecution(name, startTime, true);
+            throw error;
+          }
+        );
+      }
+
+      this.recordExecution(name, startTime, false);
+      return result;
+    } catch (error) {
+      this.recordExecution(name, startTime, true);
+      throw error;
+    }
+  }
+
+  private buildMetrics(
+    since: number,
+    histogramOf: (stats: FunctionStats) => LatencyHistogram,
+    errorsOf: (stats: FunctionStats) => number
+  ): ExecutionMetrics {
+    const metrics: ExecutionMetrics = {
       totalCalls: 0,
       totalDuration: 0,
       averageDuration: 0,
       errorCount: 0,
+      since,
       functionMetrics: new Map(),
     };
+
+    for (const stats of this.functions.values()) {
+      const histogram = histogramOf(stats);
+      if (histogram.count === 0) continue;
+
+      const errorCount = errorsOf(stats);
+      metrics.totalCalls += histogram.count;
+      metrics.totalDuration += histogram.sum;
+      metrics.errorCount += errorCount;
+
+      metrics.functionMetrics.set(stats.name, {
+        name: stats.name,
+        callCount: histogram.count,
+        totalDuration: histogram.sum,
+        averageDuration: histogram.sum / histogram.count,
+        minDuration: histogram.min,
+        maxDuration: histogram.max,
+        p50: histogram.percentile(0.5),
+        p90: histogram.percentile(0.9),
+        p99: histogram.percentile(0.99),
+        errorCount,
+        lastCalled: stats.lastCalled,
+      });
+    }
+
+    metrics.averageDuration = metrics.totalCalls > 0
+      ? metrics.totalDuration / metrics.totalCalls
+      : 0;
+
+    return metrics;
   }
 
   private recordExecution(functionName: string, startTime: bigint, isError: boolean): void {
     const endTime = process.hrtime.bigint();
     const duration = Number(endTime - startTime) / 1000000; // Convert to milliseconds
 
-    // Update global metrics
-    this.metrics.totalCalls++;
-    this.metrics.totalDuration += duration;
-    if (isError) {
-      this.metrics.errorCount++;
-    }
-
-    // Update function-specific metrics
-    let funcMetrics = this.metrics.functionMetrics.get(functionName);
-    if (!funcMetrics) {
-      funcMetrics = {
+    let stats = this.functions.get(functionName);
+    if (!stats) {
+      stats = {
         name: functionName,
-        callCount: 0,
-        totalDuration: 0,
-        averageDuration: 0,
-        errorCount: 0,
-        lastCalled: Date.now(),
+        total: new LatencyHistogram(),
+        delta: new LatencyHistogram(),
+        errors: 0,
+        deltaErrors: 0,
+        lastCalled: 0,
       };
-      this.metrics.functionMetrics.set(functionName, funcMetrics);
+      this.functions.set(functionName, stats);
     }
 
-    funcMetrics.callCount++;
-    funcMetrics.totalDuration += duration;
-    funcMetrics.lastCalled = Date.now();
+    stats.total.record(duration);
+    stats.delta.record(duration);
+    stats.lastCalled = Date.now();
     if (isError) {
-      funcMetrics.errorCount++;
+      stats.errors++;
+      stats.deltaErrors++;
     }
   }
 }
@@ -0,0 +1,100 @@
+// Log-linear latency histogram over a preallocated typed array
+//
+// Durations are kept in whole microseconds. Values below 32us get a bucket
+// each; every power of two above that is split into 16 linear buckets, so a
+// bucket is never wider than 1/16 of its lower bound. Recording is a few
+// integer operations and one array increment, with no allocation.
+
+const LINEAR_BUCKETS = 32;
+const SUB_BUCKET_BITS = 4;
+const SUB_BUCKETS = 1 << SUB_BUCKET_BITS;
+const LINEAR_BITS = 5; // log2(LINEAR_BUCKETS)
+const MAX_VALUE = 0xffffffff; // microseconds, about 71 minutes
+
+export const BUCKET_COUNT = LINEAR_BUCKETS + (32 - LINEAR_BITS) * SUB_BUCKETS;
+
+function bucketIndex(microseconds: number): number {
+  if (microseconds < LINEAR_BUCKETS) return microseconds;
+
+  const exponent = 31 - Math.clz32(microseconds);
+  const shift = exponent - SUB_BUCKET_BITS;
+  return LINEAR_BUCKETS
+    + (exponent - LINEAR_BITS) * SUB_BUCKETS
+    + ((microseconds >>> shift) & (SUB_BUCKETS - 1));
+}
+
+// [lower, upper) of a bucket, in microseconds
+function bucketBounds(index: number): [number, number] {
+  if (index < LINEAR_BUCKETS) return [index, index + 1];
+
+  const exponent = LINEAR_BITS + Math.floor((index - LINEAR_BUCKETS) / SUB_BUCKETS);
+  const width = 2 ** (exponent - SUB_BUCKET_BITS);
+  const lower = (SUB_BUCKETS + (index - LINEAR_BUCKETS) % SUB_BUCKETS) * width;
+  return [lower, lower + width];
+}
+
+export class LatencyHistogram {
+  public count = 0;
+  public sum = 0; // milliseconds
+  public min = Infinity;
+  public max = 0;
+  private counts = new Float64Array(BUCKET_COUNT);
+
+  public record(durationMs: number): void {
+    const microseconds = Math.min(Math.max(Math.round(durationMs * 1000), 0), MAX_VALUE);
+    const index = bucketIndex(microseconds);
+    this.counts[index] = this.counts[index]! + 1;
+
+    this.count++;
+    this.sum += durationMs;
+    if (durationMs < this.min) this.min = durationMs;
+    if (durationMs > this.max) this.max = durationMs;
+  }
+
+  // Duration in milliseconds below which a fraction p (0..1) of calls fell,
+  // accurate to about 3%
+  public percentile(p: number): number {
+    if (this.count === 0) return 0;
+
+    const rank = Math.max(1, Math.ceil(p * this.count));
+    let seen = 0;
+    for (let i = 0; i < BUCKET_COUNT; i++) {
+      seen += this.counts[i]!;
+      if (seen >= rank) {
+        const [lower, upper] = bucketBounds(i);
+        const estimate = (lower + upper) / 2 / 1000;
+        return Math.min(Math.max(estimate, this.min), this.max);
+      }
+    }
+    return this.max;
+  }
+
+  public merge(other: LatencyHistogram): void {
+    for (let i = 0; i < BUCKET_COUNT; i++) {
+      this.counts[i] = this.counts[i]! + other.counts[i]!;
+    }
+    this.count += other.count;
+    this.sum += other.sum;
+    this.min = Math.min(this.min, other.min);
+    this.max = Math.max(this.max, other.max);
+  }
+
+  public reset(): void {
+    this.counts.fill(0);
+    this.count = 0;
+    this.sum = 0;
+    this.min = Infinity;
+    this.max = 0;
+  }
+
+  // Non-empty buckets as [upper bound in milliseconds, count]
+  public getBuckets(): Array<[number, number]> {
+    const buckets: Array<[number, number]> = [];
+    for (let i = 0; i < BUCKET_COUNT; i++) {
+      if (this.counts[i]! > 0) {
+        buckets.push([bucketBounds(i)[1] / 1000, this.counts[i]!]);
+      }
+    }
+    return buckets;
+  }
+}
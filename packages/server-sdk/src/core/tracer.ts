@@ -13,6 +13,7 @@ export interface ServerSDKConfig extends TracingConfig {
   enableDependencyScanning: boolean;
   enableExecutionTracking: boolean;
   otlpEndpoint?: string;
+  executionSpanSampleRate?: number; // fraction of tracked calls that get a span
   debug: boolean;
 }
 
@@ -33,11 +34,14 @@ export class TraceLensServerSDK {
       enableDependencyScanning: config.enableDependencyScanning !== false,
       enableExecutionTracking: config.enableExecutionTracking !== false,
       otlpEndpoint: config.otlpEndpoint || undefined,
+      executionSpanSampleRate: config.executionSpanSampleRate ?? 1.0,
       debug: config.debug || false
     };
 
     this.dependencyScanner = new DependencyScanner(this.config);
-    this.executionTracker = new ExecutionTracker(this.config);
+    this.executionTracker = new ExecutionTracker(this.config, {
+      spanSampleRate: this.config.executionSpanSampleRate
+    });
   }
 
   public async initialize(): Promise<void> {
@@ -111,6 +115,10 @@ export class TraceLensServerSDK {
     return this.executionTracker.getMetrics();
   }
 
+  public getExecutionMetricsDelta() {
+    return this.executionTracker.getMetricsDelta();
+  }
+
   public isInitialized(): boolean {
     return this.initialized;
   }
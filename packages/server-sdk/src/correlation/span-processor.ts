@@ -1,8 +1,18 @@
 // Custom span processing for TraceLens integration
+//
+// Ended spans are held by reference in a fixed-size ring buffer; nothing is
+// copied on the application's request path. Attribute extraction happens
+// when a batch is exported. Batches are sent gzipped, at most maxInFlight
+// at a time, and retried with exponential backoff. Spans arriving while the
+// buffer is full are dropped and counted.
+import { gzip } from 'zlib';
+import { promisify } from 'util';
 import { SpanProcessor, Span, ReadableSpan } from '@opentelemetry/sdk-trace-base';
 import { Context } from '@opentelemetry/api';
 import { DependencySnapshot, RuntimeDependency } from '@tracelens/shared';
 
+const gzipAsync = promisify(gzip);
+
 export interface TraceLensSpanData {
   traceId: string;
   spanId: string;
@@ -17,21 +27,72 @@ export interface TraceLensSpanData {
   cpuUsage?: number;
 }
 
+export interface TraceLensSpanProcessorOptions {
+  maxSpans?: number; // ring buffer capacity
+  flushInterval?: number; // milliseconds
+  maxBatchSize?: number;
+  maxInFlight?: number; // concurrent export requests
+  maxRetries?: number;
+  retryDelay?: number; // milliseconds before the first retry, doubled per attempt
+  maxRetryDelay?: number;
+  endpoint?: string; // batches are POSTed here by the default onFlush
+  compression?: 'gzip' | 'none';
+  headers?: Record<string, string>;
+  onFlush?: (spans: TraceLensSpanData[]) => void | Promise<void>;
+}
+
+export interface SpanProcessorStats {
+  buffered: number;
+  capacity: number;
+  dropped: number; // spans that arrived while the buffer was full
+  exported: number;
+  failed: number; // spans in batches that ran out of retries
+  retries: number;
+  inFlight: number;
+  bytesSent: number; // request bodies sent to the endpoint, after compression
+}
+
 export class TraceLensSpanProcessor implements SpanProcessor {
-  private spans: TraceLensSpanData[] = [];
+  private buffer: Array<ReadableSpan | undefined>;
+  private head = 0; // index of the oldest buffered span
+  private count = 0;
   private dependencySnapshot: DependencySnapshot | null = null;
   private maxSpans: number;
   private flushInterval: number;
+  private maxBatchSize: number;
+  private maxInFlight: number;
+  private maxRetries: number;
+  private retryDelay: number;
+  private maxRetryDelay: number;
+  private endpoint: string | undefined;
+  private compression: 'gzip' | 'none';
+  private headers: Record<string, string>;
   private flushTimer: NodeJS.Timeout | null = null;
+  private flushScheduled = false;
+  private exports = new Set<Promise<void>>();
+  private backoffTimers = new Set<NodeJS.Timeout>();
+  private shuttingDown = false;
+  private stats = {
+    dropped: 0,
+    exported: 0,
+    failed: 0,
+    retries: 0,
+    bytesSent: 0
+  };
 
-  constructor(options: {
-    maxSpans?: number;
-    flushInterval?: number;
-    onFlush?: (spans: TraceLensSpanData[]) => void;
-  } = {}) {
+  constructor(options: TraceLensSpanProcessorOptions = {}) {
     this.maxSpans = options.maxSpans || 1000;
     this.flushInterval = options.flushInterval || 30000; // 30 seconds
-    
+    this.maxBatchSize = Math.min(options.maxBatchSize || 512, this.maxSpans);
+    this.maxInFlight = options.maxInFlight || 2;
+    this.maxRetries = options.maxRetries ?? 5;
+    this.retryDelay = options.retryDelay || 1000;
+    this.maxRetryDelay = options.maxRetryDelay || 30000;
+    this.endpoint = options.endpoint;
+    this.compression = options.compression || 'gzip';
+    this.headers = options.headers || {};
+    this.buffer = new Array(this.maxSpans);
+
     if (options.onFlush) {
       this.onFlush = options.onFlush;
     }
@@ -59,32 +120,44 @@ export class TraceLensSpanProcessor implements SpanProcessor {
   }
 
   public onEnd(span: ReadableSpan): void {
-    try {
-      const spanData = this.extractSpanData(span);
-      this.spans.push(spanData);
+    if (this.count === this.maxSpans) {
+      this.stats.dropped++;
+      return;
+    }
 
-      // Flush if buffer is full
-      if (this.spans.length >= this.maxSpans) {
+    this.buffer[(this.head + this.count) % this.maxSpans] = span;
+    this.count++;
+
+    // Export a full batch once the current request has finished
+    if (this.count >= this.maxBatchSize && !this.flushScheduled) {
+      this.flushScheduled = true;
+      setImmediate(() => {
+        this.flushScheduled = false;
         this.flush();
-      }
-    } catch (error) {
-      console.error('Error processing span in TraceLens:', error);
+      });
     }
   }
 
-  public forceFlush(): Promise<void> {
-    return new Promise((resolve) => {
+  // Resolves once every span buffered so far has been exported or given up on
+  public async forceFlush(): Promise<void> {
+    this.flush();
+    while (this.exports.size > 0) {
+      await Promise.race(this.exports);
       this.flush();
-      resolve();
-    });
+    }
   }
 
-  public shutdown(): Promise<void> {
-    return new Promise((resolve) => {
-      this.stopFlushTimer();
-      this.flush();
-      resolve();
-    });
+  public async shutdown(): Promise<void> {
+    this.stopFlushTimer();
+
+    // Backoffs are unref'd so idle retries never hold the process open; the
+    // ones shutdown waits on must, or it could exit before they finish
+    this.shuttingDown = true;
+    for (const timer of this.backoffTimers) {
+      timer.ref();
+    }
+
+    await this.forceFlush();
   }
 
   public setDependencySnapshot(snapshot: DependencySnapshot): void {
@@ -92,16 +165,51 @@ export class TraceLensSpanProcessor implements SpanProcessor {
   }
 
   public getSpans(): TraceLensSpanData[] {
-    return [...this.spans];
+    const spans: TraceLensSpanData[] = [];
+    for (let i = 0; i < this.count; i++) {
+      spans.push(this.extractSpanData(this.buffer[(this.head + i) % this.maxSpans]!));
+    }
+    return spans;
   }
 
   public clearSpans(): void {
-    this.spans = [];
+    this.buffer.fill(undefined);
+    this.head = 0;
+    this.count = 0;
+  }
+
+  public getStats(): SpanProcessorStats {
+    return {
+      buffered: this.count,
+      capacity: this.maxSpans,
+      inFlight: this.exports.size,
+      ...this.stats
+    };
   }
 
-  protected onFlush(spans: TraceLensSpanData[]): void {
+  protected async onFlush(spans: TraceLensSpanData[]): Promise<void> {
     // Default implementation - override in constructor
-    console.log(`TraceLens: Flushing ${spans.length} spans`);
+    if (!this.endpoint) {
+      console.log(`TraceLens: Flushing ${spans.length} spans`);
+      return;
+    }
+
+    const json = JSON.stringify({ spans });
+    const body = this.compression === 'gzip' ? await gzipAsync(json) : Buffer.from(json);
+    const response = await fetch(this.endpoint, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        ...(this.compression === 'gzip' ? { 'Content-Encoding': 'gzip' } : {}),
+        ...this.headers
+      },
+      body
+    });
+
+    if (!response.ok) {
+      throw new Error(`TraceLens export failed: ${response.status} ${response.statusText}`);
+    }
+    this.stats.bytesSent += body.length;
   }
 
   private extractSpanData(span: ReadableSpan): TraceLensSpanData {
@@ -188,27 +296,69 @@ export class TraceLensSpanProcessor implements SpanProcessor {
     }
   }
 
+  // Starts exports for buffered batches, up to the in-flight limit
   private flush(): void {
-    if (this.spans.length === 0) return;
+    while (this.count > 0 && this.exports.size < this.maxInFlight) {
+      const size = Math.min(this.count, this.maxBatchSize);
+      const batch: ReadableSpan[] = new Array(size);
+      for (let i = 0; i < size; i++) {
+        batch[i] = this.buffer[this.head]!;
+        this.buffer[this.head] = undefined;
+        this.head = (this.head + 1) % this.maxSpans;
+      }
+      this.count -= size;
 
-    const spansToFlush = [...this.spans];
-    this.spans = [];
+      const exporting: Promise<void> = this.exportBatch(batch).finally(() => {
+        this.exports.delete(exporting);
+      });
+      this.exports.add(exporting);
+    }
+  }
 
+  private async exportBatch(batch: ReadableSpan[]): Promise<void> {
+    let spans: TraceLensSpanData[];
     try {
-      this.onFlush(spansToFlush);
+      spans = batch.map(span => this.extractSpanData(span));
     } catch (error) {
-      console.error('Error in TraceLens span flush:', error);
-      // Re-add spans to buffer on error (with limit)
-      this.spans.unshift(...spansToFlush.slice(0, this.maxSpans - this.spans.length));
+      console.error('Error processing span in TraceLens:', error);
+      this.stats.failed += batch.length;
+      return;
+    }
+
+    for (let attempt = 0; ; attempt++) {
+      try {
+        await this.onFlush(spans);
+        this.stats.exported += spans.length;
+        return;
+      } catch (error) {
+        if (attempt >= this.maxRetries) {
+          console.error('Error in TraceLens span flush:', error);
+          this.stats.failed += spans.length;
+          return;
+        }
+      }
+
+      // Full jitter keeps many processes from retrying in lockstep
+      const delay = Math.min(this.retryDelay * 2 ** attempt, this.maxRetryDelay);
+      this.stats.retries++;
+      await new Promise<void>(resolve => {
+        const timer = setTimeout(() => {
+          this.backoffTimers.delete(timer);
+          resolve();
+        }, Math.random() * delay);
+        if (!this.shuttingDown) timer.unref();
+        this.backoffTimers.add(timer);
+      });
     }
   }
 
   private startFlushTimer(): void {
     this.flushTimer = setInterval(() => {
-      if (this.spans.length > 0) {
+      if (this.count > 0) {
         this.flush();
       }
     }, this.flushInterval);
+    this.flushTimer.unref();
   }
 
   private stopFlushTimer(): void {
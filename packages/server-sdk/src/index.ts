@@ -2,8 +2,10 @@
 export { TraceLensServerSDK } from './core/tracer';
 export type { ServerSDKConfig } from './core/tracer';
 export { DependencyScanner } from './core/dependency-scanner';
+export type { RequireHookStats } from './core/dependency-scanner';
 export { ExecutionTracker } from './core/execution-tracker';
-export type { ExecutionMetrics, FunctionMetrics } from './core/execution-tracker';
+export type { ExecutionMetrics, FunctionMetrics, ExecutionTrackerOptions } from './core/execution-tracker';
+export { LatencyHistogram } from './core/latency-histogram';
 
 // Middleware
 export { createTraceLensMiddleware } from './middleware/express';
@@ -19,11 +21,13 @@ export { ImportTracker, globalImportTracker } from './analyzers/import-tracker';
 export type { ImportEvent, ImportMetrics } from './analyzers/import-tracker';
 export { VersionDetector } from './analyzers/version-detector';
 export type { VersionInfo, VersionAnalysis } from './analyzers/version-detector';
+export { PackageResolver, packageOf } from './analyzers/package-resolver';
+export type { PackageLocation, PackageResolverStats } from './analyzers/package-resolver';
 
 // Correlation
 export { TraceContextManager } from './correlation/trace-context';
 export { TraceLensSpanProcessor } from './correlation/span-processor';
-export type { TraceLensSpanData } from './correlation/span-processor';
+export type { TraceLensSpanData, TraceLensSpanProcessorOptions, SpanProcessorStats } from './correlation/span-processor';
 
 // Re-export shared types for convenience
 export type { 
@@ -105,4 +105,5 @@ export interface PerformanceEvent {
   data: WebVitalsMetrics | ResourceTiming | NavigationTiming | LongTask;
   url: string;
   userAgent: string;
+  sampleWeight?: number; // events this one stands for after sampling (1 / keep probability)
 }